@@ -0,0 +1,448 @@
+"""
+Servicios Falsos para el Harness End-to-End
+-------------------------------------------
+Reemplazos locales de lo que el sync usa por red, para correr el flujo
+completo sin credenciales y con costos de red reproducibles:
+
+- FakeSupabase: cliente en memoria con la API del query builder de
+  supabase-py que usa el proyecto (select con embeds y !inner, eq, neq,
+  gt/gte/lt/lte, like/ilike, in_, is_, order, limit, range,
+  count='exact', insert, upsert(on_conflict), update, delete). Las claves
+  foráneas se resuelven por convención (carreras -> carrera_id). Como
+  PostgREST, un select devuelve a lo más max_rows filas.
+- FakeWeb: requests.get / requests.post contra fixtures HTML locales
+  (bench/fixtures) para los sitios de los hipódromos y el deploy hook.
+
+Cada request pasa por los datos serializados a JSON (como por la red),
+espera latency_ms + bytes / bandwidth y se cuenta en net_calls / net_bytes
+de la etapa activa (instrumentation), así el harness ve el efecto de
+batching y cache en round trips y no sólo en CPU.
+
+Author: ML Engineering Team
+Date: 2026-10-19
+"""
+
+import os
+import re
+import sys
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from unittest import mock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils import instrumentation, tracing
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+MAX_ROWS = 1000  # db-max-rows por defecto de Supabase
+HTTP_METHODS = {'select': 'GET', 'insert': 'POST', 'upsert': 'POST', 'update': 'PATCH', 'delete': 'DELETE'}
+
+# URL -> fixture (las que scrapea monitor_pozos)
+PAGES = {
+    'https://www.clubhipico.cl/pozos-estimados/': 'clubhipico_pozos.html',
+    'https://www.hipodromo.cl': 'hipodromo_chile.html',
+    'https://www.sporting.cl': 'sporting.html',
+    'https://www.clubhipicoconcepcion.cl': 'concepcion.html',
+}
+DEPLOY_HOOK = 'https://api.vercel.invalid/v1/integrations/deploy/pista-inteligente'
+
+
+class Network:
+    """Latencia simulada + contadores de los servicios falsos."""
+
+    def __init__(self, latency_ms=0.0, bandwidth_mbps=100.0):
+        self.latency_s = latency_ms / 1000.0
+        self.bytes_per_s = bandwidth_mbps * 1e6 / 8
+        self.calls = Counter()
+        self.bytes = 0
+
+    def request(self, kind, sent, received, count=True):
+        self.calls[kind] += 1
+        self.bytes += sent + received
+        if count:
+            instrumentation.count(net_calls=1, net_bytes=sent + received)
+        delay = self.latency_s + (sent + received) / self.bytes_per_s
+        if delay > 0:
+            time.sleep(delay)
+
+    def stats(self):
+        return {'calls': sum(self.calls.values()), 'bytes': self.bytes, 'by_kind': dict(self.calls)}
+
+
+# ---------------------------------------------------------------------------
+# Supabase
+# ---------------------------------------------------------------------------
+
+class APIResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _singular(table):
+    return table[:-1] if table.endswith('s') else table
+
+
+def _split_top(text):
+    """Separa por comas fuera de paréntesis."""
+    parts, depth, current = [], 0, ''
+    for ch in text:
+        if ch == ',' and depth == 0:
+            parts.append(current)
+            current = ''
+            continue
+        depth += (ch == '(') - (ch == ')')
+        current += ch
+    parts.append(current)
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _parse_select(columns):
+    """'id, carreras!inner(numero)' -> [('id', None, False), ('carreras', [...], True)]"""
+    fields = []
+    for part in _split_top(columns or '*'):
+        match = re.match(r'^([\w*]+)(!inner)?\s*(?:\((.*)\))?$', part, re.S)
+        if not match:
+            raise ValueError(f"select no soportado: {part!r}")
+        name, inner, nested = match.groups()
+        fields.append((name, _parse_select(nested) if nested is not None else None, bool(inner)))
+    return fields
+
+
+def _like(pattern, case=True):
+    regex = ''.join('.*' if c == '%' else '.' if c == '_' else re.escape(c) for c in pattern)
+    return re.compile(f'^{regex}$', re.S if case else re.S | re.I)
+
+
+def _compare(op, value, target):
+    if op == 'is':
+        return value is None if target in (None, 'null') else value is target
+    if value is None:
+        return op == 'neq' and target is not None
+    if op == 'eq':
+        return value == target
+    if op == 'neq':
+        return value != target
+    if op == 'in':
+        return value in target
+    if op in ('like', 'ilike'):
+        return bool(_like(str(target), case=op == 'like').match(str(value)))
+    if op == 'gt':
+        return value > target
+    if op == 'gte':
+        return value >= target
+    if op == 'lt':
+        return value < target
+    if op == 'lte':
+        return value <= target
+    raise ValueError(f"operador no soportado: {op}")
+
+
+class _Query:
+    """Query builder: cada método devuelve self, execute() hace el request."""
+
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.action = None
+        self.payload = None
+        self.fields = None
+        self.on_conflict = None
+        self.ignore_duplicates = False
+        self.want_count = False
+        self.filters = []
+        self.ordering = []
+        self.limit_n = None
+        self.offset = 0
+
+    # Acciones
+    def select(self, columns='*', count=None):
+        self.action, self.fields, self.want_count = 'select', _parse_select(columns), count is not None
+        return self
+
+    def insert(self, data, **kwargs):
+        self.action, self.payload = 'insert', data
+        return self
+
+    def upsert(self, data, on_conflict='', ignore_duplicates=False, **kwargs):
+        self.action, self.payload = 'upsert', data
+        self.on_conflict, self.ignore_duplicates = on_conflict or 'id', ignore_duplicates
+        return self
+
+    def update(self, data, **kwargs):
+        self.action, self.payload = 'update', data
+        return self
+
+    def delete(self, **kwargs):
+        self.action = 'delete'
+        return self
+
+    # Filtros y modificadores
+    def _filter(self, op, column, value):
+        self.filters.append((op, column, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter('eq', column, value)
+
+    def neq(self, column, value):
+        return self._filter('neq', column, value)
+
+    def gt(self, column, value):
+        return self._filter('gt', column, value)
+
+    def gte(self, column, value):
+        return self._filter('gte', column, value)
+
+    def lt(self, column, value):
+        return self._filter('lt', column, value)
+
+    def lte(self, column, value):
+        return self._filter('lte', column, value)
+
+    def like(self, column, pattern):
+        return self._filter('like', column, pattern)
+
+    def ilike(self, column, pattern):
+        return self._filter('ilike', column, pattern)
+
+    def in_(self, column, values):
+        return self._filter('in', column, list(values))
+
+    def is_(self, column, value):
+        return self._filter('is', column, value)
+
+    def order(self, column, desc=False, **kwargs):
+        self.ordering.append((column, desc))
+        return self
+
+    def limit(self, n, **kwargs):
+        self.limit_n = n
+        return self
+
+    def range(self, start, end, **kwargs):
+        self.offset, self.limit_n = start, end - start + 1
+        return self
+
+    def execute(self):
+        # Mismo nombre de span que los requests httpx reales (instrument_httpx)
+        with tracing.span(f'supabase {HTTP_METHODS[self.action]} {self.table}', action=self.action) as s:
+            # Ida y vuelta por JSON, como por la red (tipos no serializables fallan igual que en supabase-py)
+            sent = json.dumps(self.payload).encode() if self.payload is not None else b''
+            payload = json.loads(sent) if sent else None
+            response = getattr(self.db, f'_{self.action}')(self, payload)
+            received = json.dumps(response.data).encode()
+            response.data = json.loads(received)
+            self.db.network.request(f'supabase.{self.action}', len(sent), len(received))
+            if s is not None:
+                s.set(rows=len(response.data), bytes=len(sent) + len(received))
+        return response
+
+
+class FakeSupabase:
+    """Cliente Supabase en memoria: tablas = listas de dicts."""
+
+    def __init__(self, network=None, max_rows=MAX_ROWS):
+        self.network = network or Network()
+        self.max_rows = max_rows
+        self.tables = {}
+        self._indexes = {}  # table -> {columnas: {clave: [filas]}}
+        self._next_id = Counter()
+
+    def table(self, name):
+        self.tables.setdefault(name, [])
+        return _Query(self, name)
+
+    from_ = table
+
+    def rows(self, table):
+        return self.tables.get(table, [])
+
+    # Índices por columnas (upserts y selects sólo-eq sin escanear la tabla)
+    def _index(self, table, columns):
+        indexes = self._indexes.setdefault(table, {})
+        if columns not in indexes:
+            index = {}
+            for row in self.tables.get(table, []):
+                index.setdefault(tuple(row.get(c) for c in columns), []).append(row)
+            indexes[columns] = index
+        return indexes[columns]
+
+    def _add(self, table, row):
+        if row.get('id') is None:
+            self._next_id[table] = max(self._next_id[table], len(self.tables[table])) + 1
+            row['id'] = self._next_id[table]
+        elif isinstance(row['id'], int):
+            self._next_id[table] = max(self._next_id[table], row['id'])
+        row.setdefault('created_at', datetime.now().isoformat())
+        self.tables[table].append(row)
+        for columns, index in self._indexes.get(table, {}).items():
+            index.setdefault(tuple(row.get(c) for c in columns), []).append(row)
+        return row
+
+    def _modify(self, table, row, changes):
+        indexes = self._indexes.get(table, {})
+        old = {columns: tuple(row.get(c) for c in columns) for columns in indexes}
+        row.update(changes)
+        for columns, index in indexes.items():
+            new = tuple(row.get(c) for c in columns)
+            if new != old[columns]:
+                index[old[columns]].remove(row)
+                index.setdefault(new, []).append(row)
+
+    def _match(self, query):
+        base = [f for f in query.filters if '.' not in f[1]]
+        eqs = [f for f in base if f[0] == 'eq']
+        if eqs and len(eqs) == len(base):
+            columns = tuple(c for _, c, _ in eqs)
+            return list(self._index(query.table, columns).get(tuple(v for _, _, v in eqs), []))
+        return [row for row in self.tables[query.table]
+                if all(_compare(op, row.get(c), v) for op, c, v in base)]
+
+    def _embed(self, table, row, name, fields):
+        """Recurso embebido: muchos-a-uno por <singular>_id, si no uno-a-muchos."""
+        fk = f'{_singular(name)}_id'
+        if fk in row:
+            parents = self._index(name, ('id',)).get((row[fk],), [])
+            return self._project(name, parents[0], fields) if parents else None
+        children = self._index(name, (f'{_singular(table)}_id',)).get((row.get('id'),), [])
+        return [self._project(name, child, fields) for child in children]
+
+    def _project(self, table, row, fields):
+        out = {}
+        for name, nested, inner in fields:
+            if nested is None:
+                if name == '*':
+                    out.update(row)
+                else:
+                    out[name] = row.get(name)
+                continue
+            value = self._embed(table, row, name, nested)
+            if inner and not value:
+                return None
+            out[name] = value
+        return out
+
+    def _select(self, query, payload):
+        matched = self._match(query)
+        for column, desc in reversed(query.ordering):
+            matched.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+        rows = []
+        nested_filters = [f for f in query.filters if '.' in f[1]]
+        for row in matched:
+            out = self._project(query.table, row, query.fields)
+            if out is not None and all(self._nested_ok(out, op, c, v) for op, c, v in nested_filters):
+                rows.append(out)
+        total = len(rows)
+        limit = min(query.limit_n or self.max_rows, self.max_rows)
+        return APIResponse(rows[query.offset:query.offset + limit], total if query.want_count else None)
+
+    @staticmethod
+    def _nested_ok(out, op, column, value):
+        *path, leaf = column.split('.')
+        node = out
+        for key in path:
+            node = node.get(key) if isinstance(node, dict) else None
+        return isinstance(node, dict) and _compare(op, node.get(leaf), value)
+
+    def _insert(self, query, payload):
+        records = payload if isinstance(payload, list) else [payload]
+        return APIResponse([dict(self._add(query.table, dict(r))) for r in records])
+
+    def _upsert(self, query, payload):
+        columns = tuple(c.strip() for c in query.on_conflict.split(','))
+        index = self._index(query.table, columns)
+        out = []
+        for record in payload if isinstance(payload, list) else [payload]:
+            key = tuple(record.get(c) for c in columns)
+            existing = index.get(key) if None not in key else None
+            if existing:
+                if not query.ignore_duplicates:
+                    self._modify(query.table, existing[0], record)
+                out.append(dict(existing[0]))
+            else:
+                out.append(dict(self._add(query.table, dict(record))))
+        return APIResponse(out)
+
+    def _update(self, query, payload):
+        rows = self._match(query)
+        for row in rows:
+            self._modify(query.table, row, payload)
+        return APIResponse([dict(r) for r in rows])
+
+    def _delete(self, query, payload):
+        rows = self._match(query)
+        if rows:
+            gone = {id(r) for r in rows}
+            self.tables[query.table] = [r for r in self.tables[query.table] if id(r) not in gone]
+            self._indexes.pop(query.table, None)
+        return APIResponse([dict(r) for r in rows])
+
+
+# ---------------------------------------------------------------------------
+# Web (sitios de hipódromos + deploy hook)
+# ---------------------------------------------------------------------------
+
+class FakeWeb:
+    """
+    requests.get/post servidos desde fixtures locales. No suma net_calls:
+    get_soup y trigger_vercel_redeploy ya cuentan sus requests.
+    """
+
+    def __init__(self, network=None, pages=None, fixtures_dir=FIXTURES_DIR):
+        self.network = network or Network()
+        self.pages = PAGES if pages is None else pages
+        self.fixtures_dir = fixtures_dir
+        self.requests = []
+
+    def _response(self, url, status, content):
+        import requests
+
+        response = requests.Response()
+        response.status_code = status
+        response._content = content
+        response.url = url
+        response.encoding = 'utf-8'
+        return response
+
+    def get(self, url, *args, **kwargs):
+        self.requests.append(('GET', url))
+        fixture = self.pages.get(url)
+        if fixture is None:
+            content, status = b'<html><head><title>404 Not Found</title></head><body>404</body></html>', 404
+        else:
+            with open(os.path.join(self.fixtures_dir, fixture), 'rb') as f:
+                content, status = f.read(), 200
+        self.network.request('web.get', len(url), len(content), count=False)
+        return self._response(url, status, content)
+
+    def post(self, url, *args, **kwargs):
+        self.requests.append(('POST', url))
+        content = b'{"job": {"state": "PENDING"}}'
+        self.network.request('web.post', len(url), len(content), count=False)
+        return self._response(url, 201 if url == DEPLOY_HOOK else 404, content)
+
+
+@contextmanager
+def patched_services(supabase, web):
+    """
+    Inyecta los falsos en el sync: SupabaseManager (singleton), el cliente de
+    monitor_pozos, requests.get/post y el deploy hook de Vercel.
+    """
+    from src.utils.supabase_client import SupabaseManager
+    from src.scraping import monitor_pozos
+
+    manager = object.__new__(SupabaseManager)
+    manager.client = supabase
+    previous = SupabaseManager._instance, monitor_pozos._supabase
+    SupabaseManager._instance = manager
+    monitor_pozos._supabase = supabase
+    try:
+        with mock.patch('requests.get', web.get), mock.patch('requests.post', web.post), \
+             mock.patch.dict(os.environ, {'VERCEL_DEPLOY_HOOK': DEPLOY_HOOK}):
+            yield
+    finally:
+        SupabaseManager._instance, monitor_pozos._supabase = previous
@@ -0,0 +1,283 @@
+"""
+Harness End-to-End del Sync
+---------------------------
+Corre sync_system.main completo (ETL -> migración -> inferencia -> upload ->
+pozos -> rendimiento -> redeploy) sobre un dataset sintético, con Supabase,
+los sitios de los hipódromos y el deploy hook reemplazados por los falsos
+de bench/fake_services.py. Mide latencia por etapa (instrumentation) y
+throughput (carreras/s, filas/s) del flujo entero: sirve para ver cómo
+interactúan cambios entre módulos (batching, cache, paralelismo) y no sólo
+cada función aislada como run_benchmarks.py.
+
+Fases, sobre el mismo directorio de trabajo y el mismo Supabase falso:
+    cold         SQLite y Supabase vacíos, todos los CSV son nuevos
+    incremental  llegan los resultados del último día de carreras
+    warm         nada nuevo (costo fijo de un sync sin cambios)
+
+El dataset lo genera src/scripts/generate_synthetic_data.py con el
+historial terminando ayer, así el programa queda en fechas futuras. El
+modelo es un LGBMRegressor chico entrenado sobre las features del
+programa (sólo para ejercitar la inferencia). Todo corre en un directorio
+temporal: la DB y los artefactos reales del repo no se tocan.
+
+Uso:
+    python bench/harness.py                              # 10k filas, 20 ms de latencia
+    python bench/harness.py --rows 100000 --latency-ms 50 --json harness.json
+
+Author: ML Engineering Team
+Date: 2026-10-19
+"""
+
+import os
+import io
+import sys
+import glob
+import json
+import time
+import shutil
+import sqlite3
+import logging
+import platform
+import tempfile
+from contextlib import contextmanager, nullcontext, redirect_stderr, redirect_stdout
+from datetime import datetime, timedelta
+from unittest import mock
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bench.fake_services import FakeSupabase, FakeWeb, Network, patched_services
+from src.utils import instrumentation, tracing
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+PHASES = ['cold', 'incremental', 'warm']
+DEFAULT_ROWS = 10_000
+DEFAULT_SEED = 7
+LATENCY_MS = 20.0
+BANDWIDTH_MBPS = 50.0
+DB_PATH = os.path.join('data', 'db', 'hipica_data.db')
+MODEL_PATH = os.path.join('src', 'models', 'lgbm_optimized_latest.pkl')
+
+
+def chile_today():
+    """Mismo 'hoy' que cargar_programa(solo_futuras=True)."""
+    return (datetime.utcnow() - timedelta(hours=3)).date()
+
+
+@contextmanager
+def working_dir(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def train_model(db_path, program_date, path, seed):
+    """LGBMRegressor chico sobre las features del programa, guardado en path."""
+    import joblib
+    import lightgbm as lgb
+    from src.models.data_manager import cargar_programa
+    from src.models.inference_optimized import OptimizedInferencePipeline
+
+    pipeline = OptimizedInferencePipeline(db_path=db_path, cache_path=None)
+    X, _ = pipeline._prepare_features(cargar_programa(db_path, fecha=program_date))
+    y = np.random.default_rng(seed).random(len(X))
+    model = lgb.LGBMRegressor(n_estimators=100, num_leaves=15, min_child_samples=5,
+                              random_state=seed, n_jobs=1, verbose=-1).fit(X, y)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    joblib.dump(model, path)
+
+
+def prepare(workdir, rows=DEFAULT_ROWS, seed=DEFAULT_SEED, program_days=1):
+    """
+    Dataset sintético + directorio del sync (exports/, data/db/, modelo).
+
+    Returns:
+        dict con sync_dir, dataset (resumen de generate) y held_back (CSV
+        del último día de resultados, para la fase incremental)
+    """
+    from src.scripts.generate_synthetic_data import generate
+
+    dataset = generate(os.path.join(workdir, 'dataset'), rows, seed, program_days=program_days,
+                       end_date=chile_today() - timedelta(days=1))
+    sync_dir = os.path.join(workdir, 'sync')
+    exports = os.path.join(sync_dir, 'exports')
+    os.makedirs(exports, exist_ok=True)
+    os.makedirs(os.path.join(sync_dir, 'data', 'db'), exist_ok=True)
+
+    held_back = []
+    for path in sorted(glob.glob(os.path.join(dataset['exports_dir'], '*.csv'))):
+        name = os.path.basename(path)
+        if name.startswith('RESULTADO_') and name.endswith(f"_{dataset['last_date']}.csv"):
+            held_back.append(path)
+        else:
+            shutil.copy(path, exports)
+
+    with redirect_stdout(io.StringIO()):
+        train_model(dataset['db_path'], dataset['program_dates'][0], os.path.join(sync_dir, MODEL_PATH), seed)
+    return {'sync_dir': sync_dir, 'dataset': dataset, 'held_back': held_back}
+
+
+def _count_races(db_path, since):
+    """(carreras con resultados, carreras del programa desde `since`)."""
+    if not os.path.exists(db_path):
+        return 0, 0
+    conn = sqlite3.connect(db_path)
+    try:
+        races = conn.execute('SELECT COUNT(*) FROM carreras').fetchone()[0]
+        program = conn.execute('''SELECT COUNT(*) FROM (SELECT DISTINCT fecha, hipodromo, nro_carrera
+                                  FROM programa_carreras WHERE fecha >= ?)''', (since,)).fetchone()[0]
+        return races, program
+    finally:
+        conn.close()
+
+
+def _net_calls(supabase, web):
+    networks = {id(n): n for n in (supabase.network, web.network)}
+    return sum(n.stats()['calls'] for n in networks.values())
+
+
+def run_phase(name, sync_dir, supabase, web, metrics_path=None, quiet=True):
+    """
+    Un sync completo (sync_system.main) dentro de sync_dir.
+
+    Returns:
+        métricas de la fase: wall/CPU, carreras y filas procesadas,
+        throughput, requests de red y las etapas de instrumentation
+    """
+    import sync_system
+
+    db_path = os.path.join(sync_dir, DB_PATH)
+    today = chile_today().isoformat()
+    races_before, _ = _count_races(db_path, today)
+    root = logging.getLogger()
+    level = root.level
+    calls_before = _net_calls(supabase, web)
+    status = 'ok'
+
+    output = io.StringIO()
+    t0, c0 = time.perf_counter(), time.process_time()
+    with working_dir(sync_dir), mock.patch('src.etl.etl_pipeline.DB_PATH', os.path.abspath(db_path)), \
+            patched_services(supabase, web), tracing.span(f'fase {name}'), instrumentation.run(f'harness_{name}', path=metrics_path,
+                                                                summary=False) as active:
+        if quiet:
+            root.setLevel(logging.WARNING)
+        try:
+            with redirect_stdout(output), redirect_stderr(output):
+                sync_system.main(force_sync=False)
+        except SystemExit as e:
+            status = 'error' if e.code else 'ok'
+        finally:
+            root.setLevel(level)
+    wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+
+    races_after, program_races = _count_races(db_path, today)
+    races = races_after - races_before + program_races
+    stages = sorted(active.stages, key=lambda s: (s['start_s'], s['depth']))
+    rows_in = sum(s['counters']['rows_in'] for s in stages if s['depth'] == 0)
+    return {
+        'status': status,
+        'wall_s': round(wall, 4),
+        'cpu_s': round(cpu, 4),
+        'races': races,
+        'rows_in': rows_in,
+        'races_per_s': round(races / wall, 2) if wall > 0 else None,
+        'rows_per_s': round(rows_in / wall) if wall > 0 else None,
+        'net_calls': _net_calls(supabase, web) - calls_before,
+        'summary': active.summary(),
+        'stages': [{
+            'stage': s['path'], 'depth': s['depth'], 'status': s['status'],
+            'wall_s': s['wall_s'], 'cpu_s': s['cpu_s'],
+            'rows_per_s': round(s['counters']['rows_in'] / s['wall_s']) if s['wall_s'] > 0 else None,
+            **s['counters'],
+        } for s in stages],
+    }
+
+
+def run_harness(rows=DEFAULT_ROWS, seed=DEFAULT_SEED, latency_ms=LATENCY_MS, bandwidth_mbps=BANDWIDTH_MBPS,
+                program_days=1, workdir=None, metrics_path=None, quiet=True, trace_path=None):
+    """
+    Prepara el dataset y corre las fases cold / incremental / warm. Con
+    trace_path las tres fases quedan en una traza (Chrome Trace JSON).
+
+    Returns:
+        reporte {'rows', 'seed', 'latency_ms', ..., 'phases': {fase: métricas},
+        'supabase': {tabla: filas}, 'network': {...}}
+    """
+    network = Network(latency_ms, bandwidth_mbps)
+    supabase, web = FakeSupabase(network), FakeWeb(network)
+    report = {
+        'rows': rows, 'seed': seed, 'latency_ms': latency_ms, 'bandwidth_mbps': bandwidth_mbps,
+        'python': platform.python_version(), 'machine': platform.machine(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'phases': {}
+    }
+
+    tmp = None
+    if workdir is None:
+        tmp = workdir = tempfile.mkdtemp(prefix='pista_harness_')
+    try:
+        logger.info(f"🔄 Preparando dataset sintético ({rows} filas, seed {seed}) en {workdir}...")
+        setup = prepare(workdir, rows, seed, program_days)
+        report['participations'] = setup['dataset']['participations']
+        report['program_dates'] = setup['dataset']['program_dates']
+
+        with tracing.trace('harness', os.path.abspath(trace_path)) if trace_path else nullcontext():
+            for phase in PHASES:
+                if phase == 'incremental':
+                    for path in setup['held_back']:
+                        shutil.copy(path, os.path.join(setup['sync_dir'], 'exports'))
+                result = run_phase(phase, setup['sync_dir'], supabase, web, metrics_path, quiet)
+                report['phases'][phase] = result
+                logger.info(f"\n📊 Fase {phase}: {result['wall_s']:.2f}s ({result['status']}), "
+                            f"{result['races']} carreras ({result['races_per_s']}/s), "
+                            f"{result['rows_in']} filas ({result['rows_per_s']}/s), {result['net_calls']} requests")
+                for line in result['summary']:
+                    logger.info(line)
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    report['supabase'] = {table: len(rows_) for table, rows_ in sorted(supabase.tables.items())}
+    report['network'] = network.stats()
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Sync end-to-end contra servicios falsos locales')
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS, help='Participaciones del dataset sintético')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--program-days', type=int, default=1)
+    parser.add_argument('--latency-ms', type=float, default=LATENCY_MS, help='Latencia por request (Supabase y web)')
+    parser.add_argument('--bandwidth-mbps', type=float, default=BANDWIDTH_MBPS)
+    parser.add_argument('--workdir', default=None, help='Directorio de trabajo (default: temporal, se borra)')
+    parser.add_argument('--metrics', default=None, help='JSONL de métricas por etapa (instrumentation)')
+    parser.add_argument('--trace', default=None, help='Guardar una traza de spans (Chrome Trace JSON)')
+    parser.add_argument('--verbose', action='store_true', help='Mostrar la salida del sync')
+    parser.add_argument('--json', default=None, help='Guardar el reporte en JSON')
+    args = parser.parse_args()
+
+    try:
+        report = run_harness(args.rows, args.seed, args.latency_ms, args.bandwidth_mbps, args.program_days,
+                             args.workdir, args.metrics, quiet=not args.verbose, trace_path=args.trace)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+                f.write('\n')
+            logger.info(f"✅ Reporte guardado: {args.json}")
+        if any(p['status'] != 'ok' for p in report['phases'].values()):
+            logger.error("❌ Alguna fase terminó con error")
+            sys.exit(1)
+    except Exception as e:
+        logger.error(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,360 @@
+"""
+Gate de Regresión de Performance
+--------------------------------
+Corre un set fijo de escenarios sobre un dataset sintético determinista y
+compara tiempo de CPU (mínimo de --repeat corridas) y pico de memoria
+(tracemalloc, una corrida aparte) contra bench/baseline.json. Falla (exit 1)
+si algún escenario empeora más allá del umbral. El wall time se reporta pero
+no se usa en el gate: en máquinas compartidas varía +-40% entre corridas.
+Además, intercalada con cada repetición se mide una carga de referencia
+fija y el gate compara cpu_rel = CPU del escenario / CPU de la referencia:
+una máquina más lenta (o más cargada en ese momento) que la que generó la
+línea base no se confunde con una regresión.
+
+Escenarios:
+    etl                   HipicaETL sobre los CSV sintéticos (DB nueva)
+    cargar_datos_3nf      lectura 3NF completa
+    cargar_datos_3nf_tipado  lectura 3NF con dtypes compactos (int32/float32/category)
+    fe_transform          FeatureEngineering.transform del historial
+    feature_store_update  FeatureStore.update del historial
+    inference             programa -> features -> modelo -> predicciones
+    patrones              calcular_todos_patrones
+    performance_stats     resultados SQLite -> match -> calculate_stats
+
+El dataset (DB + CSV de resultados + un programa) lo genera
+src/scripts/generate_synthetic_data.py con --rows participaciones y --seed;
+la línea base sólo se compara contra un run con el mismo dataset.
+
+Uso:
+    python bench/run_benchmarks.py                      # compara contra la línea base
+    python bench/run_benchmarks.py --scenario etl patrones
+    python bench/run_benchmarks.py --update-baseline    # tras una optimización aceptada
+
+Author: ML Engineering Team
+Date: 2026-10-19
+"""
+
+import os
+import io
+import gc
+import sys
+import json
+import time
+import logging
+import platform
+import tempfile
+import statistics
+from contextlib import redirect_stdout
+from datetime import datetime
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+DEFAULT_ROWS = 10_000
+DEFAULT_SEED = 7
+TIME_THRESHOLD = 0.30
+MEMORY_THRESHOLD = 0.20
+MIN_SECONDS = 0.05  # bajo esto el ruido de medición domina
+MIN_MB = 1.0
+
+
+def run_etl(db_path, exports_dir):
+    """ETL completo sobre exports_dir hacia db_path (sin la salida por consola)."""
+    from src.etl.etl_pipeline import HipicaETL
+
+    with redirect_stdout(io.StringIO()):
+        return HipicaETL(db_path=db_path, exports_dir=exports_dir).run(force_reprocess=True)
+
+
+# ---------------------------------------------------------------------------
+# Escenarios: cada uno recibe el contexto y devuelve (work, filas). El setup
+# no se mide; work() es lo que se cronometra.
+# ---------------------------------------------------------------------------
+
+def scenario_etl(ctx):
+    runs = iter(range(10 ** 6))
+
+    def work():
+        run_etl(os.path.join(ctx['workdir'], f"etl_{next(runs)}.db"), ctx['exports'])
+    return work, ctx['rows']
+
+
+def scenario_cargar_datos_3nf(ctx):
+    from src.models.data_manager import cargar_datos_3nf
+    return (lambda: cargar_datos_3nf(ctx['db'])), ctx['rows']
+
+
+def scenario_cargar_datos_3nf_tipado(ctx):
+    from src.models.data_manager import cargar_datos_3nf_tipado
+    return (lambda: cargar_datos_3nf_tipado(ctx['db'])), ctx['rows']
+
+
+def scenario_fe_transform(ctx):
+    from src.models.features import FeatureEngineering
+    fe = FeatureEngineering()
+    return (lambda: fe.transform(ctx['history'], is_training=True)), ctx['rows']
+
+
+def scenario_feature_store_update(ctx):
+    from src.models.feature_store import FeatureStore
+    history = ctx['history'].sort_values('fecha', kind='stable')
+    return (lambda: FeatureStore().update(history)), ctx['rows']
+
+
+def scenario_inference(ctx):
+    import lightgbm as lgb
+    from src.models.data_manager import cargar_programa
+    from src.models.inference_optimized import OptimizedInferencePipeline
+
+    def features():
+        pipeline = OptimizedInferencePipeline(db_path=ctx['db'], cache_path=None)
+        X, df_enriched = pipeline._prepare_features(cargar_programa(ctx['db'], fecha=ctx['program_date']))
+        return pipeline, X, df_enriched
+
+    # Modelo chico entrenado sobre las features del programa (sólo para ejercitar predict)
+    _, X, _ = features()
+    y = np.random.default_rng(ctx['seed']).random(len(X))
+    model = lgb.LGBMRegressor(n_estimators=200, num_leaves=15, min_child_samples=5,
+                              random_state=ctx['seed'], n_jobs=1, verbose=-1).fit(X, y)
+
+    def work():
+        pipeline, X, df_enriched = features()
+        pipeline.model = model
+        return pipeline._predict(X, df_enriched)
+    return work, len(X)
+
+
+def scenario_patrones(ctx):
+    from src.models.data_manager import calcular_todos_patrones
+    return (lambda: calcular_todos_patrones(ctx['history'])), ctx['rows']
+
+
+def scenario_performance_stats(ctx):
+    from src.scripts import calculate_performance as perf
+
+    # Predicciones sintéticas: el resultado real con los dos primeros
+    # invertidos en una de cada tres carreras
+    results_by_race = perf.get_results_from_sqlite(ctx['db'])
+    predictions = {}
+    for i, (key, actual) in enumerate(sorted(results_by_race.items())):
+        order = [actual[1], actual[0]] + actual[2:] if i % 3 == 0 and len(actual) > 1 else actual
+        predictions[key] = [{'caballo': a['caballo_nombre'], 'hipodromo_original': a['hipodromo_original']}
+                            for a in order]
+
+    def work():
+        results = perf.match_predictions_with_results(predictions, perf.get_results_from_sqlite(ctx['db']))
+        return perf.calculate_stats(results), perf.calculate_stats_by_hipodromo(results)
+    return work, ctx['rows']
+
+
+SCENARIOS = {
+    'etl': scenario_etl,
+    'cargar_datos_3nf': scenario_cargar_datos_3nf,
+    'cargar_datos_3nf_tipado': scenario_cargar_datos_3nf_tipado,
+    'fe_transform': scenario_fe_transform,
+    'feature_store_update': scenario_feature_store_update,
+    'inference': scenario_inference,
+    'patrones': scenario_patrones,
+    'performance_stats': scenario_performance_stats,
+}
+
+
+# ---------------------------------------------------------------------------
+# Medición y comparación
+# ---------------------------------------------------------------------------
+
+def measure(work, repeat=5, reference=None):
+    """
+    Mínimos de wall/CPU y mediana de wall en `repeat` corridas + pico
+    tracemalloc (MB). Con reference, la corre antes de cada repetición y
+    agrega cpu_rel (CPU del escenario / CPU de la referencia).
+    """
+    import tracemalloc
+
+    times, cpu, ref = [], [], []
+    with redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            gc.collect()
+            if reference is not None:
+                c0 = time.process_time()
+                reference()
+                ref.append(time.process_time() - c0)
+            t0, c0 = time.perf_counter(), time.process_time()
+            work()
+            times.append(time.perf_counter() - t0)
+            cpu.append(time.process_time() - c0)
+
+        gc.collect()
+        tracemalloc.start()
+        try:
+            work()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    result = {
+        'wall_s': round(min(times), 4),
+        'median_s': round(statistics.median(times), 4),
+        'cpu_s': round(min(cpu), 4),
+        'peak_mb': round(peak / 1024 ** 2, 2),
+    }
+    if ref:
+        result['cpu_rel'] = round(min(cpu) / min(ref), 3) if min(ref) > 0 else None
+    return result
+
+
+def _reference_work():
+    """Carga fija de Python puro + pandas, parecida en mezcla a los escenarios."""
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'k': rng.integers(0, 500, 100_000), 'v': rng.random(100_000)})
+    df.groupby('k')['v'].agg(['sum', 'mean']).sort_values('sum')
+    counts = {}
+    for i in range(300_000):
+        key = (i % 97, str(i % 13))
+        counts[key] = counts.get(key, 0) + 1
+    sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))
+
+
+def run_benchmarks(scenarios=None, rows=DEFAULT_ROWS, seed=DEFAULT_SEED, repeat=5):
+    """
+    Genera el dataset en un directorio temporal y mide los escenarios.
+
+    Returns:
+        reporte {'rows', 'seed', 'repeat', 'scenarios': {nombre: métricas}}
+    """
+    import pandas as pd
+    from src.models.data_manager import cargar_datos_3nf
+    from src.scripts.generate_synthetic_data import generate
+
+    # Los módulos del proyecto loguean a INFO; aquí sólo interesan las métricas
+    logging.getLogger('src').setLevel(logging.WARNING)
+
+    report = {
+        'rows': rows, 'seed': seed, 'repeat': repeat,
+        'python': platform.python_version(), 'machine': platform.machine(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'scenarios': {}
+    }
+    with tempfile.TemporaryDirectory(prefix='pista_bench_') as workdir:
+        logger.info(f"🔄 Generando dataset sintético ({rows} filas, seed {seed})...")
+        dataset = generate(os.path.join(workdir, 'dataset'), rows, seed)
+        ctx = {'workdir': workdir, 'exports': dataset['exports_dir'], 'db': dataset['db_path'],
+               'rows': dataset['participations'], 'program_date': dataset['program_dates'][0], 'seed': seed}
+        with redirect_stdout(io.StringIO()):
+            ctx['history'] = cargar_datos_3nf(ctx['db'])
+        ctx['history']['fecha'] = pd.to_datetime(ctx['history']['fecha'])
+
+        for name in scenarios or list(SCENARIOS):
+            with redirect_stdout(io.StringIO()):
+                work, n = SCENARIOS[name](ctx)
+            result = measure(work, repeat, reference=_reference_work)
+            result['rows'] = n
+            result['rows_per_s'] = round(n / result['wall_s']) if result['wall_s'] > 0 else None
+            report['scenarios'][name] = result
+            logger.info(f"   {name:22s} {result['wall_s']:8.3f} s  CPU {result['cpu_s']:8.3f} s "
+                        f"(x{result['cpu_rel']:6.1f} ref)  "
+                        f"{result['peak_mb']:8.1f} MB  {n} filas")
+    return report
+
+
+def compare(baseline, current, time_threshold=TIME_THRESHOLD, memory_threshold=MEMORY_THRESHOLD,
+            min_seconds=MIN_SECONDS, min_mb=MIN_MB):
+    """
+    Escenarios que empeoraron respecto de la línea base.
+
+    Returns:
+        lista de {'scenario', 'metric', 'baseline', 'current', 'change'}
+
+    Raises:
+        ValueError: si los reportes no usan el mismo dataset (rows/seed)
+    """
+    for key in ('rows', 'seed'):
+        if baseline.get(key) != current.get(key):
+            raise ValueError(f"La línea base usa {key}={baseline.get(key)} y este run {key}={current.get(key)}")
+
+    regressions = []
+    for name, cur in current['scenarios'].items():
+        base = baseline['scenarios'].get(name)
+        if base is None:
+            continue
+        for metric, threshold, floor in (('cpu_s', time_threshold, min_seconds),
+                                         ('peak_mb', memory_threshold, min_mb)):
+            before, after = base[metric], cur[metric]
+            if max(before, after) < floor:
+                continue
+            if metric == 'cpu_s' and base.get('cpu_rel') and cur.get('cpu_rel'):
+                # Tiempo normalizado por la referencia medida junto al escenario
+                before, after = base['cpu_rel'], cur['cpu_rel']
+            change = (after - before) / before if before > 0 else float('inf')
+            if change > threshold:
+                regressions.append({'scenario': name, 'metric': metric, 'baseline': before,
+                                    'current': after, 'change': round(change, 3)})
+    return regressions
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(report, path=BASELINE_PATH):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmarks con gate de regresión')
+    parser.add_argument('--scenario', nargs='+', choices=list(SCENARIOS), default=None)
+    parser.add_argument('--rows', type=int, default=None, help='Participaciones (default: las de la línea base)')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=TIME_THRESHOLD, help='Regresión de tiempo tolerada')
+    parser.add_argument('--memory-threshold', type=float, default=MEMORY_THRESHOLD)
+    parser.add_argument('--update-baseline', action='store_true', help='Guardar este run como línea base')
+    parser.add_argument('--json', default=None, help='Guardar el reporte en JSON')
+    args = parser.parse_args()
+
+    try:
+        baseline = load_baseline(args.baseline)
+        rows = args.rows or (baseline or {}).get('rows', DEFAULT_ROWS)
+        seed = args.seed if args.seed is not None else (baseline or {}).get('seed', DEFAULT_SEED)
+        report = run_benchmarks(args.scenario, rows, seed, args.repeat)
+        if args.json:
+            save_baseline(report, args.json)
+
+        if args.update_baseline:
+            if baseline and args.scenario and baseline.get('rows') == rows and baseline.get('seed') == seed:
+                baseline['scenarios'].update(report['scenarios'])
+                report = dict(report, scenarios=baseline['scenarios'])
+            save_baseline(report, args.baseline)
+            logger.info(f"✅ Línea base actualizada: {args.baseline}")
+            sys.exit(0)
+
+        if baseline is None:
+            logger.warning(f"⚠️ Sin línea base en {args.baseline} (usar --update-baseline)")
+            sys.exit(0)
+
+        regressions = compare(baseline, report, args.threshold, args.memory_threshold)
+        for r in regressions:
+            logger.error(f"❌ Regresión {r['scenario']} ({r['metric']}): {r['baseline']} -> "
+                         f"{r['current']} ({r['change']:+.0%})")
+        if regressions:
+            sys.exit(1)
+        logger.info("✅ Sin regresiones respecto de la línea base")
+    except Exception as e:
+        logger.error(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
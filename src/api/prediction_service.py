@@ -0,0 +1,326 @@
+"""
+Servicio de Inferencia Persistente (Flask)
+------------------------------------------
+Mantiene en memoria los artefactos de OptimizedInferencePipeline (v5, por
+defecto servido desde el modelo compilado a NumPy si existe) o de
+EnsembleInferencePipeline (v4) y atiende predicciones en milisegundos.
+
+Las peticiones concurrentes se agrupan en micro-batches: el worker espera
+unos pocos ms tras la primera petición, concatena los programas recibidos,
+hace UNA pasada de features + predict y reparte los resultados. Cada
+petición se normaliza por separado (su race_unique_id se prefija con el
+índice de la petición dentro del batch). Si el batch falla, cada petición
+se reintenta sola para que el error quede sólo en la que lo causó.
+
+Endpoints:
+    POST /predict              {"entries": [...]} (una carrera o un programa)
+                               o {"fecha": "YYYY-MM-DD"} (programa de la BD)
+    GET  /predictions/<fecha>  predicciones guardadas (predicciones_activas)
+    GET  /health
+
+Uso:
+    python -m src.api.prediction_service --engine v5 --port 8080
+    python -m src.api.prediction_service --engine ensemble --student ''      # ensemble completo
+    python -m src.api.prediction_service --registry src/models/registry   # versión activa + hot-swap
+    gunicorn -w 1 --threads 8 'src.api.prediction_service:create_app()'
+
+Author: ML Engineering Team
+Date: 2026-10-19
+"""
+
+import sys
+import os
+import time
+import queue
+import sqlite3
+import logging
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from flask import Flask, jsonify, request
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DB_PATH = 'data/db/hipica_data.db'
+STUDENT_PATH = 'src/models/ensemble_student_latest.pkl'
+REQUIRED_FIELDS = ['fecha', 'hipodromo', 'nro_carrera', 'numero', 'caballo']
+
+
+class MicroBatcher:
+    """
+    Agrupa llamadas concurrentes: process_fn(items) -> lista de resultados
+    (uno por item) se ejecuta en un único thread worker.
+    """
+
+    def __init__(self, process_fn, window_ms=3.0, max_batch_rows=5000):
+        self.process_fn = process_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_rows = max_batch_rows
+        self.queue = queue.Queue()
+        self.n_batches = 0
+        self._worker = threading.Thread(target=self._loop, name='micro-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, item, n_rows=1):
+        """Encola un item; devuelve un Future con su resultado."""
+        future = Future()
+        self.queue.put((item, n_rows, future))
+        return future
+
+    def _loop(self):
+        while True:
+            batch = [self.queue.get()]
+            rows = batch[0][1]
+            deadline = time.perf_counter() + self.window
+            while rows < self.max_batch_rows:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(entry)
+                rows += entry[1]
+
+            self.n_batches += 1
+            try:
+                self._run(batch)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][2].set_exception(e)
+                    continue
+                # Una petición inválida no debe tumbar a las demás: cada una se
+                # reintenta sola y el error queda en la que lo causó
+                logger.warning(f"⚠️ Batch de {len(batch)} peticiones falló ({e}); reintentando por separado")
+                for entry in batch:
+                    try:
+                        self._run([entry])
+                    except Exception as item_error:
+                        entry[2].set_exception(item_error)
+
+    def _run(self, batch):
+        results = list(self.process_fn([item for item, _, _ in batch]))
+        if len(results) != len(batch):
+            raise RuntimeError(f"process_fn devolvió {len(results)} resultados para {len(batch)} peticiones")
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+def _pipeline_fns(pipeline):
+    """(pipeline, prepare_fn, predict_fn) de un pipeline v5 o ensemble."""
+    score = getattr(pipeline, '_predict', None) or pipeline._predict_with_calibration
+    return pipeline, pipeline._prepare_features, score
+
+
+def _build_pipeline(engine, db_path, student_path=STUDENT_PATH):
+    """Pipeline con artefactos cargados: (pipeline, prepare_fn, predict_fn)."""
+    if engine == 'ensemble':
+        from src.models.inference_ensemble import EnsembleInferencePipeline
+        pipeline = EnsembleInferencePipeline(student_path=student_path, db_path=db_path)
+        pipeline.load_artifacts()
+        return _pipeline_fns(pipeline)
+
+    from src.models.inference_optimized import OptimizedInferencePipeline
+    from src.models.tree_compiler import V5_COMPILED_PATH
+    pipeline = OptimizedInferencePipeline(db_path=db_path, compiled_path=V5_COMPILED_PATH)
+    pipeline.load_artifacts()
+    return _pipeline_fns(pipeline)
+
+
+class PredictionService:
+    """Artefactos residentes + micro-batching de peticiones."""
+
+    def __init__(self, engine='v5', db_path=DB_PATH, window_ms=3.0, max_batch_rows=5000, pipeline=None,
+                 registry=None, swap_poll_seconds=30, student_path=STUDENT_PATH):
+        """
+        Args:
+            engine: 'v5' (OptimizedInferencePipeline) o 'ensemble' (v4)
+            pipeline: pipeline ya cargado (si se omite se construye según engine)
+            window_ms: espera máxima para agrupar peticiones concurrentes
+            registry: ModelRegistry (src/models/model_registry.py). Si se indica,
+                      se sirve su versión activa y se hace hot-swap cuando cambia
+                      (polling cada swap_poll_seconds)
+            student_path: student destilado del engine 'ensemble' (None = ensemble completo)
+        """
+        self._engine = engine
+        self.registry = registry
+        self.db_path = db_path
+        self.swap = None
+        start = time.time()
+        if registry is not None:
+            from src.models.model_registry import HotSwap
+            self.swap = HotSwap(
+                registry,
+                build_fn=lambda version: _pipeline_fns(registry.build_pipeline(version, db_path=db_path)),
+                poll_seconds=swap_poll_seconds
+            )
+        elif pipeline is None:
+            self._bundle = _build_pipeline(engine, db_path, student_path)
+        else:
+            self._bundle = _pipeline_fns(pipeline)
+        logger.info(f"✅ Artefactos residentes ({self.engine}) en {time.time() - start:.2f}s")
+
+        self.batcher = MicroBatcher(self._predict_batch, window_ms, max_batch_rows)
+
+    @property
+    def pipeline(self):
+        return self._active()[0]
+
+    @property
+    def version(self):
+        return self.swap.version if self.swap else None
+
+    @property
+    def engine(self):
+        """Engine servido; con registry, el del manifest de la versión activa (sigue al hot-swap)."""
+        if self.swap:
+            return self.registry.manifest(self.swap.version)['engine']
+        return self._engine
+
+    def _active(self):
+        """(pipeline, prepare_fn, predict_fn) vigente; con registry, la versión activa."""
+        return self.swap.current()[1] if self.swap else self._bundle
+
+    def _predict_batch(self, programs):
+        """Una pasada de features + predict para todos los programas del batch."""
+        # Una sola lectura de la referencia: un hot-swap no afecta al batch en curso
+        _, prepare, score = self._active()
+        sizes = [len(p) for p in programs]
+        df = pd.concat(programs, ignore_index=True)
+        tags = np.repeat([f'{i:05d}|' for i in range(len(programs))], sizes)
+
+        X, df_enriched = prepare(df)
+        # Normalización por carrera dentro de cada petición
+        df_enriched['race_unique_id'] = tags + df_enriched['race_unique_id'].astype(str).values
+        records = score(X, df_enriched)
+
+        # Los registros salen ordenados por race_unique_id => contiguos por petición
+        bounds = np.cumsum(sizes)[:-1]
+        return [list(chunk) for chunk in np.split(np.array(records, dtype=object), bounds)]
+
+    def predict_program(self, df_program, timeout=30):
+        """Predicciones (lista de dicts) para un DataFrame en formato cargar_programa."""
+        if df_program.empty:
+            return []
+        return self.batcher.submit(df_program, len(df_program)).result(timeout=timeout)
+
+    def load_program(self, fecha):
+        from src.models.data_manager import cargar_programa
+        return cargar_programa(self.db_path, solo_futuras=False, fecha=fecha)
+
+    def stored_predictions(self, fecha):
+        """Predicciones guardadas por el batch diario para una fecha."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            df = pd.read_sql(
+                "SELECT * FROM predicciones_activas WHERE fecha = ? ORDER BY carrera, probabilidad DESC",
+                conn, params=[fecha]
+            )
+            conn.close()
+        except Exception as e:
+            logger.warning(f"⚠️ predicciones_activas no disponible: {e}")
+            return []
+        return df.to_dict('records')
+
+
+def _valid_fecha(fecha):
+    try:
+        datetime.strptime(fecha, '%Y-%m-%d')
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def create_app(service=None, **service_kwargs):
+    """Factory de la app Flask (los artefactos se cargan una sola vez aquí)."""
+    service = service or PredictionService(**service_kwargs)
+    app = Flask(__name__)
+    app.config['PREDICTION_SERVICE'] = service
+
+    @app.post('/predict')
+    def predict():
+        start = time.perf_counter()
+        body = request.get_json(silent=True)
+
+        if isinstance(body, dict) and body.get('fecha') and not body.get('entries'):
+            if not _valid_fecha(body['fecha']):
+                return jsonify({'error': 'fecha debe ser YYYY-MM-DD'}), 400
+            df_program = service.load_program(body['fecha'])
+            if df_program.empty:
+                return jsonify({'error': f"Sin programa para {body['fecha']}"}), 404
+        else:
+            entries = body.get('entries') if isinstance(body, dict) else body
+            if not isinstance(entries, list) or not entries:
+                return jsonify({'error': 'Se espera {"entries": [...]} o {"fecha": "YYYY-MM-DD"}'}), 400
+            df_program = pd.DataFrame(entries)
+            missing = [c for c in REQUIRED_FIELDS if c not in df_program.columns]
+            if missing:
+                return jsonify({'error': f'Faltan campos: {missing}'}), 400
+
+        try:
+            predictions = service.predict_program(df_program)
+        except Exception as e:
+            logger.error(f"❌ Error en predicción: {e}", exc_info=True)
+            return jsonify({'error': str(e)}), 500
+
+        return jsonify({
+            'predicciones': predictions,
+            'n': len(predictions),
+            'latency_ms': round((time.perf_counter() - start) * 1000, 2)
+        })
+
+    @app.get('/predictions/<fecha>')
+    def predictions_by_fecha(fecha):
+        if not _valid_fecha(fecha):
+            return jsonify({'error': 'fecha debe ser YYYY-MM-DD'}), 400
+        predictions = service.stored_predictions(fecha)
+        if not predictions:
+            return jsonify({'error': f'Sin predicciones para {fecha}'}), 404
+        return jsonify({'fecha': fecha, 'predicciones': predictions, 'n': len(predictions)})
+
+    @app.get('/health')
+    def health():
+        return jsonify({'status': 'ok', 'engine': service.engine, 'version': service.version,
+                        'batches': service.batcher.n_batches})
+
+    return app
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Servicio HTTP de predicciones con artefactos residentes')
+    parser.add_argument('--engine', choices=['v5', 'ensemble'], default='v5', help='Pipeline a servir')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--window-ms', type=float, default=3.0, help='Ventana de micro-batching')
+    parser.add_argument('--db', default=DB_PATH, help='Base de datos SQLite')
+    parser.add_argument('--student', default=STUDENT_PATH,
+                        help="Student destilado del engine ensemble ('' = ensemble completo)")
+    parser.add_argument('--registry', default=None,
+                        help='Directorio del model registry (sirve la versión activa con hot-swap)')
+    args = parser.parse_args()
+
+    try:
+        registry = None
+        if args.registry:
+            from src.models.model_registry import ModelRegistry
+            registry = ModelRegistry(args.registry)
+        app = create_app(engine=args.engine, db_path=args.db, window_ms=args.window_ms, registry=registry,
+                         student_path=args.student or None)
+        app.run(host=args.host, port=args.port, threaded=True)
+    except Exception as e:
+        logger.error(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -17,11 +17,19 @@ import pandas as pd
 import glob
 import os
 import re
+import sys
 from datetime import datetime
 from typing import Optional, Dict, List, Tuple, Set
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.utils import instrumentation
+
 # Path relativo para que funcione desde cualquier ubicación del proyecto
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data', 'db', 'hipica_data.db')
+# Versión de datos (PRAGMA user_version); ver HipicaETL._migrar
+# 1: peso_fs / dividendo legacy en texto normalizados a REAL
+SCHEMA_VERSION = 1
 
 # ============================================================================
 # UTILIDADES DE LIMPIEZA
@@ -289,8 +297,10 @@ class SmartLoader:
 
 class HipicaETL:
     
-    def __init__(self):
-        self.conn = sqlite3.connect(DB_PATH)
+    def __init__(self, db_path=None, exports_dir='exports'):
+        self.db_path = db_path or DB_PATH  # resuelto al instanciar (el harness redirige DB_PATH)
+        self.exports_dir = exports_dir
+        self.conn = instrumentation.instrument_connection(sqlite3.connect(self.db_path))
         self.cursor = self.conn.cursor()
         self._init_db()
         self.loader = SmartLoader(self.conn)
@@ -359,6 +369,7 @@ class HipicaETL:
         self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_jornadas_fecha ON jornadas(fecha)')
         self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_carreras_jornada ON carreras(jornada_id)')
         self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_participaciones_caballo ON participaciones(caballo_id)')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_participaciones_jinete ON participaciones(jinete_id)')
         
         # Tabla Programa (Normalizada)
         self.cursor.execute('''
@@ -412,8 +423,46 @@ class HipicaETL:
         )''')
         
         self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_archivos_nombre ON archivos_procesados(nombre_archivo)')
-        
+
+        self.conn.commit()
+        self._migrar()
+
+    def _migrar(self):
+        """
+        Migraciones de datos de una sola vez. La versión aplicada queda en
+        PRAGMA user_version, así los HipicaETL siguientes no repiten el scan.
+        """
+        version = self.cursor.execute('PRAGMA user_version').fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        if version < 1:
+            self._normalizar_numericos()
+        self.cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self.conn.commit()
+
+    def _normalizar_numericos(self):
+        """
+        Convierte a REAL los peso_fs / dividendo que quedaron como texto en
+        cargas antiguas ('2,5', '56 Kg'), con la misma regla que el insert
+        (clean_decimal). Así los loaders leen columnas numéricas sin volver a
+        limpiar strings. Migración 1 de _migrar: corre una vez por BD (los
+        inserts nuevos ya pasan por clean_decimal).
+        """
+        legacy = self.cursor.execute('''
+            SELECT id, peso_fs, dividendo FROM participaciones
+            WHERE typeof(peso_fs) = 'text' OR typeof(dividendo) = 'text'
+        ''').fetchall()
+        if not legacy:
+            return 0
+
+        self.cursor.executemany(
+            'UPDATE participaciones SET peso_fs = ?, dividendo = ? WHERE id = ?',
+            [(DataCleaner.clean_decimal(peso), DataCleaner.clean_decimal(dividendo), part_id)
+             for part_id, peso, dividendo in legacy]
+        )
         self.conn.commit()
+        print(f"   🧹 {len(legacy)} participaciones con peso/dividendo en texto normalizadas.")
+        return len(legacy)
 
     def _archivo_ya_procesado(self, nombre_archivo):
         """Verifica si un archivo ya fue procesado anteriormente"""
@@ -494,6 +543,7 @@ class HipicaETL:
 
             csv_content = "".join(clean_lines)
             df = pd.read_csv(StringIO(csv_content), sep=delimiter)
+            instrumentation.count(bytes_read=os.path.getsize(file_path), rows_in=len(df))
             
         except Exception as e:
             print(f"❌ Error leyendo CSV: {e}")
@@ -610,6 +660,7 @@ class HipicaETL:
             num_registros = self._process_program_bulk(df)
         else:
             num_registros = self._process_results_bulk(df)
+        instrumentation.count(rows_out=num_registros)
         
         return num_registros
 
@@ -849,10 +900,11 @@ class HipicaETL:
         
         return len(participaciones_batch)
 
+    @instrumentation.instrumented('etl')
     def run(self, force_reprocess=False):
         """Ejecuta ETL procesando solo archivos nuevos (a menos que force_reprocess=True)"""
         print("🚀 Iniciando ETL Optimizado...")
-        files = glob.glob('exports/*.csv')
+        files = sorted(glob.glob(os.path.join(self.exports_dir, '*.csv')))
         print(f"📂 Encontrados {len(files)} archivos CSV.")
         
         # Filtrar archivos ya procesados
@@ -1,4 +1,3 @@
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
 import time
@@ -41,6 +40,7 @@ Para usar las funcionalidades de IA, necesitas configurar tu API Key de Gemini:
         print("⚠️ Continuando sin soporte de IA... (No API Key)")
     else:
         # Configurar explícitamente con API key
+        import google.generativeai as genai
         genai.configure(api_key=api_key)
         print("✅ Gemini configurado con API Key")
 
@@ -115,6 +115,7 @@ def get_gemini_response_stream(prompt, history=[]):
         
         # Configurar modelo (Usando versión verificada por script)
         # Usar modelo estable en lugar de alias -latest para evitar cambios automáticos
+        import google.generativeai as genai
         model = genai.GenerativeModel('gemini-2.0-flash')
         
         # System Prompt Mejorado - Rol Senior & Contexto Global
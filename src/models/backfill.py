@@ -0,0 +1,327 @@
+"""
+Backfill de Predicciones v5 (multi-fecha)
+-----------------------------------------
+Regenera las predicciones de un rango de fechas históricas en una sola
+pasada, p.ej. una temporada completa después de reentrenar el modelo.
+
+- Programas: programa_carreras del rango; las fechas sin programa guardado
+  se reconstruyen desde los resultados (participaciones con mandil).
+- Features point-in-time vectorizadas: las stats de caballo, jinete y
+  jinete-hipódromo de cada fila se calculan sólo con resultados de fechas
+  ANTERIORES a la carrera (sumas acumuladas por entidad + merge_asof
+  estricto), igual que habría visto la inferencia diaria ese día.
+- Scoring en batches grandes, misma calibración y softmax por carrera
+  (temperatura 1/3) que OptimizedInferencePipeline._predict.
+- Salida columnar: .npz comprimido (strings como categorías + códigos,
+  sin pickle) en data/backfill/.
+
+Alcance: sólo v5 (OptimizedInferencePipeline). EnsembleInferencePipeline
+no tiene ruta de backfill: sus features salen del Feature Store, que es
+una foto de las stats al momento de construirlo (no hay versión por
+fecha), y el ensemble se entrenó con FeatureEngineering v2, no con las
+features v5 que aquí se reconstruyen point-in-time. Backfillear el
+ensemble con cualquiera de las dos daría predicciones con fuga de
+resultados futuros o con features distintas a las de entrenamiento.
+
+Uso:
+    python src/models/backfill.py --desde 2025-03-01 --hasta 2025-12-31
+    python src/models/backfill.py --desde 2025-03-01 --hasta 2025-12-31 --compiled
+
+Author: ML Engineering Team
+Date: 2026-10-19
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.models.data_manager import cargar_programa
+from src.models.segment_ops import race_order, segment_softmax
+from src.models.prediction_cache import artifacts_version
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = 'data/backfill'
+BATCH_ROWS = 200_000
+
+# Columnas de texto del archivo (se guardan como categorías + códigos)
+TEXT_COLS = ['fecha', 'hipodromo', 'caballo', 'jinete']
+
+
+def load_history(db_path):
+    """
+    Todas las participaciones con su fecha, para stats point-in-time.
+    Los flags replican los JOIN de _load_historical_stats (caballo/jinete/
+    hipódromo existentes en sus tablas).
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        history = pd.read_sql("""
+            SELECT jor.fecha, p.caballo_id, p.jinete_id, jor.hipodromo_id,
+                   CASE WHEN p.posicion = 1 THEN 1 ELSE 0 END AS win,
+                   c.id IS NOT NULL AS has_caballo,
+                   j.id IS NOT NULL AS has_jinete,
+                   h.id IS NOT NULL AS has_hipodromo
+            FROM participaciones p
+            JOIN carreras car ON p.carrera_id = car.id
+            JOIN jornadas jor ON car.jornada_id = jor.id
+            LEFT JOIN caballos c ON p.caballo_id = c.id
+            LEFT JOIN jinetes j ON p.jinete_id = j.id
+            LEFT JOIN hipodromos h ON jor.hipodromo_id = h.id
+        """, conn)
+    finally:
+        conn.close()
+    history['fecha'] = pd.to_datetime(history['fecha'], errors='coerce')
+    return history.dropna(subset=['fecha'])
+
+
+def load_programs(db_path, fecha_inicio, fecha_fin):
+    """
+    Programas del rango. Fechas sin programa_carreras se reconstruyen desde
+    los resultados (mismo formato que cargar_programa).
+    """
+    programa = cargar_programa(db_path, solo_futuras=False, fecha=fecha_inicio, fecha_hasta=fecha_fin)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        resultados = pd.read_sql("""
+            SELECT jor.fecha, h.nombre AS hipodromo, car.numero AS nro_carrera, car.distancia,
+                   p.mandil AS numero, c.nombre AS caballo, j.nombre AS jinete, s.nombre AS stud,
+                   p.peso_fs AS peso, p.caballo_id, p.jinete_id, p.stud_id
+            FROM participaciones p
+            JOIN carreras car ON p.carrera_id = car.id
+            JOIN jornadas jor ON car.jornada_id = jor.id
+            JOIN hipodromos h ON jor.hipodromo_id = h.id
+            LEFT JOIN caballos c ON p.caballo_id = c.id
+            LEFT JOIN jinetes j ON p.jinete_id = j.id
+            LEFT JOIN studs s ON p.stud_id = s.id
+            WHERE jor.fecha BETWEEN ? AND ?
+            ORDER BY jor.fecha, h.nombre, car.numero, p.mandil
+        """, conn, params=[fecha_inicio, fecha_fin])
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudieron reconstruir programas desde resultados: {e}")
+        resultados = pd.DataFrame()
+    finally:
+        conn.close()
+
+    if programa.empty:
+        return resultados.reset_index(drop=True)
+    if resultados.empty:
+        return programa.reset_index(drop=True)
+    fechas_programa = set(programa['fecha'].astype(str).str.split().str[0])
+    resultados = resultados[~resultados['fecha'].astype(str).isin(fechas_programa)]
+    return pd.concat([programa, resultados], ignore_index=True)
+
+
+def asof_counts(events, keys, queries):
+    """
+    (races, wins) acumulados por entidad con resultados de fechas
+    estrictamente anteriores a la de cada query.
+
+    Args:
+        events: DataFrame con keys + fecha (datetime) + win
+        keys: columnas de la entidad, p.ej. ['caballo_id']
+        queries: DataFrame con keys + fecha, una fila por participante
+    """
+    n = len(queries)
+    if events.empty or n == 0:
+        return np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64)
+
+    daily = events.groupby(keys + ['fecha']).agg(races=('win', 'size'), wins=('win', 'sum')).reset_index()
+    daily[['races', 'wins']] = daily.groupby(keys)[['races', 'wins']].cumsum()
+
+    left = queries[keys + ['fecha']].astype({k: np.int64 for k in keys})
+    left['_row'] = np.arange(n)
+    merged = pd.merge_asof(
+        left.sort_values('fecha', kind='stable'),
+        daily.astype({k: np.int64 for k in keys}).sort_values('fecha', kind='stable'),
+        on='fecha', by=keys, direction='backward', allow_exact_matches=False
+    ).sort_values('_row')
+    return (merged['races'].fillna(0).astype(np.int64).values,
+            merged['wins'].fillna(0).astype(np.int64).values)
+
+
+def build_features(pipeline, df_programs, history):
+    """
+    X y df_enriched point-in-time para todos los programas del rango (una
+    sola pasada). Mismas reglas que OptimizedInferencePipeline._prepare_features.
+    """
+    df_enriched = df_programs.copy()
+    c_ids = pipeline._resolve_ids(df_enriched, 'caballo_id', 'caballo', 'caballos')
+    j_ids = pipeline._resolve_ids(df_enriched, 'jinete_id', 'jinete', 'jinetes')
+    h_ids = pipeline._hipodromo_ids(df_enriched)
+
+    queries = pd.DataFrame({
+        'caballo_id': c_ids.values, 'jinete_id': j_ids.values, 'hipodromo_id': h_ids.values,
+        'fecha': pd.to_datetime(df_enriched['fecha'].astype(str).str.split().str[0], errors='coerce')
+    })
+    valid_hist = history.dropna(subset=['caballo_id'])
+
+    races, wins = asof_counts(valid_hist[valid_hist['has_caballo'] == 1], ['caballo_id'], queries)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        horse_wr = np.where(races > 0, wins / np.maximum(races, 1), np.nan)
+
+    jockey_events = history[(history['has_jinete'] == 1)].dropna(subset=['jinete_id'])
+    j_races, j_wins = asof_counts(jockey_events, ['jinete_id'], queries)
+    jockey_wr = np.where(j_races > 0, j_wins / np.maximum(j_races, 1), 0.08)
+
+    jt_events = jockey_events[jockey_events['has_hipodromo'] == 1]
+    jt_races, jt_wins = asof_counts(jt_events, ['jinete_id', 'hipodromo_id'], queries)
+    jt_wr = np.where(jt_races > 0, jt_wins / np.maximum(jt_races, 1), np.nan)
+
+    X = pipeline._assemble_features(df_enriched, races, horse_wr, jockey_wr, jt_wr)
+
+    df_enriched['caballo_id'] = c_ids.values
+    df_enriched['jinete_id'] = j_ids.values
+    df_enriched['hipodromo_id'] = h_ids.values
+    df_enriched['race_unique_id'] = (
+        df_enriched['fecha'].astype(str) + '_' + df_enriched['hipodromo'].astype(str) + '_' +
+        df_enriched['nro_carrera'].astype(str)
+    )
+    return X, df_enriched
+
+
+def score(pipeline, X, df_enriched, batch_rows=BATCH_ROWS):
+    """Raw scores en batches + calibración + softmax por carrera. Devuelve un DataFrame columnar."""
+    raw_scores = np.concatenate([
+        np.asarray(pipeline.model.predict(X.iloc[start:start + batch_rows]), dtype=float)
+        for start in range(0, len(X), batch_rows)
+    ]) if len(X) else np.empty(0)
+    probs = pipeline._calibrate(raw_scores)
+
+    segments = race_order(df_enriched['race_unique_id'].values)
+    probs_normalized, ranks = segment_softmax(probs, None, temperature=1 / 3, segments=segments)
+    order = segments[0]
+
+    rows = df_enriched.iloc[order]
+    return pd.DataFrame({
+        'fecha': rows['fecha'].astype(str).str.split().str[0].values,
+        'hipodromo': rows['hipodromo'].astype(str).values,
+        'carrera': pd.to_numeric(rows['nro_carrera'], errors='coerce').fillna(0).astype(np.int16).values,
+        'numero': pd.to_numeric(rows['numero'], errors='coerce').fillna(0).astype(np.int16).values,
+        'caballo': rows['caballo'].astype(str).values,
+        'jinete': rows['jinete'].astype(str).values if 'jinete' in rows.columns else '',
+        'caballo_id': rows['caballo_id'].astype(np.int64).values,
+        'raw_score': raw_scores[order].astype(np.float32),
+        'prob_raw': np.asarray(probs, dtype=np.float32)[order],
+        'probabilidad': np.round(probs_normalized[order] * 100, 1).astype(np.float32),
+        'rank': ranks[order].astype(np.int16)
+    })
+
+
+def save_archive(df, path, meta=None):
+    """Guarda el DataFrame columnar en .npz comprimido (sin pickle)."""
+    arrays = {}
+    for col in df.columns:
+        if col in TEXT_COLS or df[col].dtype == object:
+            # Nulos -> código -1 (se restauran como None al cargar)
+            codes, categories = pd.factorize(df[col], sort=True)
+            arrays[f'{col}__codes'] = codes.astype(np.int32)
+            arrays[f'{col}__categories'] = np.asarray(categories, dtype=str)
+        else:
+            arrays[col] = df[col].values
+    arrays['__columns__'] = np.asarray(list(df.columns), dtype=str)
+    arrays['__meta__'] = np.asarray(json.dumps(meta or {}, ensure_ascii=False))
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    np.savez_compressed(path, **arrays)
+    return path
+
+
+def load_archive(path):
+    """(DataFrame, meta) de un archivo de backfill."""
+    with np.load(path, allow_pickle=False) as data:
+        columns = data['__columns__'].tolist()
+        meta = json.loads(str(data['__meta__']))
+        frame = {}
+        for col in columns:
+            if f'{col}__codes' in data:
+                codes, categories = data[f'{col}__codes'], data[f'{col}__categories']
+                values = np.full(len(codes), None, dtype=object)
+                values[codes >= 0] = categories[codes[codes >= 0]]
+                frame[col] = values
+            else:
+                frame[col] = data[col]
+    return pd.DataFrame(frame, columns=columns), meta
+
+
+def run_backfill(pipeline, fecha_inicio, fecha_fin, output_path=None, batch_rows=BATCH_ROWS):
+    """
+    Backfill completo del rango [fecha_inicio, fecha_fin].
+
+    Returns:
+        (ruta del archivo o None si no hay programas, DataFrame de predicciones)
+    """
+    start = time.time()
+    if not hasattr(pipeline, '_assemble_features'):
+        raise ValueError(f"Backfill sólo soporta OptimizedInferencePipeline (v5), no {type(pipeline).__name__}")
+    if pipeline.model is None:
+        pipeline.load_artifacts()
+
+    df_programs = load_programs(pipeline.db_path, fecha_inicio, fecha_fin)
+    if df_programs.empty:
+        logger.warning(f"⚠️ Sin programas entre {fecha_inicio} y {fecha_fin}")
+        return None, pd.DataFrame()
+    logger.info(f"✅ {len(df_programs)} participantes en {df_programs['fecha'].nunique()} fechas")
+
+    history = load_history(pipeline.db_path)
+    X, df_enriched = build_features(pipeline, df_programs, history)
+    logger.info(f"✅ Features point-in-time: {X.shape} ({time.time() - start:.1f}s)")
+
+    predictions = score(pipeline, X, df_enriched, batch_rows)
+
+    model_path = (pipeline.compiled_path if pipeline.compiled_path and os.path.exists(pipeline.compiled_path)
+                  else pipeline.model_path)
+    meta = {
+        'desde': fecha_inicio, 'hasta': fecha_fin,
+        'model_path': model_path,
+        'artifacts_version': artifacts_version(model_path, pipeline.calibrator_path, pipeline.fe_path),
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'rows': len(predictions)
+    }
+    output_path = output_path or os.path.join(ARCHIVE_DIR, f'pred_{fecha_inicio}_{fecha_fin}.npz')
+    save_archive(predictions, output_path, meta)
+
+    logger.info(f"✅ Backfill: {len(predictions)} predicciones, "
+                f"{predictions.groupby(['fecha', 'hipodromo', 'carrera']).ngroups} carreras "
+                f"en {time.time() - start:.1f}s -> {output_path}")
+    return output_path, predictions
+
+
+if __name__ == "__main__":
+    import argparse
+    from src.models.inference_optimized import OptimizedInferencePipeline
+
+    parser = argparse.ArgumentParser(description='Backfill de predicciones v5 para un rango de fechas')
+    parser.add_argument('--desde', required=True, help='YYYY-MM-DD')
+    parser.add_argument('--hasta', required=True, help='YYYY-MM-DD')
+    parser.add_argument('--output', default=None, help='Ruta .npz (default: data/backfill/)')
+    parser.add_argument('--compiled', action='store_true', help='Usar el modelo compilado a NumPy')
+    parser.add_argument('--batch-rows', type=int, default=BATCH_ROWS)
+    args = parser.parse_args()
+
+    try:
+        compiled_path = None
+        if args.compiled:
+            from src.models.tree_compiler import V5_COMPILED_PATH
+            compiled_path = V5_COMPILED_PATH
+        pipeline = OptimizedInferencePipeline(compiled_path=compiled_path)
+        run_backfill(pipeline, args.desde, args.hasta, args.output, args.batch_rows)
+    except Exception as e:
+        logger.error(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
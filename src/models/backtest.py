@@ -0,0 +1,416 @@
+"""
+Backtest Walk-Forward por Jornada (modelo v5)
+---------------------------------------------
+Reproduce la historia jornada por jornada como si el modelo hubiera estado
+en producción:
+
+1. Features v5 point-in-time calculadas UNA sola vez y cacheadas en disco
+   con un fingerprint de los datos. Las tasas (caballo, pista, distancia,
+   jinete, jinete-hipódromo, padre) son sumas acumuladas por entidad unidas
+   con merge_asof estricto (backfill.asof_counts) y la forma del caballo
+   (recent_form, avg_speed_3, trend_3, days_rest) sale de sus jornadas
+   anteriores: cada fila sólo ve resultados de fechas ANTERIORES a su
+   carrera, nunca del mismo día ni posteriores.
+2. Filas ordenadas por (fecha, carrera): el set de entrenamiento de cada
+   jornada es un prefijo contiguo de las matrices, sin copias ni regrouping.
+3. Re-entrenamiento completo cada `retrain_every` jornadas; entre medio,
+   actualización warm (init_model) con unos pocos árboles sobre las
+   jornadas nuevas.
+4. Aciertos por carrera (ganador, quiniela, trifecta, superfecta en orden
+   exacto, igual que calculate_performance.py) agregados por día y por mes.
+
+Uso:
+    python -m src.models.backtest --retrain-every 8 --warm-trees 25
+
+Author: ML Engineering Team
+Date: 2026-10-19
+"""
+
+import sys
+import os
+import json
+import time
+import hashlib
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import joblib
+from lightgbm import LGBMRanker
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DATASET_CACHE_PATH = 'data/backtest_dataset.pkl'
+REPORT_PATH = 'data/backtest_report.json'
+BET_TYPES = ['ganador', 'quiniela', 'trifecta', 'superfecta']
+DATASET_VERSION = 2  # cambia si cambian las features (invalida caches viejos)
+
+
+def _fingerprint(df):
+    """Hash estable de los datos crudos (invalida el cache si cambian resultados)."""
+    cols = [c for c in ['part_id', 'posicion', 'fecha', 'caballo_id', 'jinete_id'] if c in df.columns]
+    hashed = pd.util.hash_pandas_object(df[cols].astype(str), index=False).values
+    return hashlib.sha1(hashed.tobytes() + str(DATASET_VERSION).encode()).hexdigest()
+
+
+def _rate(races, wins, default):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(races > 0, wins / np.maximum(races, 1), default)
+
+
+def _prior_mean(daily, col, window=3):
+    """Promedio de `col` en las `window` jornadas anteriores del caballo (NaN si no hay)."""
+    by_horse = daily['caballo_id']
+    cumsum = daily.groupby('caballo_id')[col].cumsum()
+    k = daily.groupby('caballo_id').cumcount()
+    prev = cumsum.groupby(by_horse).shift(1)
+    older = cumsum.groupby(by_horse).shift(window + 1).fillna(0)
+    return ((prev - older) / np.minimum(k, window)).where(k > 0)
+
+
+def point_in_time_features(df):
+    """
+    Features v5 (mismas columnas y defaults que OptimizedFeatureEngineering)
+    usando sólo resultados de fechas estrictamente anteriores a cada fila.
+
+    Returns:
+        (X con fe.feature_cols, df_enriched, fe) en el orden de filas de df
+    """
+    from src.models.backfill import asof_counts
+    from src.models.train_v5_optimized import OptimizedFeatureEngineering
+
+    fe = OptimizedFeatureEngineering()
+    out = df.reset_index(drop=True).copy()
+    out['fecha'] = pd.to_datetime(out['fecha']).dt.normalize()
+    out['posicion'] = pd.to_numeric(out['posicion'], errors='coerce').fillna(0)
+    out['distancia'] = pd.to_numeric(out['distancia'], errors='coerce').fillna(1000)
+    out['mandil'] = pd.to_numeric(out['mandil'], errors='coerce').fillna(0)
+    out['peso'] = (pd.to_numeric(out['peso_fs'], errors='coerce').fillna(470)
+                   if 'peso_fs' in out.columns else 470.0)
+    for col in ['caballo_id', 'jinete_id', 'hipodromo_id']:
+        out[col] = pd.to_numeric(out[col], errors='coerce').fillna(0).astype(np.int64)
+
+    # Entidades de texto como códigos enteros (asof_counts agrupa por int64)
+    out['dist_code'] = np.select([out['distancia'] < 1100, out['distancia'] <= 1400], [0, 1], default=2)
+    padre = out['padre'] if 'padre' in out.columns else pd.Series(None, index=out.index)
+    out['padre_code'] = pd.factorize(padre, use_na_sentinel=False)[0]
+
+    events = out.assign(win=(out['posicion'] == 1).astype(np.int64))
+    queries = out[['caballo_id', 'jinete_id', 'hipodromo_id', 'dist_code', 'padre_code', 'fecha']]
+
+    races, wins = asof_counts(events, ['caballo_id'], queries)
+    out['races_count'] = races
+    out['win_rate'] = _rate(races, wins, 0.0)
+    out['track_win_rate'] = _rate(*asof_counts(events, ['caballo_id', 'hipodromo_id'], queries), 0.0)
+    out['dist_win_rate'] = _rate(*asof_counts(events, ['caballo_id', 'dist_code'], queries), 0.0)
+    out['jockey_win_rate'] = _rate(*asof_counts(events, ['jinete_id'], queries), 0.08)
+    out['jockey_track_rate'] = _rate(*asof_counts(events, ['jinete_id', 'hipodromo_id'], queries), 0.08)
+    out['sire_win_rate'] = _rate(*asof_counts(events, ['padre_code'], queries), 0.10)
+    # Sin preparador en el historial 3NF: mismos valores fijos que v5
+    out['trainer_win_rate'] = 0.08
+    out['duo_eff'] = 0.0
+
+    # Forma del caballo: una fila por (caballo, jornada), sólo jornadas previas
+    pos_score = np.select([out['posicion'] <= 0, out['posicion'] == 1, out['posicion'] == 2,
+                           out['posicion'] == 3, out['posicion'] == 4], [0, 10, 8, 6, 4], default=2)
+    seconds = (out['tiempo'].apply(fe._clean_time).astype(float) if 'tiempo' in out.columns
+               else pd.Series(0.0, index=out.index))
+    speed = np.where(seconds > 0, out['distancia'] / seconds.where(seconds > 0, 1), 0)
+    daily = (out.assign(pos_score=pos_score, speed_mps=speed)
+             .groupby(['caballo_id', 'fecha'], sort=True)
+             .agg(pos_score=('pos_score', 'mean'), speed_mps=('speed_mps', 'mean'),
+                  posicion=('posicion', 'mean'))
+             .reset_index())
+    by_horse = daily.groupby('caballo_id')
+    daily['recent_form'] = _prior_mean(daily, 'pos_score').fillna(5)
+    daily['avg_speed_3'] = _prior_mean(daily, 'speed_mps').fillna(14)
+    daily['trend_3'] = (by_horse['posicion'].shift(1) - by_horse['posicion'].shift(3)).fillna(0)
+    daily['days_rest'] = (daily['fecha'] - by_horse['fecha'].shift(1)).dt.days.fillna(30).clip(0, 180)
+    form_cols = ['recent_form', 'avg_speed_3', 'trend_3', 'days_rest']
+    out = out.drop(columns=[c for c in form_cols if c in out.columns]).merge(
+        daily[['caballo_id', 'fecha'] + form_cols], on=['caballo_id', 'fecha'], how='left')
+
+    # Cold start de debutantes (mismo prior que v5)
+    debut = out['races_count'] == 0
+    out.loc[debut, 'win_rate'] = out.loc[debut, 'sire_win_rate'] * 0.6 + 0.08 * 0.4
+    out.loc[debut, 'recent_form'] = 5.0
+
+    X = out[fe.feature_cols].astype(float).replace([np.inf, -np.inf], np.nan).fillna(0)
+    return X, out, fe
+
+
+def build_backtest_dataset(df=None, cache_path=DATASET_CACHE_PATH, use_cache=True):
+    """
+    Matriz de features point-in-time ordenada por (fecha, carrera).
+
+    Returns:
+        dict con X (float32), y, posicion, fecha, race_codes, group_sizes,
+        day_offsets (fila inicial de cada jornada), days, feature_cols
+    """
+    from src.models.train_v5_optimized import get_relevance
+
+    if df is None:
+        from src.models.data_manager import cargar_datos_3nf
+        df = cargar_datos_3nf()
+    if df.empty:
+        raise ValueError("No hay datos para el backtest")
+
+    fingerprint = _fingerprint(df)
+    if use_cache and cache_path and os.path.exists(cache_path):
+        try:
+            cached = joblib.load(cache_path)
+            if cached.get('fingerprint') == fingerprint:
+                logger.info(f"✅ Dataset desde cache: {cache_path}")
+                return cached
+            logger.info("   Cache desactualizado (datos cambiaron), recalculando FE...")
+        except Exception as e:
+            logger.warning(f"⚠️ Cache ilegible ({e}), recalculando FE...")
+
+    t0 = time.perf_counter()
+    X, df_enriched, fe = point_in_time_features(df)
+    y = df_enriched['posicion'].apply(get_relevance)
+    groups = (df_enriched['hipodromo'].astype(str) + '_' + df_enriched['fecha'].astype(str) + '_' +
+              df_enriched['nro_carrera'].astype(str))
+
+    fechas = pd.to_datetime(df_enriched['fecha']).dt.normalize()
+    order = np.lexsort((groups.values, fechas.values))
+
+    fechas_sorted = fechas.values[order]
+    race_sorted = groups.values[order]
+    race_codes, race_index = pd.factorize(race_sorted)
+    _, group_sizes = np.unique(race_codes, return_counts=True)
+
+    days, day_offsets = np.unique(fechas_sorted, return_index=True)
+
+    dataset = {
+        'fingerprint': fingerprint,
+        'feature_cols': list(fe.feature_cols),
+        'X': X.values[order].astype(np.float32),
+        'y': y.values[order].astype(np.int32),
+        'posicion': df_enriched['posicion'].values[order].astype(np.int32),
+        'fecha': fechas_sorted,
+        'race_codes': race_codes.astype(np.int32),
+        'race_ids': np.asarray(race_index),
+        'group_sizes': group_sizes.astype(np.int32),
+        'days': days,
+        'day_offsets': np.append(day_offsets, len(order)).astype(np.int64)
+    }
+    logger.info(f"   FE point-in-time: {len(order)} filas, {len(days)} jornadas "
+                f"en {time.perf_counter() - t0:.1f}s")
+
+    if cache_path:
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        joblib.dump(dataset, cache_path)
+        logger.info(f"✅ Dataset cacheado: {cache_path}")
+
+    return dataset
+
+
+def race_hits(race_codes, scores, posicion):
+    """
+    Aciertos por carrera (orden exacto) dado el score de cada caballo.
+
+    Returns:
+        DataFrame indexado por race_code con columnas BET_TYPES (bool)
+    """
+    df = pd.DataFrame({'race': race_codes, 'score': scores, 'pos': posicion})
+    df = df.sort_values(['race', 'score'], ascending=[True, False], kind='stable')
+    df['rank'] = df.groupby('race').cumcount()
+
+    top = df[df['rank'] < 4].pivot(index='race', columns='rank', values='pos')
+    top = top.reindex(columns=range(4))
+
+    hits = pd.DataFrame(index=top.index)
+    ok = pd.Series(True, index=top.index)
+    for k, bet in enumerate(BET_TYPES):
+        ok = ok & (top[k] == k + 1)
+        hits[bet] = ok.values
+    return hits
+
+
+def walk_forward(dataset, retrain_every=8, warm_trees=25, min_train_days=30,
+                 params=None, desde=None, hasta=None):
+    """
+    Backtest walk-forward jornada por jornada.
+
+    Args:
+        dataset: salida de build_backtest_dataset
+        retrain_every: jornadas entre re-entrenamientos completos
+        warm_trees: árboles a agregar con init_model en las jornadas intermedias
+                    (0 = sin warm update, el modelo queda fijo hasta el retrain)
+        min_train_days: jornadas mínimas de historia antes de empezar a predecir
+        params: overrides del LGBMRanker (default: DEFAULT_PARAMS + hyperparam_search)
+        desde / hasta: rango de fechas (YYYY-MM-DD) a evaluar
+
+    Returns:
+        (daily DataFrame, stats dict)
+    """
+    from src.models.train_v5_optimized import DEFAULT_PARAMS, load_search_params
+
+    model_params = dict(DEFAULT_PARAMS)
+    model_params.update(params if params is not None else (load_search_params() or {}))
+
+    X, y = dataset['X'], dataset['y']
+    race_codes, group_sizes = dataset['race_codes'], dataset['group_sizes']
+    days, offsets = dataset['days'], dataset['day_offsets']
+
+    # Filas ordenadas por carrera: los group sizes de un rango de filas son
+    # un slice contiguo de group_sizes
+    def groups_between(row_start, row_end):
+        first = race_codes[row_start] if row_start < len(race_codes) else len(group_sizes)
+        last = race_codes[row_end - 1] + 1
+        return group_sizes[first:last]
+
+    first_day = max(min_train_days, 1)
+    day_idx = [
+        i for i in range(first_day, len(days))
+        if (desde is None or days[i] >= np.datetime64(desde))
+        and (hasta is None or days[i] <= np.datetime64(hasta))
+    ]
+    if not day_idx:
+        raise ValueError(f"Sin jornadas para evaluar (hay {len(days)}, min_train_days={min_train_days})")
+
+    model = None
+    trained_until = 0        # fila hasta la cual el modelo vio datos
+    days_since_retrain = None
+    n_retrains = n_warm = 0
+    fit_seconds = 0.0
+
+    scores = np.full(len(y), np.nan)
+    daily = []
+    t0 = time.perf_counter()
+
+    for i in day_idx:
+        start, end = offsets[i], offsets[i + 1]
+
+        t_fit = time.perf_counter()
+        if model is None or days_since_retrain >= retrain_every:
+            model = LGBMRanker(**model_params)
+            model.fit(X[:start], y[:start], group=groups_between(0, start))
+            trained_until, days_since_retrain = start, 0
+            n_retrains += 1
+        elif warm_trees and start > trained_until:
+            warm = LGBMRanker(**{**model_params, 'n_estimators': warm_trees})
+            warm.fit(X[trained_until:start], y[trained_until:start],
+                     group=groups_between(trained_until, start),
+                     init_model=model.booster_)
+            model, trained_until = warm, start
+            n_warm += 1
+        fit_seconds += time.perf_counter() - t_fit
+
+        scores[start:end] = model.predict(X[start:end])
+        days_since_retrain += 1
+
+        hits = race_hits(race_codes[start:end], scores[start:end], dataset['posicion'][start:end])
+        daily.append({
+            'fecha': str(days[i])[:10],
+            'carreras': int(len(hits)),
+            **{f'{bet}_hits': int(hits[bet].sum()) for bet in BET_TYPES}
+        })
+
+    elapsed = time.perf_counter() - t0
+    daily = pd.DataFrame(daily)
+
+    total = int(daily['carreras'].sum())
+    stats = {
+        'jornadas': int(len(daily)),
+        'total_carreras': total,
+        'n_retrains': n_retrains,
+        'n_warm_updates': n_warm,
+        'fit_seconds': round(fit_seconds, 2),
+        'elapsed_seconds': round(elapsed, 2),
+        'params': {
+            'retrain_every': retrain_every,
+            'warm_trees': warm_trees,
+            'min_train_days': min_train_days,
+            'n_estimators': int(model_params['n_estimators'])
+        }
+    }
+    for bet in BET_TYPES:
+        count = int(daily[f'{bet}_hits'].sum())
+        stats[f'{bet}_count'] = count
+        stats[f'{bet}_pct'] = round(count / total * 100, 1) if total else 0
+
+    return daily, stats
+
+
+def summarize_by_month(daily):
+    """Tasas de acierto por mes (para ver la evolución en el tiempo)."""
+    monthly = daily.assign(mes=daily['fecha'].str[:7]).groupby('mes').sum(numeric_only=True)
+    rows = []
+    for mes, r in monthly.iterrows():
+        row = {'mes': mes, 'carreras': int(r['carreras'])}
+        for bet in BET_TYPES:
+            row[f'{bet}_pct'] = round(r[f'{bet}_hits'] / r['carreras'] * 100, 1) if r['carreras'] else 0
+        rows.append(row)
+    return rows
+
+
+def run_backtest(retrain_every=8, warm_trees=25, min_train_days=30, desde=None, hasta=None,
+                 use_cache=True, output_path=REPORT_PATH, df=None):
+    """Backtest completo: dataset cacheado + walk-forward + reporte JSON."""
+    logger.info("=" * 70)
+    logger.info("BACKTEST WALK-FORWARD v5")
+    logger.info("=" * 70)
+
+    logger.info("\n[PASO 1/3] Preparando dataset point-in-time...")
+    dataset = build_backtest_dataset(df, use_cache=use_cache)
+
+    logger.info("\n[PASO 2/3] Reproduciendo jornadas...")
+    daily, stats = walk_forward(dataset, retrain_every, warm_trees, min_train_days,
+                                desde=desde, hasta=hasta)
+
+    monthly = summarize_by_month(daily)
+
+    logger.info(f"\n   {'Mes':8s} {'Carreras':>8s} {'Ganador':>8s} {'Quiniela':>9s} {'Trifecta':>9s}")
+    for m in monthly:
+        logger.info(f"   {m['mes']:8s} {m['carreras']:8d} {m['ganador_pct']:7.1f}% "
+                    f"{m['quiniela_pct']:8.1f}% {m['trifecta_pct']:8.1f}%")
+    logger.info(f"\n   Total: {stats['total_carreras']} carreras en {stats['jornadas']} jornadas")
+    logger.info(f"   Ganador {stats['ganador_pct']}% | Quiniela {stats['quiniela_pct']}% | "
+                f"Trifecta {stats['trifecta_pct']}% | Superfecta {stats['superfecta_pct']}%")
+    logger.info(f"   {stats['n_retrains']} re-entrenamientos, {stats['n_warm_updates']} warm updates, "
+                f"{stats['elapsed_seconds']}s")
+
+    logger.info("\n[PASO 3/3] Guardando reporte...")
+    report = {
+        'timestamp': datetime.now().strftime('%Y%m%d_%H%M%S'),
+        'summary': stats,
+        'monthly': monthly,
+        'daily': daily.to_dict('records')
+    }
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"✅ Reporte: {output_path}")
+
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Backtest walk-forward por jornada')
+    parser.add_argument('--retrain-every', type=int, default=8, help='Jornadas entre re-entrenamientos')
+    parser.add_argument('--warm-trees', type=int, default=25, help='Árboles por warm update (0 = desactivar)')
+    parser.add_argument('--min-train-days', type=int, default=30, help='Jornadas mínimas de historia')
+    parser.add_argument('--desde', type=str, default=None, help='Fecha inicial YYYY-MM-DD')
+    parser.add_argument('--hasta', type=str, default=None, help='Fecha final YYYY-MM-DD')
+    parser.add_argument('--no-cache', action='store_true', help='Recalcular features')
+    args = parser.parse_args()
+
+    try:
+        run_backtest(args.retrain_every, args.warm_trees, args.min_train_days,
+                     args.desde, args.hasta, use_cache=not args.no_cache)
+    except Exception as e:
+        logger.error(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
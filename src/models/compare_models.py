@@ -0,0 +1,332 @@
+"""
+Comparación Multi-Modelo sobre una Matriz de Features Compartida
+----------------------------------------------------------------
+Evalúa todos los artefactos registrados (v2, v4 ensemble/student/baseline,
+v5) sobre EL MISMO índice de carreras históricas:
+
+1. Una sola pasada de Feature Engineering por familia de features
+   ('v2' = features.FeatureEngineering, usada por v2 y v4;
+   'v5' = backtest.point_in_time_features, las columnas de v5 calculadas
+   sólo con fechas anteriores), en paralelo.
+2. Las filas de cada familia se alinean por part_id al índice común de
+   evaluación: por defecto las carreras posteriores al último día de
+   entrenamiento de los artefactos (train_hasta en su *_metadata.json).
+   Si la ventana se solapa con el entrenamiento de algún artefacto (o no
+   se conoce), se avisa y su fila queda con fuera_de_muestra != True.
+3. Cada artefacto aplica sólo lo propio (imputer de su FE) y predice; los
+   modelos se evalúan en paralelo con un ThreadPoolExecutor.
+4. Una única tabla: NDCG@3, aciertos ganador/quiniela/trifecta y latencia.
+
+Uso:
+    python -m src.models.compare_models --test-fraction 0.2
+
+Author: ML Engineering Team
+Date: 2026-10-19
+"""
+
+import sys
+import os
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.metrics import ndcg_score
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+REPORT_PATH = 'data/model_comparison.json'
+
+# Artefactos evaluables. family = familia de features que consume el modelo;
+# fe_path (opcional) = FE entrenado cuyo imputer se aplica sobre la matriz compartida;
+# metadata_path (opcional) = metadata del entrenamiento con 'train_hasta'.
+MODEL_REGISTRY = [
+    {'name': 'v2_lgbm_ranker', 'family': 'v2', 'loader': 'joblib',
+     'path': 'src/models/lgbm_ranker_v1.pkl', 'fe_path': 'src/models/feature_eng_v2.pkl'},
+    {'name': 'v4_ensemble', 'family': 'v2', 'loader': 'ensemble',
+     'path': 'src/models/ensemble_latest.pkl', 'fe_path': 'src/models/feature_eng_v4_ensemble.pkl',
+     'metadata_path': 'src/models/ensemble_metadata.json'},
+    {'name': 'v4_student', 'family': 'v2', 'loader': 'student',
+     'path': 'src/models/ensemble_student_latest.pkl', 'fe_path': 'src/models/feature_eng_v4_ensemble.pkl',
+     'metadata_path': 'src/models/ensemble_metadata.json'},
+    {'name': 'v4_baseline', 'family': 'v2', 'loader': 'joblib',
+     'path': 'src/models/lgbm_baseline_for_comparison.pkl', 'fe_path': 'src/models/feature_eng_v4_ensemble.pkl',
+     'metadata_path': 'src/models/ensemble_metadata.json'},
+    {'name': 'v5_lgbm_optimized', 'family': 'v5', 'loader': 'joblib',
+     'path': 'src/models/lgbm_optimized_latest.pkl',
+     'metadata_path': 'src/models/lgbm_optimized_metadata.json'},
+]
+
+
+class _PassthroughImputer:
+    """Deja los NaN intactos: cada artefacto aplica luego su propio imputer."""
+
+    def transform(self, X):
+        return X.values
+
+
+def _features_v2(df):
+    """Familia v2 (features.py). Devuelve (X con NaN, part_id alineado)."""
+    from src.models.features import FeatureEngineering
+
+    # FeatureEngineering.transform ordena por (caballo_id, fecha) y resetea el
+    # índice; replicamos el orden para recuperar el part_id de cada fila
+    df = df.copy()
+    df['fecha'] = pd.to_datetime(df['fecha'])
+    df = df.sort_values(['caballo_id', 'fecha'], kind='stable').reset_index(drop=True)
+
+    fe = FeatureEngineering()
+    fe.imputer = _PassthroughImputer()
+    X = fe.transform(df, is_training=False)
+    return X, df['part_id'].values
+
+
+def _features_v5(df):
+    """
+    Familia v5: mismas columnas que OptimizedFeatureEngineering, pero point-in-time
+    (backtest.point_in_time_features). fit_transform usa estadísticas de todo el
+    historial, incluidas las carreras evaluadas.
+    """
+    from src.models.backtest import point_in_time_features
+
+    X, df_enriched, _ = point_in_time_features(df)
+    return X, df_enriched['part_id'].values
+
+
+FEATURE_FAMILIES = {
+    'v2': _features_v2,
+    'v5': _features_v5,
+}
+
+
+def build_eval_index(df, test_fraction=0.2, desde=None):
+    """
+    Índice común de evaluación: una fila por participación de las últimas
+    carreras (por fecha), ordenado por (fecha, carrera, mandil).
+    """
+    idx = df[['part_id', 'posicion', 'fecha', 'hipodromo', 'nro_carrera', 'mandil']].copy()
+    idx['fecha'] = pd.to_datetime(idx['fecha'])
+    idx['race_id'] = (
+        idx['hipodromo'].astype(str) + '_' +
+        idx['fecha'].dt.strftime('%Y-%m-%d') + '_' +
+        idx['nro_carrera'].astype(str)
+    )
+    idx['posicion'] = pd.to_numeric(idx['posicion'], errors='coerce').fillna(0).astype(int)
+    idx = idx.sort_values(['fecha', 'race_id', 'mandil'], kind='stable').reset_index(drop=True)
+
+    if desde is not None:
+        idx = idx[idx['fecha'] >= pd.Timestamp(desde)]
+    else:
+        races = idx['race_id'].unique()
+        cut = races[int(len(races) * (1 - test_fraction))]
+        idx = idx.iloc[np.flatnonzero(idx['race_id'].values == cut)[0]:]
+
+    return idx.reset_index(drop=True)
+
+
+def training_cutoff(entry):
+    """Último día de entrenamiento del artefacto ('train_hasta' de su metadata) o None."""
+    path = entry.get('metadata_path')
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            hasta = json.load(f).get('train_hasta')
+        return pd.Timestamp(hasta) if hasta else None
+    except Exception as e:
+        logger.warning(f"⚠️ {entry['name']}: no se pudo leer {path}: {e}")
+        return None
+
+
+def build_feature_matrices(df, eval_index, families, max_workers=2):
+    """Una pasada de FE por familia (en paralelo), alineada al índice común."""
+    def build(family):
+        t0 = time.perf_counter()
+        X, part_ids = FEATURE_FAMILIES[family](df)
+        pos = pd.Series(np.arange(len(part_ids)), index=part_ids)
+        rows = pos.reindex(eval_index['part_id'].values).values
+        if np.isnan(rows).any():
+            raise ValueError(f"Familia {family}: filas sin features en el índice de evaluación")
+        X_eval = X.iloc[rows.astype(int)].reset_index(drop=True)
+        logger.info(f"   Familia {family}: {X.shape[1]} features en {time.perf_counter() - t0:.2f}s")
+        return family, X_eval
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return dict(pool.map(build, sorted(families)))
+
+
+def _load_model(entry):
+    """Carga el artefacto y devuelve un objeto con .predict(X)."""
+    if entry['loader'] == 'ensemble':
+        from src.models.ensemble_ranker import EnsembleRanker
+        return EnsembleRanker.load(entry['path'])
+    if entry['loader'] == 'student':
+        from src.models.distillation import load_student
+        return load_student(entry['path'])['model']
+    return joblib.load(entry['path'])
+
+
+def _impute(X, fe_path):
+    """Aplica el imputer del FE del artefacto (o fillna(0) como en inferencia)."""
+    if fe_path and os.path.exists(fe_path):
+        imputer = getattr(joblib.load(fe_path), 'imputer', None)
+        if imputer is not None:
+            return pd.DataFrame(imputer.transform(X), columns=X.columns)
+    return X.fillna(0)
+
+
+def evaluate_scores(scores, eval_index, k=3):
+    """NDCG@k medio por carrera + aciertos en orden exacto (como calculate_performance)."""
+    from src.models.backtest import race_hits, BET_TYPES
+
+    race_codes = pd.factorize(eval_index['race_id'])[0]
+    pos = eval_index['posicion'].values
+    rel = np.select([pos == 1, pos == 2, pos == 3, pos == 4, pos == 5], [10, 5, 3, 2, 1], 0)
+
+    bounds = np.flatnonzero(np.diff(race_codes)) + 1
+    ndcgs = [
+        ndcg_score([r], [s], k=k)
+        for r, s in zip(np.split(rel, bounds), np.split(scores, bounds))
+        if len(r) > 1 and r.max() > 0
+    ]
+
+    hits = race_hits(race_codes, scores, pos)
+    metrics = {f'ndcg@{k}': float(np.mean(ndcgs)) if ndcgs else 0.0, 'carreras': int(len(hits))}
+    for bet in BET_TYPES:
+        metrics[f'{bet}_pct'] = round(float(hits[bet].mean()) * 100, 1) if len(hits) else 0.0
+    return metrics
+
+
+def compare_models(df=None, registry=None, test_fraction=0.2, desde=None, max_workers=4):
+    """
+    Evalúa todos los artefactos disponibles sobre el mismo índice de carreras.
+
+    Returns:
+        (tabla, eval_index): DataFrame con una fila por modelo (ordenado por
+        ndcg@3) y el índice de carreras evaluadas (build_eval_index)
+    """
+    registry = registry or MODEL_REGISTRY
+    available = [m for m in registry if os.path.exists(m['path'])]
+    for m in registry:
+        if m not in available:
+            logger.warning(f"⚠️ {m['name']}: artefacto no encontrado ({m['path']})")
+    if not available:
+        raise FileNotFoundError("No hay artefactos de modelo para comparar")
+
+    if df is None:
+        from src.models.data_manager import cargar_datos_3nf
+        df = cargar_datos_3nf()
+    if df.empty:
+        raise ValueError("No hay datos históricos para evaluar")
+
+    logger.info("\n[PASO 1/3] Construyendo índice de evaluación...")
+    cutoffs = {m['name']: training_cutoff(m) for m in available}
+    known = [c for c in cutoffs.values() if c is not None]
+    if desde is None and known:
+        # Sólo carreras que ningún artefacto vio al entrenar
+        desde = max(known) + pd.Timedelta(days=1)
+        logger.info(f"   Ventana fuera de muestra: desde {desde.date()} (train_hasta más reciente)")
+    eval_index = build_eval_index(df, test_fraction, desde)
+    if eval_index.empty:
+        raise ValueError(f"No hay carreras desde {pd.Timestamp(desde).date()} para evaluar fuera de "
+                         f"muestra: esperar resultados nuevos o pasar --desde (fuera_de_muestra=False)")
+    logger.info(f"   {eval_index['race_id'].nunique()} carreras, {len(eval_index)} participaciones "
+                f"desde {eval_index['fecha'].min().date()}")
+
+    logger.info("\n[PASO 2/3] Feature Engineering (una pasada por familia)...")
+    matrices = build_feature_matrices(df, eval_index, {m['family'] for m in available})
+
+    logger.info(f"\n[PASO 3/3] Evaluando {len(available)} modelos en paralelo...")
+
+    eval_desde = eval_index['fecha'].min()
+    for name, cutoff in cutoffs.items():
+        if cutoff is None:
+            logger.warning(f"⚠️ {name}: sin train_hasta en su metadata, las métricas pueden ser in-sample")
+        elif eval_desde <= cutoff:
+            logger.warning(f"⚠️ {name}: entrenado hasta {cutoff.date()}, la ventana desde "
+                           f"{eval_desde.date()} se solapa con su entrenamiento (métricas in-sample)")
+
+    def evaluate(entry):
+        cutoff = cutoffs[entry['name']]
+        sample = {
+            'train_hasta': str(cutoff.date()) if cutoff is not None else None,
+            'fuera_de_muestra': bool(eval_desde > cutoff) if cutoff is not None else None
+        }
+        try:
+            model = _load_model(entry)
+            X = _impute(matrices[entry['family']], entry.get('fe_path'))
+            t0 = time.perf_counter()
+            scores = np.asarray(model.predict(X), dtype=float)
+            latency = (time.perf_counter() - t0) * 1000
+            return {
+                'modelo': entry['name'],
+                'familia': entry['family'],
+                **evaluate_scores(scores, eval_index),
+                'predict_ms': round(latency, 1),
+                'ms_por_1k': round(latency / max(len(X), 1) * 1000, 2),
+                **sample
+            }
+        except Exception as e:
+            logger.error(f"❌ {entry['name']}: {e}")
+            return {'modelo': entry['name'], 'familia': entry['family'], 'error': str(e), **sample}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        rows = list(pool.map(evaluate, available))
+
+    table = pd.DataFrame(rows)
+    if 'ndcg@3' in table.columns:
+        table = table.sort_values('ndcg@3', ascending=False, na_position='last')
+    return table.reset_index(drop=True), eval_index
+
+
+def run_comparison(test_fraction=0.2, desde=None, output_path=REPORT_PATH, df=None, registry=None):
+    """Compara modelos, imprime la tabla y guarda el reporte JSON."""
+    logger.info("=" * 70)
+    logger.info("COMPARACIÓN DE MODELOS (MATRIZ DE FEATURES COMPARTIDA)")
+    logger.info("=" * 70)
+
+    table, eval_index = compare_models(df, registry, test_fraction, desde)
+
+    logger.info("\n" + table.to_string(index=False))
+
+    report = {
+        'timestamp': datetime.now().strftime('%Y%m%d_%H%M%S'),
+        'desde': str(eval_index['fecha'].min().date()),
+        'hasta': str(eval_index['fecha'].max().date()),
+        'n_carreras': int(eval_index['race_id'].nunique()),
+        'modelos': json.loads(table.to_json(orient='records'))
+    }
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    logger.info(f"✅ Reporte: {output_path}")
+
+    return table
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compara todos los modelos sobre las mismas carreras')
+    parser.add_argument('--test-fraction', type=float, default=0.2,
+                        help='Fracción final de carreras a evaluar (sólo si ningún artefacto tiene train_hasta)')
+    parser.add_argument('--desde', type=str, default=None, help='Evaluar desde YYYY-MM-DD')
+    args = parser.parse_args()
+
+    try:
+        run_comparison(args.test_fraction, args.desde)
+    except Exception as e:
+        logger.error(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -2,11 +2,18 @@ import sqlite3
 import pandas as pd
 import os
 import json
-import joblib
 import numpy as np
 from datetime import datetime, timedelta
 
+from src.utils import instrumentation, tracing
 
+
+def _connect(nombre_db):
+    """Conexión SQLite instrumentada (sentencias como db_statements y eventos de traza)."""
+    return instrumentation.instrument_connection(sqlite3.connect(nombre_db))
+
+
+@tracing.traced('sqlite cargar_datos')
 def cargar_datos(nombre_db='data/db/hipica_data.db'):
     """Carga los datos desde la base de datos SQLite (tabla antigua para compatibilidad)."""
     # Fix paths if running from root or src
@@ -17,13 +24,48 @@ def cargar_datos(nombre_db='data/db/hipica_data.db'):
         return pd.DataFrame()
         
     try:
-        conn = sqlite3.connect(nombre_db)
+        conn = _connect(nombre_db)
         df = pd.read_sql("SELECT * FROM resultados", conn)
         conn.close()
         return df
     except Exception as e:
         return pd.DataFrame()
 
+# FROM / ORDER BY compartido por los dos loaders 3NF (mismo orden de filas)
+_FROM_3NF = '''
+        FROM participaciones p
+        JOIN carreras car ON p.carrera_id = car.id
+        JOIN jornadas jor ON car.jornada_id = jor.id
+        JOIN hipodromos h ON jor.hipodromo_id = h.id
+        JOIN caballos c ON p.caballo_id = c.id
+        JOIN jinetes j ON p.jinete_id = j.id
+        ORDER BY jor.fecha DESC, car.numero ASC
+'''
+
+COLUMNAS_3NF = ['part_id', 'posicion', 'mandil', 'peso_fs', 'dividendo', 'tiempo',
+                'caballo_id', 'caballo', 'ano_nacimiento', 'padre', 'jinete_id', 'jinete',
+                'fecha', 'hipodromo_id', 'hipodromo', 'distancia', 'tipo', 'pista', 'nro_carrera']
+
+CHUNK_3NF = 100_000  # filas por lectura del loader tipado (acota el pico de objetos Python)
+
+
+def _limpiar_numericos_3nf(df):
+    """
+    peso_fs / dividendo como número. El ETL ya los guarda como REAL
+    (HipicaETL._normalizar_numericos); la limpieza de strings sólo corre si
+    la DB todavía tiene valores legacy en texto.
+    """
+    if 'dividendo' in df.columns and df['dividendo'].dtype == object:
+        df['dividendo'] = df['dividendo'].astype(str).str.replace(',', '.', regex=False)
+        df['dividendo'] = pd.to_numeric(df['dividendo'], errors='coerce')
+
+    if 'peso_fs' in df.columns and df['peso_fs'].dtype == object:
+        df['peso_fs'] = df['peso_fs'].astype(str).str.replace('Kg', '', case=False, regex=False).str.strip()
+        df['peso_fs'] = pd.to_numeric(df['peso_fs'], errors='coerce')
+    return df
+
+
+@tracing.traced('sqlite cargar_datos_3nf')
 def cargar_datos_3nf(nombre_db='data/db/hipica_data.db'):
     """Carga datos desde la estructura 3NF normalizada."""
     if not os.path.exists(nombre_db) and os.path.exists(f'data/db/{nombre_db}'):
@@ -33,7 +75,7 @@ def cargar_datos_3nf(nombre_db='data/db/hipica_data.db'):
         return pd.DataFrame()
     
     try:
-        conn = sqlite3.connect(nombre_db)
+        conn = _connect(nombre_db)
         query = '''
         SELECT 
             p.id as part_id,
@@ -55,49 +97,159 @@ def cargar_datos_3nf(nombre_db='data/db/hipica_data.db'):
             car.tipo,
             car.pista,
             car.numero as nro_carrera
-        FROM participaciones p
-        JOIN carreras car ON p.carrera_id = car.id
-        JOIN jornadas jor ON car.jornada_id = jor.id
-        JOIN hipodromos h ON jor.hipodromo_id = h.id
-        JOIN caballos c ON p.caballo_id = c.id
-        JOIN jinetes j ON p.jinete_id = j.id
-        ORDER BY jor.fecha DESC, car.numero ASC
-        '''
+        ''' + _FROM_3NF
         df = pd.read_sql(query, conn)
         conn.close()
         
         # Limpieza de tipos de datos
         if not df.empty:
-            if 'dividendo' in df.columns:
-                df['dividendo'] = df['dividendo'].astype(str).str.replace(',', '.', regex=False)
-                df['dividendo'] = pd.to_numeric(df['dividendo'], errors='coerce')
-            
-            if 'peso_fs' in df.columns:
-                df['peso_fs'] = df['peso_fs'].astype(str).str.replace('Kg', '', case=False, regex=False).str.strip()
-                df['peso_fs'] = pd.to_numeric(df['peso_fs'], errors='coerce')
+            _limpiar_numericos_3nf(df)
                 
         return df
     except Exception as e:
         print(f"Error cargando datos 3NF: {e}")
         return pd.DataFrame()
 
-def cargar_programa(nombre_db='data/db/hipica_data.db', solo_futuras=True):
+
+def _categoria(valores, pos):
+    """Columna category a partir de una tabla de dimensión (valores) y la posición de cada fila en ella."""
+    dim = pd.Categorical(valores)
+    codes = np.where(pos >= 0, dim.codes[pos], -1)
+    return pd.Categorical.from_codes(codes, dim.categories).remove_unused_categories()
+
+
+def _desde_dimension(valores, pos, dtype):
+    """Columna numérica de una tabla de dimensión (NaN si la fila no está)."""
+    valores = pd.to_numeric(pd.Series(valores), errors='coerce').to_numpy(dtype='float64')
+    out = np.where(pos >= 0, valores[pos], np.nan)
+    return out.astype(dtype)
+
+
+@tracing.traced('sqlite cargar_datos_3nf_tipado')
+def cargar_datos_3nf_tipado(nombre_db='data/db/hipica_data.db'):
+    """
+    Mismo resultado que cargar_datos_3nf (columnas y orden de filas) con
+    dtypes compactos: ids y nro_carrera int32, numéricos float32 (NaN para
+    nulos), textos category y fecha datetime64.
+
+    La tabla de hechos se lee sólo con columnas numéricas (+ tiempo) en
+    bloques de CHUNK_3NF filas; nombres, padre, hipódromo, fecha, tipo y
+    pista salen de las tablas de dimensión (chicas) como códigos de
+    category, sin un string Python por fila. Para historiales grandes
+    ocupa varias veces menos memoria que cargar_datos_3nf.
+    """
+    if not os.path.exists(nombre_db) and os.path.exists(f'data/db/{nombre_db}'):
+        nombre_db = f'data/db/{nombre_db}'
+
+    if not os.path.exists(nombre_db):
+        return pd.DataFrame()
+
+    try:
+        conn = _connect(nombre_db)
+        caballos = pd.read_sql('SELECT id, nombre, ano_nacimiento, padre FROM caballos', conn)
+        jinetes = pd.read_sql('SELECT id, nombre FROM jinetes', conn)
+        carreras = pd.read_sql('''
+            SELECT car.id, jor.fecha, h.id AS hipodromo_id, h.nombre AS hipodromo,
+                   car.distancia, car.tipo, car.pista, car.numero
+            FROM carreras car
+            JOIN jornadas jor ON car.jornada_id = jor.id
+            JOIN hipodromos h ON jor.hipodromo_id = h.id
+        ''', conn)
+        tiempos = [t for (t,) in conn.execute(
+            'SELECT DISTINCT tiempo FROM participaciones WHERE tiempo IS NOT NULL ORDER BY tiempo')]
+
+        query = '''
+        SELECT
+            p.id as part_id,
+            p.carrera_id,
+            p.caballo_id,
+            p.jinete_id,
+            p.posicion,
+            p.mandil,
+            p.peso_fs,
+            p.dividendo,
+            p.tiempo
+        ''' + _FROM_3NF
+        chunks = []
+        for chunk in pd.read_sql(query, conn, chunksize=CHUNK_3NF):
+            _limpiar_numericos_3nf(chunk)
+            chunks.append(pd.DataFrame({
+                'part_id': chunk['part_id'].astype('int32'),
+                'carrera_id': chunk['carrera_id'].astype('int32'),
+                'caballo_id': chunk['caballo_id'].astype('int32'),
+                'jinete_id': chunk['jinete_id'].astype('int32'),
+                'posicion': pd.to_numeric(chunk['posicion'], errors='coerce').astype('float32'),
+                'mandil': pd.to_numeric(chunk['mandil'], errors='coerce').astype('float32'),
+                'peso_fs': chunk['peso_fs'].astype('float32'),
+                'dividendo': chunk['dividendo'].astype('float32'),
+                'tiempo': pd.Categorical(chunk['tiempo'], categories=tiempos),
+            }))
+        conn.close()
+
+        if not chunks:
+            return pd.DataFrame(columns=COLUMNAS_3NF)
+        hechos = pd.concat(chunks, ignore_index=True)
+        del chunks
+
+        # Posición de cada fila en las tablas de dimensión
+        pos_caballo = pd.Index(caballos['id']).get_indexer(hechos['caballo_id'])
+        pos_jinete = pd.Index(jinetes['id']).get_indexer(hechos['jinete_id'])
+        pos_carrera = pd.Index(carreras['id']).get_indexer(hechos.pop('carrera_id'))
+        fechas = pd.to_datetime(carreras['fecha'], errors='coerce').to_numpy()
+
+        df = pd.DataFrame({
+            'part_id': hechos['part_id'],
+            'posicion': hechos['posicion'],
+            'mandil': hechos['mandil'],
+            'peso_fs': hechos['peso_fs'],
+            'dividendo': hechos['dividendo'],
+            'tiempo': hechos['tiempo'].cat.remove_unused_categories(),
+            'caballo_id': hechos['caballo_id'],
+            'caballo': _categoria(caballos['nombre'], pos_caballo),
+            'ano_nacimiento': _desde_dimension(caballos['ano_nacimiento'], pos_caballo, 'float32'),
+            'padre': _categoria(caballos['padre'], pos_caballo),
+            'jinete_id': hechos['jinete_id'],
+            'jinete': _categoria(jinetes['nombre'], pos_jinete),
+            'fecha': fechas[pos_carrera],
+            'hipodromo_id': carreras['hipodromo_id'].to_numpy(dtype='int32')[pos_carrera],
+            'hipodromo': _categoria(carreras['hipodromo'], pos_carrera),
+            'distancia': _desde_dimension(carreras['distancia'], pos_carrera, 'float32'),
+            'tipo': _categoria(carreras['tipo'], pos_carrera),
+            'pista': _categoria(carreras['pista'], pos_carrera),
+            'nro_carrera': carreras['numero'].to_numpy(dtype='int32')[pos_carrera],
+        })
+        return df
+    except Exception as e:
+        print(f"Error cargando datos 3NF tipados: {e}")
+        return pd.DataFrame()
+
+@tracing.traced('sqlite cargar_programa')
+def cargar_programa(nombre_db='data/db/hipica_data.db', solo_futuras=True, fecha=None, fecha_hasta=None):
     """
     Carga el programa de carreras desde la base de datos.
     
     Args:
         nombre_db: Ruta a la base de datos.
         solo_futuras: Si es True, filtra por fecha >= hoy (optimización de memoria).
+        fecha: Si se indica (YYYY-MM-DD), sólo el programa de esa jornada.
+        fecha_hasta: Con `fecha`, rango [fecha, fecha_hasta] (backfill).
     """
     if not os.path.exists(nombre_db) and os.path.exists(f'data/db/{nombre_db}'):
         nombre_db = f'data/db/{nombre_db}'
         
     try:
-        conn = sqlite3.connect(nombre_db)
+        conn = _connect(nombre_db)
         
         # Filtro de fecha inyectable
         fecha_filter = ""
-        if solo_futuras:
+        params = None
+        if fecha and fecha_hasta:
+            fecha_filter = "WHERE pc.fecha BETWEEN ? AND ?"
+            params = [fecha, fecha_hasta]
+        elif fecha:
+            fecha_filter = "WHERE pc.fecha = ?"
+            params = [fecha]
+        elif solo_futuras:
             # FIX: Use Python to determine date, avoiding SQLite 'localtime' issues on Cloud Run (UTC)
             # Chile is UTC-3 (approx, ignoring DST complex rules for now or use pytz if available)
             from datetime import timedelta
@@ -131,12 +283,17 @@ def cargar_programa(nombre_db='data/db/hipica_data.db', solo_futuras=True):
                 {fecha_filter}
                 ORDER BY pc.fecha ASC, pc.nro_carrera ASC, pc.numero ASC
              """
-             df = pd.read_sql(query, conn)
+             df = pd.read_sql(query, conn, params=params)
         except:
              # Fallback to simple select if flat table
              # También aplicamos filtro si es posible
-             where_simple = f"WHERE fecha >= '{today_str}'" if solo_futuras else ""
-             df = pd.read_sql(f"SELECT * FROM programa_carreras {where_simple}", conn)
+             if fecha and fecha_hasta:
+                 where_simple = "WHERE fecha BETWEEN ? AND ?"
+             elif fecha:
+                 where_simple = "WHERE fecha = ?"
+             else:
+                 where_simple = f"WHERE fecha >= '{today_str}'" if solo_futuras else ""
+             df = pd.read_sql(f"SELECT * FROM programa_carreras {where_simple}", conn, params=params)
              
         conn.close()
         return df
@@ -258,13 +415,13 @@ def calcular_todos_patrones(df=None):
     Retorna una lista de patrones completa (sin filtrar por hipódromo aún).
     """
     if df is None:
-        df = cargar_datos_3nf()
+        df = cargar_datos_3nf_tipado()
     
     if df.empty: return []
 
-    # Agrupar por carrera
+    # Agrupar por carrera (observed: con columnas category sólo las combinaciones presentes)
     try:
-        carreras_groups = df.groupby(['hipodromo', 'fecha', 'nro_carrera'])
+        carreras_groups = df.groupby(['hipodromo', 'fecha', 'nro_carrera'], observed=True)
     except KeyError:
         # Fallback si faltan columnas
         return []
@@ -300,7 +457,7 @@ def calcular_todos_patrones(df=None):
         # Add metadata for filtering later in view
         for r in race_details:
             r['hipodromo'] = hip
-            r['fecha'] = fecha
+            r['fecha'] = str(fecha)[:10]  # 'YYYY-MM-DD' también si fecha viene como datetime
             r['nro_carrera'] = nro
 
         # Quinela (Top 2 - Box allowed in logic, checking sorted tuple)
@@ -568,14 +725,14 @@ def detectar_patrones_futuros():
 
 def obtener_estadisticas_generales():
     """Calcula estadísticas generales de rendimiento."""
-    df = cargar_datos_3nf()
+    df = cargar_datos_3nf_tipado()
     if df.empty:
         return {'jinetes': [], 'caballos': [], 'pistas': [], 'total_carreras': 0, 'aciertos_ultimo_mes': 0, 'dividendos_generados': 0}
 
     try:
         # 1. Top Jinetes (Por Eficiencia de Ganador)
         # Filtrar jinetes con al menos 5 carreras para evitar sesgos de 100% con 1 carrera
-        jinetes_stats = df.groupby('jinete').agg(
+        jinetes_stats = df.groupby('jinete', observed=True).agg(
             carreras=('posicion', 'count'),
             ganadas=('posicion', lambda x: (x==1).sum()),
             top3=('posicion', lambda x: (x<=3).sum())
@@ -586,18 +743,18 @@ def obtener_estadisticas_generales():
         top_jinetes = jinetes_stats.sort_values('eficiencia', ascending=False).head(10).to_dict('records')
         
         # 2. Top Caballos (Más ganadores recientemente)
-        caballos_stats = df.groupby('caballo').agg(
+        caballos_stats = df.groupby('caballo', observed=True).agg(
             carreras=('posicion', 'count'),
             ganadas=('posicion', lambda x: (x==1).sum())
         ).reset_index()
         top_caballos = caballos_stats.sort_values('ganadas', ascending=False).head(10).to_dict('records')
         
         # 3. Estadísticas por Pista (Hipódromo)
-        pistas_stats = df.groupby('hipodromo').agg(
+        pistas_stats = df.groupby('hipodromo', observed=True).agg(
             carreras=('nro_carrera', 'count'), # Total participaciones
             promedio_div=('dividendo', 'mean')
         ).reset_index()
-        pistas_stats['promedio_div'] = pistas_stats['promedio_div'].fillna(0)
+        pistas_stats['promedio_div'] = pistas_stats['promedio_div'].astype('float64').fillna(0)
         track_stats = pistas_stats.to_dict('records')
 
         # 4. Precision mes y Dividendos (Usando funcion existente)
@@ -632,6 +789,7 @@ def obtener_estadisticas_generales():
         print(f"Error calculando estadisticas: {e}")
         return {'jinetes': [], 'caballos': [], 'pistas': [], 'total_carreras': 0}
 
+@tracing.traced('sqlite obtener_predicciones_historicas')
 def obtener_predicciones_historicas(fecha_inicio=None, fecha_fin=None, hipodromo=None, limite=100, nombre_db='data/db/hipica_data.db'):
     """
     Obtiene predicciones históricas de la base de datos.
@@ -650,7 +808,7 @@ def obtener_predicciones_historicas(fecha_inicio=None, fecha_fin=None, hipodromo
         nombre_db = f'data/db/{nombre_db}'
         
     try:
-        conn = sqlite3.connect(nombre_db)
+        conn = _connect(nombre_db)
         
         query = """
         SELECT 
@@ -698,6 +856,7 @@ def obtener_predicciones_historicas(fecha_inicio=None, fecha_fin=None, hipodromo
         print(f"Error obteniendo predicciones históricas: {e}")
         return pd.DataFrame()
 
+@tracing.traced('sqlite obtener_ultimos_aciertos')
 def obtener_ultimos_aciertos(dias=30, nombre_db='data/db/hipica_data.db'):
     """
     Obtiene los aciertos recientes (Ranking 1 que ganó la carrera) de los últimos X días.
@@ -706,7 +865,7 @@ def obtener_ultimos_aciertos(dias=30, nombre_db='data/db/hipica_data.db'):
         nombre_db = f'data/db/{nombre_db}'
         
     try:
-        conn = sqlite3.connect(nombre_db)
+        conn = _connect(nombre_db)
         
         # Calculate date threshold in Python for safety
         fecha_limite = (datetime.now() - timedelta(days=dias)).strftime('%Y-%m-%d')
@@ -751,6 +910,7 @@ def obtener_ultimos_aciertos(dias=30, nombre_db='data/db/hipica_data.db'):
         print(f"Error obteniendo aciertos: {e}")
         return []
 
+@tracing.traced('sqlite calcular_precision_modelo')
 def calcular_precision_modelo(fecha_inicio=None, fecha_fin=None, nombre_db='data/db/hipica_data.db'):
     """
     Calcula métricas de precisión del modelo comparando predicciones con resultados reales.
@@ -767,7 +927,7 @@ def calcular_precision_modelo(fecha_inicio=None, fecha_fin=None, nombre_db='data
         nombre_db = f'data/db/{nombre_db}'
         
     try:
-        conn = sqlite3.connect(nombre_db)
+        conn = _connect(nombre_db)
         
         # Query que une predicciones con resultados reales
         query = """
@@ -0,0 +1,175 @@
+"""
+Destilación del Ensemble v4 en un único LightGBM compacto
+---------------------------------------------------------
+El ensemble (LightGBM + XGBoost + CatBoost + Ridge) es el "teacher"; el
+"student" es un solo LightGBM con pocos árboles poco profundos entrenado
+sobre los scores out-of-fold del teacher.
+
+- El student regresa el score del teacher (misma escala), así el calibrador
+  isotónico del ensemble (calibrator_v4.pkl) sigue siendo válido.
+- Fidelidad: NDCG@3 y acuerdo del top-1 por carrera contra el teacher, más
+  el NDCG contra resultados reales de ambos (gap de calidad).
+
+Author: ML Engineering Team
+Date: 2026-10-19
+"""
+
+import os
+import json
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import joblib
+from lightgbm import LGBMRegressor
+from sklearn.metrics import ndcg_score
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STUDENT_PATH = 'src/models/ensemble_student_latest.pkl'
+STUDENT_METADATA_PATH = 'src/models/ensemble_student_metadata.json'
+
+# Student compacto: pocos árboles poco profundos
+STUDENT_PARAMS = {
+    'objective': 'regression',
+    'n_estimators': 150,
+    'num_leaves': 15,
+    'max_depth': 4,
+    'learning_rate': 0.08,
+    'min_child_samples': 20,
+    'colsample_bytree': 0.9,
+    'subsample': 0.9,
+    'subsample_freq': 1,
+    'random_state': 42,
+    'n_jobs': -1,
+    'verbose': -1
+}
+
+
+def teacher_scores(ensemble, X):
+    """
+    Scores del teacher para entrenar al student.
+
+    Usa las predicciones OOF del meta-learner donde existen (sin sobreajuste
+    del ensemble re-entrenado) y el ensemble final para las filas del primer
+    bloque temporal, que nunca fueron validación.
+    """
+    scores = np.asarray(ensemble.predict(X), dtype=float)
+
+    oof = getattr(ensemble, 'oof_predictions', None)
+    mask = getattr(ensemble, 'oof_mask', None)
+    if oof is not None and mask is not None and len(oof) == len(scores):
+        scores[mask] = ensemble.meta_model.predict(oof[mask])
+
+    return scores
+
+
+def _per_race_fidelity(student, teacher, y_true, groups, k=3):
+    """NDCG@k y acuerdo top-1 por carrera (promedio sobre carreras con >1 caballo)."""
+    df = pd.DataFrame({
+        'student': np.asarray(student, dtype=float),
+        'teacher': np.asarray(teacher, dtype=float),
+        'y': np.asarray(y_true, dtype=float),
+        'race': np.asarray(groups)
+    })
+
+    ndcg_teacher, ndcg_student_true, ndcg_teacher_true, top1 = [], [], [], []
+    for _, g in df.groupby('race', sort=False):
+        if len(g) < 2:
+            continue
+        # Relevancia del teacher: ranking invertido (el favorito tiene la mayor)
+        teacher_rel = g['teacher'].rank(method='first').values - 1
+        ndcg_teacher.append(ndcg_score([teacher_rel], [g['student'].values], k=k))
+        top1.append(g['student'].values.argmax() == g['teacher'].values.argmax())
+        if g['y'].max() > 0:
+            ndcg_student_true.append(ndcg_score([g['y'].values], [g['student'].values], k=k))
+            ndcg_teacher_true.append(ndcg_score([g['y'].values], [g['teacher'].values], k=k))
+
+    student_true = float(np.mean(ndcg_student_true)) if ndcg_student_true else 0.0
+    teacher_true = float(np.mean(ndcg_teacher_true)) if ndcg_teacher_true else 0.0
+
+    return {
+        f'ndcg@{k}_vs_teacher': float(np.mean(ndcg_teacher)) if ndcg_teacher else 0.0,
+        'top1_agreement': float(np.mean(top1)) if top1 else 0.0,
+        f'student_ndcg@{k}': student_true,
+        f'teacher_ndcg@{k}': teacher_true,
+        'fidelity_gap': teacher_true - student_true,
+        'n_races': len(top1)
+    }
+
+
+def distill_ensemble(ensemble, X_train, groups_train, X_eval, y_eval, groups_eval,
+                     params=None, save=True, path=STUDENT_PATH):
+    """
+    Entrena el student sobre los scores OOF del teacher y mide fidelidad.
+
+    Args:
+        ensemble: EnsembleRanker ya entrenado (con oof_predictions)
+        X_train, groups_train: datos con los que se entrenó el ensemble
+        X_eval, y_eval, groups_eval: hold-out para medir fidelidad
+        params: overrides de STUDENT_PARAMS
+        save: si se guarda el artefacto + metadata
+
+    Returns:
+        (student, fidelity dict)
+    """
+    logger.info("=" * 70)
+    logger.info("DESTILACIÓN: ENSEMBLE -> LIGHTGBM COMPACTO")
+    logger.info("=" * 70)
+
+    target = teacher_scores(ensemble, X_train)
+
+    student = LGBMRegressor(**{**STUDENT_PARAMS, **(params or {})})
+    student.fit(X_train, target)
+    logger.info(f"✅ Student entrenado ({student.n_estimators} árboles, "
+                f"max_depth={student.max_depth})")
+
+    teacher_eval = ensemble.predict(X_eval)
+    student_eval = student.predict(X_eval)
+    fidelity = _per_race_fidelity(student_eval, teacher_eval, y_eval, groups_eval)
+
+    logger.info(f"   NDCG@3 vs teacher:  {fidelity['ndcg@3_vs_teacher']:.4f}")
+    logger.info(f"   Acuerdo top-1:      {fidelity['top1_agreement']:.2%}")
+    logger.info(f"   NDCG@3 teacher:     {fidelity['teacher_ndcg@3']:.4f}")
+    logger.info(f"   NDCG@3 student:     {fidelity['student_ndcg@3']:.4f}")
+    logger.info(f"   Gap de fidelidad:   {fidelity['fidelity_gap']:+.4f}")
+
+    if save:
+        save_student(student, fidelity, list(getattr(X_train, 'columns', [])), path)
+
+    return student, fidelity
+
+
+def save_student(student, fidelity, feature_cols, path=STUDENT_PATH):
+    """Guarda el student (alias latest + timestamp) y su metadata de fidelidad."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    data = {
+        'model': student,
+        'feature_cols': feature_cols,
+        'fidelity': fidelity,
+        'timestamp': timestamp
+    }
+    joblib.dump(data, path.replace('_latest.pkl', f'_{timestamp}.pkl'))
+    joblib.dump(data, path)
+    logger.info(f"✅ Student guardado: {path}")
+
+    metadata = {'timestamp': timestamp, 'params': student.get_params(), **fidelity}
+    metadata_path = os.path.join(os.path.dirname(path), os.path.basename(STUDENT_METADATA_PATH))
+    with open(metadata_path, 'w') as f:
+        json.dump(metadata, f, indent=2, default=str)
+    logger.info(f"✅ Metadata: {metadata_path}")
+
+
+def load_student(path=STUDENT_PATH):
+    """Carga el student; devuelve el dict guardado por save_student."""
+    data = joblib.load(path)
+    logger.info(f"✅ Student cargado desde: {path}")
+    logger.info(f"   Timestamp: {data.get('timestamp', 'N/A')}")
+    fidelity = data.get('fidelity') or {}
+    if fidelity:
+        logger.info(f"   Acuerdo top-1 vs ensemble: {fidelity.get('top1_agreement', 0):.2%}")
+    return data
@@ -17,11 +17,18 @@ from sklearn.model_selection import TimeSeriesSplit
 from sklearn.metrics import ndcg_score
 import joblib
 import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from src.utils.profiling import maybe_stage
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Protege el cache de boosters XGBoost por cantidad de threads
+_XGB_BOOSTERS_LOCK = threading.Lock()
+
 
 class EnsembleRanker:
     """
@@ -38,18 +45,34 @@ class EnsembleRanker:
         >>> predictions = ensemble.predict(X_test)
     """
     
-    def __init__(self, save_individual_models=True):
+    def __init__(self, save_individual_models=True, params=None, n_jobs=-1, min_meta_weight=0.0):
         """
         Args:
             save_individual_models: Si se guardan los modelos base individualmente
+            params: Overrides de hiperparámetros por modelo base, p.ej.
+                    {'LightGBM': {'n_estimators': 180, 'num_leaves': 15}}
+                    (ver src/models/hyperparam_search.py)
+            n_jobs: Threads totales para predict (-1 = todos los cores). Se
+                    reparten entre los modelos base que corren en paralelo
+            min_meta_weight: Modelos base con |peso Ridge| menor se omiten en
+                    predict (su columna se reemplaza por su media OOF; > 0
+                    requiere member_means, ausente en pickles anteriores)
         """
         self.save_individual_models = save_individual_models
+        self.n_jobs = n_jobs
+        self.min_meta_weight = min_meta_weight
         
         # Base Models (configuración optimizada)
         self.lgbm = self._build_lgbm()
         self.xgb = self._build_xgb()
         self.catboost = self._build_catboost()
         
+        params = params or {}
+        for model, name in zip([self.lgbm, self.xgb, self.catboost],
+                               ['LightGBM', 'XGBoost', 'CatBoost']):
+            if params.get(name):
+                model.set_params(**params[name])
+        
         # Meta-learner
         self.meta_model = Ridge(alpha=1.0, random_state=42)
         
@@ -57,9 +80,12 @@ class EnsembleRanker:
         self.base_model_names = ['LightGBM', 'XGBoost', 'CatBoost']
         self.base_models = [self.lgbm, self.xgb, self.catboost]
         
-        # OOF predictions (para análisis)
+        # OOF predictions (para análisis y destilación)
         self.oof_predictions = None
+        self.oof_mask = None
         self.meta_weights = None
+        # Media OOF por modelo base: valor de relleno de los modelos omitidos
+        self.member_means = None
     
     def _build_lgbm(self):
         """LightGBM con configuración optimizada"""
@@ -125,7 +151,7 @@ class EnsembleRanker:
             allow_writing_files=False
         )
     
-    def fit(self, X, y, groups, categorical_features=None):
+    def fit(self, X, y, groups, categorical_features=None, profiler=None):
         """
         Entrena el ensemble con stacking
         
@@ -134,6 +160,7 @@ class EnsembleRanker:
             y: Target (relevance scores)
             groups: Group IDs para ranking (race IDs)
             categorical_features: Lista de columnas categóricas para CatBoost
+            profiler: TrainingProfiler opcional (src/utils/profiling.py)
         
         Returns:
             self
@@ -149,13 +176,17 @@ class EnsembleRanker:
         
         # Paso 1: Generar out-of-fold predictions para meta-learner
         logger.info("\n[PASO 1/3] Generando OOF predictions con CV temporal...")
-        oof_preds = self._generate_oof_predictions(
-            X, y, groups, categorical_features
-        )
+        with maybe_stage(profiler, 'oof'):
+            oof_preds = self._generate_oof_predictions(
+                X, y, groups, categorical_features, profiler
+            )
         
         # Paso 2: Entrenar meta-learner
         logger.info("\n[PASO 2/3] Entrenando meta-learner Ridge...")
-        self.meta_model.fit(oof_preds, y_np)
+        with maybe_stage(profiler, 'meta_fit'):
+            self.meta_model.fit(oof_preds, y_np)
+        mask = self.oof_mask if self.oof_mask is not None and self.oof_mask.any() else slice(None)
+        self.member_means = oof_preds[mask].mean(axis=0)
         
         # Guardar coeficientes
         self.meta_weights = {
@@ -170,7 +201,8 @@ class EnsembleRanker:
         
         # Paso 3: Re-entrenar base models en TODO el dataset
         logger.info("\n[PASO 3/3] Re-entrenando base models en dataset completo...")
-        self._retrain_base_models(X, y, groups, categorical_features)
+        with maybe_stage(profiler, 'retrain'):
+            self._retrain_base_models(X, y, groups, categorical_features, profiler)
         
         logger.info("\n" + "="*70)
         logger.info("✅ ENSEMBLE ENTRENADO EXITOSAMENTE")
@@ -178,7 +210,7 @@ class EnsembleRanker:
         
         return self
     
-    def _generate_oof_predictions(self, X, y, groups, categorical_features=None):
+    def _generate_oof_predictions(self, X, y, groups, categorical_features=None, profiler=None):
         """
         Genera out-of-fold predictions usando CV temporal
         
@@ -191,6 +223,7 @@ class EnsembleRanker:
         n_samples = len(X)
         n_models = len(self.base_models)
         oof_preds = np.zeros((n_samples, n_models))
+        oof_mask = np.zeros(n_samples, dtype=bool)
         
         logger.info(f"   Cross-Validation: {n_splits} folds temporales")
         
@@ -202,43 +235,47 @@ class EnsembleRanker:
             fold_scores = []
             
             for fold, (train_idx, val_idx) in enumerate(tscv.split(X), 1):
-                # Split data
-                X_train, X_val = X.iloc[train_idx], X.iloc[val_idx]
-                y_train, y_val = y.iloc[train_idx], y.iloc[val_idx]
-                g_train, g_val = groups.iloc[train_idx], groups.iloc[val_idx]
+                with maybe_stage(profiler, f'{name}/fold_{fold}'):
+                    # Split data
+                    X_train, X_val = X.iloc[train_idx], X.iloc[val_idx]
+                    y_train, y_val = y.iloc[train_idx], y.iloc[val_idx]
+                    g_train, g_val = groups.iloc[train_idx], groups.iloc[val_idx]
                 
-                # Get group counts
-                train_groups = g_train.value_counts().sort_index().values
-                val_groups = g_val.value_counts().sort_index().values
+                    # Get group counts
+                    train_groups = g_train.value_counts().sort_index().values
+                    val_groups = g_val.value_counts().sort_index().values
                 
-                # Train
-                if isinstance(model, CatBoostRanker):
-                    model.fit(
-                        X_train, y_train, group_id=g_train,
-                        cat_features=categorical_features,
-                        verbose=False
-                    )
-                else:
-                    model.fit(X_train, y_train, group=train_groups)
+                    # Train
+                    if isinstance(model, CatBoostRanker):
+                        model.fit(
+                            X_train, y_train, group_id=g_train,
+                            cat_features=categorical_features,
+                            verbose=False
+                        )
+                    else:
+                        model.fit(X_train, y_train, group=train_groups)
                 
-                # Predict on validation (OOF)
-                val_preds = model.predict(X_val)
-                oof_preds[val_idx, model_idx] = val_preds
+                    # Predict on validation (OOF)
+                    val_preds = model.predict(X_val)
+                    oof_preds[val_idx, model_idx] = val_preds
+                    oof_mask[val_idx] = True
                 
-                # Evaluate
-                score = ndcg_score([y_val.values], [val_preds])
-                fold_scores.append(score)
+                    # Evaluate
+                    score = ndcg_score([y_val.values], [val_preds])
+                    fold_scores.append(score)
                 
-                logger.info(f"      Fold {fold}/{n_splits}: NDCG = {score:.4f}")
+                    logger.info(f"      Fold {fold}/{n_splits}: NDCG = {score:.4f}")
             
             avg_score = np.mean(fold_scores)
             std_score = np.std(fold_scores)
             logger.info(f"      {name} CV Score: {avg_score:.4f} ± {std_score:.4f}")
         
         self.oof_predictions = oof_preds
+        # Filas del primer bloque temporal nunca son validación (OOF = 0)
+        self.oof_mask = oof_mask
         return oof_preds
     
-    def _retrain_base_models(self, X, y, groups, categorical_features=None):
+    def _retrain_base_models(self, X, y, groups, categorical_features=None, profiler=None):
         """Re-entrena base models en todo el dataset"""
         # Get group counts
         group_counts = groups.value_counts().sort_index().values
@@ -246,50 +283,125 @@ class EnsembleRanker:
         for model, name in zip(self.base_models, self.base_model_names):
             logger.info(f"   Re-entrenando {name}...")
             
-            if isinstance(model, CatBoostRanker):
-                model.fit(
-                    X, y, group_id=groups,
-                    cat_features=categorical_features,
-                    verbose=False
-                )
-            else:
-                model.fit(X, y, group=group_counts)
+            with maybe_stage(profiler, name):
+                if isinstance(model, CatBoostRanker):
+                    model.fit(
+                        X, y, group_id=groups,
+                        cat_features=categorical_features,
+                        verbose=False
+                    )
+                else:
+                    model.fit(X, y, group=group_counts)
             
             logger.info(f"      ✅ {name} entrenado")
     
-    def predict(self, X):
+    def _active_members(self, min_meta_weight):
+        """Índices de los modelos base con |peso| >= min_meta_weight (al menos uno)"""
+        coefs = np.abs(np.asarray(self.meta_model.coef_, dtype=float))
+        active = [i for i, coef in enumerate(coefs) if coef >= min_meta_weight]
+        return active or [int(np.argmax(coefs))]
+    
+    def _member(self, idx):
+        """Modelo base idx; los miembros lazy (src/models/model_registry.py) se cargan aquí"""
+        model = self.base_models[idx]
+        if hasattr(model, 'resolve'):
+            model = model.resolve()
+            self.base_models[idx] = model
+            setattr(self, ['lgbm', 'xgb', 'catboost'][idx], model)
+        return model
+    
+    def _member_predict(self, idx, X, n_threads):
+        """Predict de un modelo base limitado a n_threads"""
+        model = self._member(idx)
+        if isinstance(model, LGBMRanker):
+            return model.predict(X, num_threads=n_threads)
+        if isinstance(model, CatBoostRanker):
+            return model.predict(X, thread_count=n_threads)
+        # XGBoost no recibe threads por llamada: se usa una copia del booster
+        # con nthread fijo en vez de mutar el estimador compartido
+        booster = self._xgb_booster(model, n_threads)
+        best = getattr(model, 'best_iteration', None)
+        return booster.inplace_predict(X, iteration_range=(0, best + 1) if best is not None else (0, 0))
+    
+    def _xgb_booster(self, model, n_threads):
+        """Copia del booster de model con nthread=n_threads (cacheada por threads)"""
+        with _XGB_BOOSTERS_LOCK:
+            cache = self.__dict__.setdefault('_xgb_boosters', {})
+            cached = cache.get(n_threads)
+            if cached is None or cached[0] is not model:
+                booster = model.get_booster().copy()
+                booster.set_param({'nthread': n_threads})
+                cached = cache[n_threads] = (model, booster)
+            return cached[1]
+    
+    def _base_predictions(self, X, parallel=True, min_meta_weight=None):
+        """
+        Matriz (n, 3) con las predicciones de los modelos base.
+        
+        Los modelos activos corren en un thread pool (el trabajo nativo
+        libera el GIL) con n_jobs // n_activos threads cada uno, así el
+        tiempo total se acerca al del modelo más lento. Los omitidos por
+        min_meta_weight quedan con su media OOF.
+        """
+        if min_meta_weight is None:
+            min_meta_weight = self.min_meta_weight
+        if min_meta_weight > 0 and self.member_means is None:
+            # Ensembles guardados antes de member_means: rellenar con ceros
+            # desplazaría la predicción del meta-learner
+            raise ValueError("min_meta_weight > 0 requiere member_means; re-entrenar el ensemble "
+                             "o usar min_meta_weight=0")
+        active = self._active_members(min_meta_weight)
+        
+        budget = self.n_jobs if self.n_jobs and self.n_jobs > 0 else (os.cpu_count() or 1)
+        base_preds = np.empty((len(X), len(self.base_models)))
+        if len(active) < len(self.base_models):
+            base_preds[:] = np.asarray(self.member_means, dtype=float)
+        
+        if parallel and len(active) > 1:
+            per_model = max(1, budget // len(active))
+            with ThreadPoolExecutor(max_workers=len(active), thread_name_prefix='ensemble') as pool:
+                futures = {i: pool.submit(self._member_predict, i, X, per_model) for i in active}
+                for i, future in futures.items():
+                    base_preds[:, i] = future.result()
+        else:
+            for i in active:
+                base_preds[:, i] = self._member_predict(i, X, budget)
+        
+        return base_preds
+    
+    def predict(self, X, parallel=True, min_meta_weight=None):
         """
         Genera predicciones del ensemble
         
         Args:
             X: Features
+            parallel: Si los modelos base se evalúan concurrentemente
+            min_meta_weight: Override de self.min_meta_weight
         
         Returns:
             Final scores (numpy array)
         """
         # Predicciones de base models
-        base_preds = np.column_stack([
-            model.predict(X) for model in self.base_models
-        ])
+        base_preds = self._base_predictions(X, parallel, min_meta_weight)
         
         # Meta-learner combina
         final_scores = self.meta_model.predict(base_preds)
         
         return final_scores
     
-    def predict_with_details(self, X):
+    def predict_with_details(self, X, parallel=True, min_meta_weight=None):
         """
         Predicción con detalles de cada modelo
         
         Returns:
             dict con 'final_scores', 'lgbm_scores', 'xgb_scores', 'catboost_scores'
         """
-        base_preds = {}
-        for model, name in zip(self.base_models, self.base_model_names):
-            base_preds[f'{name.lower()}_scores'] = model.predict(X)
+        stacked = self._base_predictions(X, parallel, min_meta_weight)
         
-        # Stack
-        stacked = np.column_stack(list(base_preds.values()))
+        base_preds = {
+            f'{name.lower()}_scores': stacked[:, i]
+            for i, name in enumerate(self.base_model_names)
+        }
         
         # Final
         base_preds['final_scores'] = self.meta_model.predict(stacked)
@@ -315,6 +427,7 @@ class EnsembleRanker:
             'catboost': self.catboost,
             'meta_model': self.meta_model,
             'meta_weights': self.meta_weights,
+            'member_means': self.member_means,
             'timestamp': timestamp
         }
         
@@ -357,6 +470,7 @@ class EnsembleRanker:
         ensemble.catboost = data['catboost']
         ensemble.meta_model = data['meta_model']
         ensemble.meta_weights = data['meta_weights']
+        ensemble.member_means = data.get('member_means')
         
         # Update base_models list
         ensemble.base_models = [ensemble.lgbm, ensemble.xgb, ensemble.catboost]
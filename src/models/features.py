@@ -186,7 +186,7 @@ class FeatureEngineering(BaseEstimator, TransformerMixin):
         df['prev_date'] = df.groupby('caballo_id')['fecha'].shift(1)
         df['days_rest'] = (df['fecha'] - df['prev_date']).dt.days.fillna(30)
         
-        df['seconds'] = df['tiempo'].apply(self._clean_time)
+        df['seconds'] = df['tiempo'].apply(self._clean_time).astype(float)
         df['speed_mps'] = np.where(df['seconds'] > 0, df['distancia'] / df['seconds'], 0)
         prev_speed = df.groupby('caballo_id')['speed_mps'].shift(1)
         df['avg_speed_3'] = grouped_horse['speed_mps'].shift(1).rolling(3, min_periods=1).mean().fillna(14) # Check alignment
@@ -0,0 +1,418 @@
+"""
+Búsqueda de Hiperparámetros con Presupuesto (Successive Halving / Hyperband)
+---------------------------------------------------------------------------
+Busca la configuración de LGBMRanker para el modelo v5 (features point-in-time
+de backtest.point_in_time_features) o para el miembro LightGBM del ensemble v4
+(--features ensemble, que train_v4_ensemble pasa a EnsembleRanker):
+1. Splits temporales por carrera (ninguna carrera queda partida entre train/val)
+2. Successive halving: muchas configuraciones con pocos árboles, sólo las
+   mejores 1/eta pasan a la siguiente ronda con eta veces más árboles
+3. Brackets tipo Hyperband para no depender de un único presupuesto inicial
+4. Early stopping por fit sobre NDCG@3 (el número de árboles lo decide la validación)
+5. Selección final: la configuración MÁS RÁPIDA dentro de `tolerance` del mejor score
+
+Uso:
+    python -m src.models.hyperparam_search --configs 27 --max-trees 800
+    python -m src.models.hyperparam_search --features ensemble
+
+Author: ML Engineering Team
+Date: 2026-10-19
+"""
+
+import sys
+import os
+import json
+import math
+import time
+import logging
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import lightgbm as lgb
+from lightgbm import LGBMRanker
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# lightgbm>=4.7 depreca eval_set en favor de eval_X/eval_y; mantenemos eval_set
+# para compatibilidad con versiones anteriores
+warnings.filterwarnings('ignore', message=".*'eval_set' is deprecated.*")
+
+RESULT_PATH = 'src/models/hyperparam_search_lgbm.json'
+ENSEMBLE_RESULT_PATH = 'src/models/hyperparam_search_ensemble.json'
+
+# Parámetros fijos (no se buscan)
+BASE_PARAMS = {
+    'objective': 'lambdarank',
+    'metric': 'ndcg',
+    'subsample_freq': 5,
+    'random_state': 42,
+    'n_jobs': -1,
+    'verbose': -1,
+    'force_col_wise': True
+}
+
+# Espacio de búsqueda (valores discretos, muestreo aleatorio con semilla)
+SEARCH_SPACE = {
+    'num_leaves': [7, 15, 20, 31],
+    'max_depth': [3, 4, 5, 6],
+    'learning_rate': [0.03, 0.05, 0.1],
+    'min_child_samples': [20, 30, 50],
+    'reg_alpha': [0.0, 0.5, 1.0],
+    'reg_lambda': [0.2, 1.0, 3.0],
+    'colsample_bytree': [0.6, 0.7, 0.8],
+    'subsample': [0.7, 0.8, 1.0]
+}
+
+
+def race_aware_splits(groups, fechas=None, n_splits=3, min_train_fraction=0.5):
+    """
+    Splits temporales expanding-window respetando carreras.
+
+    Las carreras se ordenan por (fecha, race_id); el primer `min_train_fraction`
+    siempre es train y el resto se divide en `n_splits` bloques de validación
+    contiguos. El fold k entrena con todas las carreras anteriores al bloque k.
+
+    Args:
+        groups: race_id por fila
+        fechas: fecha por fila (si es None se usa el orden de aparición)
+        n_splits: número de folds
+        min_train_fraction: fracción mínima de carreras en el primer train
+
+    Returns:
+        Lista de (train_idx, val_idx) con índices posicionales
+    """
+    groups = pd.Series(np.asarray(groups))
+
+    if fechas is not None:
+        races = pd.DataFrame({'race': groups, 'fecha': pd.to_datetime(np.asarray(fechas))})
+        race_order = (
+            races.groupby('race', sort=False)['fecha'].min()
+            .reset_index()
+            .sort_values(['fecha', 'race'], kind='stable')['race']
+            .values
+        )
+    else:
+        race_order = groups.unique()
+
+    n_races = len(race_order)
+    first_val = int(n_races * min_train_fraction)
+    if n_races - first_val < n_splits:
+        raise ValueError(f"Muy pocas carreras ({n_races}) para {n_splits} folds")
+
+    rank = pd.Series(np.arange(n_races), index=race_order)
+    row_rank = groups.map(rank).values
+
+    bounds = np.linspace(first_val, n_races, n_splits + 1).astype(int)
+    splits = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        train_idx = np.flatnonzero(row_rank < start)
+        val_idx = np.flatnonzero((row_rank >= start) & (row_rank < end))
+        splits.append((train_idx, val_idx))
+
+    return splits
+
+
+def _contiguous_by_race(idx, race_codes):
+    """Reordena índices para que cada carrera quede contigua; devuelve (idx, group_sizes)."""
+    order = np.argsort(race_codes[idx], kind='stable')
+    idx = idx[order]
+    _, sizes = np.unique(race_codes[idx], return_counts=True)
+    return idx, sizes
+
+
+def sample_configs(n_configs, space=None, seed=42):
+    """Muestrea `n_configs` configuraciones distintas del espacio de búsqueda."""
+    space = space or SEARCH_SPACE
+    rng = np.random.default_rng(seed)
+    keys = sorted(space)
+    total = int(np.prod([len(space[k]) for k in keys]))
+    n_configs = min(n_configs, total)
+
+    configs, seen = [], set()
+    while len(configs) < n_configs:
+        cfg = {k: space[k][rng.integers(len(space[k]))] for k in keys}
+        key = tuple(cfg[k] for k in keys)
+        if key in seen:
+            continue
+        seen.add(key)
+        configs.append(cfg)
+    return configs
+
+
+def inference_cost(params, n_trees):
+    """Costo relativo de inferencia: árboles x profundidad efectiva."""
+    depth = min(params.get('max_depth', 6), math.ceil(math.log2(max(params.get('num_leaves', 31), 2))))
+    return int(n_trees) * depth
+
+
+def evaluate_config(params, X, y, race_codes, splits, n_estimators,
+                    early_stopping_rounds=30, eval_at=3):
+    """
+    Entrena una configuración en cada fold con early stopping sobre NDCG@k.
+
+    Returns:
+        dict con score (NDCG@k medio), best_iteration medio y segundos de fit
+    """
+    X_np = X.values if isinstance(X, pd.DataFrame) else np.asarray(X)
+    y_np = y.values if isinstance(y, pd.Series) else np.asarray(y)
+    metric_key = f'ndcg@{eval_at}'
+
+    scores, iters = [], []
+    t0 = time.perf_counter()
+
+    for train_idx, val_idx in splits:
+        tr, tr_sizes = _contiguous_by_race(train_idx, race_codes)
+        va, va_sizes = _contiguous_by_race(val_idx, race_codes)
+
+        model = LGBMRanker(**{**BASE_PARAMS, **params, 'n_estimators': int(n_estimators)})
+        model.fit(
+            X_np[tr], y_np[tr], group=tr_sizes,
+            eval_set=[(X_np[va], y_np[va])],
+            eval_group=[va_sizes],
+            eval_at=[eval_at],
+            callbacks=[lgb.early_stopping(early_stopping_rounds, first_metric_only=True, verbose=False)]
+        )
+
+        best_iter = model.best_iteration_ or int(n_estimators)
+        iters.append(best_iter)
+        scores.append(model.best_score_['valid_0'][metric_key])
+
+    return {
+        'score': float(np.mean(scores)),
+        'score_std': float(np.std(scores)),
+        'best_iteration': int(math.ceil(np.mean(iters))),
+        'fit_seconds': round(time.perf_counter() - t0, 3)
+    }
+
+
+def successive_halving(configs, X, y, race_codes, splits, min_trees, max_trees,
+                       eta=3, early_stopping_rounds=30, config_offset=0):
+    """
+    Successive halving: evalúa todas las configs con `min_trees`, conserva el
+    mejor 1/eta y multiplica el presupuesto por eta hasta `max_trees`.
+
+    Si una config ya se detuvo por early stopping con holgura en la ronda
+    anterior, más árboles no cambian el resultado y se reutiliza sin re-entrenar.
+
+    Returns:
+        Lista de resultados (uno por config y ronda evaluada)
+    """
+    results = []
+    survivors = [(config_offset + i, cfg) for i, cfg in enumerate(configs)]
+    previous = {}
+    budget = min_trees
+    rung = 0
+
+    while survivors:
+        logger.info(f"   Ronda {rung}: {len(survivors)} configs x {budget} árboles")
+        rung_results = []
+        for cfg_id, cfg in survivors:
+            prev = previous.get(cfg_id)
+            if prev is not None and prev['best_iteration'] + early_stopping_rounds <= prev['budget']:
+                res = {k: prev[k] for k in ('score', 'score_std', 'best_iteration')}
+                res['fit_seconds'] = 0.0
+            else:
+                res = evaluate_config(cfg, X, y, race_codes, splits, budget, early_stopping_rounds)
+            res.update({'config_id': cfg_id, 'params': cfg, 'budget': int(budget), 'rung': rung})
+            rung_results.append(res)
+            previous[cfg_id] = res
+        results.extend(rung_results)
+
+        if budget >= max_trees or len(survivors) == 1:
+            break
+
+        rung_results.sort(key=lambda r: r['score'], reverse=True)
+        keep = max(1, len(rung_results) // eta)
+        survivors = [(r['config_id'], r['params']) for r in rung_results[:keep]]
+        budget = min(max_trees, budget * eta)
+        rung += 1
+
+    return results
+
+
+def hyperband(X, y, groups, fechas=None, n_configs=27, min_trees=50, max_trees=800,
+              eta=3, n_splits=3, early_stopping_rounds=30, seed=42):
+    """
+    Brackets tipo Hyperband: cada bracket arranca con menos configs pero más
+    árboles, cubriendo tanto exploración amplia como configs de convergencia lenta.
+
+    Returns:
+        Lista de resultados de todas las rondas de todos los brackets
+    """
+    splits = race_aware_splits(groups, fechas, n_splits=n_splits)
+    race_codes = pd.factorize(np.asarray(groups))[0]
+
+    s_max = int(math.floor(math.log(max_trees / min_trees, eta) + 1e-9))
+
+    # Bracket s: n_s configs con max_trees * eta^-s árboles iniciales.
+    # El bracket más exploratorio (s = s_max) evalúa `n_configs` configs.
+    n_per_bracket = {
+        s: max(1, int(math.ceil(n_configs * (s_max + 1) / (s + 1) * eta ** (s - s_max))))
+        for s in range(s_max, -1, -1)
+    }
+    configs = sample_configs(sum(n_per_bracket.values()), seed=seed)
+
+    results = []
+    offset = 0
+    for s, n in n_per_bracket.items():
+        bracket_configs = configs[offset:offset + n] or configs[:n]
+        offset += n
+        r0 = max(min_trees, int(max_trees * eta ** -s))
+
+        logger.info(f"\n   Bracket s={s}: {len(bracket_configs)} configs, {r0} árboles iniciales")
+        bracket = successive_halving(
+            bracket_configs, X, y, race_codes, splits,
+            min_trees=r0, max_trees=max_trees, eta=eta,
+            early_stopping_rounds=early_stopping_rounds,
+            config_offset=offset - len(bracket_configs)
+        )
+        for r in bracket:
+            r['bracket'] = s
+        results.extend(bracket)
+
+    return results
+
+
+def select_fastest(results, tolerance=0.005):
+    """
+    Entre los resultados dentro de `tolerance` del mejor score, elige el de
+    menor costo de inferencia (best_iteration x profundidad).
+    """
+    if not results:
+        raise ValueError("Sin resultados de búsqueda")
+
+    best_score = max(r['score'] for r in results)
+    candidates = [r for r in results if r['score'] >= best_score - tolerance]
+    for r in candidates:
+        r['inference_cost'] = inference_cost(r['params'], r['best_iteration'])
+
+    chosen = min(candidates, key=lambda r: (r['inference_cost'], -r['score']))
+    best_params = dict(chosen['params'])
+    best_params['n_estimators'] = int(chosen['best_iteration'])
+
+    return {
+        'best_params': best_params,
+        'score': chosen['score'],
+        'best_score': best_score,
+        'tolerance': tolerance,
+        'inference_cost': chosen['inference_cost'],
+        'n_candidates': len(candidates)
+    }
+
+
+def search_data(df=None, features='v5'):
+    """
+    Matriz sobre la que se rankean las configuraciones.
+
+    Args:
+        df: DataFrame crudo (formato cargar_datos_3nf). Si es None se lee de SQLite.
+        features: 'v5' = backtest.point_in_time_features (cada fila sólo ve
+                  fechas anteriores; prepare_training_data usa tasas de todo el
+                  historial y premia configs que memorizan el resultado) o
+                  'ensemble' = features del ensemble v4 (train_v4_ensemble)
+
+    Returns:
+        X, y, groups (race_id), fechas por fila
+    """
+    if df is None:
+        from src.models.data_manager import cargar_datos_3nf_tipado
+        df = cargar_datos_3nf_tipado()
+
+    if features == 'ensemble':
+        from src.models.train_v4_ensemble import prepare_training_data, race_fechas
+
+        X, y, groups, _, _ = prepare_training_data(df=df)
+        return X, y, groups, race_fechas(groups)
+
+    from src.models.backtest import point_in_time_features
+    from src.models.train_v5_optimized import get_relevance
+
+    X, df_enriched, _ = point_in_time_features(df)
+    y = df_enriched['posicion'].apply(get_relevance)
+    groups = (df_enriched['hipodromo'].astype(str) + '_' +
+              df_enriched['fecha'].dt.strftime('%Y-%m-%d') + '_' +
+              df_enriched['nro_carrera'].astype(str))
+    return X, y, groups, df_enriched['fecha']
+
+
+def run_search(n_configs=27, min_trees=50, max_trees=800, eta=3, n_splits=3,
+               tolerance=0.005, output_path=None, df=None, features='v5'):
+    """
+    Ejecuta la búsqueda completa y guarda el resultado (RESULT_PATH para v5,
+    ENSEMBLE_RESULT_PATH para el ensemble si output_path es None).
+    """
+    output_path = output_path or (ENSEMBLE_RESULT_PATH if features == 'ensemble' else RESULT_PATH)
+
+    logger.info("=" * 70)
+    logger.info("BÚSQUEDA DE HIPERPARÁMETROS (SUCCESSIVE HALVING + EARLY STOPPING)")
+    logger.info("=" * 70)
+
+    logger.info(f"\n[PASO 1/3] Preparando datos (features {features})...")
+    X, y, groups, fechas = search_data(df, features)
+    logger.info(f"   {len(X)} registros, {groups.nunique()} carreras")
+
+    logger.info("\n[PASO 2/3] Ejecutando brackets...")
+    t0 = time.perf_counter()
+    results = hyperband(
+        X, y, groups, fechas,
+        n_configs=n_configs, min_trees=min_trees, max_trees=max_trees,
+        eta=eta, n_splits=n_splits
+    )
+    elapsed = time.perf_counter() - t0
+
+    logger.info("\n[PASO 3/3] Seleccionando configuración...")
+    selection = select_fastest(results, tolerance)
+
+    logger.info(f"   Mejor NDCG@3:       {selection['best_score']:.4f}")
+    logger.info(f"   Elegida NDCG@3:     {selection['score']:.4f}")
+    logger.info(f"   Árboles:            {selection['best_params']['n_estimators']}")
+    logger.info(f"   Costo inferencia:   {selection['inference_cost']}")
+
+    output = {
+        'timestamp': datetime.now().strftime('%Y%m%d_%H%M%S'),
+        'metric': 'ndcg@3',
+        'features': features,
+        'n_fits': int(sum(r['fit_seconds'] > 0 for r in results) * n_splits),
+        'search_seconds': round(elapsed, 1),
+        **selection,
+        'results': sorted(results, key=lambda r: r['score'], reverse=True)
+    }
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(output, f, indent=2, default=float)
+    logger.info(f"✅ Resultado: {output_path}")
+
+    return output
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Búsqueda de hiperparámetros LGBMRanker (v5 / ensemble)')
+    parser.add_argument('--configs', type=int, default=27, help='Configuraciones a muestrear')
+    parser.add_argument('--min-trees', type=int, default=50, help='Presupuesto mínimo de árboles')
+    parser.add_argument('--max-trees', type=int, default=800, help='Presupuesto máximo de árboles')
+    parser.add_argument('--eta', type=int, default=3, help='Factor de reducción por ronda')
+    parser.add_argument('--splits', type=int, default=3, help='Folds temporales por carrera')
+    parser.add_argument('--tolerance', type=float, default=0.005, help='Tolerancia de NDCG@3')
+    parser.add_argument('--features', choices=['v5', 'ensemble'], default='v5',
+                        help='v5 (point-in-time) o ensemble (miembro LightGBM de train_v4_ensemble)')
+    args = parser.parse_args()
+
+    try:
+        run_search(args.configs, args.min_trees, args.max_trees, args.eta,
+                   args.splits, args.tolerance, features=args.features)
+    except Exception as e:
+        logger.error(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -2,14 +2,14 @@ import pandas as pd
 import numpy as np
 import joblib
 import os
-import sqlite3
-import json
 import sys
 import logging
 import time
 from datetime import datetime
 from src.models.data_manager import cargar_programa, cargar_datos_3nf
 from src.models.features import FeatureEngineering
+from src.models.segment_ops import segment_minmax, segment_softmax, race_order
+from src.utils.profiling import profile_run, pop_profile_arg
 
 # Configure logging
 logging.basicConfig(
@@ -267,69 +267,44 @@ class InferencePipeline:
         # Apply Softmax per Race
         print("⚖️ Applying Softmax Normalization...")
         
-        results = []
-        
-        for race_id, group in df_program.groupby('race_unique_id'):
-            # Get raw scores from model
-            scores = group['raw_score'].values
-            
-            # 🎯 PROFESSIONAL CALIBRATION: Temperature + Min-Max + Amplification
-            score_min = scores.min()
-            score_max = scores.max()
-            score_range = score_max - score_min
-            
-            if score_range > 1e-6:  # Avoid division by zero
-                # 1. Normalize to [0, 1]
-                normalized = (scores - score_min) / score_range
-                
-                # 2. Amplify differences (power > 1 increases separation)
-                amplified = normalized ** self.amplification_power
-                
-                # 3. Temperature scaling (T < 1 = more confident)
-                scaled = amplified / self.temperature
-                
-                # 4. Softmax with numerical stability
-                exp_scores = np.exp(scaled - np.max(scaled))
-                probs = exp_scores / np.sum(exp_scores)
-            else:
-                # All scores identical → uniform distribution
-                probs = np.ones(len(scores)) / len(scores)
-                logger.warning(f"Race {race_id}: All scores identical ({score_min:.3f}), using uniform")
-            
-            # Map back
-            group['prob_win'] = probs
-            
-            # Formating
-            for idx, r in group.iterrows():
-                results.append({
-                    'fecha': r['fecha'], # str or date
-                    'hipodromo': r['hipodromo'],
-                    'carrera': r['nro_carrera'],
-                    'numero': r['numero'],
-                    'caballo': r['caballo'],
-                    'probabilidad': round(r['prob_win'] * 100, 1)
-                })
+        # 🎯 PROFESSIONAL CALIBRATION: Min-Max + Amplification + Temperature Softmax,
+        # en una sola pasada vectorizada sobre los segmentos de cada carrera
+        segments = race_order(df_program['race_unique_id'].values)
+        
+        # 1. Normalize to [0, 1] within race
+        normalized, degenerate = segment_minmax(df_program['raw_score'].values, None, segments=segments)
+        
+        # 2. Amplify differences (power > 1 increases separation)
+        amplified = normalized ** self.amplification_power
+        
+        # 3-4. Temperature scaling (T < 1 = more confident) + softmax.
+        # All scores identical → normalized = 0 → uniform distribution
+        probs, _ = segment_softmax(amplified, None, temperature=self.temperature, segments=segments)
+        
+        for race_id in df_program.loc[degenerate, 'race_unique_id'].unique():
+            logger.warning(f"Race {race_id}: All scores identical, using uniform")
+        
+        # Formating (columna a columna, en orden de carrera)
+        order = segments[0]
+        race_rows = df_program.iloc[order]
+        results = pd.DataFrame({
+            'fecha': race_rows['fecha'].values, # str or date
+            'hipodromo': race_rows['hipodromo'].values,
+            'carrera': race_rows['nro_carrera'].values,
+            'numero': race_rows['numero'].values,
+            'caballo': race_rows['caballo'].values,
+            'probabilidad': np.round(probs[order] * 100, 1)
+        }).to_dict('records')
                 
         # Save results
         self.save_results(results)
 
     def save_results(self, results):
-        # Save to local JSON/DB
-        path = 'data/predicciones_activas.json'
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(results, f, default=str, indent=2)
-        print(f"✅ Saved {len(results)} predictions to {path}")
-        
-        # Optional: Save to SQLite
-        try:
-            df = pd.DataFrame(results)
-            conn = sqlite3.connect('data/db/hipica_data.db')
-            df.to_sql('predicciones_activas', conn, if_exists='replace', index=False)
-            conn.close()
-            print("✅ Saved to DB table 'predicciones_activas'")
-        except Exception as e:
-            print(f"⚠️ DB Save Error: {e}")
+        """Guarda resultados en JSON y SQLite (publicación atómica, src/models/publish.py)"""
+        from src.models.publish import publish_predictions
+        publish_predictions(results)
 
 if __name__ == "__main__":
-    pipeline = InferencePipeline()
-    pipeline.run()
+    with profile_run('inference', pop_profile_arg()):
+        pipeline = InferencePipeline()
+        pipeline.run()
@@ -20,6 +20,8 @@ from datetime import datetime
 from src.models.data_manager import cargar_programa
 from src.models.ensemble_ranker import EnsembleRanker
 from src.models.feature_store import FeatureStore
+from src.models.segment_ops import segment_normalize, race_order
+from src.utils.profiling import profile_run, pop_profile_arg
 
 # Configure logging
 logging.basicConfig(
@@ -39,24 +41,36 @@ class EnsembleInferencePipeline:
     def __init__(self, 
                  ensemble_path='src/models/ensemble_latest.pkl',
                  feature_store_path='data/feature_store.pkl',
-                 calibrator_path='src/models/calibrator_v4.pkl'):
+                 calibrator_path='src/models/calibrator_v4.pkl',
+                 student_path=None,
+                 db_path='data/db/hipica_data.db'):
         """
         Args:
             ensemble_path: Ruta al ensemble guardado
             feature_store_path: Ruta al Feature Store
             calibrator_path: Ruta al calibrador Isotonic
+            student_path: Ruta al student destilado (ensemble_student_latest.pkl).
+                          Si existe se usa en lugar del ensemble completo.
+            db_path: BD de donde se resuelven los ids de caballo/jinete/stud
         """
         self.ensemble_path = ensemble_path
+        self.db_path = db_path
         self.feature_store_path = feature_store_path
         self.calibrator_path = calibrator_path
+        self.student_path = student_path
         self.ensemble = None
+        self.student = None
         self.store = None
         self.calibrator = None
         
     def load_artifacts(self):
         """Carga modelos, Feature Store y Calibrador"""
+        use_student = bool(self.student_path) and os.path.exists(self.student_path)
+        if self.student_path and not use_student:
+            logger.warning(f"⚠️ Student not found at {self.student_path}. Using full ensemble.")
+        
         # Verificar existencia de ensemble
-        if not os.path.exists(self.ensemble_path):
+        if not use_student and not os.path.exists(self.ensemble_path):
             raise FileNotFoundError(f"Ensemble not found: {self.ensemble_path}")
         
         # Enforce Feature Store
@@ -65,8 +79,12 @@ class EnsembleInferencePipeline:
         
         start = time.time()
         
-        # Cargar ensemble
-        self.ensemble = EnsembleRanker.load(self.ensemble_path)
+        # Cargar ensemble (o student destilado: un solo LightGBM)
+        if use_student:
+            from src.models.distillation import load_student
+            self.student = load_student(self.student_path)['model']
+        else:
+            self.ensemble = EnsembleRanker.load(self.ensemble_path)
         
         # Cargar Feature Store
         self.store = FeatureStore.load(self.feature_store_path)
@@ -81,6 +99,7 @@ class EnsembleInferencePipeline:
         
         logger.info("Artifacts loaded", extra={
             'ensemble_path': self.ensemble_path,
+            'student_path': self.student_path if use_student else None,
             'feature_store_path': self.feature_store_path,
             'calibrator_path': self.calibrator_path,
             'load_time_ms': int((time.time() - start) * 1000)
@@ -99,7 +118,7 @@ class EnsembleInferencePipeline:
             
             # 2. Load Future Races
             logger.info("\n[PASO 1/4] Cargando programa de carreras futuras...")
-            df_program = cargar_programa(solo_futuras=True)
+            df_program = cargar_programa(self.db_path, solo_futuras=True)
             
             if df_program.empty:
                 logger.warning("⚠️ No hay carreras futuras en la base de datos")
@@ -157,21 +176,7 @@ class EnsembleInferencePipeline:
             'peso', 'mandil', 'distancia'
         ]
         
-        # ID Mappers
-        import sqlite3
-        try:
-            conn = sqlite3.connect('data/db/hipica_data.db')
-            caballos = pd.read_sql("SELECT id, nombre FROM caballos", conn)
-            jinetes = pd.read_sql("SELECT id, nombre FROM jinetes", conn)
-            studs = pd.read_sql("SELECT id, nombre FROM studs", conn)
-            conn.close()
-            
-            c_map = dict(zip(caballos['nombre'], caballos['id']))
-            j_map = dict(zip(jinetes['nombre'], jinetes['id']))
-            s_map = dict(zip(studs['nombre'], studs['id']))
-        except Exception as e:
-            logger.warning(f"Feature Store Map Load Error: {e}")
-            c_map = {}; j_map = {}; s_map = {}
+        c_map, j_map, s_map = self._id_maps(df_program)
             
         hip_map = {
             'Club Hípico de Santiago': '1',
@@ -180,37 +185,36 @@ class EnsembleInferencePipeline:
             'Club Hípico de Concepción': '4'
         }
         
-        features_list = []
-        enriched_rows = []
+        def column(name, default):
+            if name in df_program.columns:
+                return df_program[name].tolist()
+            return [default] * len(df_program)
         
-        for idx, row in df_program.iterrows():
-            c_name = row.get('caballo', 'Unknown')
-            # ID resolution
-            c_id = str(c_map.get(c_name, 0))
-            j_id = str(j_map.get(row.get('jinete', ''), 0))
-            p_id = str(s_map.get(row.get('stud', ''), 0))
-            h_name = row.get('hipodromo', 'UNKNOWN')
-            h_id = hip_map.get(h_name, '0')
-
-            candidate = {
+        # Candidatos del Feature Store (columna a columna, sin iterrows)
+        c_ids = [str(c_map.get(name, 0)) for name in column('caballo', 'Unknown')]
+        j_ids = [str(j_map.get(name, 0)) for name in column('jinete', '')]
+        p_ids = [str(s_map.get(name, 0)) for name in column('stud', '')]
+        h_ids = [hip_map.get(name, '0') for name in column('hipodromo', 'UNKNOWN')]
+        features_list = [
+            self.store.get_features({
                 'caballo_id': c_id,
                 'jinete_id': j_id,
                 'preparador_id': p_id,
                 'hipodromo_id': h_id,
-                'fecha': row['fecha'],
-                'distancia': row.get('distancia', 1000),
+                'fecha': fecha,
+                'distancia': distancia,
                 'padre': '0', 
-                'mandil': row.get('numero', 0),
-                'peso_fs': row.get('peso', 470)
-            }
-            
-            # Lookup
-            feats = self.store.get_features(candidate)
-            features_list.append(feats)
-            
-            row_enriched = row.copy()
-            row_enriched['caballo_id'] = c_id
-            enriched_rows.append(row_enriched)
+                'mandil': mandil,
+                'peso_fs': peso
+            })
+            for c_id, j_id, p_id, h_id, fecha, distancia, mandil, peso in zip(
+                c_ids, j_ids, p_ids, h_ids, df_program['fecha'].tolist(), column('distancia', 1000),
+                column('numero', 0), column('peso', 470)
+            )
+        ]
+        
+        df_enriched = df_program.copy()
+        df_enriched['caballo_id'] = c_ids
             
         # Create X DataFrame
         X_future = pd.DataFrame(features_list)
@@ -222,7 +226,30 @@ class EnsembleInferencePipeline:
                 
         X_future = X_future[feature_cols].fillna(0)
         
-        return X_future, pd.DataFrame(enriched_rows)
+        return X_future, df_enriched
+    
+    def _id_maps(self, df_program):
+        """
+        nombre -> id de caballos, jinetes y studs del programa (lookups IN en
+        chunks, sin leer las tablas completas).
+        """
+        import sqlite3
+        from src.models.inference_optimized import _read_sql_in
+        
+        maps = []
+        try:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                for table, col in [('caballos', 'caballo'), ('jinetes', 'jinete'), ('studs', 'stud')]:
+                    names = df_program[col].dropna().unique().tolist() if col in df_program.columns else []
+                    rows = _read_sql_in(conn, f"SELECT id, nombre FROM {table} {{where}} ORDER BY id", 'nombre', names)
+                    maps.append(dict(zip(rows['nombre'], rows['id'])))
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.warning(f"Feature Store Map Load Error: {e}")
+            return {}, {}, {}
+        return tuple(maps)
     
     def _predict_with_calibration(self, X_future, df_program_enriched):
         """
@@ -235,8 +262,12 @@ class EnsembleInferencePipeline:
             df_program_enriched['nro_carrera'] = df_program_enriched['nro_carrera'].fillna(0).astype(int)
 
         # 1. Raw Scores
-        logger.info("   Obteniendo raw scores del Ensemble...")
-        raw_scores = self.ensemble.predict(X_future)
+        if self.student is not None:
+            logger.info("   Obteniendo raw scores del Student destilado...")
+            raw_scores = self.student.predict(X_future)
+        else:
+            logger.info("   Obteniendo raw scores del Ensemble...")
+            raw_scores = self.ensemble.predict(X_future)
         
         # 2. Calibration
         df_program = df_program_enriched.copy()
@@ -260,72 +291,40 @@ class EnsembleInferencePipeline:
             else:
                 df_program['prob_win'] = 0.1
 
-        # 3. Race-level Normalization
-        results = []
+        # 3. Race-level Normalization (suma 100% por carrera, vectorizado por segmentos)
+        segments = race_order(df_program['race_unique_id'].values)
+        probs_final = segment_normalize(df_program['prob_win'].values, None, segments=segments)
+        order = segments[0]
         
-        for race_id, group in df_program.groupby('race_unique_id'):
-            probs = group['prob_win'].values
-            
-            # Normalizar para que sume 100% (Probabilidad de ganar ESTA carrera)
-            total_prob = probs.sum()
-            
-            if total_prob > 0:
-                probs_normalized = probs / total_prob
-            else:
-                probs_normalized = np.ones(len(probs)) / len(probs)
-            
-            group = group.copy()
-            group['prob_final'] = probs_normalized
-            
-            # Format results
-            for idx, r in group.iterrows():
-                try:
-                    carrera_num = int(r['nro_carrera']) if pd.notnull(r['nro_carrera']) else 0
-                    mandil_num = int(r['numero']) if pd.notnull(r['numero']) else 0
-                except:
-                    carrera_num = 0; mandil_num = 0
-                
-                results.append({
-                    'fecha': str(r['fecha']).split()[0],
-                    'hipodromo': r['hipodromo'],
-                    'carrera': carrera_num,
-                    'numero': mandil_num,
-                    'caballo': r['caballo'],
-                    'jinete': r.get('jinete', ''),
-                    'probabilidad': round(r['prob_final'] * 100, 1)
-                })
+        # Format results (columna a columna, en orden de carrera)
+        race_rows = df_program.iloc[order]
+        results = pd.DataFrame({
+            'fecha': race_rows['fecha'].astype(str).str.split().str[0].values,
+            'hipodromo': race_rows['hipodromo'].values,
+            'carrera': pd.to_numeric(race_rows['nro_carrera'], errors='coerce').fillna(0).astype(int).values,
+            'numero': pd.to_numeric(race_rows['numero'], errors='coerce').fillna(0).astype(int).values,
+            'caballo': race_rows['caballo'].values,
+            'jinete': race_rows['jinete'].values if 'jinete' in race_rows.columns else '',
+            'probabilidad': np.round(probs_final[order] * 100, 1)
+        }).to_dict('records')
         
         logger.info(f"✅ Predicciones calibradas para {len(results)} caballos")
         
         return results
     
     def save_results(self, results):
-        """Guarda resultados en JSON y SQLite"""
-        # Save to JSON
-        path = 'data/predicciones_activas.json'
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(results, f, default=str, indent=2, ensure_ascii=False)
-        
-        logger.info(f"✅ Guardado JSON: {path}")
-        
-        # Save to SQLite
-        try:
-            import sqlite3
-            df = pd.DataFrame(results)
-            conn = sqlite3.connect('data/db/hipica_data.db')
-            df.to_sql('predicciones_activas', conn, if_exists='replace', index=False)
-            conn.close()
-            logger.info(f"✅ Guardado SQLite: predicciones_activas")
-        except Exception as e:
-            logger.warning(f"⚠️ No se pudo guardar en SQLite: {e}")
+        """Guarda resultados en JSON y SQLite (publicación atómica, src/models/publish.py)"""
+        from src.models.publish import publish_predictions
+        publish_predictions(results)
 
 
 if __name__ == "__main__":
     try:
-        pipeline = EnsembleInferencePipeline()
-        pipeline.run()
+        profile = pop_profile_arg()
+        student = 'src/models/ensemble_student_latest.pkl' if '--student' in sys.argv else None
+        with profile_run('inference_ensemble', profile):
+            pipeline = EnsembleInferencePipeline(student_path=student)
+            pipeline.run()
         sys.exit(0)
     except Exception as e:
         logger.error(f"❌ Pipeline failed: {e}")
@@ -13,9 +13,12 @@ import os
 import json
 import sys
 import logging
-import joblib
-from datetime import datetime
 from src.models.data_manager import cargar_programa
+from src.models.segment_ops import segment_softmax, race_order
+from src.utils.profiling import profile_run, pop_profile_arg
+from src.models.prediction_cache import (
+    CACHE_PATH, PredictionCache, artifacts_version, race_fingerprints, race_key
+)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -26,6 +29,91 @@ logger = logging.getLogger(__name__)
 if sys.platform == "win32" and hasattr(sys.stdout, 'reconfigure'):
     sys.stdout.reconfigure(encoding='utf-8')
 
+# Límite de parámetros por sentencia (SQLite antiguo admite 999)
+SQLITE_MAX_PARAMS = 900
+
+# Feature columns (DEBE COINCIDIR con entrenamiento)
+FEATURE_COLS = [
+    'win_rate', 'races_count', 'recent_form', 'avg_speed_3',
+    'track_win_rate', 'dist_win_rate',
+    'jockey_win_rate', 'jockey_track_rate', 'trainer_win_rate', 'duo_eff',
+    'trend_3', 'days_rest',
+    'sire_win_rate',
+    'peso', 'mandil', 'distancia'
+]
+
+HIP_MAP = {
+    'Club Hípico de Santiago': 1,
+    'Hipódromo Chile': 2,
+    'Valparaíso Sporting': 3,
+    'Club Hípico de Concepción': 4
+}
+
+
+def _read_sql_in(conn, query, column, values):
+    """
+    Ejecuta `query` (con un placeholder {where}) para todas las filas si
+    values es None, o sólo para column IN (values) en chunks acotados.
+    """
+    if values is None:
+        return pd.read_sql(query.format(where=''), conn)
+    values = list(values)
+    if not values:
+        return pd.read_sql(query.format(where='WHERE 0'), conn)
+
+    chunks = []
+    for i in range(0, len(values), SQLITE_MAX_PARAMS):
+        chunk = values[i:i + SQLITE_MAX_PARAMS]
+        where = f"WHERE {column} IN ({','.join('?' * len(chunk))})"
+        chunks.append(pd.read_sql(query.format(where=where), conn, params=chunk))
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def _column(df, name, fill=None):
+    """Columna del DataFrame o una Serie constante si no existe."""
+    if name in df.columns:
+        return df[name]
+    return pd.Series([fill] * len(df), index=df.index, dtype=object)
+
+
+def _safe_float_series(values, default=0.0):
+    """
+    Conversión numérica vectorizada (manejar None y formatos texto).
+
+    Números: float, NaN => default. Textos: se remueven unidades ("Mts.",
+    "mts", "m", "M") y el punto de miles de "1.200"; vacío o no convertible
+    => default.
+    """
+    values = pd.Series(values, dtype=object)
+    result = pd.Series(default, index=values.index, dtype=float)
+    is_str = values.map(type).eq(str)
+
+    numeric = pd.to_numeric(values[~is_str], errors='coerce')
+    result[~is_str] = numeric.fillna(default)
+
+    if is_str.any():
+        text = values[is_str].str.strip()
+        text = (text.str.replace('Mts.', '', regex=False)
+                    .str.replace('mts', '', regex=False)
+                    .str.replace('m', '', regex=False)
+                    .str.replace('M', '', regex=False)
+                    .str.strip())
+        # Manejar formato "1.200" (miles con punto) => 1200
+        thousands = text.str.contains('.', regex=False) & text.str.split('.').str[0].str.len().le(2)
+        text = text.mask(thousands, text.str.replace('.', '', regex=False))
+
+        def to_float(val_str):
+            try:
+                return float(val_str) if val_str else default
+            except ValueError:
+                return default
+
+        # float() sólo sobre los textos distintos (pocos: 470, 1200, ...)
+        uniques = text.unique()
+        result[is_str] = text.map(dict(zip(uniques, map(to_float, uniques))))
+
+    return result
+
 
 class OptimizedInferencePipeline:
     """
@@ -35,10 +123,19 @@ class OptimizedInferencePipeline:
     def __init__(self,
                  model_path='src/models/lgbm_optimized_latest.pkl',
                  fe_path='src/models/feature_eng_v5_latest.pkl',
-                 calibrator_path='src/models/calibrator_v5.pkl'):
+                 calibrator_path='src/models/calibrator_v5.pkl',
+                 db_path='data/db/hipica_data.db',
+                 compiled_path=None,
+                 cache_path=CACHE_PATH):
         self.model_path = model_path
+        self.compiled_path = compiled_path  # .npz de tree_compiler: evita importar lightgbm
         self.fe_path = fe_path
         self.calibrator_path = calibrator_path
+        self.db_path = db_path
+        self.cache_path = cache_path  # None desactiva el cache por carrera
+        self.changed_races = None  # race_keys recalculadas en la última ejecución
+        self.upload_races = None  # recalculadas + pendientes de upload de corridas anteriores
+        self.overwrite_races = []  # pendientes que reemplazan lo publicado (retiros)
         self.model = None
         self.fe = None
         self.calibrator = None
@@ -48,16 +145,24 @@ class OptimizedInferencePipeline:
         self.jockey_stats = {}
         self.track_stats = {}
         self.trainer_stats = {}  # NUEVO: stats de preparadores
+        self._stats_all = False  # True si ya se cargaron las stats de todas las entidades
     
     def load_artifacts(self):
         """Carga modelo, feature engineering y calibrador."""
+        import joblib
+        
         logger.info("Cargando artefactos...")
         
-        # Modelo
-        if not os.path.exists(self.model_path):
+        # Modelo (compilado a NumPy si está disponible)
+        if self.compiled_path and os.path.exists(self.compiled_path):
+            from src.models.tree_compiler import load_compiled
+            self.model = load_compiled(self.compiled_path)
+            logger.info(f"✅ Modelo compilado cargado: {self.compiled_path}")
+        elif not os.path.exists(self.model_path):
             raise FileNotFoundError(f"Modelo no encontrado: {self.model_path}")
-        self.model = joblib.load(self.model_path)
-        logger.info(f"✅ Modelo cargado: {self.model_path}")
+        else:
+            self.model = joblib.load(self.model_path)
+            logger.info(f"✅ Modelo cargado: {self.model_path}")
         
         # Feature Engineering
         if os.path.exists(self.fe_path):
@@ -77,12 +182,18 @@ class OptimizedInferencePipeline:
         else:
             logger.warning(f"⚠️ Calibrador no encontrado, usando heurístico")
     
-    def _load_historical_stats(self):
-        """Carga estadísticas históricas para features."""
+    def _load_historical_stats(self, caballo_ids=None, jinete_ids=None, stud_ids=None):
+        """
+        Carga estadísticas históricas para features.
+
+        Sin ids carga todas las entidades. Con ids (lo que usa _prepare_features)
+        sólo consulta los caballos/jinetes/studs del programa mediante IN (...)
+        acotado, de modo que la latencia no crece con el tamaño de las tablas.
+        """
         import sqlite3
         
         try:
-            conn = sqlite3.connect('data/db/hipica_data.db')
+            conn = sqlite3.connect(self.db_path)
             
             # Estadísticas de caballos
             horse_query = """
@@ -94,17 +205,20 @@ class OptimizedInferencePipeline:
                 AVG(CASE WHEN p.posicion <= 3 THEN 1 ELSE 0 END) as top3_rate
             FROM participaciones p
             JOIN caballos c ON p.caballo_id = c.id
+            {where}
             GROUP BY c.id
             """
-            horses = pd.read_sql(horse_query, conn)
+            horses = _read_sql_in(conn, horse_query, 'p.caballo_id', caballo_ids)
             self.horse_stats = {
-                row['caballo_id']: {
-                    'races': row['races'],
-                    'wins': row['wins'],
-                    'win_rate': row['wins'] / row['races'] if row['races'] > 0 else 0,
-                    'top3_rate': row['top3_rate'] or 0
+                c_id: {
+                    'races': races,
+                    'wins': wins,
+                    'win_rate': wins / races if races > 0 else 0,
+                    'top3_rate': top3 or 0
                 }
-                for _, row in horses.iterrows()
+                for c_id, races, wins, top3 in zip(
+                    horses['caballo_id'], horses['races'], horses['wins'], horses['top3_rate']
+                )
             }
             
             # Estadísticas de jinetes
@@ -116,16 +230,17 @@ class OptimizedInferencePipeline:
                 SUM(CASE WHEN p.posicion = 1 THEN 1 ELSE 0 END) as wins
             FROM participaciones p
             JOIN jinetes j ON p.jinete_id = j.id
+            {where}
             GROUP BY j.id
             """
-            jockeys = pd.read_sql(jockey_query, conn)
+            jockeys = _read_sql_in(conn, jockey_query, 'p.jinete_id', jinete_ids)
             self.jockey_stats = {
-                row['jinete_id']: {
-                    'races': row['races'],
-                    'wins': row['wins'],
-                    'win_rate': row['wins'] / row['races'] if row['races'] > 0 else 0.08
+                j_id: {
+                    'races': races,
+                    'wins': wins,
+                    'win_rate': wins / races if races > 0 else 0.08
                 }
-                for _, row in jockeys.iterrows()
+                for j_id, races, wins in zip(jockeys['jinete_id'], jockeys['races'], jockeys['wins'])
             }
             
             # Estadísticas jinete-pista
@@ -140,16 +255,19 @@ class OptimizedInferencePipeline:
             JOIN carreras car ON p.carrera_id = car.id
             JOIN jornadas jor ON car.jornada_id = jor.id
             JOIN hipodromos h ON jor.hipodromo_id = h.id
+            {where}
             GROUP BY j.id, h.id
             """
-            jt = pd.read_sql(jt_query, conn)
-            self.track_stats = {}
-            for _, row in jt.iterrows():
-                key = (row['jinete_id'], row['hipodromo_id'])
-                self.track_stats[key] = {
-                    'races': row['races'],
-                    'win_rate': row['wins'] / row['races'] if row['races'] > 0 else 0.08
+            jt = _read_sql_in(conn, jt_query, 'p.jinete_id', jinete_ids)
+            self.track_stats = {
+                (j_id, h_id): {
+                    'races': races,
+                    'win_rate': wins / races if races > 0 else 0.08
                 }
+                for j_id, h_id, races, wins in zip(
+                    jt['jinete_id'], jt['hipodromo_id'], jt['races'], jt['wins']
+                )
+            }
             
             # Estadísticas de preparadores (NUEVO)
             try:
@@ -160,21 +278,24 @@ class OptimizedInferencePipeline:
                     SUM(CASE WHEN p.posicion = 1 THEN 1 ELSE 0 END) as wins
                 FROM participaciones p
                 JOIN programa_carreras pc ON p.caballo_id = pc.caballo_id
+                {where}
                 GROUP BY pc.stud_id
                 HAVING races > 0
                 """
-                trainers = pd.read_sql(trainer_query, conn)
+                trainers = _read_sql_in(conn, trainer_query, 'pc.stud_id', stud_ids)
                 self.trainer_stats = {
-                    row['preparador_id']: {
-                        'races': row['races'],
-                        'win_rate': row['wins'] / row['races'] if row['races'] > 0 else 0.08
+                    s_id: {
+                        'races': races,
+                        'win_rate': wins / races if races > 0 else 0.08
                     }
-                    for _, row in trainers.iterrows() if row['preparador_id']
+                    for s_id, races, wins in zip(trainers['preparador_id'], trainers['races'], trainers['wins'])
+                    if s_id
                 }
             except:
                 self.trainer_stats = {}
             
             conn.close()
+            self._stats_all = caballo_ids is None and jinete_ids is None
             logger.info(f"✅ Stats cargadas: {len(self.horse_stats)} caballos, {len(self.jockey_stats)} jinetes, {len(self.trainer_stats)} preparadores")
             
         except Exception as e:
@@ -187,13 +308,13 @@ class OptimizedInferencePipeline:
         logger.info("=" * 70)
         
         try:
-            # 1. Cargar artefactos
+            # 1. Cargar artefactos (las stats se cargan en _prepare_features,
+            #    sólo para los caballos y jinetes del programa)
             self.load_artifacts()
-            self._load_historical_stats()
             
             # 2. Cargar programa futuro
             logger.info("\n[PASO 1/4] Cargando programa de carreras...")
-            df_program = cargar_programa(solo_futuras=True)
+            df_program = cargar_programa(self.db_path, solo_futuras=True)
             
             if df_program.empty:
                 logger.warning("⚠️ No hay carreras futuras")
@@ -209,7 +330,7 @@ class OptimizedInferencePipeline:
             
             # 4. Predecir
             logger.info("\n[PASO 3/4] Generando predicciones...")
-            predictions = self._predict(X_future, df_enriched)
+            predictions = self._predict_cached(X_future, df_enriched)
             
             # 5. Guardar
             logger.info("\n[PASO 4/4] Guardando resultados...")
@@ -219,235 +340,326 @@ class OptimizedInferencePipeline:
             logger.info(f"✅ INFERENCIA COMPLETADA: {len(predictions)} predicciones")
             logger.info("=" * 70)
             
+            return self.upload_races
+            
         except Exception as e:
             logger.error(f"❌ Error: {e}", exc_info=True)
             raise
     
-    def _prepare_features(self, df_program):
-        """Prepara features para inferencia."""
+    def run_races(self, races, fecha):
+        """
+        Re-infiere sólo las carreras indicadas de una fecha (race-day scheduler).
+        
+        Args:
+            races: race_keys (fecha_hipodromo_carrera) a re-inferir
+            fecha: 'YYYY-MM-DD' del programa
+        
+        Returns:
+            race_keys cuyas predicciones cambiaron (ya escritas en
+            predicciones_activas JSON/SQLite; el resto no se toca)
+        """
+        if self.model is None:
+            self.load_artifacts()
+        
+        df_program = cargar_programa(self.db_path, solo_futuras=False, fecha=fecha)
+        if df_program.empty:
+            self.changed_races = []
+            return []
+        
+        keys = [
+            race_key(str(f).split()[0], h, int(c))
+            for f, h, c in zip(df_program['fecha'], df_program['hipodromo'],
+                               pd.to_numeric(df_program['nro_carrera'], errors='coerce').fillna(0))
+        ]
+        df_program = df_program[np.isin(keys, list(races))].reset_index(drop=True)
+        if df_program.empty:
+            self.changed_races = []
+            return []
+        
+        X, df_enriched = self._prepare_features(df_program)
+        records = self._predict_cached(X, df_enriched, prune=False)
+        
+        changed = set(self.changed_races)
+        records_by_race = {}
+        for record in records:
+            key = race_key(record['fecha'], record['hipodromo'], record['carrera'])
+            if key in changed:
+                records_by_race.setdefault(key, []).append(record)
+        replace_active_races(records_by_race, db_path=self.db_path)
+        
+        logger.info(f"✅ {len(races)} carreras evaluadas, {len(records_by_race)} con predicciones nuevas")
+        return self.changed_races
+    
+    def run_backfill(self, fecha_inicio, fecha_fin, output_path=None):
+        """Backfill point-in-time de un rango de fechas (ver src/models/backfill.py)."""
+        from src.models.backfill import run_backfill
+        return run_backfill(self, fecha_inicio, fecha_fin, output_path)
+    
+    def _resolve_ids(self, df_program, id_col, name_col, table):
+        """
+        ID directo del programa si viene; si no, lookup por nombre sólo de los
+        nombres faltantes (IN acotado). Sin match => 0.
+        """
         import sqlite3
         
-        # Mapeo de IDs
+        n = len(df_program)
+        ids = pd.to_numeric(df_program[id_col], errors='coerce') if id_col in df_program.columns \
+            else pd.Series(np.nan, index=df_program.index)
+        missing = ids.isna()
+        if not missing.any():
+            return ids.astype(np.int64)
+        
+        names = df_program[name_col] if name_col in df_program.columns \
+            else pd.Series([None] * n, index=df_program.index)
+        wanted = names[missing].dropna().unique().tolist()
         try:
-            conn = sqlite3.connect('data/db/hipica_data.db')
-            caballos = pd.read_sql("SELECT id, nombre FROM caballos", conn)
-            jinetes = pd.read_sql("SELECT id, nombre FROM jinetes", conn)
+            conn = sqlite3.connect(self.db_path)
+            found = _read_sql_in(conn, f"SELECT id, nombre FROM {table} {{where}}", 'nombre', wanted)
             conn.close()
-            
-            c_map = dict(zip(caballos['nombre'], caballos['id']))
-            j_map = dict(zip(jinetes['nombre'], jinetes['id']))
+            name_map = dict(zip(found['nombre'], found['id']))
         except:
-            c_map = {}
-            j_map = {}
-        
-        hip_map = {
-            'Club Hípico de Santiago': 1,
-            'Hipódromo Chile': 2,
-            'Valparaíso Sporting': 3,
-            'Club Hípico de Concepción': 4
-        }
-        
-        # Feature columns (DEBE COINCIDIR con entrenamiento)
-        feature_cols = [
-            'win_rate', 'races_count', 'recent_form', 'avg_speed_3',
-            'track_win_rate', 'dist_win_rate',
-            'jockey_win_rate', 'jockey_track_rate', 'trainer_win_rate', 'duo_eff',
-            'trend_3', 'days_rest',
-            'sire_win_rate',
-            'peso', 'mandil', 'distancia'
-        ]
+            name_map = {}
         
-        features_list = []
-        enriched_rows = []
-        
-        for _, row in df_program.iterrows():
-            # IDs
-            c_name = row.get('caballo', 'Unknown')
-            # 1. Intentar usar el ID directo si viene del DataFrame
-            c_id = row.get('caballo_id')
-            if pd.isna(c_id) or c_id is None:
-                c_id = c_map.get(c_name, 0)
-            else:
-                c_id = int(c_id)
-                
-            j_name = row.get('jinete', '')
-            j_id = row.get('jinete_id')
-            if pd.isna(j_id) or j_id is None:
-                j_id = j_map.get(j_name, 0)
-            else:
-                j_id = int(j_id)
-                
-            h_name = row.get('hipodromo', '')
-            h_id = hip_map.get(h_name, 0)
-            
-            # Stats del caballo
-            h_stats = self.horse_stats.get(c_id, {'races': 0, 'wins': 0, 'win_rate': 0})
-            j_stats = self.jockey_stats.get(j_id, {'win_rate': 0.08})
-            jt_key = (j_id, h_id)
-            jt_stats = self.track_stats.get(jt_key, {'win_rate': 0.08})
-            
-            # Conversión segura de tipos numéricos (manejar None y formatos texto)
-            def safe_float(val, default=0.0):
-                if val is None or val == '' or val == 'None':
-                    return default
-                if isinstance(val, (int, float)):
-                    if np.isnan(val) if isinstance(val, float) else False:
-                        return default
-                    return float(val)
-                try:
-                    # Limpiar texto: remover "m", "Mts.", etc
-                    val_str = str(val).strip()
-                    # Remover unidades comunes
-                    val_str = val_str.replace('Mts.', '').replace('mts', '').replace('m', '')
-                    val_str = val_str.replace('M', '').strip()
-                    # Manejar formato "1.200" (miles con punto)
-                    if '.' in val_str and len(val_str.split('.')[0]) <= 2:
-                        # Es formato "1.200" => 1200
-                        val_str = val_str.replace('.', '')
-                    return float(val_str) if val_str else default
-                except (ValueError, TypeError):
-                    return default
-            
-            dist = safe_float(row.get('distancia'), 1200)
-            
-            # Construir features
-            feats = {
-                'win_rate': h_stats.get('win_rate', 0) if h_stats['races'] > 0 else 0.10,
-                'races_count': h_stats.get('races', 0),
-                'recent_form': 5.0,  # Default neutral
-                'avg_speed_3': 14.0,  # Default
-                'track_win_rate': 0.0,  # Necesitaría más datos
-                'dist_win_rate': 0.0,
-                'jockey_win_rate': j_stats.get('win_rate', 0.08),
-                'jockey_track_rate': jt_stats.get('win_rate', 0.08),
-                'trainer_win_rate': 0.08,  # Default, se actualizará abajo
-                'duo_eff': 0.08,
-                'trend_3': 0.0,
-                'days_rest': 30,
-                'sire_win_rate': 0.10,
-                'peso': safe_float(row.get('peso'), 470),
-                'mandil': safe_float(row.get('numero'), 0),
-                'distancia': dist
-            }
-            
-            features_list.append(feats)
-            
-            # Enriquecer fila
-            row_copy = row.copy()
-            row_copy['caballo_id'] = c_id
-            row_copy['jinete_id'] = j_id
-            row_copy['hipodromo_id'] = h_id
-            enriched_rows.append(row_copy)
-        
-        X = pd.DataFrame(features_list)
-        # Asegurar que todas las columnas requeridas existen (evita KeyError)
-        for col in feature_cols:
-            if col not in X.columns:
-                X[col] = 0.0
-        X = X[feature_cols].copy()
-        X = X.fillna(0)
-        
-        df_enriched = pd.DataFrame(enriched_rows)
-        
-        # Race ID para agrupación (Safe Apply para evitar KeyError y mezclas de tipos)
-        if not df_enriched.empty:
-            df_enriched['race_unique_id'] = df_enriched.apply(
-                lambda r: f"{r.get('fecha', '')}_{r.get('hipodromo', '')}_{r.get('nro_carrera', '')}", 
-                axis=1
+        ids[missing] = names[missing].map(name_map)
+        return ids.fillna(0).astype(np.int64)
+    
+    @staticmethod
+    def _hipodromo_ids(df_enriched):
+        """Id de hipódromo (HIP_MAP) por fila; 0 si no se reconoce."""
+        return (df_enriched['hipodromo'].map(HIP_MAP) if 'hipodromo' in df_enriched.columns
+                else pd.Series(np.nan, index=df_enriched.index)).fillna(0).astype(np.int64)
+    
+    @staticmethod
+    def _assemble_features(df_enriched, races, horse_wr, jockey_wr, jt_wr):
+        """
+        Matriz de features a partir de las stats ya alineadas por fila
+        (compartido por _prepare_features y el backfill point-in-time).
+        """
+        races = np.asarray(races)
+        horse_wr = np.asarray(horse_wr, dtype=float)
+        jockey_wr = np.asarray(jockey_wr, dtype=float)
+        jt_wr = np.asarray(jt_wr, dtype=float)
+        
+        n = len(df_enriched)
+        X = pd.DataFrame({
+            'win_rate': np.where(races > 0, horse_wr, 0.10),
+            'races_count': races,
+            'recent_form': np.full(n, 5.0),  # Default neutral
+            'avg_speed_3': np.full(n, 14.0),  # Default
+            'track_win_rate': np.zeros(n),  # Necesitaría más datos
+            'dist_win_rate': np.zeros(n),
+            'jockey_win_rate': jockey_wr,
+            'jockey_track_rate': np.where(np.isnan(jt_wr), 0.08, jt_wr),
+            'trainer_win_rate': np.full(n, 0.08),  # Default
+            'duo_eff': np.full(n, 0.08),
+            'trend_3': np.zeros(n),
+            'days_rest': np.full(n, 30),
+            'sire_win_rate': np.full(n, 0.10),
+            'peso': _safe_float_series(_column(df_enriched, 'peso'), 470).values,
+            'mandil': _safe_float_series(_column(df_enriched, 'numero'), 0).values,
+            'distancia': _safe_float_series(_column(df_enriched, 'distancia'), 1200).values
+        })
+        return X[FEATURE_COLS].fillna(0)
+    
+    def _prepare_features(self, df_program):
+        """Prepara features para inferencia (vectorizado sobre el programa)."""
+        df_enriched = df_program.copy()
+        
+        # Mapeo de IDs
+        c_ids = self._resolve_ids(df_enriched, 'caballo_id', 'caballo', 'caballos')
+        j_ids = self._resolve_ids(df_enriched, 'jinete_id', 'jinete', 'jinetes')
+        
+        h_ids = self._hipodromo_ids(df_enriched)
+        
+        # Stats sólo de las entidades del programa (salvo que ya estén todas en cache)
+        if not self._stats_all:
+            stud_ids = (pd.to_numeric(df_enriched['stud_id'], errors='coerce').dropna().astype(np.int64).unique().tolist()
+                        if 'stud_id' in df_enriched.columns else [])
+            self._load_historical_stats(
+                caballo_ids=c_ids.unique().tolist(),
+                jinete_ids=j_ids.unique().tolist(),
+                stud_ids=stud_ids
             )
+        
+        # Stats del caballo / jinete / jinete-pista
+        races = c_ids.map({k: v['races'] for k, v in self.horse_stats.items()}).fillna(0).astype(np.int64)
+        horse_wr = c_ids.map({k: v['win_rate'] for k, v in self.horse_stats.items()})
+        jockey_wr = j_ids.map({k: v['win_rate'] for k, v in self.jockey_stats.items()}).fillna(0.08)
+        jt_wr = pd.Series({k: v['win_rate'] for k, v in self.track_stats.items()}, dtype=float)
+        if len(jt_wr):
+            jt_wr = jt_wr.reindex(pd.MultiIndex.from_arrays([j_ids.values, h_ids.values])).values
         else:
-            df_enriched['race_unique_id'] = []
+            jt_wr = np.full(len(df_enriched), np.nan)
+        
+        X = self._assemble_features(df_enriched, races, horse_wr, jockey_wr, jt_wr)
+        
+        # Enriquecer filas
+        df_enriched['caballo_id'] = c_ids.values
+        df_enriched['jinete_id'] = j_ids.values
+        df_enriched['hipodromo_id'] = h_ids.values
+        
+        # Race ID para agrupación
+        df_enriched['race_unique_id'] = (
+            _column(df_enriched, 'fecha', '').astype(str) + '_' +
+            _column(df_enriched, 'hipodromo', '').astype(str) + '_' +
+            _column(df_enriched, 'nro_carrera', '').astype(str)
+        )
             
         return X, df_enriched
     
+    def _calibrate(self, raw_scores):
+        """Probabilidad por fila (calibrador o heurístico min/max)."""
+        if self.calibrator:
+            probs = self.calibrator.transform(raw_scores)
+            return np.clip(probs, 0.01, 0.99)
+        
+        # Heurístico si no hay calibrador
+        s_min, s_max = raw_scores.min(), raw_scores.max()
+        if s_max > s_min:
+            probs = (raw_scores - s_min) / (s_max - s_min)
+            return probs ** 1.2  # Ajuste
+        return np.ones(len(raw_scores)) * 0.1
+    
     def _predict(self, X, df_enriched):
         """Genera predicciones calibradas."""
         # Raw scores
         raw_scores = self.model.predict(X)
         
         # Calibración
-        if self.calibrator:
-            probs = self.calibrator.transform(raw_scores)
-            probs = np.clip(probs, 0.01, 0.99)
-        else:
-            # Heurístico si no hay calibrador
-            s_min, s_max = raw_scores.min(), raw_scores.max()
-            if s_max > s_min:
-                probs = (raw_scores - s_min) / (s_max - s_min)
-                probs = probs ** 1.2  # Ajuste
-            else:
-                probs = np.ones(len(raw_scores)) * 0.1
+        probs = self._calibrate(raw_scores)
         
         df_enriched['prob_raw'] = probs
         
-        # Normalización por carrera
-        results = []
+        # Normalización por carrera: softmax suave (temperatura 1/3) en una
+        # sola pasada vectorizada sobre los segmentos de cada carrera
+        segments = race_order(df_enriched['race_unique_id'].values)
+        probs_normalized, _ = segment_softmax(probs, None, temperature=1 / 3, segments=segments)
+        order = segments[0]
         
-        for race_id, group in df_enriched.groupby('race_unique_id'):
-            probs_race = group['prob_raw'].values
-            
-            # Softmax suave
-            exp_probs = np.exp(probs_race * 3)  # Temperatura
-            probs_normalized = exp_probs / exp_probs.sum()
-            
-            for i, (idx, row) in enumerate(group.iterrows()):
-                try:
-                    carrera_num = int(row['nro_carrera']) if pd.notnull(row['nro_carrera']) else 0
-                    mandil_num = int(row['numero']) if pd.notnull(row['numero']) else 0
-                except:
-                    carrera_num = 0
-                    mandil_num = 0
-                
-                results.append({
-                    'fecha': str(row['fecha']).split()[0],
-                    'hipodromo': row['hipodromo'],
-                    'carrera': carrera_num,
-                    'numero': mandil_num,
-                    'caballo': row['caballo'],
-                    'jinete': row.get('jinete', ''),
-                    'probabilidad': round(probs_normalized[i] * 100, 1)
-                })
+        race_rows = df_enriched.iloc[order]
+        results = pd.DataFrame({
+            'fecha': race_rows['fecha'].astype(str).str.split().str[0].values,
+            'hipodromo': race_rows['hipodromo'].values,
+            'carrera': pd.to_numeric(race_rows['nro_carrera'], errors='coerce').fillna(0).astype(int).values,
+            'numero': pd.to_numeric(race_rows['numero'], errors='coerce').fillna(0).astype(int).values,
+            'caballo': race_rows['caballo'].values,
+            'jinete': race_rows['jinete'].values if 'jinete' in race_rows.columns else '',
+            'probabilidad': np.round(probs_normalized[order] * 100, 1)
+        }).to_dict('records')
         
         logger.info(f"✅ {len(results)} predicciones generadas")
         return results
     
-    def _save_results(self, results):
-        """Guarda resultados con backup timestamped."""
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    def _predict_cached(self, X, df_enriched, prune=True):
+        """
+        Predice sólo las carreras cuyo fingerprint (participantes + features) o
+        versión de artefactos cambió; el resto se reutiliza del cache.
+        Deja en self.changed_races las race_keys recalculadas y en
+        self.upload_races las que hay que subir: las recalculadas más las de
+        corridas anteriores cuyo upload no se confirmó (mark_uploaded). De
+        ésas, self.overwrite_races deben reemplazar lo ya publicado (retiros).
+        
+        prune=False cuando X cubre sólo algunas carreras (run_races): las
+        demás carreras del cache se conservan.
+        """
+        if not self.cache_path or self.calibrator is None:
+            # Sin calibrador la normalización heurística usa min/max de todo el
+            # programa: una carrera depende de las demás y no se puede cachear
+            results = self._predict(X, df_enriched)
+            self.changed_races = sorted({race_key(r['fecha'], r['hipodromo'], r['carrera']) for r in results})
+            self.upload_races = self.changed_races
+            self.overwrite_races = []
+            return results
         
-        # 1. Guardar en directorio de backups con timestamp
-        backup_dir = 'data/predictions'
-        os.makedirs(backup_dir, exist_ok=True)
-        backup_path = f'{backup_dir}/pred_{timestamp}.json'
+        model_path = self.compiled_path if self.compiled_path and os.path.exists(self.compiled_path) else self.model_path
+        version = artifacts_version(model_path, self.calibrator_path, self.fe_path)
+        fingerprints = race_fingerprints(df_enriched, X)
+        cache = PredictionCache(self.cache_path)
+        unchanged, changed = cache.split(fingerprints, version)
+        logger.info(f"   Cache: {len(unchanged)} carreras sin cambios, {len(changed)} a recalcular")
         
-        with open(backup_path, 'w', encoding='utf-8') as f:
-            json.dump(results, f, default=str, indent=2, ensure_ascii=False)
-        logger.info(f"✅ Backup: {backup_path}")
+        race_ids = df_enriched['race_unique_id'].astype(str)
+        mask = race_ids.isin(changed).values
+        # Los retiros registrados (src/models/scratches.py) siguen fuera al recalcular
+        scratched = {race: cache.scratched(race) for race in changed if cache.scratched(race)}
+        if scratched:
+            numeros = pd.to_numeric(df_enriched['numero'], errors='coerce').values
+            for race, mandiles in scratched.items():
+                mask = mask & ~((race_ids == race).values & np.isin(numeros, mandiles))
         
-        # 2. Guardar en predicciones_activas.json (para compatibilidad)
-        json_path = 'data/predicciones_activas.json'
-        os.makedirs(os.path.dirname(json_path), exist_ok=True)
+        records_by_race, scores_by_race = {}, {}
+        if mask.any():
+            df_changed = df_enriched[mask].copy()
+            new_records = self._predict(X[mask], df_changed)
+            # _predict devuelve las carreras ordenadas por race_unique_id
+            prob_raw = df_changed['prob_raw'].values[race_order(df_changed['race_unique_id'].values)[0]]
+            counts = race_ids[mask].value_counts().sort_index()
+            bounds = np.cumsum(counts.values)
+            for race, end, size in zip(counts.index, bounds, counts.values):
+                records_by_race[race] = new_records[end - size:end]
+                scores_by_race[race] = [float(p) for p in prob_raw[end - size:end]]
         
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(results, f, default=str, indent=2, ensure_ascii=False)
-        logger.info(f"✅ JSON activo: {json_path}")
+        cache.update(fingerprints, version, records_by_race, scores_by_race, prune=prune)
+        cache.save()
         
-        # 3. SQLite
+        self.changed_races = sorted(
+            race_key(recs[0]['fecha'], recs[0]['hipodromo'], recs[0]['carrera'])
+            for recs in records_by_race.values() if recs
+        )
+        self.upload_races = cache.pending_upload()
+        self.overwrite_races = cache.pending_overwrite()
+        return [
+            record for race in sorted(fingerprints)
+            for record in (records_by_race[race] if race in records_by_race else cache.records([race]))
+        ]
+    
+    def mark_uploaded(self, races):
+        """Confirma en el cache las carreras que run_upload subió a Supabase."""
+        if not self.cache_path or not races:
+            return
+        cache = PredictionCache(self.cache_path)
+        cache.mark_uploaded(races)
+        cache.save()
+    
+    def _save_results(self, results):
+        """Guarda resultados y archiva la corrida (src/models/prediction_archive.py)."""
+        # 1. Archivo histórico particionado por fecha (reemplaza pred_<timestamp>.json)
+        from src.models.prediction_archive import PredictionArchive, write_json_backup
         try:
-            import sqlite3
-            df = pd.DataFrame(results)
-            conn = sqlite3.connect('data/db/hipica_data.db')
-            df.to_sql('predicciones_activas', conn, if_exists='replace', index=False)
-            conn.close()
-            logger.info(f"✅ SQLite: predicciones_activas")
+            model_path = self.compiled_path if self.compiled_path and os.path.exists(self.compiled_path) else self.model_path
+            model_version = (getattr(self, 'registry_version', None)
+                             or artifacts_version(model_path, self.calibrator_path, self.fe_path))
+            PredictionArchive().append(results, model_version=model_version)
         except Exception as e:
-            logger.warning(f"⚠️ SQLite error: {e}")
+            # Es la única copia histórica de la corrida: no perderla en silencio
+            logger.error(f"❌ Archivo histórico error: {e}", exc_info=True)
+            try:
+                logger.error(f"   Corrida respaldada en {write_json_backup(results)} (migrate la archiva)")
+            except Exception as backup_error:
+                logger.error(f"❌ Tampoco se pudo escribir el backup JSON: {backup_error}")
+        
+        # 2. predicciones_activas: JSON atómico + upsert SQLite de filas cambiadas
+        from src.models.publish import publish_predictions
+        publish_predictions(results, db_path=self.db_path)
+
 
+def replace_active_races(records_by_race, json_path='data/predicciones_activas.json',
+                         db_path='data/db/hipica_data.db'):
+    """
+    Reemplaza sólo las carreras indicadas (race_key -> registros) en
+    predicciones_activas (JSON y SQLite); el resto del día queda intacto.
+    """
+    if not records_by_race:
+        return
+    from src.models.publish import publish_predictions
+    records = [record for race_records in records_by_race.values() for record in race_records]
+    publish_predictions(records, json_path=json_path, db_path=db_path, races=records_by_race)
 
 if __name__ == "__main__":
     try:
-        pipeline = OptimizedInferencePipeline()
-        pipeline.run()
+        with profile_run('inference_optimized', pop_profile_arg()):
+            pipeline = OptimizedInferencePipeline()
+            pipeline.run()
         sys.exit(0)
     except Exception as e:
         logger.error(f"❌ Failed: {e}")
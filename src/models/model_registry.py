@@ -0,0 +1,432 @@
+"""
+Model Registry Direccionado por Contenido
+-----------------------------------------
+Guarda los artefactos de modelo por hash (sha256) en lugar de archivos
+sueltos con rutas fijas en src/models/:
+
+    src/models/registry/
+        blobs/ab/ab12...ef.pkl     # un blob por contenido (dedupe automático)
+        versions/<version>.json    # manifest: engine, roles -> blob, features, métricas
+        ACTIVE                     # versión activa (se cambia con os.replace)
+
+- Dedupe: registrar dos veces el mismo archivo (o los duplicados por modelo
+  que escribe EnsembleRanker.save) no ocupa espacio extra.
+- Lazy loading: cada rol se carga en el primer uso (LazyArtifact). En el
+  ensemble, un modelo base omitido por min_meta_weight nunca se deserializa.
+- Hot-swap: HotSwap construye y precalienta la versión nueva fuera del
+  camino de las peticiones y sólo entonces reemplaza la referencia activa,
+  así un servidor de larga vida cambia de versión sin reinicio ni picos.
+
+Uso:
+    python src/models/model_registry.py register --engine v5 \\
+        --artifact model=src/models/lgbm_optimized_latest.pkl \\
+        --artifact calibrator=src/models/calibrator_v5.pkl \\
+        --artifact fe=src/models/feature_eng_v5_latest.pkl \\
+        --metadata src/models/lgbm_optimized_metadata.json --activate
+    python src/models/model_registry.py register --engine ensemble \\
+        --artifact ensemble=src/models/ensemble_latest.pkl \\
+        --artifact calibrator=src/models/calibrator_v4.pkl
+    python src/models/model_registry.py list
+    python src/models/model_registry.py activate <version>
+    python src/models/model_registry.py gc
+
+Author: ML Engineering Team
+Date: 2026-10-19
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from datetime import datetime
+
+import joblib
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+REGISTRY_DIR = 'src/models/registry'
+
+# Miembros del pickle de EnsembleRanker.save que se guardan como blobs propios
+ENSEMBLE_MEMBERS = ['lgbm', 'xgb', 'catboost', 'meta_model']
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _atomic_write_text(path, text):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _load_blob(path):
+    """Deserializa un blob según su extensión (.npz = modelo compilado)."""
+    if path.endswith('.npz'):
+        from src.models.tree_compiler import load_compiled
+        return load_compiled(path)
+    return joblib.load(path)
+
+
+class LazyArtifact:
+    """
+    Artefacto que se carga en el primer uso (thread-safe). Delega atributos
+    al objeto cargado, así `pipeline.model.predict(X)` funciona sin cambios.
+    """
+
+    def __init__(self, path, role=None):
+        self.path = path
+        self.role = role
+        self._obj = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._obj is not None
+
+    def resolve(self):
+        if self._obj is None:
+            with self._lock:
+                if self._obj is None:
+                    start = time.perf_counter()
+                    self._obj = _load_blob(self.path)
+                    logger.info(f"   Lazy load {self.role or ''}: {os.path.basename(self.path)} "
+                                f"({(time.perf_counter() - start) * 1000:.0f} ms)")
+        return self._obj
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+
+class ModelRegistry:
+    """Blobs por hash + manifests por versión + puntero ACTIVE."""
+
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = root
+        self.blobs_dir = os.path.join(root, 'blobs')
+        self.versions_dir = os.path.join(root, 'versions')
+        self.active_path = os.path.join(root, 'ACTIVE')
+
+    # ------------------------------------------------------------------ blobs
+    def blob_path(self, sha, ext):
+        return os.path.join(self.blobs_dir, sha[:2], f'{sha}{ext}')
+
+    def put_blob(self, path):
+        """Copia el archivo al store (si no existe ya). Devuelve (sha, ext, size)."""
+        sha = file_sha256(path)
+        ext = os.path.splitext(path)[1] or '.bin'
+        target = self.blob_path(sha, ext)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp_path = f'{target}.tmp'
+            with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                for block in iter(lambda: src.read(1 << 20), b''):
+                    dst.write(block)
+            os.replace(tmp_path, target)
+        return sha, ext, os.path.getsize(target)
+
+    def _put_object(self, obj, ext='.pkl'):
+        """joblib.dump a un temporal y lo guarda como blob."""
+        fd, tmp_path = tempfile.mkstemp(suffix=ext)
+        os.close(fd)
+        try:
+            joblib.dump(obj, tmp_path)
+            return self.put_blob(tmp_path)
+        finally:
+            os.remove(tmp_path)
+
+    # --------------------------------------------------------------- versions
+    def register(self, artifacts, engine='v5', version=None, feature_cols=None, metrics=None,
+                 extra=None, activate=False):
+        """
+        Registra una versión.
+
+        Args:
+            artifacts: {rol: ruta}. Roles v5: model, calibrator, fe, compiled.
+                       Ensemble: ensemble (pickle de EnsembleRanker.save, se
+                       separa en un blob por miembro) y calibrator.
+            feature_cols / metrics / extra: se guardan en el manifest
+
+        Returns:
+            version (si el contenido ya estaba registrado, la versión existente)
+        """
+        entries, extra = {}, dict(extra or {})
+        for role, path in artifacts.items():
+            if role == 'ensemble':
+                data = joblib.load(path)
+                for member in ENSEMBLE_MEMBERS:
+                    sha, ext, size = self._put_object(data[member])
+                    entries[member] = {'sha256': sha, 'ext': ext, 'size': size}
+                extra['meta_weights'] = {k: float(v) for k, v in (data.get('meta_weights') or {}).items()}
+                if data.get('member_means') is not None:
+                    extra['member_means'] = [float(v) for v in data['member_means']]
+                extra['timestamp'] = data.get('timestamp')
+            else:
+                sha, ext, size = self.put_blob(path)
+                entries[role] = {'sha256': sha, 'ext': ext, 'size': size}
+
+        content_id = hashlib.sha256(
+            json.dumps({'engine': engine, 'artifacts': entries}, sort_keys=True).encode()
+        ).hexdigest()[:12]
+        for existing in self.versions():
+            if self.manifest(existing).get('content_id') == content_id:
+                logger.info(f"✅ Contenido ya registrado como {existing}")
+                if activate:
+                    self.activate(existing)
+                return existing
+
+        version = version or f"{engine}-{datetime.now().strftime('%Y%m%d_%H%M%S')}-{content_id[:8]}"
+        manifest = {
+            'version': version,
+            'engine': engine,
+            'content_id': content_id,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'artifacts': entries,
+            'feature_cols': list(feature_cols) if feature_cols is not None else None,
+            'metrics': metrics or {},
+            **extra
+        }
+        _atomic_write_text(os.path.join(self.versions_dir, f'{version}.json'),
+                           json.dumps(manifest, indent=2, ensure_ascii=False, default=str))
+        logger.info(f"✅ Versión registrada: {version} ({len(entries)} blobs)")
+        if activate:
+            self.activate(version)
+        return version
+
+    def versions(self):
+        if not os.path.isdir(self.versions_dir):
+            return []
+        return sorted(f[:-5] for f in os.listdir(self.versions_dir) if f.endswith('.json'))
+
+    def manifest(self, version=None):
+        version = version or self.active_version()
+        if version is None:
+            raise FileNotFoundError(f"No hay versión activa en {self.root}")
+        path = os.path.join(self.versions_dir, f'{version}.json')
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Versión no registrada: {version}")
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def active_version(self):
+        if not os.path.exists(self.active_path):
+            return None
+        with open(self.active_path, 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+
+    def activate(self, version):
+        """Cambia la versión activa de forma atómica (os.replace del puntero)."""
+        self.manifest(version)  # valida que exista
+        _atomic_write_text(self.active_path, version)
+        logger.info(f"✅ Versión activa: {version}")
+
+    def gc(self):
+        """Elimina blobs que ningún manifest referencia. Devuelve cuántos borró."""
+        referenced = {
+            entry['sha256'] for v in self.versions() for entry in self.manifest(v)['artifacts'].values()
+        }
+        removed = 0
+        for dirpath, _, files in os.walk(self.blobs_dir):
+            for name in files:
+                if name.split('.')[0] not in referenced:
+                    os.remove(os.path.join(dirpath, name))
+                    removed += 1
+        return removed
+
+    # ---------------------------------------------------------------- loading
+    def artifact_path(self, manifest, role):
+        entry = manifest['artifacts'].get(role)
+        return self.blob_path(entry['sha256'], entry['ext']) if entry else None
+
+    def lazy(self, role, version=None, manifest=None):
+        """LazyArtifact de un rol (None si la versión no lo tiene)."""
+        manifest = manifest or self.manifest(version)
+        path = self.artifact_path(manifest, role)
+        return LazyArtifact(path, role) if path else None
+
+    def load_ensemble(self, version=None, min_meta_weight=0.0):
+        """EnsembleRanker con los modelos base cargados en el primer uso."""
+        from src.models.ensemble_ranker import EnsembleRanker
+
+        manifest = self.manifest(version)
+        ensemble = EnsembleRanker(save_individual_models=False, min_meta_weight=min_meta_weight)
+        ensemble.lgbm = self.lazy('lgbm', manifest=manifest)
+        ensemble.xgb = self.lazy('xgb', manifest=manifest)
+        ensemble.catboost = self.lazy('catboost', manifest=manifest)
+        ensemble.base_models = [ensemble.lgbm, ensemble.xgb, ensemble.catboost]
+        ensemble.meta_model = _load_blob(self.artifact_path(manifest, 'meta_model'))
+        ensemble.meta_weights = manifest.get('meta_weights')
+        if manifest.get('member_means') is not None:
+            ensemble.member_means = np.asarray(manifest['member_means'])
+        return ensemble
+
+    def build_pipeline(self, version=None, db_path='data/db/hipica_data.db', warm=True, min_meta_weight=0.0):
+        """
+        Pipeline de inferencia de una versión, con artefactos lazy. Con warm=True
+        se cargan modelo y calibrador y se hace un predict de prueba (para que
+        la primera petición real no pague la deserialización). min_meta_weight
+        aplica al ensemble: los modelos base bajo el umbral no se cargan.
+        """
+        manifest = self.manifest(version)
+
+        if manifest['engine'] == 'ensemble':
+            from src.models.inference_ensemble import EnsembleInferencePipeline
+            from src.models.feature_store import FeatureStore
+            pipeline = EnsembleInferencePipeline(calibrator_path=self.artifact_path(manifest, 'calibrator') or '',
+                                                 db_path=db_path)
+            pipeline.ensemble = self.load_ensemble(manifest['version'], min_meta_weight=min_meta_weight)
+            pipeline.store = FeatureStore.load(pipeline.feature_store_path)
+            pipeline.calibrator = self.lazy('calibrator', manifest=manifest)
+        else:
+            from src.models.inference_optimized import OptimizedInferencePipeline, FEATURE_COLS
+            pipeline = OptimizedInferencePipeline(
+                model_path=self.artifact_path(manifest, 'model') or '',
+                fe_path=self.artifact_path(manifest, 'fe') or '',
+                calibrator_path=self.artifact_path(manifest, 'calibrator') or '',
+                compiled_path=self.artifact_path(manifest, 'compiled'),
+                db_path=db_path
+            )
+            pipeline.model = self.lazy('compiled', manifest=manifest) or self.lazy('model', manifest=manifest)
+            pipeline.fe = self.lazy('fe', manifest=manifest)
+            pipeline.calibrator = self.lazy('calibrator', manifest=manifest)
+
+        pipeline.registry_version = manifest['version']
+        if warm:
+            start = time.perf_counter()
+            if pipeline.calibrator is not None:
+                pipeline.calibrator.resolve()
+            if manifest['engine'] == 'ensemble':
+                # Sólo los modelos base que predict va a usar
+                for idx in pipeline.ensemble._active_members(pipeline.ensemble.min_meta_weight):
+                    pipeline.ensemble._member(idx)
+            else:
+                import pandas as pd
+                feature_cols = manifest.get('feature_cols') or FEATURE_COLS
+                pipeline.model.predict(pd.DataFrame(np.zeros((1, len(feature_cols))), columns=feature_cols))
+            logger.info(f"✅ {manifest['version']} precalentada en {(time.perf_counter() - start) * 1000:.0f} ms")
+        return pipeline
+
+
+class HotSwap:
+    """
+    Referencia a la versión activa que se puede cambiar en caliente.
+
+    current() devuelve (version, objeto) y nunca bloquea: el build + warm de
+    la versión nueva ocurre en refresh() (thread de polling o llamada
+    explícita) y el cambio es una sola asignación de referencia. Las
+    peticiones en curso terminan con la versión con la que empezaron.
+    """
+
+    def __init__(self, registry, build_fn=None, poll_seconds=None):
+        self.registry = registry
+        self.build_fn = build_fn or registry.build_pipeline
+        self._current = None
+        self._build_lock = threading.Lock()
+        self.refresh()
+        if poll_seconds:
+            threading.Thread(target=self._watch, args=(poll_seconds,), name='registry-watch', daemon=True).start()
+
+    def current(self):
+        return self._current
+
+    @property
+    def version(self):
+        return self._current[0] if self._current else None
+
+    def refresh(self):
+        """Si cambió ACTIVE, construye la versión nueva y la publica. True si hubo cambio."""
+        version = self.registry.active_version()
+        if version is None or version == self.version:
+            return False
+        with self._build_lock:
+            if version == self.version:
+                return False
+            start = time.perf_counter()
+            obj = self.build_fn(version)
+            previous = self.version
+            self._current = (version, obj)
+        logger.info(f"🔄 Hot-swap {previous} -> {version} ({(time.perf_counter() - start) * 1000:.0f} ms de build)")
+        return True
+
+    def _watch(self, poll_seconds):
+        while True:
+            time.sleep(poll_seconds)
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"❌ Hot-swap fallido, se mantiene {self.version}: {e}")
+
+
+def _metrics_from_metadata(path):
+    """Métricas escalares y lista de features desde un *_metadata.json de entrenamiento."""
+    with open(path, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+    metrics = {k: v for k, v in metadata.items() if isinstance(v, (int, float, str, bool))}
+    # feature_importance viene ordenada por importancia: sólo sirve una lista explícita
+    features = metadata.get('feature_cols') or metadata.get('features')
+    return metrics, features
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Registry de modelos por contenido')
+    parser.add_argument('--root', default=REGISTRY_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    reg = sub.add_parser('register', help='Registrar una versión')
+    reg.add_argument('--engine', choices=['v5', 'ensemble'], default='v5')
+    reg.add_argument('--artifact', action='append', required=True, help='rol=ruta')
+    reg.add_argument('--metadata', default=None, help='*_metadata.json con métricas')
+    reg.add_argument('--version', default=None)
+    reg.add_argument('--activate', action='store_true')
+
+    sub.add_parser('list', help='Listar versiones')
+    act = sub.add_parser('activate', help='Activar una versión')
+    act.add_argument('version')
+    sub.add_parser('gc', help='Borrar blobs no referenciados')
+    args = parser.parse_args()
+
+    try:
+        registry = ModelRegistry(args.root)
+        if args.command == 'register':
+            artifacts = dict(a.split('=', 1) for a in args.artifact)
+            metrics, features = _metrics_from_metadata(args.metadata) if args.metadata else ({}, None)
+            if features is None and args.engine == 'v5':
+                from src.models.inference_optimized import FEATURE_COLS
+                features = FEATURE_COLS
+            print(registry.register(artifacts, engine=args.engine, version=args.version,
+                                    feature_cols=features, metrics=metrics, activate=args.activate))
+        elif args.command == 'list':
+            active = registry.active_version()
+            for v in registry.versions():
+                m = registry.manifest(v)
+                print(f"{'*' if v == active else ' '} {v}  {m['engine']:8s}  {m['created_at']}  {m.get('metrics', {})}")
+        elif args.command == 'activate':
+            registry.activate(args.version)
+        elif args.command == 'gc':
+            print(f"Blobs eliminados: {registry.gc()}")
+    except Exception as e:
+        logger.error(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,231 @@
+"""
+Archivo Histórico de Predicciones
+---------------------------------
+Reemplaza los backups data/predictions/pred_<timestamp>.json (una copia
+JSON indentada por corrida, sin límite y no consultable) por un archivo
+append-only particionado por fecha de carrera:
+
+    data/predictions/archive/
+        runs.jsonl                          # índice: run_id, timestamp, versión, carreras, filas
+        fecha=2026-10-20/run_<run_id>.npz   # predicciones de esa fecha en esa corrida
+
+Cada partición es columnar comprimida (.npz, strings como categorías +
+códigos, sin pickle; el mismo formato que src/models/backfill.py). Una
+consulta por carrera sólo abre los archivos de su fecha.
+
+Uso:
+    python src/models/prediction_archive.py runs
+    python src/models/prediction_archive.py race 2026-10-20 "Hipódromo Chile" 3
+    python src/models/prediction_archive.py migrate            # backups JSON -> archivo
+    python src/models/prediction_archive.py migrate --remove   # y borra los JSON migrados
+
+Si append falla, la corrida se respalda como pred_<timestamp>.json
+(write_json_backup) para que el próximo migrate la archive.
+
+Author: ML Engineering Team
+Date: 2026-10-19
+"""
+
+import os
+import sys
+import glob
+import json
+import logging
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.models.backfill import save_archive, load_archive
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = 'data/predictions/archive'
+BACKUP_DIR = 'data/predictions'
+
+
+class PredictionArchive:
+    """Archivo append-only de corridas de inferencia, particionado por fecha."""
+
+    def __init__(self, root=ARCHIVE_DIR):
+        self.root = root
+        self.index_path = os.path.join(root, 'runs.jsonl')
+
+    def _partition_path(self, fecha, run_id):
+        return os.path.join(self.root, f'fecha={fecha}', f'run_{run_id}.npz')
+
+    def append(self, records, model_version=None, run_id=None, timestamp=None, source='inference'):
+        """
+        Agrega una corrida.
+
+        Args:
+            records: lista de dicts (fecha, hipodromo, carrera, numero, ...)
+            model_version: versión del registry o hash de artefactos
+            run_id: id de la corrida (default: timestamp)
+
+        Returns:
+            run_id (None si no hay registros). Un run_id ya archivado no se
+            vuelve a escribir.
+        """
+        df = pd.DataFrame(records)
+        if df.empty:
+            return None
+
+        timestamp = timestamp or datetime.now()
+        run_id = run_id or timestamp.strftime('%Y%m%d_%H%M%S_%f')
+        if run_id in set(self.runs()['run_id']):
+            logger.info(f"   Corrida {run_id} ya archivada")
+            return run_id
+
+        df['fecha'] = df['fecha'].astype(str).str[:10]
+        for fecha, part in df.groupby('fecha', sort=True):
+            save_archive(part.reset_index(drop=True), self._partition_path(fecha, run_id), {'run_id': run_id})
+
+        entry = {
+            'run_id': run_id,
+            'timestamp': timestamp.isoformat(timespec='seconds'),
+            'model_version': model_version,
+            'races': int(df.groupby(['fecha', 'hipodromo', 'carrera'], dropna=False).ngroups),
+            'rows': len(df),
+            'fechas': sorted(df['fecha'].unique().tolist()),
+            'source': source
+        }
+        # El índice se escribe después de las particiones: una corrida
+        # interrumpida no queda indexada
+        os.makedirs(self.root, exist_ok=True)
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        logger.info(f"✅ Archivo: corrida {run_id} ({entry['rows']} filas, {len(entry['fechas'])} fechas)")
+        return run_id
+
+    def runs(self):
+        """Índice de corridas como DataFrame (ordenado por timestamp)."""
+        columns = ['run_id', 'timestamp', 'model_version', 'races', 'rows', 'fechas', 'source']
+        if not os.path.exists(self.index_path):
+            return pd.DataFrame(columns=columns)
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        return pd.DataFrame(entries, columns=columns).sort_values('timestamp', kind='stable').reset_index(drop=True)
+
+    def load(self, fecha=None, desde=None, hasta=None):
+        """
+        Predicciones archivadas (todas las corridas) con columnas run_id y
+        timestamp. fecha o [desde, hasta] limitan las particiones leídas.
+        """
+        if fecha is not None:
+            desde = hasta = str(fecha)[:10]
+
+        runs = self.runs().set_index('run_id')
+        frames = []
+        for part_dir in sorted(glob.glob(os.path.join(self.root, 'fecha=*'))):
+            part_fecha = os.path.basename(part_dir).split('=', 1)[1]
+            if (desde and part_fecha < desde) or (hasta and part_fecha > hasta):
+                continue
+            for path in sorted(glob.glob(os.path.join(part_dir, 'run_*.npz'))):
+                df, meta = load_archive(path)
+                if meta['run_id'] not in runs.index:
+                    continue  # corrida sin indexar (interrumpida)
+                df.insert(0, 'run_id', meta['run_id'])
+                df.insert(1, 'timestamp', runs.at[meta['run_id'], 'timestamp'])
+                frames.append(df)
+
+        if not frames:
+            return pd.DataFrame(columns=['run_id', 'timestamp'])
+        return pd.concat(frames, ignore_index=True)
+
+    def race_history(self, fecha, hipodromo, carrera):
+        """Todas las predicciones de una carrera en todas las corridas."""
+        df = self.load(fecha=fecha)
+        if df.empty:
+            return df
+        mask = (df['hipodromo'] == hipodromo) & (pd.to_numeric(df['carrera'], errors='coerce') == int(carrera))
+        return df[mask].sort_values(['timestamp', 'numero'], kind='stable').reset_index(drop=True)
+
+    def migrate_json_backups(self, backup_dir=BACKUP_DIR, remove=False):
+        """
+        Migración única de los backups pred_<YYYYmmdd_HHMMSS>.json. Cada
+        archivo es una corrida (run_id = su timestamp). Con remove=True se
+        borra cada JSON después de verificar sus filas en el archivo.
+
+        Returns:
+            cantidad de backups migrados
+        """
+        migrated = 0
+        for path in sorted(glob.glob(os.path.join(backup_dir, 'pred_*.json'))):
+            run_id = os.path.basename(path)[len('pred_'):-len('.json')]
+            try:
+                timestamp = datetime.strptime(run_id, '%Y%m%d_%H%M%S')
+            except ValueError:
+                logger.warning(f"⚠️ Nombre inesperado, se omite: {path}")
+                continue
+
+            with open(path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+            if not records:
+                continue
+            self.append(records, run_id=run_id, timestamp=timestamp, source='json_backup')
+            migrated += 1
+
+            if remove:
+                fechas = sorted({str(r['fecha'])[:10] for r in records})
+                archived = sum(
+                    len(load_archive(self._partition_path(fecha, run_id))[0]) for fecha in fechas
+                )
+                if archived != len(records):
+                    raise RuntimeError(f"Migración incompleta de {path}: {archived}/{len(records)} filas")
+                os.remove(path)
+
+        logger.info(f"✅ Backups migrados: {migrated}")
+        return migrated
+
+
+def write_json_backup(records, backup_dir=BACKUP_DIR):
+    """
+    Respaldo pred_<YYYYmmdd_HHMMSS>.json de una corrida que no se pudo
+    archivar; migrate_json_backups la incorpora al archivo más tarde.
+
+    Returns:
+        ruta del backup escrito
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    path = os.path.join(backup_dir, f"pred_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(records, f, default=str, ensure_ascii=False)
+    return path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Archivo histórico de predicciones')
+    parser.add_argument('--root', default=ARCHIVE_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('runs', help='Listar corridas')
+    race = sub.add_parser('race', help='Predicciones de una carrera en todas las corridas')
+    race.add_argument('fecha')
+    race.add_argument('hipodromo')
+    race.add_argument('carrera', type=int)
+    mig = sub.add_parser('migrate', help='Migrar backups pred_*.json')
+    mig.add_argument('--backup-dir', default=BACKUP_DIR)
+    mig.add_argument('--remove', action='store_true', help='Borrar los JSON migrados')
+    args = parser.parse_args()
+
+    try:
+        archive = PredictionArchive(args.root)
+        if args.command == 'runs':
+            print(archive.runs().to_string(index=False))
+        elif args.command == 'race':
+            print(archive.race_history(args.fecha, args.hipodromo, args.carrera).to_string(index=False))
+        elif args.command == 'migrate':
+            print(f"Backups migrados: {archive.migrate_json_backups(args.backup_dir, remove=args.remove)}")
+    except Exception as e:
+        logger.error(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
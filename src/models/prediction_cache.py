@@ -0,0 +1,170 @@
+"""
+Cache de Predicciones por Carrera
+---------------------------------
+Evita recalcular carreras que no cambiaron entre syncs. Cada carrera se
+identifica por un fingerprint de sus participantes (mandil, caballo,
+jinete, peso, distancia, ids) y de su fila de features, combinado con la
+versión de los artefactos (hash de modelo + calibrador + FE).
+
+Si fingerprint y versión coinciden con lo guardado, se reutilizan las
+probabilidades; si no, la carrera se recalcula y queda marcada como
+cambiada para que el upload a Supabase procese sólo esas carreras.
+
+Una carrera recalculada queda pendiente de upload hasta que el sync
+confirma que llegó a Supabase (mark_uploaded, después de run_upload): si el
+upload falla o se interrumpe, el siguiente sync la vuelve a subir aunque su
+fingerprint no haya cambiado. Los retiros (src/models/scratches.py) marcan
+además la carrera con `overwrite`: ya está publicada y el reintento tiene
+que reemplazarla en Supabase (pending_overwrite).
+
+Cada entrada guarda también la probabilidad calibrada previa al softmax
+(`prob_raw`) y los mandiles retirados, para que src/models/scratches.py
+pueda renormalizar una carrera sin volver a pasar por modelo ni features.
+
+Author: ML Engineering Team
+Date: 2026-10-19
+"""
+
+import os
+import json
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = 'data/prediction_cache.json'
+
+# Columnas del programa que definen "la misma carrera" (además de las features)
+ENTRANT_COLS = ['numero', 'caballo', 'jinete', 'peso', 'distancia', 'caballo_id', 'jinete_id']
+
+
+def race_key(fecha, hipodromo, carrera):
+    """Clave de carrera usada por el upload: fecha_hipodromo_carrera."""
+    return f"{fecha}_{hipodromo}_{carrera}"
+
+
+def artifacts_version(*paths):
+    """Hash de los artefactos (los que no existen cuentan como ausentes)."""
+    digest = hashlib.sha1()
+    for path in paths:
+        digest.update(str(path).encode())
+        if path and os.path.exists(path):
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+        else:
+            digest.update(b'<missing>')
+    return digest.hexdigest()[:16]
+
+
+def race_fingerprints(df_enriched, X, race_col='race_unique_id'):
+    """
+    Fingerprint por carrera (dict race_id -> hex). Independiente del orden de
+    las filas: se ordena por mandil dentro de cada carrera.
+    """
+    # numpy/pandas sólo aquí: race_key se importa desde el upload sin cargarlos
+    import numpy as np
+    import pandas as pd
+
+    cols = [c for c in ENTRANT_COLS if c in df_enriched.columns]
+    entrants = df_enriched[cols].astype(str).reset_index(drop=True)
+    features = pd.DataFrame(np.round(np.asarray(X, dtype=float), 10)).reset_index(drop=True)
+    row_hash = (
+        pd.util.hash_pandas_object(entrants, index=False).values ^
+        pd.util.hash_pandas_object(features, index=False).values
+    )
+
+    frame = pd.DataFrame({
+        'race': df_enriched[race_col].astype(str).values,
+        'mandil': pd.to_numeric(df_enriched['numero'], errors='coerce').fillna(0).values
+                  if 'numero' in df_enriched.columns else 0,
+        'h': row_hash
+    }).sort_values(['race', 'mandil', 'h'], kind='stable')
+
+    return {
+        race: hashlib.sha1(group['h'].values.tobytes()).hexdigest()[:16]
+        for race, group in frame.groupby('race', sort=False)
+    }
+
+
+class PredictionCache:
+    """Probabilidades por carrera + fingerprint + versión, persistidas en JSON."""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self.races = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.races = json.load(f).get('races', {})
+            except Exception as e:
+                logger.warning(f"⚠️ Cache de predicciones ilegible, se ignora: {e}")
+                self.races = {}
+
+    def split(self, fingerprints, version):
+        """Devuelve (sin_cambios, cambiadas) como listas de race_id."""
+        unchanged, changed = [], []
+        for race, fp in fingerprints.items():
+            entry = self.races.get(race)
+            hit = entry is not None and entry['fingerprint'] == fp and entry['version'] == version
+            (unchanged if hit else changed).append(race)
+        return unchanged, changed
+
+    def records(self, races):
+        """Registros guardados de las carreras indicadas."""
+        return [record for race in races for record in self.races[race]['records']]
+
+    def scratched(self, race):
+        """Mandiles retirados de una carrera (se conservan al recalcularla)."""
+        return self.races.get(race, {}).get('scratched', [])
+
+    def update(self, fingerprints, version, records_by_race, scores_by_race=None, prune=True):
+        """
+        Guarda las carreras recalculadas. Con prune=True (programa completo)
+        descarta las que ya no están en el programa; con prune=False (sólo
+        algunas carreras, p.ej. el scheduler del día) conserva el resto.
+        """
+        scores_by_race = scores_by_race or {}
+        for race, records in records_by_race.items():
+            previous = self.races.get(race, {})
+            self.races[race] = {
+                'fingerprint': fingerprints[race], 'version': version, 'records': records,
+                'prob_raw': scores_by_race.get(race), 'scratched': self.scratched(race),
+                'uploaded': False,
+                # Un retiro sin confirmar sigue necesitando reemplazar lo publicado
+                'overwrite': bool(previous.get('overwrite')) and not previous.get('uploaded', True)
+            }
+        if prune:
+            self.races = {race: entry for race, entry in self.races.items() if race in fingerprints}
+
+    def pending_upload(self):
+        """race_keys de las carreras recalculadas que aún no se confirmaron en Supabase."""
+        return sorted(
+            race_key(entry['records'][0]['fecha'], entry['records'][0]['hipodromo'], entry['records'][0]['carrera'])
+            for entry in self.races.values()
+            if not entry.get('uploaded', True) and entry['records']
+        )
+
+    def pending_overwrite(self):
+        """Subconjunto de pending_upload que debe reemplazar lo ya publicado (retiros)."""
+        return sorted(
+            race_key(entry['records'][0]['fecha'], entry['records'][0]['hipodromo'], entry['records'][0]['carrera'])
+            for entry in self.races.values()
+            if not entry.get('uploaded', True) and entry.get('overwrite') and entry['records']
+        )
+
+    def mark_uploaded(self, races):
+        """Marca como subidas las carreras indicadas (race_keys)."""
+        races = set(races)
+        for entry in self.races.values():
+            records = entry['records']
+            if records and race_key(records[0]['fecha'], records[0]['hipodromo'], records[0]['carrera']) in races:
+                entry['uploaded'] = True
+                entry['overwrite'] = False
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'races': self.races}, f, default=str, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,176 @@
+"""
+Publicación Atómica de Predicciones
+-----------------------------------
+Un solo paso de publicación para predicciones_activas:
+
+- JSON: se serializa una vez (compacto) y se reemplaza con archivo
+  temporal + os.replace, así los lectores ven el archivo anterior o el
+  nuevo, nunca uno a medio escribir.
+- SQLite: upsert de sólo las filas que cambiaron (clave fecha, hipodromo,
+  carrera, numero) dentro de una transacción, en lugar de
+  to_sql(if_exists='replace'), que borra y recrea la tabla.
+
+Con races=None la publicación reemplaza todo el contenido (filas que ya no
+están se borran); con races se limita a esas carreras y el resto queda
+intacto (race-day scheduler, retiros).
+
+Author: ML Engineering Team
+Date: 2026-10-19
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import logging
+import tempfile
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.models.prediction_cache import race_key
+from src.utils import instrumentation
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+JSON_PATH = 'data/predicciones_activas.json'
+DB_PATH = 'data/db/hipica_data.db'
+TABLE = 'predicciones_activas'
+KEY_COLS = ['fecha', 'hipodromo', 'carrera', 'numero']
+
+
+def _plain(value):
+    """Escalares numpy -> Python (sqlite3 y la comparación con lo guardado)."""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def write_json_atomic(payload, path):
+    """Escribe bytes en path vía temporal en el mismo directorio + os.replace."""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _sql_type(value):
+    if isinstance(value, (bool, int, np.integer)):
+        return 'INTEGER'
+    if isinstance(value, (float, np.floating)):
+        return 'REAL'
+    return 'TEXT'
+
+
+def upsert_sqlite(records, db_path=DB_PATH, races=None, table=TABLE):
+    """
+    Sincroniza la tabla con records en una transacción, tocando sólo las
+    filas distintas.
+
+    Args:
+        records: lista de dicts con KEY_COLS
+        races: race_keys a las que se limita (None = toda la tabla)
+
+    Returns:
+        dict con inserted / updated / deleted / unchanged
+    """
+    columns = list(records[0].keys()) if records else list(KEY_COLS)
+    new_rows = {}
+    for record in records:
+        row = tuple(_plain(record.get(c)) for c in columns)
+        new_rows[tuple(row[columns.index(k)] for k in KEY_COLS)] = row
+
+    stats = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+    conn = instrumentation.instrument_connection(sqlite3.connect(db_path, timeout=30))
+    try:
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            existing_cols = [r[1] for r in conn.execute(f'PRAGMA table_info({table})')]
+            if not existing_cols:
+                sample = records[0] if records else {}
+                conn.execute(
+                    f"CREATE TABLE {table} ({', '.join(f'{c} {_sql_type(sample.get(c))}' for c in columns)})"
+                )
+            else:
+                for c in columns:
+                    if c not in existing_cols:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {c} {_sql_type(_plain(records[0].get(c)))}")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_key ON {table} ({', '.join(KEY_COLS)})")
+
+            old_rows = {}
+            for row in conn.execute(f"SELECT {', '.join(columns)} FROM {table}"):
+                key = tuple(row[columns.index(k)] for k in KEY_COLS)
+                if races is not None and race_key(key[0], key[1], key[2]) not in races:
+                    continue
+                old_rows.setdefault(key, []).append(row)
+
+            where = ' AND '.join(f'{k} IS ?' for k in KEY_COLS)
+            stale = [key for key in old_rows if key not in new_rows]
+            changed = [
+                key for key, row in new_rows.items()
+                if key in old_rows and old_rows[key] != [row]
+            ]
+            inserts = [row for key, row in new_rows.items() if key not in old_rows]
+
+            # Filas modificadas: delete + insert de la clave (también limpia duplicados viejos)
+            conn.executemany(f"DELETE FROM {table} WHERE {where}", stale + changed)
+            conn.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                inserts + [new_rows[key] for key in changed]
+            )
+            stats.update(inserted=len(inserts), updated=len(changed), deleted=len(stale),
+                         unchanged=len(new_rows) - len(inserts) - len(changed))
+    finally:
+        conn.close()
+    return stats
+
+
+def publish_predictions(records, json_path=JSON_PATH, db_path=DB_PATH, races=None):
+    """
+    Publica predicciones en el JSON activo y en SQLite.
+
+    Args:
+        records: predicciones a publicar
+        races: race_keys que reemplazan (el resto del JSON y de la tabla se
+               conserva). None = records es el contenido completo.
+
+    Returns:
+        estadísticas del upsert SQLite (None si falló)
+    """
+    published = list(records)
+    if races is not None:
+        races = set(races)
+        if os.path.exists(json_path):
+            with open(json_path, 'r', encoding='utf-8') as f:
+                current = json.load(f)
+            published = [
+                p for p in current if race_key(p['fecha'], p['hipodromo'], p['carrera']) not in races
+            ] + published
+
+    # 1. JSON activo (lo lee el upload): una serialización, reemplazo atómico
+    payload = json.dumps(published, default=str, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    write_json_atomic(payload, json_path)
+    logger.info(f"✅ JSON activo: {json_path} ({len(published)} filas)")
+
+    # 2. SQLite: sólo filas cambiadas, una transacción
+    try:
+        stats = upsert_sqlite(records, db_path, races)
+        instrumentation.count(rows_out=len(records))
+        logger.info(f"✅ SQLite {TABLE}: {stats['inserted']} nuevas, {stats['updated']} actualizadas, "
+                    f"{stats['deleted']} eliminadas, {stats['unchanged']} sin cambios")
+        return stats
+    except Exception as e:
+        logger.warning(f"⚠️ SQLite error: {e}")
+        return None
@@ -0,0 +1,176 @@
+"""
+Retiros de Último Minuto (Scratches)
+------------------------------------
+Ruta rápida para retiros del día de carrera: quita los mandiles retirados
+de las carreras guardadas en el cache de predicciones y renormaliza sólo
+esas carreras a partir de la probabilidad calibrada guardada (`prob_raw`).
+
+La calibración es por fila (isotónica/sigmoide sobre el score), así que un
+retiro no la cambia: basta repetir el softmax (temperatura 1/3) sobre los
+participantes que quedan. No se cargan modelos ni se generan features.
+
+Después se reescriben sólo las carreras afectadas en
+data/predicciones_activas.json y en SQLite (predicciones_activas) y se
+suben a Supabase con force_overwrite para esas carreras. Igual que en el
+sync, la carrera queda pendiente de upload en el cache hasta que
+run_upload la confirma; si falla, el siguiente sync la vuelve a subir
+reemplazando lo publicado (PredictionCache.pending_overwrite).
+
+Uso:
+    python src/models/scratches.py "2026-10-20_Hipódromo Chile_3:5" "2026-10-20_Hipódromo Chile_7:2"
+    python src/models/scratches.py "2026-10-20_Hipódromo Chile_3:5" --no-upload
+
+Author: ML Engineering Team
+Date: 2026-10-19
+"""
+
+import os
+import sys
+import time
+import logging
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.models.prediction_cache import CACHE_PATH, PredictionCache, race_key
+from src.models.segment_ops import segment_softmax
+from src.models.inference_optimized import replace_active_races
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+JSON_PATH = 'data/predicciones_activas.json'
+DB_PATH = 'data/db/hipica_data.db'
+TEMPERATURE = 1 / 3  # la misma de OptimizedInferencePipeline._predict
+
+
+def parse_scratch(text):
+    """'fecha_hipodromo_carrera:mandil' -> (race_key, mandil)"""
+    race, _, mandil = str(text).rpartition(':')
+    if not race or not mandil.strip().isdigit():
+        raise ValueError(f"Retiro inválido '{text}' (formato fecha_hipodromo_carrera:mandil)")
+    return race, int(mandil)
+
+
+def renormalize(prob_raw, temperature=TEMPERATURE):
+    """Probabilidades (0-100, 1 decimal) de una carrera a partir de prob_raw."""
+    prob_raw = np.asarray(prob_raw, dtype=float)
+    n = len(prob_raw)
+    segments = (np.arange(n), np.zeros(1, dtype=int), np.array([n]))
+    probs, _ = segment_softmax(prob_raw, None, temperature=temperature, segments=segments)
+    return np.round(probs * 100, 1)
+
+
+def apply_scratches(scratches, cache_path=CACHE_PATH, temperature=TEMPERATURE):
+    """
+    Aplica retiros sobre el cache de predicciones.
+
+    Args:
+        scratches: iterable de (race_key, mandil), race_key = fecha_hipodromo_carrera
+        cache_path: cache de OptimizedInferencePipeline
+
+    Returns:
+        dict race_key -> registros renormalizados de cada carrera afectada
+    """
+    cache = PredictionCache(cache_path)
+    # race_key (como en el upload) -> race_unique_id del cache
+    by_key = {
+        race_key(entry['records'][0]['fecha'], entry['records'][0]['hipodromo'], entry['records'][0]['carrera']): race
+        for race, entry in cache.races.items() if entry['records']
+    }
+
+    pending = {}
+    for key, mandil in scratches:
+        if key not in by_key:
+            logger.warning(f"⚠️ Carrera {key} no está en el cache de predicciones; retiro ignorado")
+            continue
+        pending.setdefault(key, set()).add(int(mandil))
+
+    updated = {}
+    for key, mandiles in pending.items():
+        entry = cache.races[by_key[key]]
+        if entry.get('prob_raw') is None:
+            logger.warning(f"⚠️ {key} sin prob_raw en cache (re-ejecutar inferencia); retiro ignorado")
+            continue
+
+        keep = [i for i, r in enumerate(entry['records']) if int(r['numero']) not in mandiles]
+        if len(keep) == len(entry['records']):
+            logger.info(f"   {key}: mandiles {sorted(mandiles)} ya retirados o inexistentes")
+            continue
+        if not keep:
+            logger.warning(f"⚠️ {key}: se retirarían todos los participantes; retiro ignorado")
+            continue
+
+        prob_raw = [entry['prob_raw'][i] for i in keep]
+        records = [dict(entry['records'][i]) for i in keep]
+        for record, prob in zip(records, renormalize(prob_raw, temperature)):
+            record['probabilidad'] = float(prob)
+
+        entry['records'] = records
+        entry['prob_raw'] = prob_raw
+        entry['scratched'] = sorted(set(entry.get('scratched', [])) | mandiles)
+        # Lo publicado aún tiene al retirado: pendiente hasta confirmar el upload
+        entry['uploaded'] = False
+        entry['overwrite'] = True
+        updated[key] = records
+        logger.info(f"✅ {key}: retirados {sorted(mandiles)}, {len(records)} participantes renormalizados")
+
+    if updated:
+        cache.save()
+    return updated
+
+
+def publish_scratches(updated, json_path=JSON_PATH, db_path=DB_PATH, upload=True, cache_path=CACHE_PATH):
+    """
+    Reescribe sólo las carreras afectadas en JSON, SQLite y Supabase.
+    Confirma en el cache sólo las carreras que run_upload subió; las
+    fallidas quedan pendientes para el próximo sync.
+    """
+    if not updated:
+        return 0
+
+    # JSON y SQLite: sólo las filas de esas carreras
+    replace_active_races(updated, json_path=json_path, db_path=db_path)
+
+    # Supabase: sólo las carreras afectadas (ya publicadas => force_overwrite)
+    if not upload:
+        return 0
+    from src.utils.upload_predictions_supabase import run_upload
+    failed = []
+    uploaded = run_upload(force_overwrite=True, races=list(updated), failed_races=failed)
+
+    cache = PredictionCache(cache_path)
+    cache.mark_uploaded(set(updated) - set(failed))
+    cache.save()
+    return uploaded
+
+
+def run_scratches(scratches, cache_path=CACHE_PATH, json_path=JSON_PATH, db_path=DB_PATH, upload=True):
+    """apply_scratches + publish_scratches. Devuelve las race_keys afectadas."""
+    start = time.perf_counter()
+    updated = apply_scratches(scratches, cache_path)
+    logger.info(f"   Renormalización: {(time.perf_counter() - start) * 1000:.2f} ms")
+    publish_scratches(updated, json_path, db_path, upload, cache_path)
+    return sorted(updated)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Aplica retiros sin re-ejecutar la inferencia')
+    parser.add_argument('scratches', nargs='+', help='fecha_hipodromo_carrera:mandil')
+    parser.add_argument('--no-upload', action='store_true', help='No subir a Supabase')
+    args = parser.parse_args()
+
+    try:
+        affected = run_scratches([parse_scratch(s) for s in args.scratches], upload=not args.no_upload)
+        print(f"Carreras actualizadas: {affected}")
+    except Exception as e:
+        logger.error(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,116 @@
+"""
+Operaciones por Carrera sobre Segmentos Ordenados
+-------------------------------------------------
+Normalización de probabilidades por carrera sin groupby ni loops:
+las filas se ordenan (estable) por carrera y cada carrera queda como un
+segmento contiguo [start, start + size). Las reducciones por carrera son
+una sola llamada a np.maximum.reduceat / np.add.reduceat y se vuelven a
+expandir a filas con np.repeat.
+
+El orden de salida de `race_order` coincide con el de
+df.groupby('race_unique_id'): carreras por clave ascendente y, dentro de
+cada carrera, el orden original de las filas. Las funciones segment_*
+aceptan `segments` (resultado de race_order) para no recalcularlo.
+
+Author: ML Engineering Team
+Date: 2026-10-19
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def race_order(race_ids):
+    """
+    Permutación que agrupa las filas por carrera.
+
+    Returns:
+        order: índices de filas ordenadas por carrera (estable)
+        starts: offset de inicio de cada carrera dentro de `order`
+        sizes: número de filas de cada carrera
+    """
+    codes, _ = pd.factorize(np.asarray(race_ids), sort=True)
+    order = np.argsort(codes, kind='stable')
+    sizes = np.bincount(codes)
+    sizes = sizes[sizes > 0]
+    starts = np.cumsum(sizes) - sizes
+    return order, starts, sizes
+
+
+def _unsort(values_sorted, order):
+    """Devuelve valores calculados en orden de carrera al orden original."""
+    out = np.empty_like(values_sorted)
+    out[order] = values_sorted
+    return out
+
+
+def segment_softmax(scores, race_ids, temperature=1.0, segments=None):
+    """
+    Softmax por carrera: exp((s - max_carrera) / T) / suma_carrera.
+
+    Returns:
+        (probs, ranks) en el orden original de las filas; rank 1 = mayor
+        probabilidad de la carrera (empates por orden de aparición).
+    """
+    scores = np.asarray(scores, dtype=float)
+    if len(scores) == 0:
+        return np.empty(0), np.empty(0, dtype=int)
+
+    order, starts, sizes = segments or race_order(race_ids)
+    s = scores[order]
+    s = (s - np.repeat(np.maximum.reduceat(s, starts), sizes)) / temperature
+    e = np.exp(s)
+    probs = e / np.repeat(np.add.reduceat(e, starts), sizes)
+
+    return _unsort(probs, order), segment_rank(probs, order, starts, sizes)
+
+
+def segment_normalize(values, race_ids, segments=None):
+    """
+    Normaliza para que cada carrera sume 1. Carreras con suma <= 0 => uniforme.
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return np.empty(0)
+
+    order, starts, sizes = segments or race_order(race_ids)
+    v = values[order]
+    totals = np.repeat(np.add.reduceat(v, starts), sizes)
+    uniform = np.repeat(1.0 / sizes, sizes)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        probs = np.where(totals > 0, v / totals, uniform)
+    return _unsort(probs, order)
+
+
+def segment_minmax(values, race_ids, eps=1e-6, segments=None):
+    """
+    Escala min-max dentro de cada carrera.
+
+    Returns:
+        (normalized, degenerate): degenerate marca filas de carreras cuyo
+        rango es <= eps (normalized = 0 en ellas).
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return np.empty(0), np.empty(0, dtype=bool)
+
+    order, starts, sizes = segments or race_order(race_ids)
+    v = values[order]
+    lo = np.repeat(np.minimum.reduceat(v, starts), sizes)
+    rng = np.repeat(np.maximum.reduceat(v, starts), sizes) - lo
+    degenerate = rng <= eps
+    normalized = np.where(degenerate, 0.0, (v - lo) / np.where(degenerate, 1.0, rng))
+    return _unsort(normalized, order), _unsort(degenerate, order)
+
+
+def segment_rank(values_sorted, order, starts, sizes):
+    """
+    Ranking descendente dentro de cada carrera (1 = mayor valor) a partir de
+    valores ya ordenados por carrera; se devuelve en el orden original.
+    """
+    race = np.repeat(np.arange(len(sizes)), sizes)
+    # Orden estable por (carrera, -valor): lexsort usa la última clave como primaria
+    by_value = np.lexsort((-values_sorted, race))
+    ranks_sorted = np.empty(len(values_sorted), dtype=int)
+    ranks_sorted[by_value] = np.arange(len(values_sorted)) - np.repeat(starts, sizes)
+    return _unsort(ranks_sorted + 1, order)
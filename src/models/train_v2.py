@@ -207,6 +207,11 @@ class HipicaLearner:
         print("✅ Modelo Ranker V1 Guardado.")
 
 if __name__ == "__main__":
-    learner = HipicaLearner()
-    learner.train()
+    import sys
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+    from src.utils.profiling import profile_run, pop_profile_arg
+
+    with profile_run('train_v2', pop_profile_arg()):
+        learner = HipicaLearner()
+        learner.train()
 
@@ -10,9 +10,10 @@ import sys
 import os
 import pandas as pd
 import numpy as np
-from src.models.data_manager import cargar_datos_3nf
+from src.models.data_manager import cargar_datos_3nf_tipado
 from src.models.features import FeatureEngineering
 from src.models.ensemble_ranker import EnsembleRanker, compare_ensemble_vs_baseline
+from src.utils.profiling import TrainingProfiler, maybe_stage, profile_run, pop_profile_arg
 from lightgbm import LGBMRanker
 import logging
 
@@ -22,21 +23,55 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Resultado de `python -m src.models.hyperparam_search --features ensemble`
+ENSEMBLE_SEARCH_PATH = 'src/models/hyperparam_search_ensemble.json'
 
-def prepare_training_data():
-    """Prepara datos para entrenamiento"""
-    logger.info("Cargando datos históricos...")
-    df = cargar_datos_3nf()
+
+def race_fechas(groups):
+    """Fecha de cada race_id ('hipodromo_YYYY-MM-DD_nro')."""
+    return pd.to_datetime(pd.Series(groups).str.extract(r'_(\d{4}-\d{2}-\d{2})_')[0])
+
+
+def load_ensemble_params(path=ENSEMBLE_SEARCH_PATH):
+    """
+    Overrides de EnsembleRanker desde hyperparam_search (o None). La búsqueda
+    sólo cubre LightGBM; XGBoost y CatBoost mantienen su configuración.
+    """
+    from src.models.train_v5_optimized import load_search_params
+
+    best = load_search_params(path)
+    return {'LightGBM': best} if best else None
+
+
+def prepare_training_data(profiler=None, df=None):
+    """
+    Prepara datos para entrenamiento
+    
+    Args:
+        profiler: TrainingProfiler opcional (src/utils/profiling.py)
+        df: DataFrame crudo (formato cargar_datos_3nf). Si es None se lee de SQLite.
+    """
+    if df is None:
+        logger.info("Cargando datos históricos...")
+        with maybe_stage(profiler, 'data_load'):
+            df = cargar_datos_3nf_tipado()
     
     if df.empty:
         raise ValueError("No hay datos para entrenar")
     
     logger.info(f"   Datos cargados: {len(df)} registros")
     
+    # FeatureEngineering.transform devuelve las filas ordenadas por
+    # (caballo_id, fecha): mismo orden aquí para que y/groups queden alineados con X
+    df = df.copy()
+    df['fecha'] = pd.to_datetime(df['fecha'])
+    df = df.sort_values(['caballo_id', 'fecha'], kind='stable').reset_index(drop=True)
+    
     # Feature Engineering
     logger.info("Generando features...")
-    fe = FeatureEngineering()
-    X = fe.transform(df, is_training=True)
+    with maybe_stage(profiler, 'feature_engineering'):
+        fe = FeatureEngineering()
+        X = fe.transform(df, is_training=True)
     
     # Target (relevance based on position)
     def get_relevance(pos):
@@ -84,30 +119,40 @@ def prepare_training_data():
     return X, y, groups, fe, categorical_features
 
 
-def train_ensemble():
-    """Entrena el ensemble completo"""
+def train_ensemble(distill=True, params=None):
+    """
+    Entrena el ensemble completo
+    
+    Args:
+        distill: Si además se entrena el student destilado (src/models/distillation.py)
+        params: Overrides por modelo base para EnsembleRanker. Si es None se usa
+                el resultado de hyperparam_search --features ensemble (si existe).
+    """
     logger.info("\n" + "="*70)
     logger.info("ENTRENAMIENTO ENSEMBLE v4.0")
     logger.info("="*70 + "\n")
     
+    profiler = TrainingProfiler('ensemble_v4')
+    
     # Preparar datos
-    X, y, groups, fe, categorical_features = prepare_training_data()
+    X, y, groups, fe, categorical_features = prepare_training_data(profiler)
     
     # Split temporal (80/20) - CRÍTICO: mantener orden temporal
     logger.info("\nDividiendo dataset...")
-    unique_groups = groups.unique()
-    n_groups = len(unique_groups)
-    split_idx = int(n_groups * 0.8)
+    with profiler.stage('split'):
+        unique_groups = groups.unique()
+        n_groups = len(unique_groups)
+        split_idx = int(n_groups * 0.8)
     
-    train_groups = unique_groups[:split_idx]
-    test_groups = unique_groups[split_idx:]
+        train_groups = unique_groups[:split_idx]
+        test_groups = unique_groups[split_idx:]
     
-    train_mask = groups.isin(train_groups)
-    test_mask = groups.isin(test_groups)
+        train_mask = groups.isin(train_groups)
+        test_mask = groups.isin(test_groups)
     
-    X_train, X_test = X[train_mask], X[test_mask]
-    y_train, y_test = y[train_mask], y[test_mask]
-    groups_train, groups_test = groups[train_mask], groups[test_mask]
+        X_train, X_test = X[train_mask], X[test_mask]
+        y_train, y_test = y[train_mask], y[test_mask]
+        groups_train, groups_test = groups[train_mask], groups[test_mask]
     
     logger.info(f"   Train: {len(X_train):,} samples, {len(train_groups):,} carreras")
     logger.info(f"   Test:  {len(X_test):,} samples, {len(test_groups):,} carreras")
@@ -117,26 +162,33 @@ def train_ensemble():
     logger.info("INICIANDO ENTRENAMIENTO DEL ENSEMBLE")
     logger.info("="*70)
     
-    ensemble = EnsembleRanker(save_individual_models=True)
-    ensemble.fit(X_train, y_train, groups_train, categorical_features)
+    if params is None:
+        params = load_ensemble_params()
+        if params:
+            logger.info(f"   Usando hiperparámetros de {ENSEMBLE_SEARCH_PATH}: {params['LightGBM']}")
+    
+    with profiler.stage('ensemble_fit'):
+        ensemble = EnsembleRanker(save_individual_models=True, params=params)
+        ensemble.fit(X_train, y_train, groups_train, categorical_features, profiler=profiler)
     
     # Entrenar baseline para comparación
     logger.info("\n" + "="*70)
     logger.info("ENTRENANDO BASELINE LIGHTGBM PARA COMPARACIÓN")
     logger.info("="*70)
     
-    lgbm_baseline = LGBMRanker(
-        objective='lambdarank',
-        metric='ndcg',
-        n_estimators=500,
-        learning_rate=0.05,
-        random_state=42,
-        n_jobs=-1,
-        verbose=-1
-    )
+    with profiler.stage('baseline_fit'):
+        lgbm_baseline = LGBMRanker(
+            objective='lambdarank',
+            metric='ndcg',
+            n_estimators=500,
+            learning_rate=0.05,
+            random_state=42,
+            n_jobs=-1,
+            verbose=-1
+        )
     
-    train_group_counts = groups_train.value_counts().sort_index().values
-    lgbm_baseline.fit(X_train, y_train, group=train_group_counts)
+        train_group_counts = groups_train.value_counts().sort_index().values
+        lgbm_baseline.fit(X_train, y_train, group=train_group_counts)
     
     logger.info("✅ Baseline entrenado")
     
@@ -145,10 +197,11 @@ def train_ensemble():
     logger.info("EVALUACIÓN EN TEST SET")
     logger.info("="*70)
     
-    results = compare_ensemble_vs_baseline(
-        X_test, y_test, groups_test,
-        ensemble, lgbm_baseline
-    )
+    with profiler.stage('evaluate'):
+        results = compare_ensemble_vs_baseline(
+            X_test, y_test, groups_test,
+            ensemble, lgbm_baseline
+        )
     
     # Guardar Feature Engineering
     import joblib
@@ -165,71 +218,93 @@ def train_ensemble():
 
     # Usamos las predicciones del Test Set para calibrar
     logger.info("   Generando scores en Test Set...")
-    try:
-        raw_scores_test = ensemble.predict(X_test)
+    with profiler.stage('calibration'):
+        try:
+            raw_scores_test = ensemble.predict(X_test)
         
-        # Target binario (Ganador o no)
-        # y_test contains relevance (10, 5, 3...). We need binary 1/0.
-        # Assuming standard relevance: 10=1st
-        y_binary_test = (y_test >= 10).astype(int) 
+            # Target binario (Ganador o no)
+            # y_test contains relevance (10, 5, 3...). We need binary 1/0.
+            # Assuming standard relevance: 10=1st
+            y_binary_test = (y_test >= 10).astype(int) 
         
-        # Train Isotonic
-        calibrator = IsotonicRegression(out_of_bounds='clip', y_min=0, y_max=1)
-        calibrator.fit(raw_scores_test, y_binary_test)
+            # Train Isotonic
+            calibrator = IsotonicRegression(out_of_bounds='clip', y_min=0, y_max=1)
+            calibrator.fit(raw_scores_test, y_binary_test)
         
-        # Validate
-        probs_test = calibrator.transform(raw_scores_test)
-        msg_mean = f"   Mean Pred Prob: {probs_test.mean():.4f}"
-        msg_actual = f"   Actual Win Rate: {y_binary_test.mean():.4f}"
-        logger.info(msg_mean)
-        logger.info(msg_actual)
+            # Validate
+            probs_test = calibrator.transform(raw_scores_test)
+            msg_mean = f"   Mean Pred Prob: {probs_test.mean():.4f}"
+            msg_actual = f"   Actual Win Rate: {y_binary_test.mean():.4f}"
+            logger.info(msg_mean)
+            logger.info(msg_actual)
         
-        # Save Calibrator
-        calibrator_path = 'src/models/calibrator_v4.pkl'
-        joblib.dump(calibrator, calibrator_path)
-        logger.info(f"✅ Calibrador guardado: {calibrator_path}")
+            # Save Calibrator
+            calibrator_path = 'src/models/calibrator_v4.pkl'
+            joblib.dump(calibrator, calibrator_path)
+            logger.info(f"✅ Calibrador guardado: {calibrator_path}")
         
-    except Exception as e:
-        logger.error(f"❌ Error training calibrator: {e}")
-        # Continue saving process
+        except Exception as e:
+            logger.error(f"❌ Error training calibrator: {e}")
+            # Continue saving process
     
     # Guardar modelos
     logger.info("\n" + "="*70)
     logger.info("GUARDANDO MODELOS")
     logger.info("="*70)
     
-    # Guardar ensemble (crea automáticamente alias 'latest')
-    ensemble_path = ensemble.save('src/models/ensemble')
-    
-    fe.save(f'src/models/feature_eng_v4_ensemble_{timestamp}.pkl')
-    fe.save('src/models/feature_eng_v4_ensemble.pkl')  # Latest alias
-    logger.info(f"✅ Feature Engineering guardado: src/models/feature_eng_v4_ensemble.pkl")
-    
-    # Guardar metadatos del entrenamiento
-    metadata = {
-        'version': '4.1', # Bump version
-        'timestamp': timestamp,
-        'ensemble_ndcg': float(results['ensemble_ndcg']),
-        'baseline_ndcg': float(results['baseline_ndcg']),
-        'mejora_porcentual': float(results['mejora_porcentual']),
-        'ensemble_mejor': bool(results['ensemble_mejor']),
-        'n_features': int(X.shape[1]),
-        'n_samples_train': int(len(X_train)),
-        'n_samples_test': int(len(X_test)),
-        'n_races_train': int(len(train_groups)),
-        'n_races_test': int(len(test_groups))
-    }
-    
-    import json
-    metadata_path = 'src/models/ensemble_metadata.json'
-    with open(metadata_path, 'w') as f:
-        json.dump(metadata, f, indent=2)
-    logger.info(f"✅ Metadatos guardados: {metadata_path}")
-    
-    # Guardar también baseline para referencia
-    baseline_path = 'src/models/lgbm_baseline_for_comparison.pkl'
-    joblib.dump(lgbm_baseline, baseline_path)
-    logger.info(f"✅ Baseline guardado: {baseline_path}")
+    with profiler.stage('save_ensemble'):
+        # Guardar ensemble (crea automáticamente alias 'latest')
+        ensemble_path = ensemble.save('src/models/ensemble')
+    
+    # Student destilado (un solo LightGBM compacto sobre los scores OOF)
+    fidelity = None
+    with profiler.stage('distillation'):
+        if distill:
+            try:
+                from src.models.distillation import distill_ensemble
+                _, fidelity = distill_ensemble(
+                    ensemble, X_train, groups_train,
+                    X_test, y_test, groups_test
+                )
+            except Exception as e:
+                logger.error(f"❌ Error en destilación: {e}")
+    
+    with profiler.stage('save_artifacts'):
+        fe.save(f'src/models/feature_eng_v4_ensemble_{timestamp}.pkl')
+        fe.save('src/models/feature_eng_v4_ensemble.pkl')  # Latest alias
+        logger.info(f"✅ Feature Engineering guardado: src/models/feature_eng_v4_ensemble.pkl")
+    
+        # Guardar metadatos del entrenamiento
+        metadata = {
+            'version': '4.1', # Bump version
+            'timestamp': timestamp,
+            'ensemble_ndcg': float(results['ensemble_ndcg']),
+            'baseline_ndcg': float(results['baseline_ndcg']),
+            'mejora_porcentual': float(results['mejora_porcentual']),
+            'ensemble_mejor': bool(results['ensemble_mejor']),
+            'n_features': int(X.shape[1]),
+            'n_samples_train': int(len(X_train)),
+            'n_samples_test': int(len(X_test)),
+            'n_races_train': int(len(train_groups)),
+            'n_races_test': int(len(test_groups)),
+            # Último día visto al entrenar (compare_models evalúa después de esta fecha)
+            'train_hasta': str(race_fechas(groups_train).max().date()),
+            'params': params,
+            'student_fidelity': fidelity
+        }
+    
+        import json
+        metadata_path = 'src/models/ensemble_metadata.json'
+        with open(metadata_path, 'w') as f:
+            json.dump(metadata, f, indent=2)
+        logger.info(f"✅ Metadatos guardados: {metadata_path}")
+    
+        # Guardar también baseline para referencia
+        baseline_path = 'src/models/lgbm_baseline_for_comparison.pkl'
+        joblib.dump(lgbm_baseline, baseline_path)
+        logger.info(f"✅ Baseline guardado: {baseline_path}")
+    
+    profiler.save('src/models/ensemble_profile.json')
     
     # Resumen final
     logger.info("\n" + "="*70)
@@ -241,7 +316,8 @@ def train_ensemble():
 
 if __name__ == "__main__":
     try:
-        ensemble, results = train_ensemble()
+        with profile_run('train_v4_ensemble', pop_profile_arg()):
+            ensemble, results = train_ensemble()
         sys.exit(0)
     except Exception as e:
         logger.error(f"❌ Error en entrenamiento: {e}")
@@ -23,6 +23,7 @@ from lightgbm import LGBMRanker
 from sklearn.model_selection import GroupKFold
 from sklearn.isotonic import IsotonicRegression
 from sklearn.metrics import ndcg_score
+from src.utils.profiling import TrainingProfiler, profile_run, pop_profile_arg
 
 logging.basicConfig(
     level=logging.INFO,
@@ -192,7 +193,7 @@ class OptimizedFeatureEngineering:
             df['sire_win_rate'] = 0.10
             
         # 11. Avg Speed últimas 3 carreras
-        df['seconds'] = df['tiempo'].apply(self._clean_time) if 'tiempo' in df.columns else 0
+        df['seconds'] = df['tiempo'].apply(self._clean_time).astype(float) if 'tiempo' in df.columns else 0
         df['speed_mps'] = np.where(df['seconds'] > 0, df['distancia'] / df['seconds'], 0)
         df['avg_speed_3'] = grouped_horse['speed_mps'].shift(1).rolling(3, min_periods=1).mean().fillna(14)
         
@@ -233,41 +234,64 @@ class OptimizedFeatureEngineering:
         return joblib.load(path)
 
 
-def train_optimized_model():
-    """
-    Entrena el modelo LightGBM optimizado.
+# Hiperparámetros base del LGBMRanker v5 (optimizados para dataset pequeño)
+DEFAULT_PARAMS = dict(
+    objective='lambdarank',
+    metric='ndcg',
+    n_estimators=400,           # Reducido para evitar overfit
+    num_leaves=20,              # Reducido
+    max_depth=5,                # Reducido
+    learning_rate=0.05,
+    
+    # Regularización fuerte
+    reg_alpha=0.5,              # Aumentado
+    reg_lambda=1.0,             # Aumentado
+    min_child_samples=30,       # Aumentado
+    
+    # Sampling
+    colsample_bytree=0.7,
+    subsample=0.7,
+    subsample_freq=5,
+    
+    random_state=42,
+    n_jobs=-1,
+    verbose=-1,
+    force_col_wise=True
+)
+
+
+def get_relevance(pos):
+    """Convierte posición final a relevance score para lambdarank."""
+    if pd.isna(pos) or pos <= 0: return 0
+    pos = int(pos)
+    if pos == 1: return 10
+    if pos == 2: return 5
+    if pos == 3: return 3
+    if pos == 4: return 2
+    if pos == 5: return 1
+    return 0
+
+
+def prepare_training_data(df=None):
     """
-    logger.info("=" * 70)
-    logger.info("ENTRENAMIENTO LIGHTGBM OPTIMIZADO v5.0")
-    logger.info("=" * 70)
+    Carga histórico, genera features v5 y construye target + race IDs.
     
-    # 1. Cargar datos
-    from src.models.data_manager import cargar_datos_3nf
+    Args:
+        df: DataFrame crudo (formato cargar_datos_3nf / cargar_datos_3nf_tipado). Si es None se lee de SQLite.
     
-    logger.info("\n[PASO 1/5] Cargando datos históricos...")
-    df = cargar_datos_3nf()
+    Returns:
+        X, y, groups, df_enriched, fe
+    """
+    if df is None:
+        from src.models.data_manager import cargar_datos_3nf_tipado
+        df = cargar_datos_3nf_tipado()
     
     if df.empty:
         raise ValueError("No hay datos para entrenar")
     
-    logger.info(f"   Datos cargados: {len(df)} registros")
-    
-    # 2. Feature Engineering
-    logger.info("\n[PASO 2/5] Generando features optimizadas...")
     fe = OptimizedFeatureEngineering()
     X, df_enriched = fe.fit_transform(df)
     
-    # 3. Target (relevance)
-    def get_relevance(pos):
-        if pd.isna(pos) or pos <= 0: return 0
-        pos = int(pos)
-        if pos == 1: return 10
-        if pos == 2: return 5
-        if pos == 3: return 3
-        if pos == 4: return 2
-        if pos == 5: return 1
-        return 0
-    
     y = df_enriched['posicion'].apply(get_relevance)
     
     # Race IDs para grouping
@@ -278,6 +302,52 @@ def train_optimized_model():
     )
     groups = df_enriched['race_id']
     
+    return X, y, groups, df_enriched, fe
+
+
+def load_search_params(path='src/models/hyperparam_search_lgbm.json'):
+    """Lee la mejor configuración encontrada por hyperparam_search (o None)."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            return json.load(f).get('best_params')
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo leer {path}: {e}")
+        return None
+
+
+def train_optimized_model(params=None):
+    """
+    Entrena el modelo LightGBM optimizado.
+    
+    Args:
+        params: Overrides de hiperparámetros para LGBMRanker. Si es None se usa
+                el resultado de hyperparam_search (si existe) sobre los defaults.
+    """
+    logger.info("=" * 70)
+    logger.info("ENTRENAMIENTO LIGHTGBM OPTIMIZADO v5.0")
+    logger.info("=" * 70)
+    
+    profiler = TrainingProfiler('lgbm_optimized_v5')
+    
+    # 1. Cargar datos
+    from src.models.data_manager import cargar_datos_3nf_tipado
+    
+    logger.info("\n[PASO 1/5] Cargando datos históricos...")
+    with profiler.stage('data_load'):
+        df = cargar_datos_3nf_tipado()
+    
+    if df.empty:
+        raise ValueError("No hay datos para entrenar")
+    
+    logger.info(f"   Datos cargados: {len(df)} registros")
+    
+    # 2. Feature Engineering + 3. Target (relevance) + Race IDs
+    logger.info("\n[PASO 2/5] Generando features optimizadas...")
+    with profiler.stage('feature_engineering'):
+        X, y, groups, df_enriched, fe = prepare_training_data(df)
+    
     logger.info(f"   Features: {X.shape[1]} columnas")
     logger.info(f"   Carreras únicas: {groups.nunique()}")
     
@@ -285,131 +355,141 @@ def train_optimized_model():
     logger.info("\n[PASO 3/5] Entrenando con GroupKFold CV...")
     
     # Usar 80/20 temporal split para test final
-    unique_races = groups.unique()
-    n_races = len(unique_races)
-    split_idx = int(n_races * 0.8)
+    with profiler.stage('split'):
+        unique_races = groups.unique()
+        n_races = len(unique_races)
+        split_idx = int(n_races * 0.8)
     
-    train_races = unique_races[:split_idx]
-    test_races = unique_races[split_idx:]
+        train_races = unique_races[:split_idx]
+        test_races = unique_races[split_idx:]
     
-    train_mask = groups.isin(train_races)
-    test_mask = groups.isin(test_races)
+        train_mask = groups.isin(train_races)
+        test_mask = groups.isin(test_races)
     
-    X_train, X_test = X[train_mask], X[test_mask]
-    y_train, y_test = y[train_mask], y[test_mask]
-    groups_train = groups[train_mask]
-    groups_test = groups[test_mask]
+        X_train, X_test = X[train_mask], X[test_mask]
+        y_train, y_test = y[train_mask], y[test_mask]
+        groups_train = groups[train_mask]
+        groups_test = groups[test_mask]
     
     logger.info(f"   Train: {len(X_train)} samples, {len(train_races)} carreras")
     logger.info(f"   Test:  {len(X_test)} samples, {len(test_races)} carreras")
     
     # Modelo optimizado para dataset pequeño
-    model = LGBMRanker(
-        objective='lambdarank',
-        metric='ndcg',
-        n_estimators=400,           # Reducido para evitar overfit
-        num_leaves=20,              # Reducido
-        max_depth=5,                # Reducido
-        learning_rate=0.05,
-        
-        # Regularización fuerte
-        reg_alpha=0.5,              # Aumentado
-        reg_lambda=1.0,             # Aumentado
-        min_child_samples=30,       # Aumentado
-        
-        # Sampling
-        colsample_bytree=0.7,
-        subsample=0.7,
-        subsample_freq=5,
-        
-        random_state=42,
-        n_jobs=-1,
-        verbose=-1,
-        force_col_wise=True
-    )
+    model_params = dict(DEFAULT_PARAMS)
     
-    # Group counts para LightGBM
-    train_group_counts = groups_train.value_counts().sort_index().values
+    if params is None:
+        params = load_search_params()
+        if params:
+            logger.info("   Usando hiperparámetros de hyperparam_search_lgbm.json")
+    if params:
+        model_params.update(params)
+        logger.info(f"   n_estimators={model_params['n_estimators']}, "
+                    f"num_leaves={model_params['num_leaves']}, "
+                    f"max_depth={model_params['max_depth']}, "
+                    f"learning_rate={model_params['learning_rate']}")
     
-    model.fit(X_train, y_train, group=train_group_counts)
+    model = LGBMRanker(**model_params)
+    
+    # LightGBM exige filas contiguas por carrera: ordenar por race_id para
+    # que coincidan con los group counts (value_counts().sort_index())
+    with profiler.stage('train'):
+        train_order = groups_train.sort_values(kind='stable').index
+        X_train, y_train = X_train.loc[train_order], y_train.loc[train_order]
+        groups_train = groups_train.loc[train_order]
+    
+        # Group counts para LightGBM
+        train_group_counts = groups_train.value_counts().sort_index().values
+    
+        model.fit(X_train, y_train, group=train_group_counts)
     
     logger.info("✅ Modelo entrenado")
     
     # 5. Evaluación
     logger.info("\n[PASO 4/5] Evaluando en Test Set...")
     
-    test_preds = model.predict(X_test)
-    ndcg = ndcg_score([y_test.values], [test_preds])
+    with profiler.stage('evaluate'):
+        test_preds = model.predict(X_test)
+        ndcg = ndcg_score([y_test.values], [test_preds])
     
-    logger.info(f"   Test NDCG: {ndcg:.4f}")
+        logger.info(f"   Test NDCG: {ndcg:.4f}")
     
-    # Feature Importance
-    importance = pd.DataFrame({
-        'feature': fe.feature_cols,
-        'importance': model.feature_importances_
-    }).sort_values('importance', ascending=False)
+        # Feature Importance
+        importance = pd.DataFrame({
+            'feature': fe.feature_cols,
+            'importance': model.feature_importances_
+        }).sort_values('importance', ascending=False)
     
-    logger.info("\n   Top Features:")
-    for _, row in importance.head(8).iterrows():
-        logger.info(f"      {row['feature']:20s}: {row['importance']:.0f}")
+        logger.info("\n   Top Features:")
+        for _, row in importance.head(8).iterrows():
+            logger.info(f"      {row['feature']:20s}: {row['importance']:.0f}")
     
     # 6. Calibración con Cross-Validation
     logger.info("\n[PASO 5/5] Entrenando Calibrador Isotónico...")
     
     # Usar predicciones del test set para calibrar
-    y_binary = (y_test >= 10).astype(int)
+    with profiler.stage('calibration'):
+        y_binary = (y_test >= 10).astype(int)
     
-    calibrator = IsotonicRegression(out_of_bounds='clip', y_min=0, y_max=1)
-    calibrator.fit(test_preds, y_binary)
+        calibrator = IsotonicRegression(out_of_bounds='clip', y_min=0, y_max=1)
+        calibrator.fit(test_preds, y_binary)
     
-    # Validar calibración
-    cal_probs = calibrator.transform(test_preds)
-    logger.info(f"   Mean Calibrated Prob: {cal_probs.mean():.4f}")
-    logger.info(f"   Actual Win Rate:      {y_binary.mean():.4f}")
+        # Validar calibración
+        cal_probs = calibrator.transform(test_preds)
+        logger.info(f"   Mean Calibrated Prob: {cal_probs.mean():.4f}")
+        logger.info(f"   Actual Win Rate:      {y_binary.mean():.4f}")
     
     # 7. Guardar artefactos
     logger.info("\n" + "=" * 70)
     logger.info("GUARDANDO ARTEFACTOS")
     logger.info("=" * 70)
     
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    
-    # Modelo
-    model_path = f'src/models/lgbm_optimized_{timestamp}.pkl'
-    joblib.dump(model, model_path)
-    logger.info(f"✅ Modelo: {model_path}")
-    
-    # Alias latest
-    joblib.dump(model, 'src/models/lgbm_optimized_latest.pkl')
-    logger.info(f"✅ Alias: src/models/lgbm_optimized_latest.pkl")
-    
-    # Feature Engineering
-    fe.save(f'src/models/feature_eng_v5_{timestamp}.pkl')
-    fe.save('src/models/feature_eng_v5_latest.pkl')
-    logger.info(f"✅ Feature Eng: src/models/feature_eng_v5_latest.pkl")
-    
-    # Calibrador
-    calibrator_path = 'src/models/calibrator_v5.pkl'
-    joblib.dump(calibrator, calibrator_path)
-    logger.info(f"✅ Calibrador: {calibrator_path}")
-    
-    # Metadata
-    metadata = {
-        'version': '5.0',
-        'timestamp': timestamp,
-        'ndcg': float(ndcg),
-        'n_features': int(X.shape[1]),
-        'n_samples_train': int(len(X_train)),
-        'n_samples_test': int(len(X_test)),
-        'n_races_train': int(len(train_races)),
-        'n_races_test': int(len(test_races)),
-        'feature_importance': importance.to_dict('records')
-    }
-    
-    with open('src/models/lgbm_optimized_metadata.json', 'w') as f:
-        json.dump(metadata, f, indent=2)
+    with profiler.stage('save'):
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    
+        # Modelo
+        model_path = f'src/models/lgbm_optimized_{timestamp}.pkl'
+        joblib.dump(model, model_path)
+        logger.info(f"✅ Modelo: {model_path}")
+    
+        # Alias latest
+        joblib.dump(model, 'src/models/lgbm_optimized_latest.pkl')
+        logger.info(f"✅ Alias: src/models/lgbm_optimized_latest.pkl")
+    
+        # Feature Engineering
+        fe.save(f'src/models/feature_eng_v5_{timestamp}.pkl')
+        fe.save('src/models/feature_eng_v5_latest.pkl')
+        logger.info(f"✅ Feature Eng: src/models/feature_eng_v5_latest.pkl")
+    
+        # Calibrador
+        calibrator_path = 'src/models/calibrator_v5.pkl'
+        joblib.dump(calibrator, calibrator_path)
+        logger.info(f"✅ Calibrador: {calibrator_path}")
+    
+        # Metadata
+        metadata = {
+            'version': '5.0',
+            'timestamp': timestamp,
+            'ndcg': float(ndcg),
+            'n_features': int(X.shape[1]),
+            'n_samples_train': int(len(X_train)),
+            'n_samples_test': int(len(X_test)),
+            'n_races_train': int(len(train_races)),
+            'n_races_test': int(len(test_races)),
+            # Último día visto al entrenar (compare_models evalúa después de esta fecha)
+            'train_hasta': str(pd.to_datetime(df_enriched.loc[train_mask, 'fecha']).max().date()),
+            'params': {k: model_params[k] for k in
+                       ('n_estimators', 'num_leaves', 'max_depth', 'learning_rate',
+                        'min_child_samples', 'reg_alpha', 'reg_lambda',
+                        'colsample_bytree', 'subsample')},
+            'feature_importance': importance.to_dict('records')
+        }
+    
+        with open('src/models/lgbm_optimized_metadata.json', 'w') as f:
+            json.dump(metadata, f, indent=2)
     logger.info(f"✅ Metadata: src/models/lgbm_optimized_metadata.json")
     
+    profiler.save('src/models/lgbm_optimized_profile.json')
+    
     logger.info("\n" + "=" * 70)
     logger.info(f"✅ ENTRENAMIENTO COMPLETADO - NDCG: {ndcg:.4f}")
     logger.info("=" * 70)
@@ -419,7 +499,8 @@ def train_optimized_model():
 
 if __name__ == "__main__":
     try:
-        model, fe, calibrator, metadata = train_optimized_model()
+        with profile_run('train_v5_optimized', pop_profile_arg()):
+            model, fe, calibrator, metadata = train_optimized_model()
         print(f"\n🎉 Modelo listo con NDCG: {metadata['ndcg']:.4f}")
     except Exception as e:
         logger.error(f"❌ Error: {e}")
@@ -0,0 +1,448 @@
+"""
+Compilador de Árboles a NumPy
+-----------------------------
+Exporta los boosters entrenados (LightGBM, XGBoost, CatBoost y el
+EnsembleRanker completo) a arrays planos:
+
+    feature, threshold, left, right, value, default_left, missing_type
+
+Todos los árboles de un booster se concatenan en los mismos arrays (hijos
+con índice absoluto; hojas con feature = -1) y `roots` marca el nodo raíz
+de cada árbol. El evaluador avanza todas las filas por todos los árboles a
+la vez (una iteración por nivel), así que puntuar una carrera de 12
+caballos no paga el overhead de predict (thread pool, conversión de datos)
+y el proceso que sirve no necesita importar lightgbm/xgboost/catboost.
+
+Semántica replicada de cada librería:
+    - LightGBM: x <= threshold va a la izquierda; missing_type None/Zero/NaN.
+    - XGBoost: x < threshold (en float32); NaN sigue default_left.
+    - CatBoost: árboles simétricos expandidos a binarios; x > border => bit 1.
+
+Uso:
+    python -m src.models.tree_compiler --model v5
+    python -m src.models.tree_compiler --model ensemble
+
+Author: ML Engineering Team
+Date: 2026-10-19
+"""
+
+import sys
+import os
+import json
+import logging
+import tempfile
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+V5_MODEL_PATH = 'src/models/lgbm_optimized_latest.pkl'
+V5_COMPILED_PATH = 'src/models/lgbm_optimized_compiled.npz'
+ENSEMBLE_PATH = 'src/models/ensemble_latest.pkl'
+ENSEMBLE_COMPILED_PATH = 'src/models/ensemble_compiled.npz'
+
+# missing_type por nodo (códigos de LightGBM)
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+K_ZERO_THRESHOLD = float(np.float32(1e-35))  # kZeroThreshold de LightGBM (float)
+
+FOREST_FIELDS = ['feature', 'threshold', 'left', 'right', 'value', 'default_left', 'missing_type', 'roots']
+
+
+class CompiledForest:
+    """Un booster aplanado: arrays de nodos + semántica de comparación."""
+
+    def __init__(self, feature, threshold, left, right, value, default_left, missing_type, roots,
+                 decision='le', dtype='float64', base_score=0.0, scale=1.0, max_depth=None,
+                 snap_zero=False):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=dtype)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.missing_type = np.asarray(missing_type, dtype=np.int8)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.decision = decision
+        self.dtype = dtype
+        self.base_score = float(base_score)
+        self.scale = float(scale)
+        self.snap_zero = bool(snap_zero)
+        self.max_depth = int(max_depth) if max_depth is not None else self._depth()
+
+    def _depth(self):
+        """Profundidad máxima (número de decisiones hasta la hoja más lejana)."""
+        depth, frontier = 0, self.roots
+        while len(frontier):
+            internal = frontier[self.feature[frontier] >= 0]
+            if not len(internal):
+                break
+            frontier = np.concatenate([self.left[internal], self.right[internal]])
+            depth += 1
+        return depth
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def _prepare(self):
+        """
+        Arrays de evaluación. Las hojas se vuelven self-loops (ambos hijos =
+        la propia hoja) para avanzar todas las posiciones sin máscaras, y
+        cada nodo ocupa dos slots (2*i = izquierda, 2*i + 1 = derecha): el
+        paso de un nivel es slot = children[slot + va_a_la_derecha].
+        """
+        is_leaf = self.feature < 0
+        nodes = np.arange(len(self.feature), dtype=np.intp)
+        left = np.where(is_leaf, nodes, self.left)
+        right = np.where(is_leaf, nodes, self.right)
+        self._children = (2 * np.column_stack([left, right])).astype(np.intp).ravel()
+        self._feat = np.repeat(np.where(is_leaf, 0, self.feature).astype(np.intp), 2)
+        self._threshold = np.repeat(self.threshold, 2)
+        self._value = np.repeat(self.value, 2)
+        self._missing = np.repeat(self.missing_type, 2)
+        self._default_right = np.repeat(~self.default_left, 2)
+        self._has_zero = bool((self.missing_type[~is_leaf] == MISSING_ZERO).any())
+
+    def predict(self, X):
+        """Score por fila: suma de hojas * scale + base_score."""
+        X = np.asarray(X, dtype=self.dtype)
+        if X.ndim == 1:
+            X = X[None, :]
+        if self.n_trees == 0:
+            return np.full(len(X), self.base_score)
+        if not hasattr(self, '_feat'):
+            self._prepare()
+
+        if self.snap_zero:
+            # LightGBM descarta |x| <= kZeroThreshold como ceros al leer las filas
+            X = np.where(np.abs(X) <= K_ZERO_THRESHOLD, 0, X)
+        slow_path = self._has_zero or bool(np.isnan(X).any())
+
+        # Una posición por (fila, árbol); índice plano fila*n_features + feature
+        flat = np.ascontiguousarray(X).ravel()
+        row_offset = (np.arange(len(X)) * X.shape[1])[:, None]
+        slot = np.broadcast_to(2 * self.roots.astype(np.intp), (len(X), self.n_trees))
+
+        for _ in range(self.max_depth):
+            x = flat[row_offset + self._feat[slot]]
+            threshold = self._threshold[slot]
+
+            if slow_path:
+                missing = self._missing[slot]
+                is_nan = np.isnan(x)
+                # Sin tratamiento NaN explícito, LightGBM evalúa NaN como 0.0
+                x = np.where(is_nan & (missing != MISSING_NAN), 0, x)
+                go_right = x > threshold if self.decision == 'le' else x >= threshold
+                use_default = (
+                    ((missing == MISSING_ZERO) & (np.abs(x) <= K_ZERO_THRESHOLD)) |
+                    ((missing == MISSING_NAN) & is_nan)
+                )
+                go_right = np.where(use_default, self._default_right[slot], go_right)
+            else:
+                go_right = x > threshold if self.decision == 'le' else x >= threshold
+
+            slot = self._children[slot + go_right]
+
+        return self._value[slot].sum(axis=1) * self.scale + self.base_score
+
+
+class CompiledModel:
+    """
+    Uno o más boosters compilados. Con meta_coef (EnsembleRanker) el score
+    final es la combinación lineal del meta-learner Ridge.
+    """
+
+    def __init__(self, forests, feature_names=None, meta_coef=None, meta_intercept=0.0, source=''):
+        self.forests = list(forests)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.meta_coef = None if meta_coef is None else np.asarray(meta_coef, dtype=np.float64)
+        self.meta_intercept = float(meta_intercept)
+        self.source = source
+
+    def predict(self, X):
+        if hasattr(X, 'columns') and self.feature_names is not None:
+            X = X[self.feature_names]
+        X = np.asarray(X, dtype=np.float64)
+        if self.meta_coef is None:
+            return self.forests[0].predict(X)
+        base = np.column_stack([forest.predict(X) for forest in self.forests])
+        return base @ self.meta_coef + self.meta_intercept
+
+    def save(self, path):
+        """Guarda en .npz (sin pickle: se carga sólo con numpy)."""
+        arrays = {}
+        forests_meta = []
+        for i, forest in enumerate(self.forests):
+            for field in FOREST_FIELDS:
+                arrays[f'f{i}_{field}'] = getattr(forest, field)
+            forests_meta.append({
+                'decision': forest.decision, 'dtype': forest.dtype, 'base_score': forest.base_score,
+                'scale': forest.scale, 'max_depth': forest.max_depth, 'snap_zero': forest.snap_zero
+            })
+        meta = {
+            'source': self.source,
+            'feature_names': self.feature_names,
+            'forests': forests_meta,
+            'meta_coef': None if self.meta_coef is None else self.meta_coef.tolist(),
+            'meta_intercept': self.meta_intercept
+        }
+        arrays['meta_json'] = np.array(json.dumps(meta))
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+        logger.info(f"✅ Modelo compilado: {path} ({sum(fr.n_trees for fr in self.forests)} árboles)")
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta_json']))
+            forests = [
+                CompiledForest(**{field: data[f'f{i}_{field}'] for field in FOREST_FIELDS}, **fm)
+                for i, fm in enumerate(meta['forests'])
+            ]
+        return cls(forests, meta['feature_names'], meta['meta_coef'], meta['meta_intercept'], meta['source'])
+
+
+def load_compiled(path):
+    """Carga un modelo compilado (.npz); expone .predict(X)."""
+    return CompiledModel.load(path)
+
+
+# ---------------------------------------------------------------------------
+# Exportadores por librería
+# ---------------------------------------------------------------------------
+
+def compile_lightgbm(model):
+    """LGBMRanker/LGBMRegressor (o Booster) => CompiledForest."""
+    booster = model.booster_ if hasattr(model, 'booster_') else model
+    dump = booster.dump_model()  # num_iteration=None => best_iteration si existe
+
+    nodes = {f: [] for f in FOREST_FIELDS if f != 'roots'}
+    roots = []
+
+    def add(tree_node):
+        idx = len(nodes['feature'])
+        for f in nodes:
+            nodes[f].append(0)
+        if 'leaf_value' in tree_node:
+            nodes['feature'][idx] = -1
+            nodes['value'][idx] = tree_node['leaf_value']
+            return idx
+        if tree_node['decision_type'] != '<=':
+            raise ValueError("Splits categóricos no soportados por el compilador")
+        nodes['feature'][idx] = tree_node['split_feature']
+        nodes['threshold'][idx] = tree_node['threshold']
+        nodes['default_left'][idx] = tree_node['default_left']
+        nodes['missing_type'][idx] = {'None': MISSING_NONE, 'Zero': MISSING_ZERO, 'NaN': MISSING_NAN}[tree_node['missing_type']]
+        nodes['left'][idx] = add(tree_node['left_child'])
+        nodes['right'][idx] = add(tree_node['right_child'])
+        return idx
+
+    for tree in dump['tree_info']:
+        roots.append(add(tree['tree_structure']))
+
+    forest = CompiledForest(roots=roots, decision='le', dtype='float64', snap_zero=True, **nodes)
+    return forest, dump['feature_names']
+
+
+def compile_xgboost(model):
+    """XGBRanker (o Booster) => CompiledForest (comparación x < t en float32)."""
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+    learner = json.loads(booster.save_raw(raw_format='json'))['learner']
+    gbtree = learner['gradient_booster']['model']
+    base_score = float(str(learner['learner_model_param']['base_score']).strip('[]'))
+
+    trees = gbtree['trees']
+    try:
+        best = model.best_iteration  # predict usa iteration_range hasta best_iteration
+        trees = trees[:int(gbtree['iteration_indptr'][best + 1])]
+    except (AttributeError, KeyError, IndexError):
+        pass
+
+    feature, threshold, left, right, value, default_left, missing_type, roots = ([] for _ in range(8))
+    offset = 0
+    for tree in trees:
+        if any(tree['split_type']):
+            raise ValueError("Splits categóricos no soportados por el compilador")
+        lc = np.asarray(tree['left_children'])
+        is_leaf = lc == -1
+        conditions = np.asarray(tree['split_conditions'])
+
+        roots.append(offset)
+        feature.append(np.where(is_leaf, -1, tree['split_indices']))
+        threshold.append(np.where(is_leaf, 0.0, conditions))
+        value.append(np.where(is_leaf, conditions, 0.0))
+        left.append(np.where(is_leaf, 0, lc + offset))
+        right.append(np.where(is_leaf, 0, np.asarray(tree['right_children']) + offset))
+        default_left.append(np.asarray(tree['default_left'], dtype=bool))
+        missing_type.append(np.full(len(lc), MISSING_NAN))
+        offset += len(lc)
+
+    cat = (lambda parts, dtype: np.concatenate(parts).astype(dtype) if parts else np.empty(0, dtype))
+    forest = CompiledForest(
+        cat(feature, np.int32), cat(threshold, np.float32), cat(left, np.int32), cat(right, np.int32),
+        cat(value, np.float64), cat(default_left, bool), cat(missing_type, np.int8), roots,
+        decision='lt', dtype='float32', base_score=base_score
+    )
+    return forest, booster.feature_names
+
+
+def compile_catboost(model):
+    """CatBoostRanker con árboles simétricos => CompiledForest."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'model.json')
+        model.save_model(path, format='json')
+        with open(path) as f:
+            cb = json.load(f)
+
+    if 'oblivious_trees' not in cb:
+        raise ValueError("Sólo se soportan árboles simétricos (grow_policy=SymmetricTree)")
+
+    float_features = {ff['feature_index']: ff for ff in cb['features_info'].get('float_features', [])}
+    scale, bias = cb.get('scale_and_bias', [1.0, [0.0]])
+    bias = bias[0] if isinstance(bias, list) else bias
+
+    nodes = {f: [] for f in FOREST_FIELDS if f != 'roots'}
+    roots = []
+
+    for tree in cb['oblivious_trees']:
+        splits = tree['splits']
+        if any(s['split_type'] != 'FloatFeature' for s in splits):
+            raise ValueError("Sólo se soportan splits numéricos")
+        depth = len(splits)
+        leaf_values = tree['leaf_values']
+
+        # Árbol binario completo en BFS: nivel k evalúa splits[k]; derecha => bit k = 1
+        start = len(nodes['feature'])
+        roots.append(start)
+        n_internal = 2 ** depth - 1
+        for k in range(depth):
+            info = float_features[splits[k]['float_feature_index']]
+            for pos in range(2 ** k):
+                nodes['feature'].append(info['flat_feature_index'])
+                nodes['threshold'].append(splits[k]['border'])
+                nodes['default_left'].append(info.get('nan_value_treatment') != 'AsTrue')
+                nodes['missing_type'].append(MISSING_NAN)
+                nodes['value'].append(0.0)
+                child = start + 2 ** (k + 1) - 1 + 2 * pos
+                nodes['left'].append(child)
+                nodes['right'].append(child + 1)
+        for pos in range(2 ** depth):
+            # pos en BFS = bits de la ruta con el nivel 0 como bit más significativo
+            leaf_index = int(format(pos, f'0{depth}b')[::-1], 2) if depth else 0
+            nodes['feature'].append(-1)
+            nodes['threshold'].append(0.0)
+            nodes['default_left'].append(False)
+            nodes['missing_type'].append(MISSING_NONE)
+            nodes['value'].append(leaf_values[leaf_index])
+            nodes['left'].append(0)
+            nodes['right'].append(0)
+        assert len(nodes['feature']) == start + n_internal + 2 ** depth
+
+    forest = CompiledForest(roots=roots, decision='le', dtype='float32', base_score=bias, scale=scale, **nodes)
+    return forest, list(model.feature_names_) if getattr(model, 'feature_names_', None) else None
+
+
+def compile_model(model):
+    """Compila un booster soportado o un EnsembleRanker completo."""
+    kind = type(model).__name__
+    module = type(model).__module__.split('.')[0]
+    if kind == 'EnsembleRanker':
+        lgbm, names = compile_lightgbm(model.lgbm)
+        xgb, _ = compile_xgboost(model.xgb)
+        cat, _ = compile_catboost(model.catboost)
+        return CompiledModel(
+            [lgbm, xgb, cat], names,
+            meta_coef=model.meta_model.coef_, meta_intercept=model.meta_model.intercept_,
+            source='EnsembleRanker'
+        )
+    if module == 'lightgbm':
+        forest, names = compile_lightgbm(model)
+    elif module == 'xgboost':
+        forest, names = compile_xgboost(model)
+    elif module == 'catboost':
+        forest, names = compile_catboost(model)
+    else:
+        raise ValueError(f"Modelo no soportado por el compilador: {kind}")
+    return CompiledModel([forest], names, source=kind)
+
+
+# ---------------------------------------------------------------------------
+# Verificación contra predict nativo
+# ---------------------------------------------------------------------------
+
+def probe_matrix(compiled, n_rows=512, seed=42, nan_fraction=0.05):
+    """
+    Filas sintéticas que caen a ambos lados de los umbrales de cada feature
+    (los casos donde una diferencia de semántica cambiaría la hoja).
+    """
+    rng = np.random.default_rng(seed)
+    n_features = len(compiled.feature_names) if compiled.feature_names else \
+        1 + max(int(f.feature.max()) for f in compiled.forests if len(f.feature))
+
+    X = rng.normal(size=(n_rows, n_features))
+    for j in range(n_features):
+        thresholds = np.concatenate([
+            f.threshold[f.feature == j].astype(np.float64) for f in compiled.forests
+        ])
+        if len(thresholds):
+            picks = rng.choice(thresholds, size=n_rows)
+            X[:, j] = picks + rng.choice([-1e-3, 0.0, 1e-3], size=n_rows) * np.maximum(1.0, np.abs(picks))
+    X[rng.random(X.shape) < nan_fraction] = np.nan
+    return X
+
+
+def verify(model, compiled, X=None, atol=1e-5):
+    """Máxima diferencia absoluta entre predict nativo y compilado."""
+    import pandas as pd
+
+    X = probe_matrix(compiled) if X is None else np.asarray(X, dtype=np.float64)
+    X_native = pd.DataFrame(X, columns=compiled.feature_names) if compiled.feature_names else X
+    diff = float(np.max(np.abs(np.asarray(model.predict(X_native)) - compiled.predict(X))))
+    if diff > atol:
+        raise ValueError(f"Modelo compilado difiere del nativo: max |diff| = {diff:.2e} > {atol:.0e}")
+    return diff
+
+
+def export_compiled(model_path=V5_MODEL_PATH, output_path=V5_COMPILED_PATH, loader='joblib', atol=1e-5):
+    """Carga el artefacto, lo compila, verifica contra predict nativo y guarda."""
+    if loader == 'ensemble':
+        from src.models.ensemble_ranker import EnsembleRanker
+        model = EnsembleRanker.load(model_path)
+    else:
+        import joblib
+        model = joblib.load(model_path)
+
+    compiled = compile_model(model)
+    diff = verify(model, compiled, atol=atol)
+    logger.info(f"   Verificación vs predict nativo: max |diff| = {diff:.2e}")
+    compiled.save(output_path)
+    return compiled
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compila boosters entrenados a arrays NumPy')
+    parser.add_argument('--model', choices=['v5', 'ensemble'], default='v5', help='Artefacto a compilar')
+    parser.add_argument('--atol', type=float, default=1e-5, help='Tolerancia vs predict nativo')
+    args = parser.parse_args()
+
+    try:
+        if args.model == 'ensemble':
+            export_compiled(ENSEMBLE_PATH, ENSEMBLE_COMPILED_PATH, loader='ensemble', atol=args.atol)
+        else:
+            export_compiled(V5_MODEL_PATH, V5_COMPILED_PATH, atol=args.atol)
+    except Exception as e:
+        logger.error(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -26,6 +26,7 @@ Versión: 3.2
 
 import os
 import re
+import sys
 import time
 import logging
 import requests
@@ -43,6 +44,10 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from bs4 import BeautifulSoup
 import pandas as pd
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils import tracing
+
 try:
     from dotenv import load_dotenv
     load_dotenv()
@@ -406,24 +411,27 @@ class PistaInteligenteBot:
                 'Referer': HIPODROMOS[hipodromo].base_url,
             }
             
-            response = requests.get(
-                url, 
-                headers=headers, 
-                timeout=self.config.pdf_timeout,
-                stream=True
-            )
-            response.raise_for_status()
-            
-            # Verificar que es un PDF
-            content_type = response.headers.get('Content-Type', '')
-            if 'pdf' not in content_type.lower() and not url.lower().endswith('.pdf'):
-                self.logger.warning(f"   ⚠️ No parece ser un PDF: {content_type}")
-            
-            # Guardar el archivo
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+            with tracing.span(f"http GET {urlparse(url).netloc}", url=url, hipodromo=hipodromo) as s:
+                response = requests.get(
+                    url, 
+                    headers=headers, 
+                    timeout=self.config.pdf_timeout,
+                    stream=True
+                )
+                response.raise_for_status()
+                
+                # Verificar que es un PDF
+                content_type = response.headers.get('Content-Type', '')
+                if 'pdf' not in content_type.lower() and not url.lower().endswith('.pdf'):
+                    self.logger.warning(f"   ⚠️ No parece ser un PDF: {content_type}")
+                
+                # Guardar el archivo
+                with open(filepath, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=8192):
+                        if chunk:
+                            f.write(chunk)
+                if s is not None:
+                    s.set(status=response.status_code, bytes=os.path.getsize(filepath))
             
             # Verificar tamaño
             size = os.path.getsize(filepath)
@@ -21,6 +21,7 @@ from collections import defaultdict
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 from src.utils.supabase_client import SupabaseManager
+from src.utils import instrumentation
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -104,12 +105,12 @@ def get_predictions_from_supabase():
         return {}
 
 
-def get_results_from_sqlite():
+def get_results_from_sqlite(db_path=DB_PATH):
     """
     Get actual race results from SQLite.
     Returns dict keyed by (fecha, hipodromo, nro_carrera) -> list of top 4 finishers.
     """
-    conn = sqlite3.connect(DB_PATH)
+    conn = instrumentation.instrument_connection(sqlite3.connect(db_path))
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     
@@ -303,7 +304,7 @@ def calculate_stats_by_hipodromo(results):
 
 def save_to_sqlite(results):
     """Save results to SQLite table rendimiento_historico."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = instrumentation.instrument_connection(sqlite3.connect(DB_PATH))
     cursor = conn.cursor()
     
     # Create table if not exists
@@ -351,7 +352,7 @@ def load_all_from_sqlite():
     Historical predictions get rotated out of Supabase, but their match 
     results are preserved in SQLite across runs.
     """
-    conn = sqlite3.connect(DB_PATH)
+    conn = instrumentation.instrument_connection(sqlite3.connect(DB_PATH))
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -452,6 +453,7 @@ def upload_to_supabase(stats_global, stats_by_hip, all_results):
             logger.warning(f"Supabase upload skipped: {e}")
 
 
+@instrumentation.instrumented('performance')
 def run():
     """Main function."""
     logger.info("=" * 60)
@@ -478,6 +480,7 @@ def run():
     logger.info("\n[3/4] Matching predictions with results...")
     results = match_predictions_with_results(predictions_by_race, results_by_race)
     logger.info(f"Found {len(results)} races with both predictions and results")
+    instrumentation.count(rows_in=sum(len(p) for p in predictions_by_race.values()), rows_out=len(results))
     
     if not results:
         logger.warning("No matching data found. Exiting.")
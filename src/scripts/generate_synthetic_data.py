@@ -0,0 +1,395 @@
+"""
+Generador de Datos Sintéticos de Carreras
+-----------------------------------------
+Genera, a partir de una semilla, un historial hípico realista para pruebas
+de escala (10k, 100k, 1M participaciones) sin depender de datos reales:
+
+- DB SQLite con el esquema de HipicaETL._init_db (hipodromos, caballos,
+  jinetes, studs, jornadas, carreras, participaciones, programa_carreras,
+  archivos_procesados).
+- exports/RESULTADO_<COD>_<fecha>.csv por jornada y PROGRAMA_<COD>_<fecha>.csv
+  para las jornadas futuras, en el formato que procesa el ETL. Los archivos
+  quedan registrados en archivos_procesados, así un sync sobre este
+  directorio no los vuelve a cargar (con --force sí).
+
+Modelo:
+- Calendario semanal por hipódromo (CHS lun/vie, HC mié/sáb, VSC mié/dom,
+  CONCE sáb), 8 a 12 carreras por jornada, campos de 8 a 16. El historial
+  termina cerca de END_DATE (fecha fija, no depende del día en que se
+  genera; end_date la cambia): a mayor escala, más años hacia atrás.
+- Caballos con carrera deportiva: debutan a los 2-3 años, corren ~15 veces
+  y se retiran (los reemplaza un debutante). Habilidad = efecto del padre +
+  ruido individual, así sire_win_rate y win_rate tienen señal.
+- Jinetes con habilidad y caballo habitual (70% de las montas), studs fijos
+  por caballo.
+- Llegada por habilidad + ruido Gumbel; tiempo del ganador según distancia,
+  cuerpos de diferencia para el resto; dividendo del ganador según la
+  probabilidad implícita del campo.
+
+Uso:
+    python src/scripts/generate_synthetic_data.py --scale 100k --out data/synthetic/100k
+    python src/scripts/generate_synthetic_data.py --participations 25000 --seed 7 --no-csv
+
+Author: ML Engineering Team
+Date: 2026-10-19
+"""
+
+import os
+import io
+import csv
+import sys
+import sqlite3
+import logging
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+END_DATE = date(2025, 12, 31)
+RUNNERS_PER_DAY = 120  # ~1 jornada diaria promedio x 10 carreras x 12 caballos
+
+# Mismos ids que HIP_MAP de inference_optimized; códigos que entiende el ETL
+HIPODROMOS = [
+    (1, 'Club Hípico de Santiago', 'CHS'),
+    (2, 'Hipódromo Chile', 'HC'),
+    (3, 'Valparaíso Sporting', 'VSC'),
+    (4, 'Club Hípico de Concepción', 'CONCE'),
+]
+# weekday() -> hipódromos que corren ese día
+CALENDARIO = {0: [1], 2: [2, 3], 4: [1], 5: [2, 4], 6: [3]}
+DISTANCIAS = {
+    1: [1000, 1100, 1200, 1300, 1400, 1600, 1800, 2000],
+    2: [1000, 1100, 1200, 1300, 1500, 1700, 1900, 2200],
+    3: [1000, 1100, 1200, 1400, 1600, 1800],
+    4: [1000, 1100, 1200, 1300, 1500, 1700],
+}
+PISTAS = {1: ['ARENA', 'PASTO'], 2: ['ARENA'], 3: ['PASTO'], 4: ['ARENA']}
+TIPOS = ['HANDICAP', 'CONDICIONAL', 'HANDICAP LIBRE', 'CLASICO', 'PREMIO']
+
+PREFIJOS = ['GRAN', 'DON', 'DOÑA', 'EL', 'LA', 'SIR', 'MISS', 'REY', 'SANTA', 'PRINCESA',
+            'CAPITAN', 'LADY', 'MISTER', 'SEÑOR', 'DAMA', 'BARON', 'CONDE', 'MAESTRO', 'REINA', 'TIO']
+NUCLEOS = ['AZUL', 'TRUENO', 'LUNA', 'VIENTO', 'FUEGO', 'PLATA', 'ORO', 'COMETA', 'TORMENTA', 'SOL',
+           'ESTRELLA', 'RAYO', 'NEVADO', 'ANDINO', 'PACIFICO', 'CONDOR', 'PUMA', 'TANGO', 'CUECA', 'ROBLE',
+           'MAITEN', 'COPIHUE', 'QUILLAY', 'ALERCE', 'VOLCAN', 'MAREA', 'DESTINO', 'CORSARIO', 'GITANO', 'FARAON']
+NOMBRES = ['JOAQUIN', 'GONZALO', 'JAIME', 'BENJAMIN', 'NICOLAS', 'FELIPE', 'KEVIN', 'RAFAEL', 'OSCAR',
+           'LUIS', 'CARLOS', 'JORGE', 'PEDRO', 'ANDRES', 'VICTOR', 'HECTOR', 'SERGIO', 'IVAN', 'DIEGO', 'JUAN']
+APELLIDOS = ['HERRERA', 'ULLOA', 'MEDINA', 'SANCHO', 'MOLINA', 'HENRIQUEZ', 'ESPINA', 'QUINTEROS',
+             'CISTERNAS', 'GUAJARDO', 'AGUILAR', 'ROJAS', 'SOTO', 'CONTRERAS', 'SILVA', 'MUÑOZ', 'TAPIA',
+             'REYES', 'VERA', 'FUENTES', 'CARRASCO', 'VALDES', 'NAVARRO', 'ARAYA', 'PIZARRO']
+
+RESULT_COLUMNS = ['fecha', 'hipodromo', 'carrera', 'hora', 'distancia', 'pista', 'tipo', 'mandil', 'posicion',
+                  'ganador', 'padre', 'jinete', 'stud', 'peso_fs', 'peso_jinete', 'distancia_cpos',
+                  'dividendo', 'tiempo']
+PROGRAM_COLUMNS = ['fecha', 'hipodromo', 'nro_carrera', 'hora', 'distancia', 'condicion', 'numero',
+                   'caballo', 'padrillo', 'peso', 'jinete', 'stud']
+
+
+def _nombre(idx, a, b):
+    """Nombre único y determinista a partir de dos listas (con sufijo numérico al agotarlas)."""
+    base = f"{a[idx % len(a)]} {b[(idx // len(a)) % len(b)]}"
+    cycle = idx // (len(a) * len(b))
+    return base if cycle == 0 else f"{base} {cycle + 1}"
+
+
+def _tiempo(seconds):
+    """Segundos -> 'm.ss.cc' (formato de los resultados)."""
+    minutes, rest = divmod(seconds, 60.0)
+    cents = int(round((rest % 1) * 100)) % 100
+    return f"{int(minutes)}.{int(rest):02d}.{cents:02d}"
+
+
+def _cuerpos(lengths):
+    """Cuerpos de diferencia como en los resultados: 'pzo', 'cza', '1 1/2', ..."""
+    if lengths < 0.15:
+        return 'nariz'
+    if lengths < 0.3:
+        return 'cza'
+    if lengths < 0.6:
+        return 'pzo'
+    whole, frac = int(lengths), lengths % 1
+    fraction = '' if frac < 0.25 else (' 1/2' if frac < 0.75 else '')
+    whole += 1 if frac >= 0.75 else 0
+    return f"{whole}{fraction}"
+
+
+class SyntheticRacing:
+    """Estado de la simulación (caballos activos, jinetes, padrillos, studs)."""
+
+    def __init__(self, participations, seed, start):
+        self.rng = np.random.default_rng(seed)
+        rng = self.rng
+        n_active = int(np.clip(participations // 15, 150, 4000))
+        self.n_active = n_active
+
+        n_sires = max(20, n_active // 10)
+        self.sires = [_nombre(i, NUCLEOS, ['(ARG)', '(USA)', '(BRZ)', '(CHI)', '(IRE)', '(GB)']) for i in range(n_sires)]
+        self.sire_effect = rng.normal(0, 0.5, n_sires)
+        self.sire_weight = rng.pareto(1.5, n_sires) + 1
+        self.sire_weight /= self.sire_weight.sum()
+
+        n_jockeys = int(np.clip(n_active // 25, 20, 160))
+        self.jockeys = [_nombre(i, NOMBRES, APELLIDOS) for i in range(n_jockeys)]
+        self.jockey_skill = rng.normal(0, 0.35, n_jockeys)
+
+        n_studs = int(np.clip(n_active // 12, 20, 400))
+        self.studs = ['STUD ' + _nombre(i, NUCLEOS, APELLIDOS) for i in range(n_studs)]
+
+        # Caballos: listas que crecen con cada debutante (id = índice + 1)
+        self.horse_name, self.horse_sire, self.horse_birth = [], [], []
+        self.horse_ability, self.horse_jockey, self.horse_stud, self.horse_weight = [], [], [], []
+        self.horse_runs, self.horse_career = [], []
+        self.active = np.array([self._debut(start.year) for _ in range(n_active)], dtype=np.int64)
+
+    def _debut(self, year):
+        rng = self.rng
+        idx = len(self.horse_name)
+        sire = int(rng.choice(len(self.sires), p=self.sire_weight))
+        self.horse_name.append(_nombre(idx, PREFIJOS, NUCLEOS))
+        self.horse_sire.append(sire)
+        self.horse_birth.append(year - int(rng.integers(2, 4)))
+        self.horse_ability.append(self.sire_effect[sire] + rng.normal(0, 1))
+        self.horse_jockey.append(int(rng.integers(len(self.jockeys))))
+        self.horse_stud.append(int(rng.integers(len(self.studs))))
+        self.horse_weight.append(int(rng.integers(430, 520)))
+        self.horse_runs.append(0)
+        self.horse_career.append(1 + int(rng.geometric(1 / 15)))
+        return idx
+
+    def field(self, size):
+        """Campo sin repetir; los caballos que cumplen su campaña se retiran."""
+        slots = self.rng.choice(self.n_active, size=size, replace=False)
+        horses = self.active[slots]
+        return slots, horses
+
+    def retire(self, slots, horses, year):
+        for slot, h in zip(slots, horses):
+            self.horse_runs[h] += 1
+            if self.horse_runs[h] >= self.horse_career[h]:
+                self.active[slot] = self._debut(year)
+
+    def race(self, horses, distancia):
+        """Orden de llegada, tiempos, cuerpos, jinetes y dividendo del ganador."""
+        rng = self.rng
+        n = len(horses)
+        regular = np.array([self.horse_jockey[h] for h in horses])
+        jockeys = np.where(rng.random(n) < 0.7, regular, rng.integers(len(self.jockeys), size=n))
+        strength = np.array([self.horse_ability[h] for h in horses]) + self.jockey_skill[jockeys]
+        order = np.argsort(-(strength + rng.gumbel(0, 0.8, n)), kind='stable')
+
+        implied = np.exp(strength - strength.max())
+        implied /= implied.sum()
+        dividendo = round(float(np.clip(0.85 / implied[order[0]], 1.1, 250.0)), 1)
+
+        speed = 16.4 + 0.15 * strength[order[0]] - 0.0004 * (distancia - 1000) + rng.normal(0, 0.15)
+        winner_time = distancia / speed
+        gaps = np.concatenate([[0.0], rng.exponential(1.3, n - 1)])
+        behind = np.cumsum(gaps)
+        return order, jockeys, winner_time, gaps, behind, dividendo
+
+
+def _schema(db_path):
+    """Crea el esquema con HipicaETL._init_db (misma definición que producción)."""
+    from src.etl.etl_pipeline import HipicaETL
+
+    with redirect_stdout(io.StringIO()):
+        etl = HipicaETL(db_path=db_path)
+    etl.conn.commit()
+    etl.conn.close()
+
+
+def generate(out_dir, participations=SCALES['10k'], seed=42, write_csv=True, program_days=1, end_date=END_DATE):
+    """
+    Genera out_dir/hipica_data.db y out_dir/exports/*.csv.
+
+    Args:
+        participations: participaciones aproximadas del historial (se
+                        completa la última jornada)
+        program_days: días de carrera futuros (programa sin resultados, todas
+                      las jornadas de cada día) tras el historial
+        end_date: fin aproximado del historial; el programa empieza después
+
+    Returns:
+        dict con db_path, exports_dir, participations, races, jornadas,
+        horses, first_date, last_date, program_dates
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    db_path = os.path.join(out_dir, 'hipica_data.db')
+    exports_dir = os.path.join(out_dir, 'exports')
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    if write_csv:
+        os.makedirs(exports_dir, exist_ok=True)
+    _schema(db_path)
+
+    start = end_date - timedelta(days=participations // RUNNERS_PER_DAY)
+    sim = SyntheticRacing(participations, seed, start)
+    rng = sim.rng
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.executemany('INSERT INTO hipodromos (id, nombre, codigo) VALUES (?, ?, ?)', HIPODROMOS)
+
+    names = {hid: name for hid, name, _ in HIPODROMOS}
+    codes = {hid: code for hid, _, code in HIPODROMOS}
+    written = jornada_id = carrera_id = 0
+    jornadas, carreras, participaciones, archivos = [], [], [], []
+    day = start
+    first_date = last_date = None
+
+    def flush():
+        conn.executemany('INSERT INTO jornadas (id, fecha, hipodromo_id, reunion) VALUES (?, ?, ?, ?)', jornadas)
+        conn.executemany('''INSERT INTO carreras (id, jornada_id, numero, hora, distancia, tipo, grado, condicion, pista)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''', carreras)
+        conn.executemany('''INSERT INTO participaciones (carrera_id, caballo_id, jinete_id, stud_id, posicion, peso_fs,
+                            peso_jinete, distancia_cpos, dividendo, tiempo, mandil)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', participaciones)
+        conn.commit()
+        jornadas.clear()
+        carreras.clear()
+        participaciones.clear()
+
+    while written < participations:
+        for hid in CALENDARIO.get(day.weekday(), []):
+            fecha = day.isoformat()
+            first_date = first_date or fecha
+            last_date = fecha
+            jornada_id += 1
+            jornadas.append((jornada_id, fecha, hid, f'REUNION {jornada_id}'))
+            csv_rows = []
+            for numero in range(1, int(rng.integers(8, 13)) + 1):
+                carrera_id += 1
+                size = int(rng.integers(8, 17))
+                slots, horses = sim.field(size)
+                distancia = int(rng.choice(DISTANCIAS[hid]))
+                pista = PISTAS[hid][int(rng.integers(len(PISTAS[hid])))]
+                tipo = TIPOS[int(rng.integers(len(TIPOS)))]
+                hora = f"{14 + (numero * 25) // 60}:{(numero * 25) % 60:02d}"
+                carreras.append((carrera_id, jornada_id, numero, hora, distancia, tipo, None, tipo, pista))
+
+                order, jockeys, winner_time, gaps, behind, dividendo = sim.race(horses, distancia)
+                mandiles = rng.permutation(size) + 1
+                for posicion, i in enumerate(order, start=1):
+                    h = int(horses[i])
+                    tiempo = _tiempo(winner_time + behind[posicion - 1] * 0.17)
+                    peso_fs = sim.horse_weight[h] + int(rng.integers(-8, 9))
+                    peso_jinete = int(rng.integers(53, 60))
+                    cpos = _cuerpos(gaps[posicion - 1]) if posicion > 1 else None
+                    div = dividendo if posicion == 1 else None
+                    participaciones.append((carrera_id, h + 1, int(jockeys[i]) + 1, sim.horse_stud[h] + 1, posicion,
+                                            peso_fs, peso_jinete, cpos, div, tiempo, int(mandiles[i])))
+                    if write_csv:
+                        csv_rows.append([fecha, names[hid], numero, hora, distancia, pista, tipo, int(mandiles[i]),
+                                         posicion, sim.horse_name[h], sim.sires[sim.horse_sire[h]],
+                                         sim.jockeys[jockeys[i]], sim.studs[sim.horse_stud[h]], peso_fs,
+                                         peso_jinete, cpos or '', '' if div is None else div, tiempo])
+                sim.retire(slots, horses, day.year)
+                written += size
+
+            if write_csv:
+                filename = f'RESULTADO_{codes[hid]}_{fecha}.csv'
+                with open(os.path.join(exports_dir, filename), 'w', newline='', encoding='utf-8') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(RESULT_COLUMNS)
+                    writer.writerows(csv_rows)
+                archivos.append((filename, len(csv_rows)))
+        if len(participaciones) >= 50_000:
+            flush()
+        day += timedelta(days=1)
+    flush()
+
+    # Programa de las próximas jornadas (sin resultados)
+    day = max(day, end_date + timedelta(days=1))
+    program_dates, programa = [], []
+    while len(program_dates) < program_days:
+        if day.weekday() in CALENDARIO:
+            program_dates.append(day.isoformat())
+        for hid in CALENDARIO.get(day.weekday(), []):
+            fecha = day.isoformat()
+            csv_rows = []
+            for numero in range(1, int(rng.integers(8, 13)) + 1):
+                size = int(rng.integers(8, 17))
+                _, horses = sim.field(size)
+                distancia = int(rng.choice(DISTANCIAS[hid]))
+                tipo = TIPOS[int(rng.integers(len(TIPOS)))]
+                hora = f"{14 + (numero * 25) // 60}:{(numero * 25) % 60:02d}"
+                for mandil, h in enumerate(horses, start=1):
+                    h = int(h)
+                    peso = int(rng.integers(54, 61))
+                    programa.append((fecha, names[hid], numero, hora, distancia, tipo, mandil, h + 1,
+                                     sim.horse_jockey[h] + 1, sim.horse_stud[h] + 1, str(peso)))
+                    csv_rows.append([fecha, names[hid], numero, hora, f'{distancia // 1000}.{distancia % 1000:03d}',
+                                     tipo, mandil, sim.horse_name[h], sim.sires[sim.horse_sire[h]], peso,
+                                     sim.jockeys[sim.horse_jockey[h]], sim.studs[sim.horse_stud[h]]])
+            if write_csv:
+                filename = f'PROGRAMA_{codes[hid]}_{fecha}.csv'
+                with open(os.path.join(exports_dir, filename), 'w', newline='', encoding='utf-8') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(PROGRAM_COLUMNS)
+                    writer.writerows(csv_rows)
+                archivos.append((filename, len(csv_rows)))
+        day += timedelta(days=1)
+
+    conn.executemany('''INSERT INTO programa_carreras (fecha, hipodromo, nro_carrera, hora, distancia, condicion,
+                        numero, caballo_id, jinete_id, stud_id, peso) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                     programa)
+    conn.executemany('INSERT INTO caballos (id, nombre, ano_nacimiento, padre) VALUES (?, ?, ?, ?)', [
+        (i + 1, name, sim.horse_birth[i], sim.sires[sim.horse_sire[i]]) for i, name in enumerate(sim.horse_name)
+    ])
+    conn.executemany('INSERT INTO jinetes (id, nombre) VALUES (?, ?)', list(enumerate(sim.jockeys, start=1)))
+    conn.executemany('INSERT INTO studs (id, nombre) VALUES (?, ?)', list(enumerate(sim.studs, start=1)))
+    conn.executemany('INSERT INTO archivos_procesados (nombre_archivo, num_registros) VALUES (?, ?)', archivos)
+    conn.commit()
+    conn.close()
+
+    return {
+        'db_path': db_path,
+        'exports_dir': exports_dir if write_csv else None,
+        'participations': written,
+        'races': carrera_id,
+        'jornadas': jornada_id,
+        'horses': len(sim.horse_name),
+        'first_date': first_date,
+        'last_date': last_date,
+        'program_dates': program_dates,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Genera un historial hípico sintético determinista')
+    parser.add_argument('--scale', choices=list(SCALES), default='10k')
+    parser.add_argument('--participations', type=int, default=None, help='Sobrescribe --scale')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', default=None, help='Directorio de salida (default: data/synthetic/<escala>)')
+    parser.add_argument('--program-days', type=int, default=1, help='Días de carrera futuros con programa')
+    parser.add_argument('--no-csv', action='store_true', help='Sólo la DB (sin exports/*.csv)')
+    args = parser.parse_args()
+
+    try:
+        participations = args.participations or SCALES[args.scale]
+        out = args.out or os.path.join('data', 'synthetic', args.scale if not args.participations else str(participations))
+        t0 = time.perf_counter()
+        summary = generate(out, participations, args.seed, not args.no_csv, args.program_days)
+        logger.info(f"✅ {summary['participations']:,} participaciones, {summary['races']:,} carreras, "
+                    f"{summary['jornadas']:,} jornadas, {summary['horses']:,} caballos "
+                    f"({summary['first_date']} -> {summary['last_date']}) en {time.perf_counter() - t0:.1f}s")
+        logger.info(f"   DB: {summary['db_path']}")
+        if summary['exports_dir']:
+            logger.info(f"   CSV: {summary['exports_dir']}")
+        logger.info(f"   Programa: {', '.join(summary['program_dates'])}")
+    except Exception as e:
+        logger.error(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
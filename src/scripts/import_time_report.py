@@ -0,0 +1,178 @@
+"""
+Reporte de Tiempo de Importación (startup budget)
+-------------------------------------------------
+Mide el costo de importar cada entry point con `python -X importtime` en un
+proceso limpio, resume por paquete raíz (pandas, supabase, lightgbm, ...)
+y verifica un presupuesto de arranque:
+
+- budget_ms: tiempo máximo de import (suma de tiempos propios, sin los
+  módulos que Python ya carga al arrancar). Depende de la máquina, por eso
+  es holgado.
+- forbid: paquetes pesados que ese entry point NO debe cargar al
+  importarse (chequeo determinista: una importación top-level nueva de
+  pandas/supabase/lightgbm en el camino equivocado falla aquí).
+
+Uso:
+    python src/scripts/import_time_report.py                 # todos los entry points
+    python src/scripts/import_time_report.py --entry chat upload --top 15
+    python src/scripts/import_time_report.py --check         # exit 1 si se excede el presupuesto
+
+Author: ML Engineering Team
+Date: 2026-10-19
+"""
+
+import os
+import sys
+import json
+import logging
+import subprocess
+from collections import defaultdict
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Dependencias pesadas que se controlan por entry point
+HEAVY = ['pandas', 'numpy', 'sklearn', 'scipy', 'joblib', 'lightgbm', 'xgboost', 'catboost',
+         'supabase', 'selenium', 'bs4', 'google', 'requests', 'flask']
+ML = ['sklearn', 'lightgbm', 'xgboost', 'catboost']
+REMOTE = ['supabase', 'selenium', 'bs4', 'google']
+
+ENTRY_POINTS = {
+    # Orquestador: cada paso importa lo suyo al ejecutarse
+    'sync': {'module': 'sync_system', 'budget_ms': 150, 'forbid': HEAVY},
+    # Chat (Gemini): datos vía data_manager (pandas); genai se carga al configurar
+    'chat': {'module': 'src.models.ai_model', 'budget_ms': 1200, 'forbid': ML + REMOTE + ['joblib']},
+    # Upload: supabase se importa al crear el cliente
+    'upload': {'module': 'src.utils.upload_predictions_supabase', 'budget_ms': 300,
+               'forbid': ['pandas', 'numpy'] + ML + REMOTE},
+    'migration': {'module': 'src.utils.migrate_sqlite_to_supabase', 'budget_ms': 1200,
+                  'forbid': ML + REMOTE},
+    'performance': {'module': 'src.scripts.calculate_performance', 'budget_ms': 150,
+                    'forbid': ['pandas', 'numpy'] + ML + REMOTE},
+    'pozos': {'module': 'src.scraping.monitor_pozos', 'budget_ms': 150,
+              'forbid': ['pandas', 'numpy', 'requests'] + ML + REMOTE},
+    'etl': {'module': 'src.etl.etl_pipeline', 'budget_ms': 1200, 'forbid': ML + REMOTE + ['joblib']},
+    # Los modelos se deserializan en load_artifacts, no al importar
+    'inference': {'module': 'src.models.inference_optimized', 'budget_ms': 1200,
+                  'forbid': ML + REMOTE + ['joblib']},
+    'scheduler': {'module': 'src.scripts.race_day_scheduler', 'budget_ms': 1200,
+                  'forbid': ML + REMOTE + ['joblib']},
+}
+
+
+def parse_importtime(text):
+    """
+    Líneas de `-X importtime` -> lista de (modulo, self_us, cumulative_us, depth).
+    """
+    rows = []
+    for line in text.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # encabezado
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), int(parts[0]), int(parts[1]), depth))
+    return rows
+
+
+def _importtime(code):
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE='1')
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'import falló')
+    return parse_importtime(proc.stderr)
+
+
+def summarize(rows, startup=()):
+    """Total (ms), ms propios por paquete raíz y paquetes cargados, sin los de arranque."""
+    startup = set(startup)
+    by_package = defaultdict(float)
+    for name, self_us, _, _ in rows:
+        if name in startup:
+            continue
+        by_package[name.split('.')[0]] += self_us / 1000
+    return {
+        'total_ms': round(sum(by_package.values()), 1),
+        'packages': {k: round(v, 1) for k, v in sorted(by_package.items(), key=lambda kv: -kv[1])}
+    }
+
+
+def measure(module, runs=3):
+    """
+    Costo de `import module` en un proceso nuevo (mínimo de runs, con la
+    caché de disco ya caliente).
+    """
+    startup = {name for name, *_ in _importtime('pass')}
+    results = [summarize(_importtime(f'import {module}'), startup) for _ in range(runs)]
+    best = min(results, key=lambda r: r['total_ms'])
+    best['module'] = module
+    return best
+
+
+def check(name, result, spec=None):
+    """Lista de violaciones del presupuesto (vacía si cumple)."""
+    spec = spec or ENTRY_POINTS[name]
+    problems = []
+    loaded = [p for p in spec['forbid'] if p in result['packages']]
+    if loaded:
+        problems.append(f"{name}: importa {', '.join(loaded)} al arrancar")
+    if result['total_ms'] > spec['budget_ms']:
+        problems.append(f"{name}: {result['total_ms']:.0f} ms > presupuesto {spec['budget_ms']} ms")
+    return problems
+
+
+def run_report(entries=None, runs=3, top=8):
+    """Mide los entry points indicados. Devuelve (resultados, violaciones)."""
+    results, problems = {}, []
+    for name in entries or list(ENTRY_POINTS):
+        spec = ENTRY_POINTS[name]
+        try:
+            result = measure(spec['module'], runs)
+        except RuntimeError as e:
+            logger.warning(f"⚠️ {name} ({spec['module']}) no se pudo importar: {e}")
+            continue
+        results[name] = result
+        problems += check(name, result, spec)
+
+        heavy = [p for p in HEAVY if p in result['packages']]
+        logger.info(f"{name:12s} {result['total_ms']:8.1f} ms  (presupuesto {spec['budget_ms']} ms)  "
+                    f"pesados: {', '.join(heavy) or '-'}")
+        for package, ms in list(result['packages'].items())[:top]:
+            logger.info(f"      {package:28s} {ms:8.1f} ms")
+    return results, problems
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Tiempo de importación por entry point')
+    parser.add_argument('--entry', nargs='+', choices=list(ENTRY_POINTS), default=None)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=8, help='Paquetes por entry point')
+    parser.add_argument('--json', default=None, help='Guardar el reporte en JSON')
+    parser.add_argument('--check', action='store_true', help='Exit 1 si se excede el presupuesto')
+    args = parser.parse_args()
+
+    try:
+        results, problems = run_report(args.entry, args.runs, args.top)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+        for problem in problems:
+            logger.error(f"❌ {problem}")
+        if args.check and problems:
+            sys.exit(1)
+        if not problems:
+            logger.info("✅ Todos los entry points dentro del presupuesto")
+    except Exception as e:
+        logger.error(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
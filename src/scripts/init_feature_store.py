@@ -6,7 +6,7 @@ import logging
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 from src.models.feature_store import FeatureStore
-from src.models.data_manager import cargar_datos_3nf
+from src.models.data_manager import cargar_datos_3nf_tipado
 
 # Configure logging
 logging.basicConfig(
@@ -20,7 +20,7 @@ def main():
     
     # 1. Load History
     logger.info("Loading historical data (3NF)...")
-    df = cargar_datos_3nf()
+    df = cargar_datos_3nf_tipado()
     
     if df.empty:
         logger.error("❌ No historical data found. Cannot initialize store.")
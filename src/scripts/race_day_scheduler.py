@@ -0,0 +1,338 @@
+"""
+Scheduler del Día de Carreras
+-----------------------------
+Complementa el sync diario (sync_system.main) durante la jornada: conoce la
+hora de cada carrera (programa_carreras.hora) y hace polling de cambios en
+el programa y en los resultados. Sólo las carreras afectadas pasan por
+inferencia, upload a Supabase y regeneración de tickets de pozos, y sólo
+mientras faltan menos de `horizon_minutes` para su largada.
+
+Qué se considera "cambio" en una carrera pendiente:
+- Su programa (mandil, caballo, jinete, stud, peso, distancia, hora).
+- Resultados nuevos de otra carrera del día en la que corrió alguno de sus
+  caballos, jinetes o studs (cambian sus stats históricas).
+
+Cada paso es incremental: OptimizedInferencePipeline.run_races usa el cache
+por carrera (sólo recalcula fingerprints distintos), el upload recibe sólo
+las race_keys cambiadas y refresh_tickets sólo toca los pozos que las
+incluyen. El trabajo del día queda proporcional a los cambios y no a
+n_syncs × programa completo.
+
+Uso:
+    python src/scripts/race_day_scheduler.py                 # loop hasta la última carrera
+    python src/scripts/race_day_scheduler.py --once          # un ciclo (cron)
+    python src/scripts/race_day_scheduler.py --fecha 2026-10-20 --horizon 90 --poll 60
+
+Author: ML Engineering Team
+Date: 2026-10-19
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.models.prediction_cache import race_key
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("RaceDayScheduler")
+
+DB_PATH = 'data/db/hipica_data.db'
+STATE_PATH = 'data/race_day_state.json'
+
+# Columnas del programa que definen una carrera (cualquier cambio => re-inferir)
+PROGRAM_COLS = ['numero', 'caballo_id', 'jinete_id', 'stud_id', 'peso', 'distancia', 'hora']
+
+
+def chile_now():
+    """Hora de Chile (UTC-3), misma convención que data_manager.cargar_programa."""
+    return datetime.utcnow() - timedelta(hours=3)
+
+
+def parse_hora(hora, fecha):
+    """'APROX. 14:30' / '14.30 hrs' -> datetime de la largada (None si no se puede)."""
+    match = re.search(r'(\d{1,2})[:.](\d{2})', str(hora or ''))
+    if not match:
+        return None
+    try:
+        return datetime.strptime(f"{fecha} {int(match.group(1)):02d}:{match.group(2)}", '%Y-%m-%d %H:%M')
+    except ValueError:
+        return None
+
+
+def _signature(df, cols):
+    """Hash estable de las filas (ordenadas) de una carrera."""
+    rows = df[cols].astype(str).sort_values(cols).values.tolist()
+    return hashlib.sha1(json.dumps(rows).encode()).hexdigest()[:16]
+
+
+def load_race_card(db_path, fecha):
+    """
+    Programa del día, una fila por participante, con race_key y post_time.
+    Usa el mismo nombre de hipódromo que cargar_programa (y por tanto que
+    las predicciones).
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        df = pd.read_sql("""
+            SELECT pc.fecha, COALESCE(h.nombre, pc.hipodromo) AS hipodromo, pc.nro_carrera, pc.hora,
+                   pc.distancia, pc.numero, pc.caballo_id, pc.jinete_id, pc.stud_id, pc.peso
+            FROM programa_carreras pc
+            LEFT JOIN hipodromos h ON LOWER(pc.hipodromo) = LOWER(h.nombre) OR h.codigo = pc.hipodromo
+            WHERE pc.fecha = ?
+        """, conn, params=[fecha])
+    finally:
+        conn.close()
+
+    if df.empty:
+        return df
+    df['nro_carrera'] = pd.to_numeric(df['nro_carrera'], errors='coerce').fillna(0).astype(int)
+    df['race_key'] = [race_key(fecha, h, c) for h, c in zip(df['hipodromo'], df['nro_carrera'])]
+    df['post_time'] = [parse_hora(h, fecha) for h in df['hora']]
+    return df
+
+
+def load_results(db_path, fecha):
+    """
+    Resultados del día por carrera: race_key -> (firma, ids de caballos,
+    jinetes y studs que corrieron).
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        df = pd.read_sql("""
+            SELECT h.nombre AS hipodromo, c.numero AS nro_carrera,
+                   p.caballo_id, p.jinete_id, p.stud_id, p.posicion
+            FROM participaciones p
+            JOIN carreras c ON p.carrera_id = c.id
+            JOIN jornadas j ON c.jornada_id = j.id
+            JOIN hipodromos h ON j.hipodromo_id = h.id
+            WHERE j.fecha = ? AND p.posicion IS NOT NULL
+        """, conn, params=[fecha])
+    except Exception as e:
+        logger.warning(f"⚠️ Resultados no disponibles: {e}")
+        return {}
+    finally:
+        conn.close()
+
+    results = {}
+    for (hipodromo, nro), group in df.groupby(['hipodromo', 'nro_carrera']):
+        entities = {
+            ('caballo_id', v) for v in group['caballo_id'].dropna().astype(int)
+        } | {
+            ('jinete_id', v) for v in group['jinete_id'].dropna().astype(int)
+        } | {
+            ('stud_id', v) for v in group['stud_id'].dropna().astype(int)
+        }
+        results[race_key(fecha, hipodromo, int(nro))] = (
+            _signature(group, ['caballo_id', 'posicion']), entities
+        )
+    return results
+
+
+class RaceDayScheduler:
+    """Polling del día: re-infiere, sube y regenera tickets sólo de las carreras afectadas."""
+
+    def __init__(self, db_path=DB_PATH, fecha=None, state_path=STATE_PATH,
+                 horizon_minutes=120, poll_seconds=60, max_sleep_seconds=900,
+                 run_etl=True, upload=True, tickets=True, overwrite_published=True, pipeline=None):
+        """
+        Args:
+            fecha: 'YYYY-MM-DD' (por defecto hoy en Chile)
+            horizon_minutes: sólo se re-infieren carreras que largan dentro de este margen
+            poll_seconds: intervalo de polling con carreras dentro del horizonte
+            overwrite_published: reescribir en Supabase carreras ya publicadas
+                                 (un cambio de programa invalida el tip anterior)
+            pipeline: OptimizedInferencePipeline ya construido (artefactos residentes)
+        """
+        self.db_path = db_path
+        self.fecha = fecha or chile_now().strftime('%Y-%m-%d')
+        self.state_path = state_path
+        self.horizon = timedelta(minutes=horizon_minutes)
+        self.poll_seconds = poll_seconds
+        self.max_sleep_seconds = max_sleep_seconds
+        self.run_etl = run_etl
+        self.upload = upload
+        self.tickets = tickets
+        self.overwrite_published = overwrite_published
+        self._pipeline = pipeline
+        self.state = self._load_state()
+
+    @property
+    def pipeline(self):
+        if self._pipeline is None:
+            from src.models.inference_optimized import OptimizedInferencePipeline
+            from src.models.tree_compiler import V5_COMPILED_PATH
+            self._pipeline = OptimizedInferencePipeline(db_path=self.db_path, compiled_path=V5_COMPILED_PATH)
+            self._pipeline.load_artifacts()
+        return self._pipeline
+
+    def _load_state(self):
+        state = {'fecha': self.fecha, 'program': {}, 'results': {}}
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, 'r', encoding='utf-8') as f:
+                    saved = json.load(f)
+                if saved.get('fecha') == self.fecha:
+                    state = saved
+            except Exception as e:
+                logger.warning(f"⚠️ Estado ilegible, se reinicia: {e}")
+        return state
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp_path = f'{self.state_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)
+
+    def _pending(self, card, now):
+        """race_keys que aún no largan y están dentro del horizonte (sin hora => siempre)."""
+        posts = card.groupby('race_key')['post_time'].first()
+        return {
+            race for race, post in posts.items()
+            if post is None or pd.isna(post) or now < post <= now + self.horizon
+        }
+
+    def detect_changes(self, card, results, now):
+        """
+        Carreras pendientes a re-inferir: programa distinto al último
+        procesado o resultados nuevos que comparten caballo/jinete/stud.
+        """
+        pending = self._pending(card, now)
+        program = {race: _signature(group, PROGRAM_COLS)
+                   for race, group in card[card['race_key'].isin(pending)].groupby('race_key')}
+        affected = {race for race, sig in program.items() if self.state['program'].get(race) != sig}
+
+        new_results = [race for race, (sig, _) in results.items() if self.state['results'].get(race) != sig]
+        if new_results:
+            entities = set().union(*(results[race][1] for race in new_results))
+            for race, group in card[card['race_key'].isin(pending - affected)].groupby('race_key'):
+                race_entities = {
+                    (col, int(v)) for col in ('caballo_id', 'jinete_id', 'stud_id')
+                    for v in pd.to_numeric(group[col], errors='coerce').dropna()
+                }
+                if race_entities & entities:
+                    affected.add(race)
+            logger.info(f"   Resultados nuevos: {len(new_results)} carreras")
+
+        return affected, program
+
+    def run_cycle(self, now=None):
+        """Un ciclo de polling. Devuelve las race_keys con predicciones nuevas."""
+        now = now or chile_now()
+
+        if self.run_etl:
+            try:
+                from src.etl.etl_pipeline import HipicaETL
+                HipicaETL().run()
+            except Exception as e:
+                logger.error(f"❌ Error en ETL: {e}")
+
+        card = load_race_card(self.db_path, self.fecha)
+        if card.empty:
+            logger.info(f"Sin programa para {self.fecha}")
+            return []
+        results = load_results(self.db_path, self.fecha)
+
+        affected, program = self.detect_changes(card, results, now)
+        changed = []
+        if affected:
+            logger.info(f"🔄 {len(affected)} carreras afectadas: {sorted(affected)}")
+            changed = self.pipeline.run_races(sorted(affected), self.fecha) or []
+            self._publish(changed)
+        else:
+            logger.info("✅ Sin cambios en carreras pendientes")
+
+        # Se marca como procesado sólo después de inferir/publicar
+        for race in affected:
+            self.state['program'][race] = program[race]
+        self.state['results'].update({race: sig for race, (sig, _) in results.items()})
+        self._save_state()
+        return changed
+
+    def _publish(self, changed):
+        """Upload y tickets sólo de las carreras con predicciones nuevas."""
+        if not changed:
+            return
+        if self.upload:
+            try:
+                from src.utils.upload_predictions_supabase import run_upload
+                failed = []
+                run_upload(force_overwrite=self.overwrite_published, races=changed, failed_races=failed)
+                self.pipeline.mark_uploaded(set(changed) - set(failed))
+            except Exception as e:
+                logger.error(f"❌ Error subiendo predicciones: {e}")
+        if self.tickets:
+            by_hipodromo = {}
+            for race in changed:
+                head, _, nro = race.rpartition('_')  # fecha_hipodromo_carrera
+                by_hipodromo.setdefault(head.split('_', 1)[1], set()).add(int(nro))
+            try:
+                from src.scraping.monitor_pozos import refresh_tickets
+                refresh_tickets(self.fecha, by_hipodromo)
+            except Exception as e:
+                logger.error(f"❌ Error regenerando tickets: {e}")
+
+    def seconds_until_next_poll(self, card, now):
+        """poll_seconds si hay carreras en el horizonte; si no, hasta que entre la próxima."""
+        if self._pending(card, now):
+            return self.poll_seconds
+        upcoming = [p for p in card['post_time'] if p is not None and not pd.isna(p) and p > now]
+        if not upcoming:
+            return None
+        wait = (min(upcoming) - self.horizon - now).total_seconds()
+        return max(self.poll_seconds, min(wait, self.max_sleep_seconds))
+
+    def run(self):
+        """Loop hasta que larga la última carrera del día."""
+        logger.info("=" * 60)
+        logger.info(f"🏇 RACE-DAY SCHEDULER {self.fecha} (horizonte {self.horizon})")
+        logger.info("=" * 60)
+        while True:
+            self.run_cycle()
+            now = chile_now()
+            wait = self.seconds_until_next_poll(load_race_card(self.db_path, self.fecha), now)
+            if wait is None:
+                logger.info("🏁 No quedan carreras pendientes")
+                return
+            time.sleep(wait)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Re-inferencia por carrera durante el día de carreras')
+    parser.add_argument('--fecha', default=None, help='YYYY-MM-DD (default: hoy en Chile)')
+    parser.add_argument('--horizon', type=int, default=120, help='Minutos antes de la largada')
+    parser.add_argument('--poll', type=int, default=60, help='Segundos entre polls')
+    parser.add_argument('--once', action='store_true', help='Un solo ciclo (cron)')
+    parser.add_argument('--no-etl', action='store_true')
+    parser.add_argument('--no-upload', action='store_true')
+    parser.add_argument('--keep-published', action='store_true',
+                        help='No reescribir carreras ya publicadas en Supabase')
+    args = parser.parse_args()
+
+    try:
+        scheduler = RaceDayScheduler(
+            fecha=args.fecha, horizon_minutes=args.horizon, poll_seconds=args.poll,
+            run_etl=not args.no_etl, upload=not args.no_upload,
+            overwrite_published=not args.keep_published
+        )
+        if args.once:
+            scheduler.run_cycle()
+        else:
+            scheduler.run()
+    except Exception as e:
+        logger.error(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
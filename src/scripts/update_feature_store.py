@@ -8,7 +8,7 @@ from datetime import datetime, timedelta
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 from src.models.feature_store import FeatureStore
-from src.models.data_manager import cargar_datos_3nf
+from src.models.data_manager import cargar_datos_3nf_tipado
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -34,11 +34,11 @@ def main():
     logger.info(f"Store last updated: {last_updated}")
     
     # 2. Fetch New Data (Since last updated)
-    # cargar_datos_3nf loads EVERYTHING. In 3NF, we can filter by date in SQL ideally.
+    # cargar_datos_3nf_tipado loads EVERYTHING. In 3NF, we can filter by date in SQL ideally.
     # But existing function loads all. Optimization: Modify data_manager or filter DF.
     # For now (8k rows), filtering DF is fine.
     
-    df_all = cargar_datos_3nf()
+    df_all = cargar_datos_3nf_tipado()
     if df_all.empty:
         logger.info("No data found in DB.")
         return
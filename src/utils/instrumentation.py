@@ -0,0 +1,243 @@
+"""
+Instrumentación de Etapas del Sync
+----------------------------------
+API liviana para medir dónde se va el tiempo de una sincronización:
+
+    from src.utils import instrumentation
+
+    with instrumentation.run('sync'):
+        with instrumentation.stage('etl'):
+            ...
+            instrumentation.count(rows_in=len(df), rows_out=insertados)
+
+    @instrumentation.instrumented('upload')
+    def run_upload(...):
+        ...
+
+Cada etapa registra wall_s, cpu_s, estado y contadores (rows_in, rows_out,
+net_calls, net_bytes, db_statements, bytes_read). Los contadores suben a
+todas las etapas abiertas, así una etapa incluye lo de sus sub-etapas.
+
+- db_statements: instrument_connection(conn) cuenta cada sentencia SQLite
+  (trace callback).
+- net_calls / net_bytes: instrument_httpx() cuenta los requests HTTP de
+  supabase (httpx).
+
+Con una traza activa (src/utils/tracing.py) cada etapa es también un span,
+cada request httpx un span hijo y cada sentencia SQLite un evento.
+
+Cada etapa terminada se agrega a logs/sync_metrics.jsonl (una línea JSON) y
+al cerrar el run se imprime una tabla resumen. Sin un run activo, stage(),
+count() y el decorador no hacen nada (costo ~0 en tests y scripts sueltos).
+
+Author: ML Engineering Team
+Date: 2026-10-19
+"""
+
+import os
+import json
+import time
+import logging
+import functools
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from src.utils import tracing
+
+logger = logging.getLogger(__name__)
+
+METRICS_PATH = 'logs/sync_metrics.jsonl'
+COUNTERS = ['rows_in', 'rows_out', 'net_calls', 'net_bytes', 'db_statements', 'bytes_read']
+
+
+class Run:
+    """Etapas y contadores de una ejecución (p.ej. un sync completo)."""
+
+    def __init__(self, name, path=METRICS_PATH):
+        self.name = name
+        self.path = path
+        self.run_id = f"{name}-{datetime.now().strftime('%Y%m%d_%H%M%S')}-{os.getpid()}"
+        self.stages = []
+        self._stack = []
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+
+    def emit(self, record):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+
+    def summary(self):
+        """Tabla resumen (lista de líneas) en orden de inicio."""
+        total = time.perf_counter() - self._t0
+        lines = [f"   {'Etapa':34s} {'Wall(s)':>8s} {'%':>5s} {'Rows in':>9s} {'Rows out':>9s} "
+                 f"{'Net':>6s} {'DB':>8s} {'Estado':>7s}"]
+        for s in sorted(self.stages, key=lambda s: (s['start_s'], s['depth'])):
+            c = s['counters']
+            name = ('  ' * s['depth'] + s['stage'])[:34]
+            share = 100 * s['wall_s'] / total if total > 0 else 0.0
+            lines.append(f"   {name:34s} {s['wall_s']:8.2f} {share:5.1f} {c['rows_in']:9d} {c['rows_out']:9d} "
+                         f"{c['net_calls']:6d} {c['db_statements']:8d} {s['status']:>7s}")
+        lines.append(f"   {'TOTAL':34s} {total:8.2f}")
+        return lines
+
+
+_current = None
+
+
+def current_run():
+    return _current
+
+
+@contextmanager
+def run(name, path=METRICS_PATH, summary=True):
+    """
+    Abre un run. Si ya hay uno activo (p.ej. run_upload llamado desde el
+    sync) se reutiliza el existente.
+    """
+    global _current
+    if _current is not None:
+        yield _current
+        return
+
+    active = Run(name, path)
+    _current = active
+    status = 'ok'
+    try:
+        yield active
+    except BaseException as e:
+        status = 'error' if not isinstance(e, SystemExit) or e.code else 'ok'
+        raise
+    finally:
+        _current = None
+        wall = round(time.perf_counter() - active._t0, 4)
+        totals = {k: sum(s['counters'][k] for s in active.stages if s['depth'] == 0) for k in COUNTERS}
+        active.emit({'run_id': active.run_id, 'run': name, 'stage': None, 'wall_s': wall,
+                     'status': status, 'counters': totals,
+                     'timestamp': datetime.now().isoformat(timespec='seconds')})
+        if summary:
+            logger.info("\n" + "=" * 70)
+            logger.info(f"MÉTRICAS POR ETAPA: {active.run_id}")
+            logger.info("=" * 70)
+            for line in active.summary():
+                logger.info(line)
+
+
+@contextmanager
+def stage(name):
+    """Mide una etapa dentro del run activo (no-op sin run). Con traza activa es además un span."""
+    with tracing.span(name), _stage(name) as record:
+        yield record
+
+
+@contextmanager
+def _stage(name):
+    active = _current
+    if active is None:
+        yield None
+        return
+
+    with active._lock:
+        record = {
+            'run_id': active.run_id,
+            'run': active.name,
+            'stage': name,
+            'path': '/'.join([s['stage'] for s in active._stack] + [name]),
+            'depth': len(active._stack),
+            'counters': dict.fromkeys(COUNTERS, 0),
+        }
+        active._stack.append(record)
+
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    record['start_s'] = round(wall0 - active._t0, 4)
+    record['status'] = 'ok'
+    try:
+        yield record
+    except BaseException as e:
+        if not isinstance(e, SystemExit) or e.code:
+            record['status'] = 'error'
+            record['error'] = f"{type(e).__name__}: {e}"[:200]
+        raise
+    finally:
+        record['wall_s'] = round(time.perf_counter() - wall0, 4)
+        record['cpu_s'] = round(time.process_time() - cpu0, 4)
+        record['timestamp'] = datetime.now().isoformat(timespec='seconds')
+        with active._lock:
+            active._stack.remove(record)
+            active.stages.append(record)
+        active.emit(record)
+
+
+def count(**counters):
+    """Suma contadores a todas las etapas abiertas del run activo."""
+    active = _current
+    if active is None or not active._stack:
+        return
+    with active._lock:
+        for record in active._stack:
+            for key, value in counters.items():
+                record['counters'][key] = record['counters'].get(key, 0) + int(value or 0)
+
+
+def instrumented(name=None):
+    """Decorador: la función completa es una etapa (nombre por defecto: su __qualname__)."""
+    def decorator(func):
+        stage_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _count_statement(sql):
+    count(db_statements=1)
+    tracing.event('sqlite', sql=sql[:300])
+
+
+def instrument_connection(conn):
+    """Cuenta las sentencias SQLite de conn como db_statements. Devuelve conn."""
+    if conn is not None:
+        conn.set_trace_callback(_count_statement)
+    return conn
+
+
+def instrument_httpx():
+    """Cuenta los requests httpx (cliente de supabase) como net_calls / net_bytes."""
+    try:
+        import httpx
+    except ImportError:
+        return
+    if getattr(httpx.Client.send, '_instrumented', False):
+        return
+    original = httpx.Client.send
+
+    @functools.wraps(original)
+    def send(self, request, *args, **kwargs):
+        path = request.url.path
+        if '/rest/v1/' in path:  # PostgREST: el span lleva la tabla
+            name = f"supabase {request.method} {path.split('/rest/v1/', 1)[1]}"
+        else:
+            name = f"http {request.method} {request.url.host}"
+        with tracing.span(name, method=request.method, url=str(request.url)[:300]) as s:
+            response = original(self, request, *args, **kwargs)
+            try:
+                sent = len(request.content)
+            except Exception:  # request en streaming
+                sent = 0
+            try:
+                received = int(response.headers.get('content-length') or 0)
+            except ValueError:
+                received = 0
+            count(net_calls=1, net_bytes=sent + received)
+            if s is not None:
+                s.set(status=response.status_code, bytes=sent + received)
+        return response
+
+    send._instrumented = True
+    httpx.Client.send = send
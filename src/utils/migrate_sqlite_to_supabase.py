@@ -8,6 +8,7 @@ from tqdm import tqdm
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 from src.utils.supabase_client import SupabaseManager
+from src.utils import instrumentation, tracing
 
 DB_PATH = 'data/db/hipica_data.db'
 
@@ -15,7 +16,7 @@ def get_sqlite_conn():
     if not os.path.exists(DB_PATH):
         print(f"❌ Database not found at {DB_PATH}")
         return None
-    return sqlite3.connect(DB_PATH)
+    return instrumentation.instrument_connection(sqlite3.connect(DB_PATH))
 
 def fetch_all_supabase(query_builder):
     """
@@ -36,6 +37,7 @@ def fetch_all_supabase(query_builder):
         
     return all_data
 
+@tracing.traced('migracion migrate_table')
 def migrate_table(table_name, supabase_table, mapping=None, on_conflict=None, columns=None):
     """
     Reads a table from SQLite and upserts to Supabase.
@@ -52,6 +54,7 @@ def migrate_table(table_name, supabase_table, mapping=None, on_conflict=None, co
         # Read from SQLite
         df = pd.read_sql(f"SELECT * FROM {table_name}", conn)
         conn.close()
+        instrumentation.count(rows_in=len(df))
         
         if df.empty:
             print(f"   ⚠️ Table {table_name} is empty.")
@@ -105,12 +108,14 @@ def migrate_table(table_name, supabase_table, mapping=None, on_conflict=None, co
 
             # Upsert with on_conflict to handle existing records
             res = client.upsert(supabase_table, clean_batch, on_conflict=on_conflict)
+            instrumentation.count(rows_out=len(clean_batch))
             
         print(f"   ✅ Migration of {table_name} completed.")
         
     except Exception as e:
         print(f"   ❌ Error migrating {table_name}: {e}")
 
+@instrumentation.instrumented('migracion')
 def run_migration():
     print("🏁 Starting Full Migration to Supabase...")
     
@@ -131,6 +136,7 @@ def run_migration():
     if conn:
         df = pd.read_sql("SELECT id, nombre FROM hipodromos", conn)
         conn.close()
+        instrumentation.count(rows_in=len(df))
         
         if not df.empty:
             print(f"   Items to migrate: {len(df)}")
@@ -154,6 +160,7 @@ def run_migration():
                 if clean_records:
                     print(f"   New hipodromos to sync: {len(clean_records)}")
                     client.get_client().table('hipodromos').upsert(clean_records, on_conflict='id').execute()
+                    instrumentation.count(rows_out=len(clean_records))
                     print("   ✅ New hipodromos inserted.")
                 else:
                     print("   ✅ No new hipodromos to sync.")
@@ -182,6 +189,7 @@ def run_migration():
             FROM jornadas j
             JOIN hipodromos h ON j.hipodromo_id = h.id
         """, conn)
+        instrumentation.count(rows_in=len(sqlite_jornadas))
         
         # Get hipodromo mapping: nombre -> Supabase ID using pagination
         sup_hip = fetch_all_supabase(client.get_client().table('hipodromos').select('id, nombre'))
@@ -207,6 +215,7 @@ def run_migration():
                     client.get_client().table('jornadas').upsert(
                         records, on_conflict='hipodromo_id,fecha'
                     ).execute()
+                    instrumentation.count(rows_out=len(records))
                     print(f"   ✅ Jornadas migrated: {len(records)}")
                 except Exception as e:
                     print(f"   ❌ Error: {e}")
@@ -226,6 +235,7 @@ def run_migration():
             JOIN hipodromos h ON j.hipodromo_id = h.id
         """, conn)
         conn.close()
+        instrumentation.count(rows_in=len(sqlite_carreras))
         
         # Get current jornadas from Supabase for mapping using pagination
         sup_jornadas = fetch_all_supabase(client.get_client().table('jornadas').select(
@@ -291,6 +301,7 @@ def run_migration():
                         inserted += len(batch)
                     except Exception as e:
                         print(f"   ⚠️ Error batch {i//batch_size}: {str(e)[:80]}")
+                instrumentation.count(rows_out=inserted)
                 print(f"   ✅ Carreras migrated: {inserted} new records")
     
     # 6. Participaciones - CRITICAL: Map using cascading natural keys
@@ -351,6 +362,7 @@ def run_migration():
         # ============================================================
         df = pd.read_sql("SELECT * FROM participaciones", conn)
         conn.close()
+        instrumentation.count(rows_in=len(df))
         
         if not df.empty:
             # Map carrera_id to Supabase IDs
@@ -417,6 +429,7 @@ def run_migration():
                 except Exception as e:
                     print(f"   ⚠️ Error batch {i//batch_size}: {str(e)[:80]}")
                 
+            instrumentation.count(rows_out=success_count)
             print(f"   ✅ Participaciones migrated: {success_count} records")
 
 if __name__ == "__main__":
@@ -0,0 +1,434 @@
+"""
+Profiling de Entrenamiento
+--------------------------
+Registra por etapa: tiempo de pared, tiempo de CPU y pico de memoria (RSS).
+
+Uso:
+    profiler = TrainingProfiler('lgbm_optimized')
+    with profiler.stage('data_load'):
+        df = cargar_datos_3nf()
+    profiler.save('src/models/lgbm_optimized_profile.json')
+
+Las etapas se pueden anidar ('oof/LightGBM/fold_1'). El pico de RSS se
+obtiene muestreando la memoria del proceso en un hilo de fondo mientras hay
+etapas abiertas (psutil si está instalado, /proc/self/statm en Linux).
+
+Profiling bajo demanda de un entry point completo (sync, train_*,
+inferencia) con `--profile[=modos]` o `PISTA_PROFILE=modos`:
+
+    PISTA_PROFILE=1 python sync_system.py
+    python src/models/train_v5_optimized.py --profile=sample,memory
+
+Modos: cprofile (.prof + top funciones), sample (stacks colapsados para
+flamegraph) y memory (tracemalloc). Salida en logs/profiles/. Apagado no
+agrega costo (nullcontext, sin imports).
+
+Author: ML Engineering Team
+Date: 2026-10-19
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+try:
+    import psutil
+    _PROCESS = psutil.Process()
+except ImportError:
+    psutil = None
+    _PROCESS = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def current_rss_mb():
+    """RSS actual del proceso en MB (None si no se puede medir)."""
+    if _PROCESS is not None:
+        return _PROCESS.memory_info().rss / 1024 ** 2
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def max_rss_mb():
+    """Pico histórico de RSS del proceso en MB (ru_maxrss)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    return peak / 1024 ** 2 if os.uname().sysname == 'Darwin' else peak / 1024
+
+
+def maybe_stage(profiler, name):
+    """Context manager de etapa, o no-op si no hay profiler."""
+    return profiler.stage(name) if profiler is not None else nullcontext()
+
+
+class TrainingProfiler:
+    """
+    Profiler de etapas para scripts de entrenamiento.
+
+    Cada etapa registra wall_s, cpu_s, rss_start_mb, rss_end_mb y peak_rss_mb.
+    """
+
+    def __init__(self, run_name, sample_interval=0.05):
+        self.run_name = run_name
+        self.sample_interval = sample_interval
+        self.stages = []
+        self._stack = []
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._stop = threading.Event()
+        self._t0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+
+    @contextmanager
+    def stage(self, name):
+        """Mide una etapa; las etapas anidadas se nombran 'padre/hija'."""
+        path = '/'.join([s['stage'] for s in self._stack] + [name])
+        rss = current_rss_mb()
+        record = {
+            'stage': name,
+            'path': path,
+            'depth': len(self._stack),
+            'rss_start_mb': rss,
+            'peak_rss_mb': rss,
+        }
+        maxrss_before = max_rss_mb()
+
+        with self._lock:
+            self._stack.append(record)
+        self._ensure_sampler()
+
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        record['start_s'] = round(wall0 - self._t0, 4)
+        try:
+            yield record
+        finally:
+            record['wall_s'] = round(time.perf_counter() - wall0, 4)
+            record['cpu_s'] = round(time.process_time() - cpu0, 4)
+            rss_end = current_rss_mb()
+            record['rss_end_mb'] = rss_end
+
+            with self._lock:
+                self._stack.remove(record)
+                self._update_peak(record, rss_end)
+                # Si el pico histórico subió durante la etapa, ése es su pico real
+                maxrss_after = max_rss_mb()
+                if maxrss_after is not None and maxrss_before is not None and maxrss_after > maxrss_before:
+                    self._update_peak(record, maxrss_after)
+                stack_empty = not self._stack
+
+            if stack_empty:
+                self._stop_sampler()
+
+            for key in ('rss_start_mb', 'rss_end_mb', 'peak_rss_mb'):
+                if record[key] is not None:
+                    record[key] = round(record[key], 1)
+            self.stages.append(record)
+
+    @staticmethod
+    def _update_peak(record, rss):
+        if rss is not None and (record['peak_rss_mb'] is None or rss > record['peak_rss_mb']):
+            record['peak_rss_mb'] = rss
+
+    def _ensure_sampler(self):
+        if self._sampler is not None and self._sampler.is_alive():
+            return
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample_loop, daemon=True)
+        self._sampler.start()
+
+    def _stop_sampler(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join(timeout=1.0)
+        self._sampler = None
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.sample_interval):
+            rss = current_rss_mb()
+            with self._lock:
+                for record in self._stack:
+                    self._update_peak(record, rss)
+
+    def report(self):
+        """Dict serializable con el resumen del run."""
+        return {
+            'run': self.run_name,
+            'timestamp': datetime.now().strftime('%Y%m%d_%H%M%S'),
+            'total_wall_s': round(time.perf_counter() - self._t0, 3),
+            'total_cpu_s': round(time.process_time() - self._cpu0, 3),
+            'peak_rss_mb': round(max_rss_mb() or 0.0, 1),
+            'rss_source': 'psutil' if _PROCESS is not None else 'procfs',
+            'stages': sorted(self.stages, key=lambda s: (s['start_s'], s['depth']))
+        }
+
+    def log_summary(self):
+        logger.info("\n" + "=" * 70)
+        logger.info(f"PROFILE: {self.run_name}")
+        logger.info("=" * 70)
+        logger.info(f"   {'Etapa':40s} {'Wall(s)':>9s} {'CPU(s)':>9s} {'Peak MB':>9s}")
+        for s in sorted(self.stages, key=lambda s: (s['start_s'], s['depth'])):
+            if s['depth'] > 1:
+                continue
+            name = ('  ' * s['depth'] + s['stage'])[:40]
+            peak = f"{s['peak_rss_mb']:.0f}" if s['peak_rss_mb'] is not None else '-'
+            logger.info(f"   {name:40s} {s['wall_s']:9.2f} {s['cpu_s']:9.2f} {peak:>9s}")
+
+    def save(self, path, history_path=None, regression_threshold=0.25):
+        """
+        Guarda el perfil en JSON y lo compara con el perfil anterior.
+
+        Args:
+            path: JSON del último run (se sobreescribe)
+            history_path: JSONL acumulativo (default: training_profile_history.jsonl
+                          en el mismo directorio)
+            regression_threshold: aumento relativo de wall time que se reporta
+
+        Returns:
+            Lista de regresiones detectadas contra el run anterior
+        """
+        report = self.report()
+        regressions = []
+
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    regressions = compare_profiles(json.load(f), report, regression_threshold)
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️ No se pudo leer perfil anterior {path}: {e}")
+        report['regressions'] = regressions
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+        history_path = history_path or os.path.join(
+            os.path.dirname(path), 'training_profile_history.jsonl')
+        with open(history_path, 'a') as f:
+            f.write(json.dumps({
+                'run': report['run'],
+                'timestamp': report['timestamp'],
+                'total_wall_s': report['total_wall_s'],
+                'peak_rss_mb': report['peak_rss_mb'],
+                'stages': {s['path']: s['wall_s'] for s in report['stages']}
+            }) + '\n')
+
+        self.log_summary()
+        for r in regressions:
+            logger.warning(f"⚠️ Regresión en '{r['stage']}': {r['previous_s']:.2f}s -> "
+                           f"{r['current_s']:.2f}s ({r['change']:+.0%})")
+        logger.info(f"✅ Profile: {path}")
+        return regressions
+
+
+def compare_profiles(previous, current, threshold=0.25, min_seconds=1.0):
+    """Etapas cuyo wall time creció más de `threshold` respecto del run anterior."""
+    prev = {s['path']: s['wall_s'] for s in previous.get('stages', [])}
+    regressions = []
+    for s in current.get('stages', []):
+        before = prev.get(s['path'])
+        if before is None or max(before, s['wall_s']) < min_seconds:
+            continue
+        change = (s['wall_s'] - before) / before if before > 0 else float('inf')
+        if change > threshold:
+            regressions.append({
+                'stage': s['path'],
+                'previous_s': before,
+                'current_s': s['wall_s'],
+                'change': round(change, 3)
+            })
+    return regressions
+
+
+# ---------------------------------------------------------------------------
+# Profiling bajo demanda de entry points (sync, train_*, inferencia)
+# ---------------------------------------------------------------------------
+
+PROFILE_ENV = 'PISTA_PROFILE'
+PROFILE_DIR = 'logs/profiles'
+PROFILE_MODES = ['cprofile', 'sample', 'memory']
+DEFAULT_PROFILE_MODES = ['cprofile', 'memory']
+
+
+def profile_modes(value=None):
+    """
+    Modos pedidos por CLI (value) o por la variable PISTA_PROFILE.
+
+    '' / '0' / 'off' = apagado; '1' / 'on' = cprofile + memory;
+    si no, lista separada por comas de PROFILE_MODES ('sample,memory').
+    """
+    if value is None:
+        value = os.environ.get(PROFILE_ENV, '')
+    value = str(value).strip().lower()
+    if value in ('', '0', 'off', 'false', 'no'):
+        return []
+    if value in ('1', 'on', 'true', 'yes'):
+        return list(DEFAULT_PROFILE_MODES)
+    modes = [m.strip() for m in value.split(',') if m.strip()]
+    unknown = [m for m in modes if m not in PROFILE_MODES]
+    if unknown:
+        raise ValueError(f"Modo de profiling desconocido: {unknown} (válidos: {PROFILE_MODES})")
+    return modes
+
+
+def pop_profile_arg(argv=None):
+    """
+    Quita --profile / --profile=modos de argv (scripts sin argparse).
+    Devuelve el valor ('1' si viene sin modos) o None si no estaba.
+    """
+    argv = sys.argv if argv is None else argv
+    value = None
+    for arg in list(argv[1:]):
+        if arg == '--profile':
+            value = '1'
+            argv.remove(arg)
+        elif arg.startswith('--profile='):
+            value = arg.split('=', 1)[1] or '1'
+            argv.remove(arg)
+    return value
+
+
+class StackSampler:
+    """
+    Profiler de muestreo: cada `interval` segundos toma el stack de los
+    demás hilos (sys._current_frames) y acumula stacks colapsados
+    ('hilo;modulo:funcion;...' -> muestras), el formato de flamegraph.pl,
+    speedscope e inferno.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def _loop(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+                    stack.append(f'{module}:{code.co_name}')
+                    frame = frame.f_back
+                key = ';'.join([names.get(ident, str(ident))] + stack[::-1])
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def write_folded(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, n in sorted(self.stacks.items(), key=lambda kv: -kv[1]):
+                f.write(f'{stack} {n}\n')
+
+
+def profile_run(name, modes=None, output_dir=PROFILE_DIR, interval=0.005, top=25):
+    """
+    Envuelve un entry point en los profilers pedidos. Con el switch apagado
+    devuelve un nullcontext: no importa cProfile/tracemalloc ni arranca
+    hilos (overhead cero).
+
+    Uso:
+        with profile_run('sync', args.profile):   # o PISTA_PROFILE=cprofile,memory
+            main()
+
+    Salida en logs/profiles/<name>_<timestamp>:
+        .prof          cProfile (snakeviz, flameprof, pstats)
+        _cprofile.txt  top funciones por tiempo acumulado
+        .folded        stacks colapsados del muestreo (flamegraph.pl / speedscope)
+        _memory.txt    top asignaciones de tracemalloc + pico
+    """
+    modes = profile_modes(modes)
+    if not modes:
+        return nullcontext()
+    return _profiled(name, modes, output_dir, interval, top)
+
+
+@contextmanager
+def _profiled(name, modes, output_dir, interval, top):
+    os.makedirs(output_dir, exist_ok=True)
+    prefix = os.path.join(output_dir, f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    outputs = {}
+    logger.info(f"🔬 Profiling {name}: {', '.join(modes)} -> {prefix}*")
+
+    tracemalloc = profiler = sampler = None
+    if 'memory' in modes:
+        import tracemalloc
+        tracemalloc.start(10)
+    if 'sample' in modes:
+        sampler = StackSampler(interval)
+        sampler.start()
+    if 'cprofile' in modes:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        yield outputs
+    finally:
+        if profiler is not None:
+            import io
+            import pstats
+            profiler.disable()
+            outputs['cprofile'] = f'{prefix}.prof'
+            profiler.dump_stats(outputs['cprofile'])
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(top)
+            outputs['cprofile_txt'] = f'{prefix}_cprofile.txt'
+            with open(outputs['cprofile_txt'], 'w', encoding='utf-8') as f:
+                f.write(text.getvalue())
+
+        if sampler is not None:
+            sampler.stop()
+            outputs['folded'] = f'{prefix}.folded'
+            sampler.write_folded(outputs['folded'])
+
+        if tracemalloc is not None:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            snapshot = snapshot.filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+            ])
+            outputs['memory'] = f'{prefix}_memory.txt'
+            with open(outputs['memory'], 'w', encoding='utf-8') as f:
+                f.write(f"Pico tracemalloc: {peak / 1024 ** 2:.1f} MB | "
+                        f"Actual: {current / 1024 ** 2:.1f} MB | "
+                        f"Pico RSS: {max_rss_mb() or 0:.1f} MB\n\n")
+                f.write(f"Top {top} asignaciones (por línea):\n")
+                for stat in snapshot.statistics('lineno')[:top]:
+                    frame = stat.traceback[0]
+                    f.write(f"{stat.size / 1024 ** 2:10.2f} MB {stat.count:9d} bloques  "
+                            f"{frame.filename}:{frame.lineno}\n")
+
+        for kind, path in outputs.items():
+            logger.info(f"   {kind:13s} {path}")
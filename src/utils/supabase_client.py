@@ -1,7 +1,12 @@
 import os
-from supabase import create_client, Client
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
 
+from src.utils import tracing
+
+if TYPE_CHECKING:
+    from supabase import Client
+
 # Load env vars
 load_dotenv()
 
@@ -24,14 +29,19 @@ class SupabaseManager:
             return
             
         try:
-            self.client: Client = create_client(url, key)
+            # supabase se importa al crear el cliente, no al importar el módulo
+            from supabase import create_client
+            from src.utils.instrumentation import instrument_httpx
+            with tracing.span('SupabaseManager.init_client'):
+                self.client = create_client(url, key)
+            instrument_httpx()
             # Test connection basic
             # self.client.table('hipodromos').select("id").limit(1).execute()
         except Exception as e:
             print(f"❌ Error initializing Supabase: {e}")
             self.client = None
 
-    def get_client(self) -> Client:
+    def get_client(self) -> "Client":
         if not self.client:
             self.init_client()
         return self.client
@@ -41,7 +51,8 @@ class SupabaseManager:
         c = self.get_client()
         if not c: return None
         try:
-            return c.table(table).insert(data).execute()
+            with tracing.span(f'SupabaseManager.insert {table}', table=table, rows=1):
+                return c.table(table).insert(data).execute()
         except Exception as e:
             print(f"Error inserting into {table}: {e}")
             return None
@@ -55,7 +66,9 @@ class SupabaseManager:
                 query = c.table(table).upsert(data, on_conflict=on_conflict)
             else:
                 query = c.table(table).upsert(data)
-            return query.execute()
+            with tracing.span(f'SupabaseManager.upsert {table}', table=table,
+                              rows=len(data) if isinstance(data, list) else 1, on_conflict=on_conflict):
+                return query.execute()
         except Exception as e:
             print(f"Error upserting into {table}: {e}")
             return None
@@ -65,7 +78,8 @@ class SupabaseManager:
         c = self.get_client()
         if not c: return None
         try:
-            return c.table(table).insert(data_list).execute()
+            with tracing.span(f'SupabaseManager.bulk_insert {table}', table=table, rows=len(data_list)):
+                return c.table(table).insert(data_list).execute()
         except Exception as e:
             print(f"Error bulk inserting into {table}: {e}")
             return None
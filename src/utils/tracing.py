@@ -0,0 +1,256 @@
+"""
+Trazas Estructuradas (spans)
+----------------------------
+Correlaciona las llamadas a Supabase, SQLite y HTTP de un sync: cada span
+tiene id, parent_id, nombre, atributos, inicio y duración, y se anida en
+el span abierto del mismo hilo.
+
+    from src.utils import tracing
+
+    with tracing.trace_run('sync', args.trace):      # o PISTA_TRACE=1
+        with tracing.span('upload', races=12):
+            with tracing.span('supabase POST predicciones') as s:
+                ...
+                s.set(status=201)
+
+    @tracing.traced('sqlite cargar_programa')
+    def cargar_programa(...):
+        ...
+
+Qué se traza:
+- etapas del sync (instrumentation.stage abre un span por etapa)
+- requests httpx de supabase (instrument_httpx) y los helpers de
+  SupabaseManager
+- helpers SQLite de data_manager; cada sentencia SQLite de una conexión
+  instrumentada queda como evento instantáneo dentro del span
+- requests.get de monitor_pozos y scraper
+
+Al cerrar la traza se escribe logs/traces/<nombre>_<timestamp>.json en
+formato Chrome Trace Event (abrir en https://ui.perfetto.dev o
+chrome://tracing): un evento 'X' por span (args: span_id, parent_id y
+atributos) y un evento 'i' por evento instantáneo. Además se loguean los
+spans hermanos repetidos (mismo nombre bajo el mismo padre): un patrón N+1
+aparece como "upload: 58 x supabase GET predicciones".
+
+Sin traza activa, span(), event() y el decorador no hacen nada.
+
+Author: ML Engineering Team
+Date: 2026-10-19
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import functools
+import itertools
+import threading
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+TRACE_ENV = 'PISTA_TRACE'
+TRACE_DIR = 'logs/traces'
+REPEAT_THRESHOLD = 10  # hermanos con el mismo nombre desde los que se reportan
+
+
+class Span:
+    """Un span: nombre, atributos y tiempos (microsegundos desde el inicio de la traza)."""
+
+    __slots__ = ('span_id', 'parent_id', 'name', 'attributes', 'start_us', 'dur_us', 'tid', 'status')
+
+    def __init__(self, span_id, parent_id, name, attributes, start_us, tid):
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start_us = start_us
+        self.dur_us = None
+        self.tid = tid
+        self.status = 'ok'
+
+    def set(self, **attributes):
+        """Agrega atributos (p.ej. status o bytes conocidos al terminar)."""
+        self.attributes.update(attributes)
+
+
+class Trace:
+    """Spans y eventos de una ejecución (p.ej. un sync completo)."""
+
+    def __init__(self, name, path=None):
+        self.name = name
+        self.path = path
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.spans = []
+        self.events = []
+        self._ids = itertools.count(1)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _now_us(self):
+        return (time.perf_counter() - self._t0) * 1e6
+
+    def current_span(self):
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def repeated(self, threshold=REPEAT_THRESHOLD):
+        """
+        Spans hermanos repetidos: [(padre, nombre, n, total_ms)] con n >=
+        threshold, de mayor a menor n.
+        """
+        names = {s.span_id: s.name for s in self.spans}
+        groups = defaultdict(lambda: [0, 0.0])
+        for s in self.spans:
+            group = groups[(s.parent_id, s.name)]
+            group[0] += 1
+            group[1] += (s.dur_us or 0) / 1000
+        found = [(names.get(parent, '(raíz)'), name, n, round(total, 1))
+                 for (parent, name), (n, total) in groups.items() if n >= threshold]
+        return sorted(found, key=lambda r: (-r[2], -r[3]))
+
+    def to_chrome(self):
+        """Formato Chrome Trace Event (JSON object format)."""
+        pid = os.getpid()
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0,
+                   'args': {'name': f'{self.name} ({self.trace_id})'}}]
+        for s in sorted(self.spans, key=lambda s: s.start_us):
+            events.append({
+                'name': s.name, 'cat': s.name.split(' ', 1)[0], 'ph': 'X',
+                'ts': round(s.start_us, 1), 'dur': round(s.dur_us or 0, 1), 'pid': pid, 'tid': s.tid,
+                'args': {'span_id': s.span_id, 'parent_id': s.parent_id, 'status': s.status, **s.attributes},
+            })
+        for name, ts, tid, parent_id, attributes in self.events:
+            events.append({
+                'name': name, 'cat': name.split(' ', 1)[0], 'ph': 'i', 's': 't',
+                'ts': round(ts, 1), 'pid': pid, 'tid': tid,
+                'args': {'parent_id': parent_id, **attributes},
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms',
+                'otherData': {'trace_id': self.trace_id, 'name': self.name,
+                              'created': datetime.now().isoformat(timespec='seconds')}}
+
+    def save(self, path=None):
+        path = path or self.path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_chrome(), f, ensure_ascii=False, default=str)
+        return path
+
+
+_current = None
+
+
+def current_trace():
+    return _current
+
+
+@contextmanager
+def trace(name, path=None):
+    """
+    Abre una traza con un span raíz `name`; al cerrar escribe `path` (si
+    se indica) y loguea los spans repetidos. Si ya hay una traza activa se
+    reutiliza.
+    """
+    global _current
+    if _current is not None:
+        with span(name):
+            yield _current
+        return
+
+    active = Trace(name, path)
+    _current = active
+    try:
+        with span(name):
+            yield active
+    finally:
+        _current = None
+        if path:
+            active.save()
+            logger.info(f"🧭 Traza {active.trace_id}: {len(active.spans)} spans -> {path}")
+        for parent, child, n, total_ms in active.repeated():
+            logger.info(f"   ⚠️ {parent}: {n} x {child} ({total_ms:.0f} ms)")
+
+
+def trace_path(value=None, name='trace', output_dir=TRACE_DIR):
+    """
+    Archivo de traza pedido por CLI (value) o por PISTA_TRACE: '' / '0' /
+    'off' = apagado (None); '1' / 'on' = logs/traces/<name>_<timestamp>.json;
+    si no, value es la ruta del archivo.
+    """
+    if value is None:
+        value = os.environ.get(TRACE_ENV, '')
+    value = str(value).strip()
+    if value.lower() in ('', '0', 'off', 'false', 'no'):
+        return None
+    if value.lower() in ('1', 'on', 'true', 'yes'):
+        return os.path.join(output_dir, f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    return value
+
+
+def trace_run(name, value=None, output_dir=TRACE_DIR):
+    """Traza de un entry point con el switch --trace / PISTA_TRACE (apagado: nullcontext)."""
+    path = trace_path(value, name, output_dir)
+    if path is None:
+        return nullcontext()
+    return trace(name, path)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Span hijo del span abierto en este hilo (no-op sin traza)."""
+    active = _current
+    if active is None:
+        yield None
+        return
+
+    stack = active._stack()
+    record = Span(next(active._ids), stack[-1].span_id if stack else None, name, attributes,
+                  active._now_us(), threading.get_native_id())
+    stack.append(record)
+    try:
+        yield record
+    except BaseException as e:
+        if not isinstance(e, SystemExit) or e.code:
+            record.status = 'error'
+            record.attributes['error'] = f"{type(e).__name__}: {e}"[:200]
+        raise
+    finally:
+        record.dur_us = active._now_us() - record.start_us
+        stack.remove(record)
+        with active._lock:
+            active.spans.append(record)
+
+
+def event(name, **attributes):
+    """Evento instantáneo dentro del span abierto (p.ej. una sentencia SQL)."""
+    active = _current
+    if active is None:
+        return
+    parent = active.current_span()
+    with active._lock:
+        active.events.append((name, active._now_us(), threading.get_native_id(),
+                              parent.span_id if parent else None, attributes))
+
+
+def traced(name=None):
+    """Decorador: cada llamada es un span (nombre por defecto: su __qualname__)."""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -12,13 +12,13 @@ import sys
 import json
 import logging
 from datetime import datetime
-import pandas as pd
 from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
 
 # Add project root to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 from src.utils.supabase_client import SupabaseManager
+from src.utils import instrumentation, tracing
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -39,6 +39,7 @@ def load_predictions():
     return predictions
 
 
+@tracing.traced('upload resolve_carrera_id')
 def resolve_carrera_id(db, hipodromo: str, fecha: str, nro_carrera: int) -> str:
     """
     Resolve carrera_id from hipodromo + fecha + nro_carrera.
@@ -146,7 +147,7 @@ def get_hora_distancia_from_sqlite(fecha: str, hipodromo: str, nro_carrera: int)
         if not os.path.exists(DB_PATH):
             return (None, None)
         
-        conn = sqlite3.connect(DB_PATH)
+        conn = instrumentation.instrument_connection(sqlite3.connect(DB_PATH))
         cursor = conn.cursor()
         
         # Query programa_carreras for hora and distancia
@@ -180,36 +181,40 @@ def get_hora_distancia_from_sqlite(fecha: str, hipodromo: str, nro_carrera: int)
         return (None, None)
 
 
-def upload_predictions_to_supabase(predictions: list, force_overwrite: bool = False) -> int:
+def upload_predictions_to_supabase(predictions: list, force_overwrite: bool = False, failed_races=None) -> int:
     """
     Upload predictions to Supabase 'predicciones' table.
     Returns number of successfully uploaded predictions.
+    
+    Args:
+        failed_races: Optional list; race keys that could not be uploaded are
+                      appended to it (the caller only confirms the rest).
     """
     if not predictions:
         logger.warning("⚠️ No predictions to upload")
         return 0
     
+    # Group predictions by carrera for ranking (sin pandas: el upload no lo necesita)
+    by_race = {}
+    for p in predictions:
+        by_race.setdefault(f"{p['fecha']}_{p['hipodromo']}_{p['carrera']}", []).append(p)
+    
+    if failed_races is None:
+        failed_races = []
+    
     db = SupabaseManager()
     client = db.get_client()
     
     if not client:
         logger.error("❌ Supabase client not available")
+        failed_races.extend(sorted(by_race))
         return 0
     
-    # Group predictions by carrera for ranking
-    df = pd.DataFrame(predictions)
-    
-    if df.empty:
-        return 0
-    
-    # Create unique race identifier
-    df['race_key'] = df['fecha'] + '_' + df['hipodromo'] + '_' + df['carrera'].astype(str)
-    
     uploaded_count = 0
-    failed_races = []
     
     # Process by race
-    for race_key, group in df.groupby('race_key'):
+    for race_key in sorted(by_race):
+        group = by_race[race_key]
         # Parse race info
         parts = race_key.split('_')
         fecha = parts[0]
@@ -234,7 +239,7 @@ def upload_predictions_to_supabase(predictions: list, force_overwrite: bool = Fa
                 logger.warning(f"   ⚠️ Could not check existing predictions for C{nro_carrera}: {e}")
         
         # Sort by probability for ranking
-        group_sorted = group.sort_values('probabilidad', ascending=False).reset_index(drop=True)
+        group_sorted = sorted(group, key=lambda p: p['probabilidad'], reverse=True)
         
         # Delete existing predictions for this carrera (to avoid duplicates)
         try:
@@ -244,10 +249,11 @@ def upload_predictions_to_supabase(predictions: list, force_overwrite: bool = Fa
         
         # Prepare records
         records = []
-        for rank, (_, row) in enumerate(group_sorted.iterrows(), 1):
+        for rank, row in enumerate(group_sorted, 1):
+            numero = row.get('numero')
             record = {
                 'carrera_id': carrera_id,
-                'numero_caballo': int(row['numero']) if pd.notna(row['numero']) else 0,
+                'numero_caballo': int(numero) if numero is not None and numero == numero else 0,
                 'caballo': str(row['caballo']),
                 'jinete': str(row.get('jinete', '')),
                 'probabilidad': float(row['probabilidad']) / 100.0,  # Store as 0-1
@@ -262,6 +268,8 @@ def upload_predictions_to_supabase(predictions: list, force_overwrite: bool = Fa
             if result.data:
                 uploaded_count += len(records)
                 logger.info(f"   ✅ Uploaded {len(records)} predictions for C{nro_carrera}")
+            else:
+                failed_races.append(race_key)
         except Exception as e:
             logger.error(f"   ❌ Error uploading predictions for {race_key} after retries: {e}")
             failed_races.append(race_key)
@@ -314,8 +322,16 @@ def verify_upload(client, expected_races, fecha_inicio):
         return False
 
 
-def run_upload(force_overwrite: bool = False):
-    """Main function to upload predictions with verification"""
+@instrumentation.instrumented('upload')
+def run_upload(force_overwrite: bool = False, races=None, failed_races=None):
+    """
+    Main function to upload predictions with verification.
+    
+    Args:
+        races: Optional race keys (fecha_hipodromo_carrera) that changed in the
+               last inference run; untouched races are skipped. None = all.
+        failed_races: Optional list that receives the race keys that failed.
+    """
     logger.info("=" * 60)
     logger.info("📤 UPLOAD PREDICTIONS TO SUPABASE (v2.0 - With Retry)")
     logger.info("=" * 60)
@@ -327,10 +343,21 @@ def run_upload(force_overwrite: bool = False):
         logger.warning("No predictions to upload. Run inference first.")
         return 0
     
+    if races is not None:
+        from src.models.prediction_cache import race_key
+        races = set(races)
+        total = len(predictions)
+        predictions = [p for p in predictions if race_key(p['fecha'], p['hipodromo'], p['carrera']) in races]
+        logger.info(f"   Carreras cambiadas: {len(races)} ({len(predictions)}/{total} predicciones)")
+        if not predictions:
+            logger.info("✅ Sin carreras cambiadas: nada que subir")
+            return 0
+    
+    instrumentation.count(rows_in=len(predictions))
+    
     # Get fecha range for verification
-    df = pd.DataFrame(predictions)
-    fecha_inicio = df['fecha'].min()
-    num_races = len(df.groupby(['fecha', 'hipodromo', 'carrera']))
+    fecha_inicio = min(p['fecha'] for p in predictions)
+    num_races = len({(p['fecha'], p['hipodromo'], p['carrera']) for p in predictions})
     
     logger.info(f"\nPreparando upload:")
     logger.info(f"   Total predicciones: {len(predictions)}")
@@ -338,7 +365,9 @@ def run_upload(force_overwrite: bool = False):
     logger.info(f"   Fecha inicio: {fecha_inicio}")
     
     # Upload
-    count = upload_predictions_to_supabase(predictions, force_overwrite=force_overwrite)
+    count = upload_predictions_to_supabase(predictions, force_overwrite=force_overwrite,
+                                           failed_races=failed_races)
+    instrumentation.count(rows_out=count)
     
     # Verify
     db = SupabaseManager()
@@ -3,7 +3,9 @@ import os
 import time
 import logging
 import argparse
-import requests
+
+from src.utils import instrumentation, tracing
+from src.utils.profiling import profile_run
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -20,7 +22,9 @@ def trigger_vercel_redeploy():
         return False
     
     try:
+        import requests
         response = requests.post(deploy_hook, timeout=30)
+        instrumentation.count(net_calls=1)
         if response.status_code == 200 or response.status_code == 201:
             logging.info("✅ Vercel redeploy disparado exitosamente!")
             return True
@@ -79,11 +83,14 @@ def main(force_sync=False):
     # PASO 3: INFERENCIA (Generar Predicciones con LightGBM Optimizado v5.0)
     # ---------------------------------------------------------
     logging.info("\n[PASO 3/5] Ejecutando Inferencia con LightGBM Optimizado v5.0...")
+    changed_races = None  # None => subir todas las carreras
+    pipeline = None
     try:
         from src.models.inference_optimized import OptimizedInferencePipeline
         
-        pipeline = OptimizedInferencePipeline()
-        pipeline.run()
+        with instrumentation.stage('inferencia'):
+            pipeline = OptimizedInferencePipeline()
+            changed_races = pipeline.run()
         logging.info("✅ Predicciones generadas con LightGBM Optimizado v5.0 (NDCG: 0.7410).")
         
     except Exception as e:
@@ -97,7 +104,20 @@ def main(force_sync=False):
     try:
         from src.utils.upload_predictions_supabase import run_upload
         
-        uploaded = run_upload(force_overwrite=force_sync)
+        # Sólo las carreras recalculadas o con un upload anterior sin confirmar
+        # (el cache reutiliza las que no cambiaron)
+        failed_races = []
+        races = None if force_sync else changed_races
+        overwrite = pipeline.overwrite_races if races is not None else []
+        uploaded = run_upload(force_overwrite=force_sync,
+                              races=None if races is None else [r for r in races if r not in overwrite],
+                              failed_races=failed_races)
+        if overwrite:
+            # Retiros cuyo upload no se confirmó: reemplazan la carrera ya publicada
+            uploaded += run_upload(force_overwrite=True, races=overwrite, failed_races=failed_races)
+        if pipeline is not None and changed_races:
+            # Recién ahora quedan confirmadas; las fallidas se reintentan en el próximo sync
+            pipeline.mark_uploaded(set(changed_races) - set(failed_races))
         logging.info(f"✅ {uploaded} predicciones subidas a Supabase.")
         
     except Exception as e:
@@ -110,7 +130,8 @@ def main(force_sync=False):
     logging.info("\n[PASO 4/5] Ejecutando Monitor de Pozos Millonarios...")
     try:
         from src.scraping.monitor_pozos import main as monitor_pozos_main
-        monitor_pozos_main()
+        with instrumentation.stage('pozos'):
+            monitor_pozos_main()
         logging.info("✅ Monitor de pozos completado.")
     except Exception as e:
         logging.error(f"❌ Error en Monitor de Pozos: {e}")
@@ -130,7 +151,8 @@ def main(force_sync=False):
     # PASO 6: REDEPLOY VERCEL (Opcional)
     # ---------------------------------------------------------
     logging.info("\n[PASO 6/6] Disparando redeploy en Vercel...")
-    trigger_vercel_redeploy()
+    with instrumentation.stage('vercel'):
+        trigger_vercel_redeploy()
 
     logging.info("\n" + "="*70)
     logging.info(f"🎉 PROCESO COMPLETADO en {time.time() - start_time:.2f}s")
@@ -140,6 +162,12 @@ def main(force_sync=False):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--force', action='store_true', help='Forzar re-procesamiento de CSVs')
+    parser.add_argument('--profile', nargs='?', const='1', default=None,
+                        help='Profiling: cprofile,sample,memory (sin valor: cprofile,memory; también PISTA_PROFILE)')
+    parser.add_argument('--trace', nargs='?', const='1', default=None,
+                        help='Traza de spans (Chrome Trace JSON) en logs/traces/ o en la ruta dada (también PISTA_TRACE)')
     args = parser.parse_args()
     
-    main(force_sync=args.force)
\ No newline at end of file
+    # Métricas por etapa en logs/sync_metrics.jsonl + tabla resumen al final
+    with profile_run('sync', args.profile), tracing.trace_run('sync', args.trace), instrumentation.run('sync'):
+        main(force_sync=args.force)
\ No newline at end of file
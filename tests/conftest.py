@@ -0,0 +1,139 @@
+"""
+Fixtures compartidas de los tests.
+
+Author: ML Engineering Team
+Date: 2026-10-19
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+# ---------------------------------------------------------------------------
+# Cache de predicciones / retiros (OptimizedInferencePipeline sin artefactos)
+# ---------------------------------------------------------------------------
+
+class _Modelo:
+    """Scorer determinista que cuenta las filas que predice."""
+
+    def __init__(self):
+        self.rows = 0
+
+    def predict(self, X):
+        self.rows += len(X)
+        return np.asarray(X['peso'], dtype=float) / 100 - np.asarray(X['mandil'], dtype=float)
+
+
+class _Calibrador:
+    def transform(self, scores):
+        return 1 / (1 + np.exp(-scores))
+
+
+@pytest.fixture
+def programa():
+    """(df_enriched, X) de 3 carreras x 5 participantes del 2026-10-20."""
+    rows = []
+    for carrera in (1, 2, 3):
+        for mandil in range(1, 6):
+            rows.append({'fecha': '2026-10-20', 'hipodromo': 'Hipódromo Chile', 'nro_carrera': carrera,
+                         'numero': mandil, 'caballo': f'C{carrera}{mandil}', 'jinete': f'J{mandil}',
+                         'peso': 460 + mandil})
+    df = pd.DataFrame(rows)
+    df['race_unique_id'] = df['fecha'] + '_' + df['hipodromo'] + '_' + df['nro_carrera'].astype(str)
+    X = pd.DataFrame({'peso': df['peso'].astype(float), 'mandil': df['numero'].astype(float)})
+    return df, X
+
+
+@pytest.fixture
+def cached_pipeline():
+    """Fábrica: directorio -> OptimizedInferencePipeline con cache y modelo/calibrador deterministas."""
+    from src.models.inference_optimized import OptimizedInferencePipeline
+
+    def build(directory):
+        pipeline = OptimizedInferencePipeline(
+            model_path=str(directory / 'model.pkl'), calibrator_path=str(directory / 'cal.pkl'),
+            cache_path=str(directory / 'cache.json')
+        )
+        pipeline.model = _Modelo()
+        pipeline.calibrator = _Calibrador()
+        return pipeline
+
+    return build
+
+
+# ---------------------------------------------------------------------------
+# Servicio de predicción / registry
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def race_entries():
+    """Fábrica: (nro, n) -> entradas de una carrera del 2026-10-20 en formato /predict."""
+    def build(nro, n=6):
+        return [{'fecha': '2026-10-20', 'hipodromo': 'Hipódromo Chile', 'nro_carrera': nro, 'numero': i,
+                 'caballo': f'C{i}', 'jinete': f'J{i}', 'peso': 470, 'distancia': 1200}
+                for i in range(1, n + 1)]
+
+    return build
+
+
+# ---------------------------------------------------------------------------
+# Históricos sintéticos (backtest / comparación / búsqueda / destilación)
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def historico_3nf():
+    """Fábrica: (n_days, seed, desde) -> histórico en formato cargar_datos_3nf (fecha DESC)."""
+    def build(n_days=24, seed=0, desde='2025-01-01'):
+        rng = np.random.default_rng(seed)
+        ability = rng.normal(size=80)
+        rows, pid = [], 0
+        for d in range(n_days):
+            fecha = (pd.Timestamp(desde) + pd.Timedelta(days=7 * d)).strftime('%Y-%m-%d')
+            for r in range(1, 5):
+                field = rng.choice(80, size=8, replace=False)
+                pos = np.argsort(np.argsort(-(ability[field] + rng.normal(scale=0.8, size=8)))) + 1
+                for i, c in enumerate(field):
+                    pid += 1
+                    rows.append({
+                        'part_id': pid, 'posicion': int(pos[i]), 'mandil': i + 1, 'peso_fs': 470.0,
+                        'dividendo': 2.0, 'tiempo': '1.12.50', 'caballo_id': int(c), 'caballo': f'C{c}',
+                        'ano_nacimiento': 2020, 'padre': f'P{c % 7}', 'jinete_id': int(rng.integers(10)),
+                        'jinete': 'J', 'fecha': fecha, 'hipodromo_id': 1,
+                        'hipodromo': 'Club Hípico de Santiago', 'distancia': 1200, 'tipo': '',
+                        'pista': 'ARENA', 'nro_carrera': r
+                    })
+        return pd.DataFrame(rows).iloc[::-1].reset_index(drop=True)
+
+    return build
+
+
+@pytest.fixture(scope='session')
+def synthetic_races():
+    """
+    Fábrica: (n_races, field, seed, shuffle) -> carreras sintéticas (6 por día) con
+    race_id, fecha, features f0..f2 (f0 determina la llegada) y relevance y.
+    """
+    def build(n_races=60, field=8, seed=0, shuffle=False):
+        rng = np.random.default_rng(seed)
+        rows = []
+        for r in range(n_races):
+            fecha = pd.Timestamp('2025-01-01') + pd.Timedelta(days=r // 6)
+            skill = rng.normal(size=field)
+            pos = np.argsort(np.argsort(-(skill + rng.normal(scale=0.5, size=field)))) + 1
+            for i in range(field):
+                rows.append({
+                    'race_id': f'HC_{fecha.date()}_{r % 6 + 1}', 'fecha': fecha,
+                    'f0': skill[i], 'f1': rng.normal(), 'f2': rng.uniform(),
+                    'y': {1: 10, 2: 5, 3: 3}.get(pos[i], 0)
+                })
+        df = pd.DataFrame(rows)
+        return df.sample(frac=1.0, random_state=seed).reset_index(drop=True) if shuffle else df
+
+    return build
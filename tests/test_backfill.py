@@ -0,0 +1,114 @@
+import pytest
+import pandas as pd
+import numpy as np
+import sqlite3
+import shutil
+import os
+import sys
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.models.backfill import load_programs, load_history, build_features, run_backfill, load_archive
+from src.models.inference_optimized import OptimizedInferencePipeline
+
+FECHAS = ['2025-03-01', '2025-03-08', '2025-03-15', '2025-03-22']
+
+
+def _crear_db(path, seed=0):
+    """4 jornadas x 3 carreras x 6 caballos con resultados; programa guardado sólo de la última."""
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE hipodromos (id INTEGER PRIMARY KEY, nombre TEXT, codigo TEXT);
+        CREATE TABLE caballos (id INTEGER PRIMARY KEY, nombre TEXT);
+        CREATE TABLE jinetes (id INTEGER PRIMARY KEY, nombre TEXT);
+        CREATE TABLE studs (id INTEGER PRIMARY KEY, nombre TEXT);
+        CREATE TABLE jornadas (id INTEGER PRIMARY KEY, fecha TEXT, hipodromo_id INTEGER);
+        CREATE TABLE carreras (id INTEGER PRIMARY KEY, jornada_id INTEGER, numero INTEGER, distancia INTEGER);
+        CREATE TABLE participaciones (id INTEGER PRIMARY KEY, carrera_id INTEGER, caballo_id INTEGER,
+                                      jinete_id INTEGER, stud_id INTEGER, posicion INTEGER,
+                                      mandil INTEGER, peso_fs REAL);
+        CREATE TABLE programa_carreras (id INTEGER PRIMARY KEY, fecha TEXT, hipodromo TEXT, nro_carrera INTEGER,
+                                        hora TEXT, distancia TEXT, condicion TEXT, numero INTEGER,
+                                        caballo_id INTEGER, jinete_id INTEGER, stud_id INTEGER, peso TEXT);
+        INSERT INTO hipodromos VALUES (2, 'Hipódromo Chile', 'HCH');
+    ''')
+    conn.executemany("INSERT INTO caballos VALUES (?, ?)", [(i, f'C{i}') for i in range(1, 31)])
+    conn.executemany("INSERT INTO jinetes VALUES (?, ?)", [(i, f'J{i}') for i in range(1, 9)])
+    carrera_id = 0
+    for jor_id, fecha in enumerate(FECHAS, 1):
+        conn.execute("INSERT INTO jornadas VALUES (?, ?, 2)", (jor_id, fecha))
+        for nro in (1, 2, 3):
+            carrera_id += 1
+            conn.execute("INSERT INTO carreras VALUES (?, ?, ?, 1200)", (carrera_id, jor_id, nro))
+            caballos = rng.choice(np.arange(1, 31), 6, replace=False)
+            posiciones = rng.permutation(6) + 1
+            for mandil, (caballo, pos) in enumerate(zip(caballos, posiciones), 1):
+                jinete = int(rng.integers(1, 9))
+                conn.execute(
+                    "INSERT INTO participaciones (carrera_id, caballo_id, jinete_id, stud_id, posicion, mandil, peso_fs) "
+                    "VALUES (?, ?, ?, NULL, ?, ?, ?)", (carrera_id, int(caballo), jinete, int(pos), mandil, 455 + mandil)
+                )
+                if fecha == FECHAS[-1]:
+                    conn.execute(
+                        "INSERT INTO programa_carreras (fecha, hipodromo, nro_carrera, distancia, numero, "
+                        "caballo_id, jinete_id, peso) VALUES (?, 'HCH', ?, '1200', ?, ?, ?, ?)",
+                        (fecha, nro, mandil, int(caballo), jinete, str(455 + mandil))
+                    )
+    conn.commit()
+    conn.close()
+
+
+class _Modelo:
+    def predict(self, X):
+        return np.asarray(X['win_rate'], dtype=float) + np.asarray(X['jockey_win_rate'], dtype=float)
+
+
+class TestBackfill:
+    """Tests del backfill multi-fecha point-in-time"""
+
+    def test_features_match_daily_inference_as_of_each_date(self, tmp_path):
+        db = str(tmp_path / 'hipica.db')
+        _crear_db(db)
+        pipeline = OptimizedInferencePipeline(db_path=db)
+        programs = load_programs(db, FECHAS[0], FECHAS[-1])
+        assert sorted(programs['fecha'].unique()) == FECHAS
+        X_all, df_all = build_features(pipeline, programs, load_history(db))
+
+        for fecha in FECHAS[1:]:
+            # DB "como estaba" ese día: sin resultados de esa fecha en adelante
+            day_db = str(tmp_path / f'{fecha}.db')
+            shutil.copy(db, day_db)
+            conn = sqlite3.connect(day_db)
+            conn.execute("""DELETE FROM participaciones WHERE carrera_id IN (
+                SELECT car.id FROM carreras car JOIN jornadas j ON car.jornada_id = j.id WHERE j.fecha >= ?)""", (fecha,))
+            conn.commit()
+            conn.close()
+
+            mask = (df_all['fecha'] == fecha).values
+            live = OptimizedInferencePipeline(db_path=day_db)
+            X_live, _ = live._prepare_features(programs[mask].reset_index(drop=True))
+            pd.testing.assert_frame_equal(X_all[mask].reset_index(drop=True), X_live, check_dtype=False)
+
+    def test_run_backfill_writes_columnar_archive(self, tmp_path):
+        db = str(tmp_path / 'hipica.db')
+        _crear_db(db)
+        pipeline = OptimizedInferencePipeline(db_path=db, calibrator_path=str(tmp_path / 'no_cal.pkl'))
+        pipeline.model = _Modelo()
+
+        path, predictions = pipeline.run_backfill(FECHAS[0], FECHAS[-1], str(tmp_path / 'season.npz'))
+        archived, meta = load_archive(path)
+
+        assert len(archived) == 72
+        assert meta['rows'] == 72 and meta['desde'] == FECHAS[0]
+        pd.testing.assert_frame_equal(archived, predictions)
+        sums = archived.groupby(['fecha', 'carrera'])['probabilidad'].sum()
+        assert sums.between(99.5, 100.5).all()
+        assert (archived.groupby(['fecha', 'carrera'])['rank'].min() == 1).all()
+
+    def test_ensemble_pipeline_is_rejected(self):
+        from src.models.inference_ensemble import EnsembleInferencePipeline
+
+        with pytest.raises(ValueError, match='OptimizedInferencePipeline'):
+            run_backfill(EnsembleInferencePipeline(), '2025-03-01', '2025-03-22')
@@ -0,0 +1,95 @@
+import pytest
+import pandas as pd
+import numpy as np
+import os
+import sys
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.models.backtest import race_hits, build_backtest_dataset, walk_forward, point_in_time_features
+
+
+class TestBacktest:
+    """Tests del backtest walk-forward"""
+
+    def test_race_hits_exact_order(self):
+        race = np.array([0, 0, 0, 0, 1, 1, 1, 1])
+        scores = np.array([0.9, 0.8, 0.1, 0.7, 0.9, 0.8, 0.7, 0.6])
+        pos = np.array([1, 2, 4, 3, 2, 1, 3, 4])
+
+        hits = race_hits(race, scores, pos)
+        assert hits.loc[0].tolist() == [True, True, True, True]
+        assert hits.loc[1].tolist() == [False, False, False, False]
+
+    def test_dataset_sorted_and_cached(self, tmp_path, historico_3nf):
+        df = historico_3nf()
+        cache = str(tmp_path / 'bt.pkl')
+        ds = build_backtest_dataset(df, cache_path=cache)
+
+        assert np.all(np.diff(ds['fecha'].astype('int64')) >= 0)
+        assert np.all(np.diff(ds['race_codes']) >= 0)
+        assert ds['day_offsets'][-1] == len(df) == ds['group_sizes'].sum()
+        assert os.path.exists(cache)
+
+        # Segunda llamada: mismo contenido desde cache
+        again = build_backtest_dataset(df, cache_path=cache)
+        assert again['fingerprint'] == ds['fingerprint']
+        assert np.array_equal(again['X'], ds['X'])
+
+        # Resultados distintos invalidan el cache
+        df.loc[0, 'posicion'] = 9
+        changed = build_backtest_dataset(df, cache_path=cache)
+        assert changed['fingerprint'] != ds['fingerprint']
+
+    def test_walk_forward_cadence(self, tmp_path, historico_3nf):
+        ds = build_backtest_dataset(historico_3nf(), cache_path=None)
+        params = {'n_estimators': 20, 'min_child_samples': 5}
+
+        daily, stats = walk_forward(ds, retrain_every=4, warm_trees=5,
+                                    min_train_days=8, params=params)
+
+        assert stats['jornadas'] == 16
+        assert stats['total_carreras'] == 64
+        assert stats['n_retrains'] == 4
+        assert stats['n_warm_updates'] == 12
+        assert 0 <= stats['trifecta_pct'] <= stats['quiniela_pct'] <= stats['ganador_pct'] <= 100
+        assert list(daily['fecha']) == sorted(daily['fecha'])
+
+    def test_features_never_see_same_day_or_later_results(self, historico_3nf):
+        # Jinete 1: gana el 05 (carrera 1), vuelve a correr ese día y antes el 01.
+        # Los caballo_id no siguen el orden de fechas.
+        rows = [
+            ('2025-01-05', 1, 9, 1, 1), ('2025-01-05', 2, 3, 1, 2),
+            ('2025-01-01', 1, 50, 1, 2), ('2025-01-09', 1, 4, 1, 3),
+        ]
+        df = pd.DataFrame([{
+            'part_id': k, 'posicion': pos, 'mandil': 1, 'peso_fs': 470.0, 'dividendo': 2.0,
+            'tiempo': '1.12.50', 'caballo_id': caballo, 'caballo': f'C{caballo}', 'ano_nacimiento': 2020,
+            'padre': 'P', 'jinete_id': jinete, 'jinete': 'J', 'fecha': fecha, 'hipodromo_id': 1,
+            'hipodromo': 'Club Hípico de Santiago', 'distancia': 1200, 'tipo': '', 'pista': 'ARENA',
+            'nro_carrera': nro} for k, (fecha, nro, caballo, jinete, pos) in enumerate(rows)])
+        _, out, _ = point_in_time_features(df)
+        rate = dict(zip(out['fecha'].dt.strftime('%Y-%m-%d') + '_' + out['nro_carrera'].astype(str),
+                        out['jockey_win_rate']))
+        assert rate['2025-01-01_1'] == 0.08          # no ve la victoria del 05
+        assert rate['2025-01-05_2'] == 0.0           # ni la del mismo día (sólo la carrera del 01)
+        assert rate['2025-01-09_1'] == pytest.approx(1 / 3)
+
+        # Fuerza bruta sobre el histórico completo
+        df = historico_3nf(n_days=10, seed=3)
+        X, out, _ = point_in_time_features(df)
+        fecha = pd.to_datetime(df['fecha']).values
+        win = (df['posicion'] == 1).values
+        for i in range(0, len(df), 7):
+            prior = fecha < fecha[i]
+            horse = prior & (df['caballo_id'].values == df['caballo_id'].values[i])
+            jockey = prior & (df['jinete_id'].values == df['jinete_id'].values[i])
+            assert out['races_count'].iloc[i] == horse.sum()
+            expected = win[jockey].mean() if jockey.any() else 0.08
+            assert out['jockey_win_rate'].iloc[i] == pytest.approx(expected)
+            if horse.any():
+                assert out['win_rate'].iloc[i] == pytest.approx(win[horse].mean())
+                last = fecha[horse].max()
+                assert out['days_rest'].iloc[i] == min((fecha[i] - last) / np.timedelta64(1, 'D'), 180)
+        assert list(X.columns) == build_backtest_dataset(df, cache_path=None)['feature_cols']
@@ -0,0 +1,50 @@
+import pytest
+import os
+import sys
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bench.run_benchmarks import SCENARIOS, compare, load_baseline, run_benchmarks
+
+
+def _report(rows=10000, seed=7, **scenarios):
+    return {'rows': rows, 'seed': seed,
+            'scenarios': {k: {'cpu_s': w, 'peak_mb': m} for k, (w, m) in scenarios.items()}}
+
+
+class TestBenchmarks:
+    """Tests del gate de regresión de performance"""
+
+    def test_compare_flags_only_real_regressions(self):
+        baseline = _report(etl=(1.0, 10.0), patrones=(0.5, 4.0), tiny=(0.01, 0.2), nuevo_base=(1.0, 1.0))
+        current = _report(etl=(1.2, 13.0), patrones=(0.8, 4.1), tiny=(0.04, 0.9), nuevo=(9.0, 90.0))
+
+        regressions = compare(baseline, current, time_threshold=0.3, memory_threshold=0.2)
+
+        # etl +20% tiempo (tolerado) pero +30% memoria; 'tiny' bajo los mínimos; 'nuevo' sin base
+        assert [(r['scenario'], r['metric']) for r in regressions] == [('etl', 'peak_mb'), ('patrones', 'cpu_s')]
+        assert regressions[1]['change'] == pytest.approx(0.6)
+
+        # Con cpu_rel se compara el tiempo normalizado por la referencia: máquina más lenta, no regresión
+        baseline['scenarios']['etl']['cpu_rel'] = 40.0
+        current['scenarios']['etl'].update(cpu_s=1.6, cpu_rel=42.0)
+        assert ('etl', 'cpu_s') not in [(r['scenario'], r['metric']) for r in compare(baseline, current)]
+        current['scenarios']['etl']['cpu_rel'] = 60.0
+        assert ('etl', 'cpu_s') in [(r['scenario'], r['metric']) for r in compare(baseline, current)]
+
+        with pytest.raises(ValueError):
+            compare(baseline, _report(rows=100, etl=(1.0, 10.0)))
+
+    def test_run_small_report(self):
+        report = run_benchmarks(['cargar_datos_3nf', 'performance_stats'], rows=300, seed=1, repeat=1)
+        assert set(report['scenarios']) == {'cargar_datos_3nf', 'performance_stats'}
+        for result in report['scenarios'].values():
+            assert result['wall_s'] > 0 and result['cpu_rel'] > 0 and result['peak_mb'] > 0
+            assert result['rows'] >= 300
+        assert compare(report, report) == []
+
+    def test_committed_baseline_covers_scenarios(self):
+        baseline = load_baseline()
+        assert baseline is not None
+        assert set(baseline['scenarios']) == set(SCENARIOS)
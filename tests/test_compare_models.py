@@ -0,0 +1,101 @@
+import pytest
+import pandas as pd
+import numpy as np
+import joblib
+import json
+import os
+import sys
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.models.compare_models import (
+    build_eval_index, build_feature_matrices, compare_models, evaluate_scores
+)
+from src.models.backtest import point_in_time_features
+from src.models.train_v5_optimized import OptimizedFeatureEngineering
+
+
+@pytest.fixture
+def historico(historico_3nf):
+    return historico_3nf(n_days=12, desde='2025-03-01')
+
+
+def _modelo_v5(df, directory):
+    from lightgbm import LGBMRanker
+
+    X, df_enr = OptimizedFeatureEngineering().fit_transform(df)
+    model = LGBMRanker(n_estimators=10, min_child_samples=5, verbose=-1)
+    model.fit(X, (9 - df_enr['posicion']).clip(0, 8), group=[len(X)])
+    path = str(directory / f'v5_{len(df)}.pkl')
+    joblib.dump(model, path)
+    return path
+
+
+class TestCompareModels:
+    """Tests del runner de comparación multi-modelo"""
+
+    def test_eval_index_is_recent_and_whole_races(self, historico):
+        df = historico
+        idx = build_eval_index(df, test_fraction=0.25)
+
+        assert idx['race_id'].nunique() == 12
+        assert idx.groupby('race_id').size().eq(8).all()
+        assert idx['fecha'].min() == pd.Timestamp('2025-03-01') + pd.Timedelta(days=63)
+
+    def test_family_matrices_aligned_by_part_id(self, historico):
+        df = historico
+        idx = build_eval_index(df, test_fraction=0.25)
+        matrices = build_feature_matrices(df, idx, {'v2', 'v5'})
+
+        assert set(matrices) == {'v2', 'v5'}
+        assert all(len(X) == len(idx) for X in matrices.values())
+
+        # v5 point-in-time: ninguna fila usa resultados de su jornada o posteriores
+        X_ref, df_ref, _ = point_in_time_features(df)
+        ref = X_ref.set_index(df_ref['part_id'].values).loc[idx['part_id'].values]
+        assert np.allclose(matrices['v5'].values, ref.values)
+
+    def test_evaluate_scores_perfect_ranking(self, historico):
+        idx = build_eval_index(historico, test_fraction=0.25)
+        perfect = -idx['posicion'].values.astype(float)
+        metrics = evaluate_scores(perfect, idx)
+
+        assert metrics['ndcg@3'] == pytest.approx(1.0)
+        assert metrics['trifecta_pct'] == 100.0
+
+    def test_compare_registered_artifacts(self, tmp_path, historico):
+        df = historico
+        registry = [
+            {'name': 'v5_test', 'family': 'v5', 'loader': 'joblib', 'path': _modelo_v5(df, tmp_path)},
+            {'name': 'missing', 'family': 'v2', 'loader': 'joblib', 'path': str(tmp_path / 'no.pkl')},
+        ]
+        table, idx = compare_models(df, registry, test_fraction=0.25)
+
+        assert table['modelo'].tolist() == ['v5_test']
+        assert table.loc[0, 'carreras'] == 12
+        assert 0.0 <= table.loc[0, 'ndcg@3'] <= 1.0
+        # Sin metadata no se sabe si la ventana es fuera de muestra
+        assert table.loc[0, 'fuera_de_muestra'] is None
+
+    def test_eval_window_starts_after_training_cutoff(self, tmp_path, historico):
+        df = historico
+        train = df[pd.to_datetime(df['fecha']) <= '2025-04-19']
+        metadata = tmp_path / 'meta.json'
+        metadata.write_text(json.dumps({'train_hasta': '2025-04-19'}))
+        registry = [{'name': 'v5_test', 'family': 'v5', 'loader': 'joblib',
+                     'path': _modelo_v5(train, tmp_path), 'metadata_path': str(metadata)}]
+
+        # Por defecto: sólo carreras posteriores al entrenamiento (test_fraction no aplica)
+        table, idx = compare_models(df, registry, test_fraction=0.9)
+        assert idx['fecha'].min() == pd.Timestamp('2025-04-26')
+        assert table.loc[0, 'carreras'] == 16 and table.loc[0, 'fuera_de_muestra'] == True
+
+        # Ventana explícita que se solapa: se evalúa, pero queda marcada como in-sample
+        table, idx = compare_models(df, registry, desde='2025-04-05')
+        assert table.loc[0, 'fuera_de_muestra'] == False and table.loc[0, 'train_hasta'] == '2025-04-19'
+
+        # Artefacto entrenado con todo el historial: no hay ventana fuera de muestra
+        metadata.write_text(json.dumps({'train_hasta': '2025-05-17'}))
+        with pytest.raises(ValueError, match='fuera de muestra'):
+            compare_models(df, registry)
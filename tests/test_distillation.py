@@ -0,0 +1,67 @@
+import pytest
+import pandas as pd
+import numpy as np
+import os
+import sys
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.models.ensemble_ranker import EnsembleRanker
+from src.models.distillation import distill_ensemble, teacher_scores, load_student
+
+
+SMALL_PARAMS = {
+    'LightGBM': {'n_estimators': 15},
+    'XGBoost': {'n_estimators': 15},
+    'CatBoost': {'iterations': 15}
+}
+
+
+@pytest.fixture(scope='module')
+def trained(synthetic_races):
+    df = synthetic_races()
+    X, y, groups = df[['f0', 'f1', 'f2']], df['y'], df['race_id']
+    split = 48 * 8
+    ensemble = EnsembleRanker(save_individual_models=False, params=SMALL_PARAMS)
+    ensemble.fit(X.iloc[:split], y.iloc[:split], groups.iloc[:split])
+    return ensemble, X, y, groups, split
+
+
+class TestDistillation:
+    """Tests del student destilado del ensemble"""
+
+    def test_params_override(self, trained):
+        ensemble = trained[0]
+        assert ensemble.lgbm.n_estimators == 15
+        assert ensemble.catboost.get_params()['iterations'] == 15
+
+    def test_teacher_uses_oof_rows(self, trained):
+        ensemble, X, _, _, split = trained
+        X_train = X.iloc[:split]
+        scores = teacher_scores(ensemble, X_train)
+        mask = ensemble.oof_mask
+
+        assert mask.any() and not mask.all()
+        expected = ensemble.meta_model.predict(ensemble.oof_predictions[mask])
+        assert np.allclose(scores[mask], expected)
+        assert np.allclose(scores[~mask], ensemble.predict(X_train.iloc[np.flatnonzero(~mask)]))
+
+    def test_distill_reports_fidelity(self, trained, tmp_path):
+        ensemble, X, y, groups, split = trained
+        path = str(tmp_path / 'ensemble_student_latest.pkl')
+
+        student, fidelity = distill_ensemble(
+            ensemble, X.iloc[:split], groups.iloc[:split],
+            X.iloc[split:], y.iloc[split:], groups.iloc[split:],
+            params={'n_estimators': 30}, path=path
+        )
+
+        assert 0.0 <= fidelity['top1_agreement'] <= 1.0
+        assert fidelity['ndcg@3_vs_teacher'] > 0.5
+        assert fidelity['n_races'] == 12
+        assert os.path.exists(tmp_path / 'ensemble_student_metadata.json')
+
+        data = load_student(path)
+        assert np.allclose(data['model'].predict(X.iloc[split:]), student.predict(X.iloc[split:]))
+        assert data['feature_cols'] == ['f0', 'f1', 'f2']
@@ -0,0 +1,84 @@
+import pytest
+import pandas as pd
+import numpy as np
+import os
+import sys
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.models.ensemble_ranker import EnsembleRanker
+
+SMALL_PARAMS = {
+    'LightGBM': {'n_estimators': 20, 'min_child_samples': 5},
+    'XGBoost': {'n_estimators': 20},
+    'CatBoost': {'iterations': 20}
+}
+
+
+@pytest.fixture(scope='module')
+def ensemble():
+    rng = np.random.default_rng(0)
+    n_races = 60
+    X = pd.DataFrame(rng.normal(size=(n_races * 8, 5)), columns=[f'f{i}' for i in range(5)])
+    y = pd.Series(rng.integers(0, 4, len(X)))
+    groups = pd.Series(np.repeat(np.arange(n_races), 8))
+    return EnsembleRanker(save_individual_models=False, params=SMALL_PARAMS).fit(X, y, groups), X
+
+
+class TestEnsemblePredict:
+    """Tests del scoring concurrente del ensemble"""
+
+    def test_parallel_matches_sequential(self, ensemble):
+        model, X = ensemble
+        sequential = np.column_stack([m.predict(X) for m in model.base_models])
+
+        assert np.allclose(model.predict(X), model.meta_model.predict(sequential))
+        assert np.allclose(model.predict(X, parallel=False), model.predict(X))
+
+        details = model.predict_with_details(X)
+        assert np.allclose(details['lightgbm_scores'], sequential[:, 0])
+        assert np.allclose(details['final_scores'], model.predict(X))
+
+    def test_min_meta_weight_skips_members(self, ensemble, monkeypatch):
+        model, X = ensemble
+        coefs = np.abs(model.meta_model.coef_)
+        weakest = int(np.argmin(coefs))
+        threshold = (np.sort(coefs)[0] + np.sort(coefs)[1]) / 2
+
+        calls = []
+        original = model._member_predict
+        monkeypatch.setattr(model, '_member_predict',
+                            lambda idx, X_, n: calls.append(idx) or original(idx, X_, n))
+
+        details = model.predict_with_details(X, min_meta_weight=threshold)
+        assert weakest not in calls and len(calls) == 2
+        skipped = details[f'{model.base_model_names[weakest].lower()}_scores']
+        assert np.allclose(skipped, model.member_means[weakest])
+
+        # Umbral por encima de todos los pesos: se conserva el modelo principal
+        calls.clear()
+        model.predict(X, min_meta_weight=np.inf)
+        assert calls == [int(np.argmax(coefs))]
+
+    def test_xgb_threads_do_not_mutate_shared_estimator(self, ensemble):
+        from concurrent.futures import ThreadPoolExecutor
+
+        model, X = ensemble
+        expected = model.xgb.predict(X)
+        n_jobs = model.xgb.get_params()['n_jobs']
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda n: model._member_predict(1, X, n), [1, 2, 3, 4] * 2))
+
+        assert model.xgb.get_params()['n_jobs'] == n_jobs
+        for result in results:
+            assert np.allclose(result, expected)
+
+    def test_legacy_ensemble_without_member_means(self, ensemble, monkeypatch):
+        model, X = ensemble
+        monkeypatch.setattr(model, 'member_means', None)
+
+        # Sin omitir miembros no hace falta el relleno
+        assert np.allclose(model.predict(X, min_meta_weight=0), model.predict(X))
+        with pytest.raises(ValueError, match='member_means'):
+            model.predict(X, min_meta_weight=1e-9)
@@ -0,0 +1,83 @@
+import pytest
+import os
+import sys
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bench.fake_services import FakeSupabase, FakeWeb, PAGES
+from bench.harness import PHASES, run_harness
+
+
+class TestHarness:
+    """Tests del harness end-to-end y sus servicios falsos"""
+
+    def test_fake_supabase_query_builder(self):
+        db = FakeSupabase(max_rows=3)
+        db.table('hipodromos').upsert([{'id': 1, 'nombre': 'Club Hípico'}, {'id': 2, 'nombre': 'Sporting'}],
+                                      on_conflict='id').execute()
+        db.table('jornadas').upsert([{'hipodromo_id': 1, 'fecha': '2026-01-02'},
+                                     {'hipodromo_id': 2, 'fecha': '2026-01-03'}], on_conflict='hipodromo_id,fecha').execute()
+        # Upsert por clave natural: actualiza, no duplica
+        db.table('jornadas').upsert({'hipodromo_id': 1, 'fecha': '2026-01-02', 'reunion': 'R1'},
+                                    on_conflict='hipodromo_id,fecha').execute()
+        assert len(db.rows('jornadas')) == 2 and db.rows('jornadas')[0]['reunion'] == 'R1'
+
+        res = db.table('carreras').insert([{'jornada_id': j, 'numero': n} for j in (1, 2) for n in (1, 2)]).execute()
+        assert [r['id'] for r in res.data] == [1, 2, 3, 4]
+        db.table('predicciones').insert([{'carrera_id': c, 'caballo': f'C{c}-{k}', 'probabilidad': k / 10}
+                                         for c in (1, 3) for k in (1, 2, 3)]).execute()
+
+        res = db.table('carreras').select('id, numero, jornadas(fecha, hipodromos(nombre))').eq('numero', 2).execute()
+        assert res.data == [{'id': 2, 'numero': 2, 'jornadas': {'fecha': '2026-01-02', 'hipodromos': {'nombre': 'Club Hípico'}}},
+                            {'id': 4, 'numero': 2, 'jornadas': {'fecha': '2026-01-03', 'hipodromos': {'nombre': 'Sporting'}}}]
+
+        # Filtro sobre el recurso embebido (!inner) + count exacto + tope de filas por request
+        res = db.table('predicciones').select('id,carreras!inner(jornadas!inner(fecha))', count='exact') \
+            .gte('carreras.jornadas.fecha', '2026-01-03').execute()
+        assert res.count == 3 and len(res.data) == 3
+        assert len(db.table('predicciones').select('*').execute().data) == 3
+        assert len(db.table('predicciones').select('*').range(3, 5).execute().data) == 3
+
+        res = db.table('predicciones').select('caballo').eq('carrera_id', 1).order('probabilidad', desc=True).limit(2).execute()
+        assert res.data == [{'caballo': 'C1-3'}, {'caballo': 'C1-2'}]
+        assert db.table('hipodromos').select('id').ilike('nombre', '%hípico%').execute().data == [{'id': 1}]
+
+        db.table('predicciones').update({'caballo': 'X'}).eq('carrera_id', 3).execute()
+        db.table('predicciones').delete().eq('carrera_id', 1).execute()
+        assert {r['caballo'] for r in db.rows('predicciones')} == {'X'}
+
+        # Los tipos no serializables fallan como en supabase-py
+        with pytest.raises(TypeError):
+            db.table('carreras').insert({'numero': object()}).execute()
+        assert db.network.stats()['calls'] > 0
+
+    def test_fake_web_serves_fixtures(self):
+        web = FakeWeb()
+        url = next(iter(PAGES))
+        response = web.get(url, timeout=20)
+        assert response.status_code == 200 and b'Pozo' in response.content
+        assert web.get('https://www.clubhipico.cl/no-existe').status_code == 404
+
+    def test_sync_end_to_end(self, tmp_path):
+        cwd = os.getcwd()
+        report = run_harness(rows=1500, seed=3, latency_ms=0, workdir=str(tmp_path))
+
+        assert os.getcwd() == cwd
+        assert list(report['phases']) == PHASES
+        stages = ['etl', 'migracion', 'inferencia', 'upload', 'pozos', 'performance', 'vercel']
+        for phase in report['phases'].values():
+            assert phase['status'] == 'ok'
+            assert [s['stage'] for s in phase['stages'] if s['depth'] == 0] == stages
+            assert all(s['status'] == 'ok' for s in phase['stages'])
+
+        cold, incremental, warm = (report['phases'][p] for p in PHASES)
+        assert cold['races'] > incremental['races'] > warm['races'] > 0
+        assert cold['races_per_s'] > 0 and cold['rows_per_s'] > 0 and cold['net_calls'] > 0
+        etl = {p: next(s for s in report['phases'][p]['stages'] if s['stage'] == 'etl') for p in PHASES}
+        assert etl['cold']['rows_in'] > etl['incremental']['rows_in'] > etl['warm']['rows_in'] == 0
+
+        # El sync llegó al Supabase falso: historial completo + predicciones del programa
+        assert report['supabase']['participaciones'] == report['participations']
+        assert report['supabase']['predicciones'] > 0
+        assert report['supabase']['pozos_alertas'] > 0
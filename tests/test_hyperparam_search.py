@@ -0,0 +1,93 @@
+import pytest
+import pandas as pd
+import numpy as np
+import os
+import sys
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.models.hyperparam_search import (
+    race_aware_splits, sample_configs, select_fastest, hyperband, inference_cost, run_search, search_data
+)
+
+
+class TestHyperparamSearch:
+    """Tests de la búsqueda de hiperparámetros con presupuesto"""
+
+    def test_splits_respect_races_and_time(self, synthetic_races):
+        """Ninguna carrera se parte y validación siempre es posterior a train"""
+        df = synthetic_races(shuffle=True)
+        splits = race_aware_splits(df['race_id'], df['fecha'], n_splits=3)
+
+        assert len(splits) == 3
+        for train_idx, val_idx in splits:
+            train_races = set(df['race_id'].iloc[train_idx])
+            val_races = set(df['race_id'].iloc[val_idx])
+            assert not train_races & val_races
+            assert df['fecha'].iloc[train_idx].max() <= df['fecha'].iloc[val_idx].min()
+
+        # Expanding window: cada fold entrena con más carreras que el anterior
+        sizes = [len(t) for t, _ in splits]
+        assert sizes == sorted(sizes)
+
+    def test_sample_configs_unique_and_seeded(self):
+        a = sample_configs(10, seed=1)
+        b = sample_configs(10, seed=1)
+        assert a == b
+        assert len({tuple(sorted(c.items())) for c in a}) == 10
+
+    def test_select_fastest_within_tolerance(self):
+        """Elige la config más barata entre las que están cerca del mejor score"""
+        results = [
+            {'score': 0.700, 'best_iteration': 400, 'params': {'max_depth': 6, 'num_leaves': 31}},
+            {'score': 0.698, 'best_iteration': 60, 'params': {'max_depth': 4, 'num_leaves': 15}},
+            {'score': 0.600, 'best_iteration': 5, 'params': {'max_depth': 3, 'num_leaves': 7}},
+        ]
+        selection = select_fastest(results, tolerance=0.005)
+
+        assert selection['best_params']['n_estimators'] == 60
+        assert selection['best_params']['max_depth'] == 4
+        assert selection['inference_cost'] == inference_cost({'max_depth': 4, 'num_leaves': 15}, 60)
+        assert selection['best_score'] == 0.700
+
+    def test_hyperband_early_stops_below_budget(self, synthetic_races):
+        """La búsqueda corre end-to-end y el número de árboles respeta el presupuesto"""
+        df = synthetic_races(shuffle=True)
+        results = hyperband(
+            df[['f0', 'f1']], df['y'], df['race_id'], df['fecha'],
+            n_configs=3, min_trees=20, max_trees=60, eta=3, n_splits=2,
+            early_stopping_rounds=5
+        )
+        assert results
+        assert all(r['best_iteration'] <= r['budget'] for r in results)
+
+        selection = select_fastest(results, tolerance=0.01)
+        assert 1 <= selection['best_params']['n_estimators'] <= 60
+        assert selection['score'] > 0.5
+
+    def test_search_ranks_configs_on_point_in_time_features(self, historico_3nf, tmp_path):
+        from src.models.backtest import point_in_time_features
+
+        df = historico_3nf()
+        X, y, groups, fechas = search_data(df)
+        assert X.equals(point_in_time_features(df)[0])
+        assert groups.nunique() == 96 and len(y) == len(fechas) == len(X)
+
+        output = run_search(n_configs=2, min_trees=10, max_trees=30, n_splits=2,
+                            output_path=str(tmp_path / 'v5.json'), df=df)
+        assert output['features'] == 'v5' and os.path.exists(tmp_path / 'v5.json')
+
+    def test_ensemble_search_reaches_train_v4(self, historico_3nf, tmp_path):
+        from src.models.ensemble_ranker import EnsembleRanker
+        from src.models.train_v4_ensemble import load_ensemble_params
+
+        path = str(tmp_path / 'ensemble.json')
+        output = run_search(n_configs=2, min_trees=10, max_trees=30, n_splits=2,
+                            output_path=path, df=historico_3nf(), features='ensemble')
+
+        params = load_ensemble_params(path)
+        assert params == {'LightGBM': output['best_params']}
+        ensemble = EnsembleRanker(save_individual_models=False, params=params)
+        assert ensemble.lgbm.get_params()['n_estimators'] == output['best_params']['n_estimators']
+        assert load_ensemble_params(str(tmp_path / 'no_existe.json')) is None
@@ -0,0 +1,40 @@
+import pytest
+import os
+import sys
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.scripts.import_time_report import ENTRY_POINTS, parse_importtime, summarize, measure, check
+
+SAMPLE = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:       300 |        300 |     numpy.core
+import time:      1500 |       1800 |   numpy
+import time:       700 |       2620 | pandas
+import time:       200 |        200 | src
+"""
+
+
+class TestImportTime:
+    """Tests del reporte de tiempos de importación"""
+
+    def test_parse_and_summarize(self):
+        rows = parse_importtime(SAMPLE)
+        assert rows[0] == ('_io', 120, 120, 1)
+        assert rows[1] == ('numpy.core', 300, 300, 2)
+        assert rows[3] == ('pandas', 700, 2620, 0)
+
+        summary = summarize(rows, startup={'_io'})
+        assert summary['packages'] == {'numpy': 1.8, 'pandas': 0.7, 'src': 0.2}
+        assert summary['total_ms'] == pytest.approx(2.7)
+
+        assert check('upload', {'total_ms': 2.7, 'packages': summary['packages']}) == [
+            'upload: importa pandas, numpy al arrancar'
+        ]
+
+    @pytest.mark.parametrize('entry', ['sync', 'upload', 'performance', 'pozos', 'inference'])
+    def test_entry_points_skip_heavy_imports(self, entry):
+        result = measure(ENTRY_POINTS[entry]['module'], runs=1)
+        loaded = [p for p in ENTRY_POINTS[entry]['forbid'] if p in result['packages']]
+        assert loaded == []
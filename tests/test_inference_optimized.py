@@ -0,0 +1,144 @@
+import pytest
+import pandas as pd
+import numpy as np
+import sqlite3
+import os
+import sys
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.models.inference_optimized import OptimizedInferencePipeline, _safe_float_series
+
+
+def _crear_db(path, n_caballos=50):
+    """DB mínima con participaciones históricas para las stats."""
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE hipodromos (id INTEGER PRIMARY KEY, nombre TEXT);
+        CREATE TABLE caballos (id INTEGER PRIMARY KEY, nombre TEXT);
+        CREATE TABLE jinetes (id INTEGER PRIMARY KEY, nombre TEXT);
+        CREATE TABLE jornadas (id INTEGER PRIMARY KEY, fecha TEXT, hipodromo_id INTEGER);
+        CREATE TABLE carreras (id INTEGER PRIMARY KEY, jornada_id INTEGER);
+        CREATE TABLE participaciones (id INTEGER PRIMARY KEY, carrera_id INTEGER,
+                                      caballo_id INTEGER, jinete_id INTEGER, posicion INTEGER);
+        CREATE TABLE programa_carreras (id INTEGER PRIMARY KEY, caballo_id INTEGER, stud_id INTEGER);
+    ''')
+    conn.execute("INSERT INTO hipodromos VALUES (2, 'Hipódromo Chile')")
+    conn.execute("INSERT INTO jornadas VALUES (1, '2025-01-01', 2)")
+    conn.execute("INSERT INTO carreras VALUES (1, 1)")
+    conn.executemany("INSERT INTO caballos VALUES (?, ?)", [(i, f'C{i}') for i in range(1, n_caballos + 1)])
+    conn.executemany("INSERT INTO jinetes VALUES (?, ?)", [(i, f'J{i}') for i in range(1, 6)])
+    # Caballo i corre i veces y gana la primera
+    rows = [(1, c, 1 + c % 5, 1 if k == 0 else 5) for c in range(1, n_caballos + 1) for k in range(c)]
+    conn.executemany(
+        "INSERT INTO participaciones (carrera_id, caballo_id, jinete_id, posicion) VALUES (?, ?, ?, ?)", rows
+    )
+    conn.commit()
+    conn.close()
+
+
+class TestOptimizedInferenceFeatures:
+    """Tests de la preparación vectorizada de features (v5)"""
+
+    def test_safe_float_series_formats(self):
+        values = [470, '455', ' 460 ', None, '', 'None', 'abc', 480.5, np.nan, '1.200', '1200m', '1.400 Mts.']
+        result = _safe_float_series(values, 470).tolist()
+        assert result == [470.0, 455.0, 460.0, 470.0, 470.0, 470.0, 470.0, 480.5, 470.0, 1200.0, 1200.0, 1400.0]
+
+    def test_prepare_features_only_program_entities(self, tmp_path):
+        db = str(tmp_path / 'hipica.db')
+        _crear_db(db)
+        program = pd.DataFrame({
+            'fecha': ['2025-02-01'] * 3,
+            'hipodromo': ['Hipódromo Chile'] * 3,
+            'nro_carrera': [1, 1, 1],
+            'numero': [1, 2, 3],
+            'caballo': ['C4', 'C10', 'Nuevo'],
+            'caballo_id': [4, None, None],
+            'jinete': ['J5', 'J1', 'J2'],
+            'jinete_id': [None, 1, 2],
+            'peso': ['455', None, 480],
+            'distancia': ['1.200', '1200', None],
+        })
+
+        pipeline = OptimizedInferencePipeline(db_path=db)
+        X, df_enriched = pipeline._prepare_features(program)
+
+        # Sólo se consultan las stats de los caballos del programa
+        assert set(pipeline.horse_stats) == {4, 10}
+        assert df_enriched['caballo_id'].tolist() == [4, 10, 0]
+        assert df_enriched['jinete_id'].tolist() == [5, 1, 2]
+
+        assert X['races_count'].tolist() == [4, 10, 0]
+        assert X['win_rate'].tolist() == pytest.approx([0.25, 0.1, 0.10])
+        assert X['peso'].tolist() == [455.0, 470.0, 480.0]
+        assert X['distancia'].tolist() == [1200.0, 1200.0, 1200.0]
+        assert X['jockey_track_rate'].iloc[0] == pytest.approx(
+            pipeline.track_stats[(5, 2)]['win_rate']
+        )
+        assert df_enriched['race_unique_id'].unique().tolist() == ['2025-02-01_Hipódromo Chile_1']
+
+    def test_run_races_rewrites_only_requested_races(self, tmp_path, monkeypatch):
+        import json
+        import src.models.inference_optimized as module
+
+        monkeypatch.chdir(tmp_path)
+        db = str(tmp_path / 'hipica.db')
+        _crear_db(db)
+        program = pd.DataFrame({
+            'fecha': ['2025-02-01'] * 6,
+            'hipodromo': ['Hipódromo Chile'] * 6,
+            'nro_carrera': [1, 1, 1, 2, 2, 2],
+            'numero': [1, 2, 3, 1, 2, 3],
+            'caballo': [f'C{i}' for i in range(1, 7)],
+            'jinete': ['J1', 'J2', 'J3'] * 2,
+            'peso': [455, 460, 470] * 2,
+        })
+        monkeypatch.setattr(module, 'cargar_programa', lambda *args, **kwargs: program.copy())
+
+        class _Modelo:
+            def predict(self, X):
+                return np.asarray(X['win_rate'], dtype=float) - np.asarray(X['mandil'], dtype=float) / 10
+
+        class _Calibrador:
+            def transform(self, scores):
+                return 1 / (1 + np.exp(-scores))
+
+        pipeline = OptimizedInferencePipeline(db_path=db, cache_path=str(tmp_path / 'cache.json'))
+        pipeline.model, pipeline.calibrator = _Modelo(), _Calibrador()
+
+        previous = [{'fecha': '2025-02-01', 'hipodromo': 'Hipódromo Chile', 'carrera': 1, 'numero': 9,
+                     'caballo': 'Viejo', 'jinete': 'J9', 'probabilidad': 100.0}]
+        os.makedirs('data', exist_ok=True)
+        with open('data/predicciones_activas.json', 'w', encoding='utf-8') as f:
+            json.dump(previous, f)
+
+        changed = pipeline.run_races(['2025-02-01_Hipódromo Chile_2'], '2025-02-01')
+        assert changed == ['2025-02-01_Hipódromo Chile_2']
+
+        with open('data/predicciones_activas.json', encoding='utf-8') as f:
+            active = json.load(f)
+        assert active[0] == previous[0]
+        assert [r['numero'] for r in active if r['carrera'] == 2] == [1, 2, 3]
+
+        # Sin cambios: el cache responde y la carrera 1 del cache no se toca
+        assert pipeline.run_races(['2025-02-01_Hipódromo Chile_2'], '2025-02-01') == []
+        pipeline.run_races(['2025-02-01_Hipódromo Chile_1'], '2025-02-01')
+        with open(str(tmp_path / 'cache.json'), encoding='utf-8') as f:
+            assert len(json.load(f)['races']) == 2
+
+    def test_jockey_lookups_use_index(self, tmp_path):
+        import io
+        from contextlib import redirect_stdout
+        from src.etl.etl_pipeline import HipicaETL
+
+        db = str(tmp_path / 'hipica.db')
+        with redirect_stdout(io.StringIO()):
+            HipicaETL(db_path=db).conn.close()
+        conn = sqlite3.connect(db)
+        plan = conn.execute(
+            'EXPLAIN QUERY PLAN SELECT COUNT(*) FROM participaciones p WHERE p.jinete_id IN (?, ?)', (1, 2)
+        ).fetchall()
+        conn.close()
+        assert any('idx_participaciones_jinete' in row[-1] for row in plan)
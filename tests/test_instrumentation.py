@@ -0,0 +1,87 @@
+import pytest
+import json
+import sqlite3
+import os
+import sys
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils import instrumentation
+
+
+def _lines(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+class TestInstrumentation:
+    """Tests de la instrumentación por etapa del sync"""
+
+    def test_nested_stages_and_counters(self, tmp_path):
+        path = str(tmp_path / 'metrics.jsonl')
+
+        @instrumentation.instrumented('upload')
+        def upload(rows):
+            instrumentation.count(rows_in=len(rows), rows_out=len(rows) - 1)
+            return len(rows)
+
+        with instrumentation.run('sync', path=path) as active:
+            with instrumentation.stage('etl'):
+                with instrumentation.stage('archivo_1'):
+                    instrumentation.count(rows_in=10, rows_out=8, bytes_read=512)
+                instrumentation.count(db_statements=3)
+            assert upload([1, 2, 3]) == 3
+            # Reentrante: un run interno reutiliza el activo
+            with instrumentation.run('upload', path=path) as inner:
+                assert inner is active
+
+        records = _lines(path)
+        by_path = {r['path']: r for r in records if r['stage']}
+        assert list(by_path) == ['etl/archivo_1', 'etl', 'upload']
+        assert by_path['etl']['counters']['rows_in'] == 10
+        assert by_path['etl']['counters']['db_statements'] == 3
+        assert by_path['etl/archivo_1']['depth'] == 1
+        assert by_path['upload']['counters']['rows_out'] == 2
+
+        total = records[-1]
+        assert total['stage'] is None and total['status'] == 'ok'
+        assert total['counters']['rows_in'] == 13
+
+        summary = active.summary()
+        assert len(summary) == 5 and summary[2].strip().startswith('archivo_1')
+
+    def test_noop_without_run_and_error_status(self, tmp_path):
+        path = str(tmp_path / 'metrics.jsonl')
+        with instrumentation.stage('suelta') as record:
+            instrumentation.count(rows_in=5)
+        assert record is None
+        assert instrumentation.current_run() is None
+
+        with pytest.raises(ValueError):
+            with instrumentation.run('sync', path=path, summary=False):
+                with instrumentation.stage('migracion'):
+                    raise ValueError('sin conexión')
+
+        stage, total = _lines(path)
+        assert stage['status'] == 'error' and 'sin conexión' in stage['error']
+        assert total['status'] == 'error'
+
+    def test_db_and_http_counters(self, tmp_path):
+        import httpx
+
+        instrumentation.instrument_httpx()
+        conn = instrumentation.instrument_connection(sqlite3.connect(':memory:'))
+        client = httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(200, content=b'x' * 100)))
+
+        with instrumentation.run('sync', path=str(tmp_path / 'metrics.jsonl'), summary=False) as active:
+            with instrumentation.stage('upload'):
+                conn.execute('CREATE TABLE t (a INTEGER)')
+                conn.executemany('INSERT INTO t VALUES (?)', [(1,), (2,)])
+                client.post('https://example.invalid/rest', content=b'{"a": 1}')
+                client.get('https://example.invalid/rest')
+
+        counters = active.stages[0]['counters']
+        assert counters['db_statements'] >= 3
+        assert counters['net_calls'] == 2
+        assert counters['net_bytes'] == 8 + 200
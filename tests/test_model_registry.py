@@ -0,0 +1,150 @@
+import pytest
+import pandas as pd
+import numpy as np
+import sqlite3
+import joblib
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.models.model_registry import ModelRegistry, LazyArtifact, HotSwap
+from src.models.inference_optimized import FEATURE_COLS
+
+
+def _ranker(seed):
+    from lightgbm import LGBMRanker
+
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(400, len(FEATURE_COLS))), columns=FEATURE_COLS)
+    X['mandil'] = np.tile(np.arange(1, 11), 40)
+    model = LGBMRanker(n_estimators=10, min_child_samples=5, verbose=-1)
+    return model.fit(X, rng.integers(0, 4, 400), group=[10] * 40)
+
+
+class _Calibrador:
+    def transform(self, scores):
+        return 1 / (1 + np.exp(-np.asarray(scores, dtype=float)))
+
+
+@pytest.fixture
+def artifacts(tmp_path):
+    paths = {}
+    for seed in (0, 1):
+        joblib.dump(_ranker(seed), tmp_path / f'model_{seed}.pkl')
+        paths[seed] = str(tmp_path / f'model_{seed}.pkl')
+    joblib.dump(_Calibrador(), tmp_path / 'cal.pkl')
+    paths['cal'] = str(tmp_path / 'cal.pkl')
+
+    db = str(tmp_path / 'hipica.db')
+    conn = sqlite3.connect(db)
+    conn.executescript('''
+        CREATE TABLE caballos (id INTEGER PRIMARY KEY, nombre TEXT);
+        CREATE TABLE jinetes (id INTEGER PRIMARY KEY, nombre TEXT);
+        CREATE TABLE participaciones (id INTEGER PRIMARY KEY, carrera_id INTEGER,
+                                      caballo_id INTEGER, jinete_id INTEGER, posicion INTEGER);
+    ''')
+    conn.close()
+    paths['db'] = db
+    return paths
+
+
+class TestModelRegistry:
+    """Tests del registry por contenido, lazy loading y hot-swap"""
+
+    def test_register_dedupes_content(self, tmp_path, artifacts):
+        registry = ModelRegistry(str(tmp_path / 'registry'))
+        v1 = registry.register({'model': artifacts[0], 'calibrator': artifacts['cal']}, activate=True)
+        again = registry.register({'model': artifacts[0], 'calibrator': artifacts['cal']})
+        v2 = registry.register({'model': artifacts[1], 'calibrator': artifacts['cal']})
+
+        assert again == v1 and v2 != v1
+        assert registry.versions() == sorted([v1, v2])
+        assert registry.active_version() == v1
+        # 2 modelos + 1 calibrador compartido
+        blobs = [f for _, _, files in os.walk(registry.blobs_dir) for f in files]
+        assert len(blobs) == 3
+
+        os.remove(os.path.join(registry.versions_dir, f'{v2}.json'))
+        assert registry.gc() == 1
+
+    def test_lazy_artifact_loads_on_first_use(self, tmp_path, artifacts):
+        lazy = LazyArtifact(artifacts['cal'], 'calibrator')
+        assert not lazy.loaded
+        assert np.allclose(lazy.transform([0.0]), [0.5])
+        assert lazy.loaded
+
+    def test_pipeline_matches_direct_load(self, tmp_path, artifacts):
+        registry = ModelRegistry(str(tmp_path / 'registry'))
+        registry.register({'model': artifacts[0], 'calibrator': artifacts['cal']},
+                          feature_cols=FEATURE_COLS, activate=True)
+
+        pipeline = registry.build_pipeline(db_path=artifacts['db'], warm=False)
+        assert not pipeline.model.loaded and not pipeline.calibrator.loaded
+
+        X = pd.DataFrame(np.random.default_rng(2).normal(size=(20, len(FEATURE_COLS))), columns=FEATURE_COLS)
+        assert np.allclose(pipeline.model.predict(X), joblib.load(artifacts[0]).predict(X))
+
+        warm = registry.build_pipeline(db_path=artifacts['db'])
+        assert warm.model.loaded and warm.calibrator.loaded
+
+    def test_ensemble_skipped_members_stay_unloaded(self, tmp_path):
+        from src.models.ensemble_ranker import EnsembleRanker
+
+        rng = np.random.default_rng(0)
+        X = pd.DataFrame(rng.normal(size=(60 * 8, 5)), columns=[f'f{i}' for i in range(5)])
+        y = pd.Series(rng.integers(0, 4, len(X)))
+        groups = pd.Series(np.repeat(np.arange(60), 8))
+        params = {'LightGBM': {'n_estimators': 20, 'min_child_samples': 5},
+                  'XGBoost': {'n_estimators': 20}, 'CatBoost': {'iterations': 20}}
+        model = EnsembleRanker(save_individual_models=False, params=params).fit(X, y, groups)
+        model.save(str(tmp_path / 'ensemble'))
+
+        registry = ModelRegistry(str(tmp_path / 'registry'))
+        version = registry.register({'ensemble': str(tmp_path / 'ensemble_latest.pkl')}, engine='ensemble')
+
+        coefs = np.abs(model.meta_model.coef_)
+        threshold = (np.sort(coefs)[0] + np.sort(coefs)[1]) / 2
+        lazy = registry.load_ensemble(version, min_meta_weight=threshold)
+        assert not any(m.loaded for m in lazy.base_models)
+
+        scores = lazy.predict(X)
+        weakest = int(np.argmin(coefs))
+        assert hasattr(lazy.base_models[weakest], 'resolve') and not lazy.base_models[weakest].loaded
+        assert np.allclose(scores, model.predict(X, min_meta_weight=threshold))
+
+    def test_hot_swap_under_concurrent_requests(self, tmp_path, artifacts, monkeypatch, race_entries):
+        from src.api.prediction_service import PredictionService
+
+        registry = ModelRegistry(str(tmp_path / 'registry'))
+        v1 = registry.register({'model': artifacts[0], 'calibrator': artifacts['cal']}, activate=True)
+        v2 = registry.register({'model': artifacts[1], 'calibrator': artifacts['cal']})
+
+        service = PredictionService(db_path=artifacts['db'], window_ms=5, registry=registry, swap_poll_seconds=None)
+        assert service.version == v1
+        old_pipeline = service.pipeline
+
+        programs = [pd.DataFrame(race_entries(1, n=4 + i % 3)) for i in range(24)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(service.predict_program, p) for p in programs[:12]]
+            registry.activate(v2)
+            assert service.swap.refresh()
+            futures += [pool.submit(service.predict_program, p) for p in programs[12:]]
+            results = [f.result() for f in futures]
+
+        assert all(len(r) == len(p) for r, p in zip(results, programs))
+        assert service.version == v2 and service.pipeline is not old_pipeline
+        # Sin cambio de ACTIVE no hay rebuild
+        assert not service.swap.refresh()
+        assert isinstance(service.swap, HotSwap)
+
+        # /health informa el engine de la versión activa, no el de la primera
+        manifest = registry.manifest
+        monkeypatch.setattr(registry, 'manifest', lambda version=None: (
+            {**manifest(version), 'engine': 'ensemble'} if version == v2 else manifest(version)))
+        assert service.engine == 'ensemble'
+        from src.api.prediction_service import create_app
+        health = create_app(service).test_client().get('/health').get_json()
+        assert health['engine'] == 'ensemble' and health['version'] == v2
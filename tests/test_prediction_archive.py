@@ -0,0 +1,99 @@
+import pytest
+import pandas as pd
+import numpy as np
+import json
+import os
+import sys
+from datetime import datetime
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.models.prediction_archive import PredictionArchive
+
+
+def _records(fechas=('2026-10-20',), carreras=(1, 2), n=4, shift=0.0):
+    return [
+        {'fecha': fecha, 'hipodromo': 'Hipódromo Chile', 'carrera': carrera, 'numero': i,
+         'caballo': f'C{carrera}{i}', 'jinete': f'J{i}', 'probabilidad': round(100 / n + shift * i, 1)}
+        for fecha in fechas for carrera in carreras for i in range(1, n + 1)
+    ]
+
+
+class TestPredictionArchive:
+    """Tests del archivo histórico de predicciones"""
+
+    def test_append_partitions_and_index(self, tmp_path):
+        archive = PredictionArchive(str(tmp_path / 'archive'))
+        run_id = archive.append(_records(fechas=('2026-10-20', '2026-10-21')), model_version='v5-abc',
+                                timestamp=datetime(2026, 10, 19, 20, 0))
+
+        assert sorted(os.listdir(tmp_path / 'archive')) == ['fecha=2026-10-20', 'fecha=2026-10-21', 'runs.jsonl']
+        runs = archive.runs()
+        assert runs.loc[0, 'run_id'] == run_id
+        assert runs.loc[0, 'model_version'] == 'v5-abc'
+        assert runs.loc[0, 'races'] == 4 and runs.loc[0, 'rows'] == 16
+
+        loaded = archive.load(fecha='2026-10-21')
+        assert len(loaded) == 8
+        assert set(loaded['fecha']) == {'2026-10-21'}
+        assert loaded['probabilidad'].dtype == float
+
+    def test_race_history_across_runs(self, tmp_path):
+        archive = PredictionArchive(str(tmp_path / 'archive'))
+        archive.append(_records(), run_id='r1', timestamp=datetime(2026, 10, 19, 20, 0))
+        archive.append(_records(carreras=(2,), shift=1.0), run_id='r2', timestamp=datetime(2026, 10, 20, 9, 0))
+        # run_id repetido no se duplica
+        archive.append(_records(), run_id='r1', timestamp=datetime(2026, 10, 19, 20, 0))
+
+        history = archive.race_history('2026-10-20', 'Hipódromo Chile', 2)
+        assert history['run_id'].tolist() == ['r1'] * 4 + ['r2'] * 4
+        assert history['numero'].tolist() == [1, 2, 3, 4] * 2
+        assert history['probabilidad'].tolist()[4:] == [26.0, 27.0, 28.0, 29.0]
+        assert len(archive.race_history('2026-10-20', 'Hipódromo Chile', 1)) == 4
+
+    def test_migrate_json_backups(self, tmp_path):
+        backup_dir = tmp_path / 'predictions'
+        backup_dir.mkdir()
+        records = _records()
+        records[0]['hipodromo'] = None
+        records[1]['jinete'] = None
+        for name in ('pred_20260211_205715.json', 'pred_20260214_193802.json'):
+            (backup_dir / name).write_text(json.dumps(records, indent=2), encoding='utf-8')
+
+        archive = PredictionArchive(str(backup_dir / 'archive'))
+        assert archive.migrate_json_backups(str(backup_dir), remove=True) == 2
+        assert not list(backup_dir.glob('pred_*.json'))
+
+        runs = archive.runs()
+        assert runs['run_id'].tolist() == ['20260211_205715', '20260214_193802']
+        assert (runs['source'] == 'json_backup').all()
+
+        first = archive.load().query("run_id == '20260211_205715'").drop(columns=['run_id', 'timestamp'])
+        expected = pd.DataFrame(records)
+        first = first.reset_index(drop=True)
+        assert pd.isna(first.loc[0, 'hipodromo']) and pd.isna(first.loc[1, 'jinete'])
+        assert first.fillna('').astype(str).equals(expected.fillna('').astype(str))
+
+    def test_failed_append_falls_back_to_json_backup(self, tmp_path, monkeypatch, caplog):
+        import src.models.prediction_archive as module
+        from src.models.inference_optimized import OptimizedInferencePipeline
+
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(module.PredictionArchive, 'append',
+                            lambda self, *args, **kwargs: (_ for _ in ()).throw(OSError('disco lleno')))
+        monkeypatch.setattr('src.models.publish.publish_predictions', lambda *args, **kwargs: None)
+
+        pipeline = OptimizedInferencePipeline(db_path=str(tmp_path / 'hipica.db'))
+        with caplog.at_level('ERROR'):
+            pipeline._save_results(_records())
+        assert 'disco lleno' in caplog.text
+
+        backups = list((tmp_path / 'data' / 'predictions').glob('pred_*.json'))
+        assert len(backups) == 1
+        assert json.loads(backups[0].read_text(encoding='utf-8')) == _records()
+
+        monkeypatch.undo()
+        archive = PredictionArchive(str(tmp_path / 'archive'))
+        assert archive.migrate_json_backups(str(tmp_path / 'data' / 'predictions')) == 1
+        assert len(archive.load()) == len(_records())
@@ -0,0 +1,97 @@
+import pytest
+import pandas as pd
+import numpy as np
+import os
+import sys
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.models.prediction_cache import race_fingerprints, PredictionCache
+from src.utils import upload_predictions_supabase as upload
+from bench.fake_services import FakeSupabase
+
+
+class TestPredictionCache:
+    """Tests del cache de predicciones por carrera"""
+
+    def test_fingerprint_ignores_row_order(self, programa):
+        df, X = programa
+        shuffled = np.random.default_rng(0).permutation(len(df))
+        fp = race_fingerprints(df, X)
+        fp_shuffled = race_fingerprints(df.iloc[shuffled], X.iloc[shuffled])
+        assert fp == fp_shuffled
+
+        df.loc[0, 'jinete'] = 'Otro'
+        assert race_fingerprints(df, X)[df.loc[0, 'race_unique_id']] != fp[df.loc[0, 'race_unique_id']]
+
+    def test_only_changed_races_recomputed(self, tmp_path, programa, cached_pipeline):
+        pipeline = cached_pipeline(tmp_path)
+        df, X = programa
+
+        first = pipeline._predict_cached(X, df.copy())
+        assert len(pipeline.changed_races) == 3
+        assert pipeline.model.rows == 15
+
+        # Sin cambios: todo sale del cache, mismas predicciones
+        again = pipeline._predict_cached(X, df.copy())
+        assert pipeline.changed_races == []
+        assert pipeline.model.rows == 15
+        assert again == first
+
+        # Cambia el peso de un caballo de la carrera 2: sólo esa se recalcula
+        X.loc[7, 'peso'] = 480.0
+        df.loc[7, 'peso'] = 480
+        third = pipeline._predict_cached(X, df.copy())
+        assert pipeline.changed_races == ['2026-10-20_Hipódromo Chile_2']
+        assert pipeline.model.rows == 20
+        assert [r for r in third if r['carrera'] != 2] == [r for r in first if r['carrera'] != 2]
+
+    def test_artifact_change_invalidates(self, tmp_path, programa, cached_pipeline):
+        pipeline = cached_pipeline(tmp_path)
+        df, X = programa
+        pipeline._predict_cached(X, df.copy())
+
+        (tmp_path / 'cal.pkl').write_bytes(b'nuevo calibrador')
+        pipeline._predict_cached(X, df.copy())
+        assert len(pipeline.changed_races) == 3
+        assert len(PredictionCache(str(tmp_path / 'cache.json')).races) == 3
+
+    def test_failed_upload_is_retried_next_sync(self, tmp_path, monkeypatch, programa, cached_pipeline):
+        pipeline = cached_pipeline(tmp_path)
+        df, X = programa
+        supabase = FakeSupabase()
+
+        class _Manager:
+            client = None  # None = Supabase caído
+
+            def get_client(self):
+                return _Manager.client
+
+        published = {}
+        monkeypatch.setattr(upload, 'SupabaseManager', _Manager)
+        monkeypatch.setattr(upload, 'load_predictions', lambda: published['records'])
+        monkeypatch.setattr(upload, 'resolve_carrera_id', lambda db, h, f, nro: nro)
+        monkeypatch.setattr(upload, 'verify_upload', lambda *args: None)
+
+        def sync():
+            # Mismo orden que sync_system.main: inferencia -> upload -> confirmar en el cache
+            published['records'] = pipeline._predict_cached(X, df.copy())
+            races = pipeline.upload_races
+            failed = []
+            upload.run_upload(races=races, failed_races=failed)
+            pipeline.mark_uploaded(set(races) - set(failed))
+            return races, failed
+
+        races, failed = sync()
+        assert len(races) == 3 and failed == races
+
+        # Nada cambió, pero el upload anterior no se confirmó: se vuelve a subir
+        _Manager.client = supabase
+        races, failed = sync()
+        assert pipeline.changed_races == [] and pipeline.model.rows == 15
+        assert len(races) == 3 and failed == []
+        assert len(supabase.rows('predicciones')) == 15
+
+        races, _ = sync()
+        assert races == []
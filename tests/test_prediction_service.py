@@ -0,0 +1,140 @@
+import pytest
+import pandas as pd
+import numpy as np
+import sqlite3
+import joblib
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.api.prediction_service import MicroBatcher, PredictionService, create_app
+from src.models.inference_optimized import OptimizedInferencePipeline, FEATURE_COLS
+
+
+@pytest.fixture(scope='module')
+def service(tmp_path_factory):
+    from lightgbm import LGBMRanker
+
+    tmp = tmp_path_factory.mktemp('service')
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(400, len(FEATURE_COLS))), columns=FEATURE_COLS)
+    X['mandil'] = np.tile(np.arange(1, 11), 40)
+    model = LGBMRanker(n_estimators=10, min_child_samples=5, verbose=-1)
+    model.fit(X, rng.integers(0, 4, 400), group=[10] * 40)
+    joblib.dump(model, tmp / 'model.pkl')
+
+    db = str(tmp / 'hipica.db')
+    conn = sqlite3.connect(db)
+    conn.executescript('''
+        CREATE TABLE caballos (id INTEGER PRIMARY KEY, nombre TEXT);
+        CREATE TABLE jinetes (id INTEGER PRIMARY KEY, nombre TEXT);
+        CREATE TABLE participaciones (id INTEGER PRIMARY KEY, carrera_id INTEGER,
+                                      caballo_id INTEGER, jinete_id INTEGER, posicion INTEGER);
+        CREATE TABLE predicciones_activas (fecha TEXT, hipodromo TEXT, carrera INTEGER, numero INTEGER,
+                                           caballo TEXT, jinete TEXT, probabilidad REAL);
+        INSERT INTO predicciones_activas VALUES ('2026-10-20', 'Hipódromo Chile', 1, 3, 'C3', 'J1', 41.5);
+    ''')
+    conn.close()
+
+    pipeline = OptimizedInferencePipeline(
+        model_path=str(tmp / 'model.pkl'), fe_path=str(tmp / 'no_fe.pkl'),
+        calibrator_path=str(tmp / 'no_cal.pkl'), db_path=db
+    )
+    pipeline.load_artifacts()
+    return PredictionService(db_path=db, window_ms=20, pipeline=pipeline)
+
+
+class TestPredictionService:
+    """Tests del servicio Flask de inferencia"""
+
+    def test_predict_endpoint_normalizes_per_race(self, service, race_entries):
+        client = create_app(service).test_client()
+        resp = client.post('/predict', json={'entries': race_entries(1) + race_entries(2, n=4)})
+
+        assert resp.status_code == 200
+        preds = pd.DataFrame(resp.get_json()['predicciones'])
+        assert len(preds) == 10
+        assert preds.groupby('carrera')['probabilidad'].sum().between(99.5, 100.5).all()
+
+    def test_concurrent_requests_coalesce(self, service, race_entries):
+        before = service.batcher.n_batches
+        programs = [pd.DataFrame(race_entries(1, n=3 + i % 4)) for i in range(8)]
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(service.predict_program, programs))
+
+        # Cada petición recibe sólo sus filas, normalizadas por separado
+        assert [len(r) for r in results] == [len(p) for p in programs]
+        for r in results:
+            assert sum(p['probabilidad'] for p in r) == pytest.approx(100, abs=0.5)
+        assert service.batcher.n_batches - before < len(programs)
+
+    def test_batcher_fails_every_request_on_missing_results(self):
+        # process_fn que pierde el último resultado: nadie queda esperando el timeout
+        batcher = MicroBatcher(lambda items: [item * 2 for item in items][:-1], window_ms=50)
+        futures = [batcher.submit(i) for i in range(3)]
+        for future in futures:
+            with pytest.raises(RuntimeError, match='resultados'):
+                future.result(timeout=2)
+
+        batcher = MicroBatcher(lambda items: [item * 2 for item in items])
+        assert batcher.submit(4).result(timeout=2) == 8
+
+    def test_batcher_keeps_errors_with_the_failing_request(self):
+        def process(items):
+            if any(item < 0 for item in items):
+                raise ValueError('item inválido')
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(process, window_ms=50)
+        futures = [batcher.submit(i) for i in (1, -1, 2)]
+        assert futures[0].result(timeout=2) == 2 and futures[2].result(timeout=2) == 4
+        with pytest.raises(ValueError, match='inválido'):
+            futures[1].result(timeout=2)
+
+    def test_ensemble_engine_resolves_ids_from_service_db(self, tmp_path, monkeypatch, race_entries):
+        import src.models.inference_optimized as optimized
+        from src.models.inference_ensemble import EnsembleInferencePipeline
+        from src.models.feature_store import FeatureStore
+
+        db = str(tmp_path / 'otra.db')
+        conn = sqlite3.connect(db)
+        conn.executescript('''
+            CREATE TABLE caballos (id INTEGER PRIMARY KEY, nombre TEXT UNIQUE);
+            CREATE TABLE jinetes (id INTEGER PRIMARY KEY, nombre TEXT UNIQUE);
+            CREATE TABLE studs (id INTEGER PRIMARY KEY, nombre TEXT UNIQUE);
+        ''')
+        conn.executemany('INSERT INTO caballos VALUES (?, ?)', [(100 + i, f'C{i}') for i in range(1, 40)])
+        conn.executemany('INSERT INTO jinetes VALUES (?, ?)', [(200 + i, f'J{i}') for i in range(1, 40)])
+        conn.commit()
+        conn.close()
+
+        lookups = []
+        read_sql_in = optimized._read_sql_in
+        monkeypatch.setattr(optimized, '_read_sql_in',
+                            lambda conn, query, column, values: lookups.append(sorted(values))
+                            or read_sql_in(conn, query, column, values))
+        monkeypatch.setattr(optimized, 'SQLITE_MAX_PARAMS', 2)
+
+        pipeline = EnsembleInferencePipeline(db_path=db)
+        pipeline.store = FeatureStore()
+        X, enriched = pipeline._prepare_features(pd.DataFrame(race_entries(1, n=5)))
+
+        # Sólo los nombres del programa, en chunks, contra la BD del servicio
+        assert lookups == [[f'C{i}' for i in range(1, 6)], [f'J{i}' for i in range(1, 6)], []]
+        assert enriched['caballo_id'].tolist() == [str(100 + i) for i in range(1, 6)]
+        assert len(X) == 5
+
+    def test_stored_predictions_and_validation(self, service):
+        client = create_app(service).test_client()
+
+        resp = client.get('/predictions/2026-10-20')
+        assert resp.status_code == 200
+        assert resp.get_json()['predicciones'][0]['probabilidad'] == 41.5
+
+        assert client.get('/predictions/2026-01-01').status_code == 404
+        assert client.get('/predictions/ayer').status_code == 400
+        assert client.post('/predict', json={'entries': [{'caballo': 'X'}]}).status_code == 400
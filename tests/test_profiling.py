@@ -0,0 +1,121 @@
+import pytest
+import numpy as np
+import json
+import os
+import sys
+import time
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.profiling import (
+    TrainingProfiler, compare_profiles, maybe_stage, profile_modes, profile_run, pop_profile_arg
+)
+
+
+class TestTrainingProfiler:
+    """Tests del profiler de etapas de entrenamiento"""
+
+    def test_nested_stages_record_time_and_memory(self):
+        profiler = TrainingProfiler('test_run', sample_interval=0.01)
+
+        with profiler.stage('oof'):
+            with profiler.stage('LightGBM/fold_1'):
+                time.sleep(0.05)
+                block = np.ones((2000, 2000))  # ~30 MB
+                block.sum()
+                time.sleep(0.05)
+                del block
+
+        report = profiler.report()
+        paths = [s['path'] for s in report['stages']]
+        assert paths == ['oof', 'oof/LightGBM/fold_1']
+
+        inner = report['stages'][1]
+        assert inner['depth'] == 1
+        assert inner['wall_s'] >= 0.1
+        assert inner['cpu_s'] >= 0
+        if inner['peak_rss_mb'] is not None:
+            assert inner['peak_rss_mb'] >= inner['rss_start_mb'] + 20
+
+    def test_maybe_stage_without_profiler(self):
+        with maybe_stage(None, 'noop') as record:
+            assert record is None
+
+    def test_save_detects_regressions(self, tmp_path):
+        path = str(tmp_path / 'profile.json')
+
+        previous = {'stages': [{'path': 'train', 'wall_s': 2.0}, {'path': 'save', 'wall_s': 0.1}]}
+        with open(path, 'w') as f:
+            json.dump(previous, f)
+
+        profiler = TrainingProfiler('test_run')
+        profiler.stages = [
+            {'stage': 'train', 'path': 'train', 'depth': 0, 'start_s': 0.0,
+             'wall_s': 3.0, 'cpu_s': 3.0, 'peak_rss_mb': None},
+            {'stage': 'save', 'path': 'save', 'depth': 0, 'start_s': 3.0,
+             'wall_s': 0.5, 'cpu_s': 0.1, 'peak_rss_mb': None},
+        ]
+        regressions = profiler.save(path)
+
+        # 'save' crece 5x pero está bajo el mínimo de 1s: no se reporta
+        assert [r['stage'] for r in regressions] == ['train']
+        with open(path) as f:
+            assert json.load(f)['regressions'][0]['change'] == 0.5
+        assert os.path.exists(tmp_path / 'training_profile_history.jsonl')
+
+    def test_compare_profiles_ignores_new_stages(self):
+        assert compare_profiles({'stages': []}, {'stages': [{'path': 'x', 'wall_s': 9.0}]}) == []
+
+
+def _busy(n=200000):
+    return sum(i * i for i in range(n))
+
+
+class TestProfileRun:
+    """Tests del profiling bajo demanda de entry points"""
+
+    def test_modes_from_env_and_cli(self, monkeypatch):
+        monkeypatch.delenv('PISTA_PROFILE', raising=False)
+        assert profile_modes() == []
+        assert profile_modes('off') == []
+        assert profile_modes('1') == ['cprofile', 'memory']
+        assert profile_modes('sample, memory') == ['sample', 'memory']
+        monkeypatch.setenv('PISTA_PROFILE', 'cprofile')
+        assert profile_modes() == ['cprofile']
+        with pytest.raises(ValueError):
+            profile_modes('perf')
+
+        argv = ['train.py', '--profile=sample', '--student']
+        assert pop_profile_arg(argv) == 'sample'
+        assert argv == ['train.py', '--student']
+        argv = ['sync.py', '--profile']
+        assert pop_profile_arg(argv) == '1' and argv == ['sync.py']
+        assert pop_profile_arg(['sync.py']) is None
+
+    def test_off_writes_nothing(self, tmp_path, monkeypatch):
+        monkeypatch.delenv('PISTA_PROFILE', raising=False)
+        with profile_run('sync', output_dir=str(tmp_path)) as outputs:
+            _busy(1000)
+        assert outputs is None
+        assert os.listdir(tmp_path) == []
+
+    def test_all_modes_write_outputs(self, tmp_path):
+        with pytest.raises(SystemExit):
+            with profile_run('sync', 'cprofile,sample,memory', output_dir=str(tmp_path), interval=0.001) as outputs:
+                data = [np.ones(1000) for _ in range(50)]
+                _busy()
+                time.sleep(0.05)
+                raise SystemExit(0)
+
+        assert set(outputs) == {'cprofile', 'cprofile_txt', 'folded', 'memory'}
+        assert all(os.path.getsize(path) > 0 for path in outputs.values())
+        with open(outputs['cprofile_txt']) as f:
+            assert '_busy' in f.read()
+        with open(outputs['folded']) as f:
+            stacks = [line.rsplit(' ', 1) for line in f]
+        assert stacks and all(n.strip().isdigit() for _, n in stacks)
+        assert any('test_all_modes_write_outputs' in s for s, _ in stacks)
+        with open(outputs['memory']) as f:
+            assert f.readline().startswith('Pico tracemalloc')
+        assert len(data) == 50
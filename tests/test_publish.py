@@ -0,0 +1,113 @@
+import pytest
+import pandas as pd
+import numpy as np
+import sqlite3
+import json
+import os
+import sys
+import threading
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.models.publish import publish_predictions
+
+
+def _records(carreras=(1, 2, 3), n=5):
+    return [
+        {'fecha': '2026-10-20', 'hipodromo': 'Hipódromo Chile', 'carrera': carrera, 'numero': i,
+         'caballo': f'C{carrera}{i}', 'jinete': f'J{i}', 'probabilidad': 20.0}
+        for carrera in carreras for i in range(1, n + 1)
+    ]
+
+
+def _table(db):
+    conn = sqlite3.connect(db)
+    df = pd.read_sql('SELECT rowid, * FROM predicciones_activas ORDER BY carrera, numero', conn)
+    conn.close()
+    return df
+
+
+class TestPublish:
+    """Tests de la publicación atómica de predicciones"""
+
+    def test_upsert_touches_only_changed_rows(self, tmp_path):
+        json_path, db = str(tmp_path / 'activas.json'), str(tmp_path / 'hipica.db')
+        records = _records()
+        first = publish_predictions(records, json_path, db)
+        assert first['inserted'] == 15
+        before = _table(db)
+
+        records[6]['probabilidad'] = 35.5
+        records = [r for r in records if not (r['carrera'] == 3 and r['numero'] == 5)]
+        stats = publish_predictions(records, json_path, db)
+        assert stats == {'inserted': 0, 'updated': 1, 'deleted': 1, 'unchanged': 13}
+
+        after = _table(db)
+        assert len(after) == 14
+        # Tabla no recreada: las filas sin cambios conservan su rowid
+        same = after[after['probabilidad'] == 20.0].merge(before, on=['carrera', 'numero'])
+        assert (same['rowid_x'] == same['rowid_y']).all()
+        assert after.loc[(after['carrera'] == 2) & (after['numero'] == 2), 'probabilidad'].item() == 35.5
+
+        with open(json_path, encoding='utf-8') as f:
+            assert json.load(f) == records
+        assert not [p for p in os.listdir(tmp_path) if p.endswith('.tmp')]
+
+    def test_race_scoped_publish_keeps_other_races(self, tmp_path):
+        json_path, db = str(tmp_path / 'activas.json'), str(tmp_path / 'hipica.db')
+        publish_predictions(_records(), json_path, db)
+
+        update = _records(carreras=(2,), n=4)
+        for r in update:
+            r['probabilidad'] = 25.0
+        stats = publish_predictions(update, json_path, db, races={'2026-10-20_Hipódromo Chile_2'})
+        assert stats == {'inserted': 0, 'updated': 4, 'deleted': 1, 'unchanged': 0}
+
+        table = _table(db)
+        assert table.groupby('carrera').size().to_dict() == {1: 5, 2: 4, 3: 5}
+        with open(json_path, encoding='utf-8') as f:
+            published = pd.DataFrame(json.load(f))
+        assert published.groupby('carrera').size().to_dict() == {1: 5, 2: 4, 3: 5}
+        assert (published.loc[published['carrera'] == 2, 'probabilidad'] == 25.0).all()
+
+    def test_readers_never_see_partial_json(self, tmp_path):
+        json_path, db = str(tmp_path / 'activas.json'), str(tmp_path / 'hipica.db')
+        publish_predictions(_records(), json_path, db)
+
+        errors, done = [], threading.Event()
+
+        def reader():
+            while not done.is_set():
+                try:
+                    with open(json_path, encoding='utf-8') as f:
+                        assert len(json.load(f)) in (15, 40)
+                except Exception as e:
+                    errors.append(e)
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        for i in range(20):
+            publish_predictions(_records(n=5 if i % 2 else 8, carreras=(1, 2, 3, 4, 5)[:3 if i % 2 else 5]),
+                                json_path, db)
+        done.set()
+        thread.join()
+        assert errors == []
+
+    def test_legacy_pipeline_publishes_through_upsert(self, tmp_path, monkeypatch):
+        from src.models.inference import InferencePipeline
+
+        monkeypatch.chdir(tmp_path)
+        os.makedirs('data/db')
+        records = [{k: v for k, v in r.items() if k != 'jinete'} for r in _records()]
+        InferencePipeline().save_results(records)
+        before = _table('data/db/hipica_data.db')
+
+        records[0]['probabilidad'] = 40.0
+        InferencePipeline().save_results(records)
+        after = _table('data/db/hipica_data.db')
+        # Upsert en la tabla existente (no if_exists='replace'): las filas sin cambios conservan su rowid
+        assert after['rowid'].tolist()[1:] == before['rowid'].tolist()[1:]
+        assert after.loc[0, 'probabilidad'] == 40.0
+        with open('data/predicciones_activas.json', encoding='utf-8') as f:
+            assert json.load(f) == records
@@ -0,0 +1,108 @@
+import pytest
+import pandas as pd
+import numpy as np
+import sqlite3
+import os
+import sys
+from datetime import datetime
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.scripts.race_day_scheduler import RaceDayScheduler, parse_hora
+
+FECHA = '2026-10-20'
+HORAS = {1: '13:00', 2: 'APROX. 14:00', 3: '18.00 hrs'}
+
+
+class _Pipeline:
+    """Registra las carreras que se le piden re-inferir."""
+
+    def __init__(self):
+        self.calls = []
+
+    def run_races(self, races, fecha):
+        self.calls.append(sorted(races))
+        return sorted(races)
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / 'hipica.db')
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE hipodromos (id INTEGER PRIMARY KEY, nombre TEXT, codigo TEXT);
+        CREATE TABLE jornadas (id INTEGER PRIMARY KEY, fecha TEXT, hipodromo_id INTEGER);
+        CREATE TABLE carreras (id INTEGER PRIMARY KEY, jornada_id INTEGER, numero INTEGER);
+        CREATE TABLE participaciones (id INTEGER PRIMARY KEY, carrera_id INTEGER, caballo_id INTEGER,
+                                      jinete_id INTEGER, stud_id INTEGER, posicion INTEGER);
+        CREATE TABLE programa_carreras (fecha TEXT, hipodromo TEXT, nro_carrera INTEGER, hora TEXT,
+                                        distancia TEXT, numero INTEGER, caballo_id INTEGER,
+                                        jinete_id INTEGER, stud_id INTEGER, peso TEXT);
+        INSERT INTO hipodromos VALUES (2, 'Hipódromo Chile', 'HCH');
+    ''')
+    rows = [(FECHA, 'HCH', nro, hora, '1200', m, nro * 10 + m, 100 + m + (nro == 3) * 10, 200 + m, '470')
+            for nro, hora in HORAS.items() for m in range(1, 5)]
+    conn.executemany('INSERT INTO programa_carreras VALUES (?,?,?,?,?,?,?,?,?,?)', rows)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _scheduler(db, tmp_path):
+    return RaceDayScheduler(db_path=db, fecha=FECHA, state_path=str(tmp_path / 'state.json'),
+                            horizon_minutes=120, run_etl=False, upload=False, tickets=False,
+                            pipeline=_Pipeline())
+
+
+def _at(hhmm):
+    return datetime.strptime(f'{FECHA} {hhmm}', '%Y-%m-%d %H:%M')
+
+
+class TestRaceDayScheduler:
+    """Tests del scheduler por carrera"""
+
+    def test_only_races_in_horizon_and_changed(self, db, tmp_path):
+        scheduler = _scheduler(db, tmp_path)
+        key = lambda n: f'{FECHA}_Hipódromo Chile_{n}'
+
+        assert scheduler.run_cycle(now=_at('12:00')) == [key(1), key(2)]
+        assert scheduler.run_cycle(now=_at('12:05')) == []
+
+        conn = sqlite3.connect(db)
+        conn.execute("UPDATE programa_carreras SET peso = '480' WHERE nro_carrera = 2 AND numero = 3")
+        conn.commit()
+        conn.close()
+        assert scheduler.run_cycle(now=_at('12:10')) == [key(2)]
+
+        # La carrera 3 entra al horizonte
+        assert scheduler.run_cycle(now=_at('16:30')) == [key(3)]
+        assert scheduler.pipeline.calls == [[key(1), key(2)], [key(2)], [key(3)]]
+
+    def test_results_trigger_races_sharing_entities(self, db, tmp_path):
+        scheduler = _scheduler(db, tmp_path)
+        scheduler.run_cycle(now=_at('12:30'))
+
+        # Resultado de la carrera 1: el jinete 102 también monta en la carrera 2 (no en la 3)
+        conn = sqlite3.connect(db)
+        conn.executescript('''
+            INSERT INTO jornadas VALUES (1, '2026-10-20', 2);
+            INSERT INTO carreras VALUES (1, 1, 1);
+            INSERT INTO participaciones VALUES (1, 1, 12, 102, 202, 1);
+        ''')
+        conn.close()
+        assert scheduler.run_cycle(now=_at('13:10')) == [f'{FECHA}_Hipódromo Chile_2']
+
+        # Estado persistido: un scheduler nuevo no repite el trabajo
+        assert _scheduler(db, tmp_path).run_cycle(now=_at('13:15')) == []
+
+    def test_poll_interval_and_hora_parsing(self, db, tmp_path):
+        scheduler = _scheduler(db, tmp_path)
+        from src.scripts.race_day_scheduler import load_race_card
+        card = load_race_card(db, FECHA)
+
+        assert parse_hora('APROX. 14:00', FECHA) == _at('14:00')
+        assert parse_hora(None, FECHA) is None
+        assert scheduler.seconds_until_next_poll(card, _at('12:00')) == 60
+        assert scheduler.seconds_until_next_poll(card, _at('14:30')) == 900
+        assert scheduler.seconds_until_next_poll(card, _at('18:30')) is None
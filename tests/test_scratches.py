@@ -0,0 +1,128 @@
+import pytest
+import pandas as pd
+import numpy as np
+import sqlite3
+import json
+import os
+import sys
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.models.scratches import apply_scratches, publish_scratches, parse_scratch
+
+RACE_2 = '2026-10-20_Hipódromo Chile_2'
+
+
+class TestScratches:
+    """Tests de la ruta rápida de retiros"""
+
+    def test_scratch_matches_full_rerun(self, tmp_path, programa, cached_pipeline):
+        pipeline = cached_pipeline(tmp_path)
+        df, X = programa
+        pipeline._predict_cached(X, df.copy())
+
+        updated = apply_scratches([parse_scratch(f'{RACE_2}:3')], cache_path=pipeline.cache_path)
+        assert list(updated) == [RACE_2]
+        assert [r['numero'] for r in updated[RACE_2]] == [1, 2, 4, 5]
+        assert sum(r['probabilidad'] for r in updated[RACE_2]) == pytest.approx(100, abs=0.3)
+
+        # Igual que predecir la carrera sin el retirado
+        keep = ~((df['nro_carrera'] == 2) & (df['numero'] == 3)).values
+        expected = cached_pipeline(tmp_path / 'otro')._predict(X[keep], df[keep].copy())
+        assert [r for r in expected if r['carrera'] == 2] == updated[RACE_2]
+
+    def test_scratch_survives_recompute(self, tmp_path, programa, cached_pipeline):
+        pipeline = cached_pipeline(tmp_path)
+        df, X = programa
+        pipeline._predict_cached(X, df.copy())
+        apply_scratches([(RACE_2, 3)], cache_path=pipeline.cache_path)
+
+        # Sync sin cambios: el retiro sale del cache
+        cached = pipeline._predict_cached(X, df.copy())
+        assert pipeline.changed_races == []
+        assert [r['numero'] for r in cached if r['carrera'] == 2] == [1, 2, 4, 5]
+
+        # Artefactos nuevos: la carrera se recalcula pero el retirado sigue fuera
+        (tmp_path / 'cal.pkl').write_bytes(b'nuevo calibrador')
+        recomputed = pipeline._predict_cached(X, df.copy())
+        assert [r['numero'] for r in recomputed if r['carrera'] == 2] == [1, 2, 4, 5]
+        assert len(recomputed) == 14
+
+    def test_publish_rewrites_only_affected_race(self, tmp_path, programa, cached_pipeline):
+        pipeline = cached_pipeline(tmp_path)
+        df, X = programa
+        records = pipeline._predict_cached(X, df.copy())
+
+        json_path, db_path = tmp_path / 'activas.json', str(tmp_path / 'hipica.db')
+        json_path.write_text(json.dumps(records, ensure_ascii=False), encoding='utf-8')
+        conn = sqlite3.connect(db_path)
+        pd.DataFrame(records).to_sql('predicciones_activas', conn, index=False)
+        conn.close()
+
+        updated = apply_scratches([(RACE_2, 1), (RACE_2, 5), ('2026-10-20_Otro_1', 1)],
+                                  cache_path=pipeline.cache_path)
+        publish_scratches(updated, json_path=str(json_path), db_path=db_path, upload=False)
+
+        published = json.loads(json_path.read_text(encoding='utf-8'))
+        assert len(published) == 13
+        assert [r for r in published if r['carrera'] != 2] == [r for r in records if r['carrera'] != 2]
+        conn = sqlite3.connect(db_path)
+        counts = pd.read_sql('SELECT carrera, COUNT(*) n FROM predicciones_activas GROUP BY carrera', conn)
+        conn.close()
+        assert counts.set_index('carrera')['n'].to_dict() == {1: 5, 2: 3, 3: 5}
+
+    def test_parse_scratch_rejects_bad_input(self):
+        assert parse_scratch('2026-10-20_Club Hípico_3:12') == ('2026-10-20_Club Hípico_3', 12)
+        with pytest.raises(ValueError):
+            parse_scratch('2026-10-20_Club Hípico_3')
+
+    def test_failed_scratch_upload_is_retried_next_sync(self, tmp_path, monkeypatch, programa, cached_pipeline):
+        from src.utils import upload_predictions_supabase as upload
+        from bench.fake_services import FakeSupabase
+
+        pipeline = cached_pipeline(tmp_path)
+        df, X = programa
+        json_path, db_path = tmp_path / 'activas.json', str(tmp_path / 'hipica.db')
+        supabase = FakeSupabase()
+
+        class _Manager:
+            client = supabase
+
+            def get_client(self):
+                return _Manager.client
+
+        monkeypatch.setattr(upload, 'SupabaseManager', _Manager)
+        monkeypatch.setattr(upload, 'load_predictions',
+                            lambda: json.loads(json_path.read_text(encoding='utf-8')))
+        monkeypatch.setattr(upload, 'resolve_carrera_id', lambda db, h, f, nro: nro)
+        monkeypatch.setattr(upload, 'verify_upload', lambda *args: None)
+
+        def sync():
+            # Mismo orden que sync_system.main: inferencia -> upload (retiros con overwrite) -> confirmar
+            json_path.write_text(json.dumps(pipeline._predict_cached(X, df.copy()), ensure_ascii=False),
+                                 encoding='utf-8')
+            races, overwrite, failed = pipeline.upload_races, pipeline.overwrite_races, []
+            upload.run_upload(races=[r for r in races if r not in overwrite], failed_races=failed)
+            if overwrite:
+                upload.run_upload(force_overwrite=True, races=overwrite, failed_races=failed)
+            pipeline.mark_uploaded(set(races) - set(failed))
+            return races, overwrite
+
+        sync()
+        assert len(supabase.rows('predicciones')) == 15
+
+        # Retiro con Supabase caído: queda publicado el caballo retirado
+        _Manager.client = None
+        updated = apply_scratches([(RACE_2, 3)], cache_path=pipeline.cache_path)
+        publish_scratches(updated, json_path=str(json_path), db_path=db_path, cache_path=pipeline.cache_path)
+        assert 3 in [r['numero_caballo'] for r in supabase.rows('predicciones') if r['carrera_id'] == 2]
+
+        # Próximo sync: cache hit, pero la carrera se vuelve a subir reemplazando lo publicado
+        _Manager.client = supabase
+        races, overwrite = sync()
+        assert pipeline.changed_races == [] and races == overwrite == [RACE_2]
+        carrera_2 = [r['numero_caballo'] for r in supabase.rows('predicciones') if r['carrera_id'] == 2]
+        assert sorted(carrera_2) == [1, 2, 4, 5]
+
+        assert sync() == ([], [])
@@ -0,0 +1,56 @@
+import pytest
+import pandas as pd
+import numpy as np
+import os
+import sys
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.models.segment_ops import race_order, segment_softmax, segment_normalize, segment_minmax
+
+
+def _carreras(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    race_ids = rng.choice([f'2025-02-01_Chile_{i}' for i in range(1, 13)], size=n)
+    return race_ids, rng.normal(size=n)
+
+
+class TestSegmentOps:
+    """Tests de la normalización por carrera vectorizada"""
+
+    def test_order_matches_groupby(self):
+        race_ids, _ = _carreras()
+        order, starts, sizes = race_order(race_ids)
+
+        expected = np.concatenate([idx for _, idx in pd.Series(race_ids).groupby(race_ids).indices.items()])
+        assert np.array_equal(order, expected)
+        assert sizes.sum() == len(race_ids)
+        assert np.array_equal(starts, np.cumsum(sizes) - sizes)
+
+    def test_softmax_matches_per_race_loop(self):
+        race_ids, scores = _carreras()
+        probs, ranks = segment_softmax(scores, race_ids, temperature=1 / 3)
+
+        for race in np.unique(race_ids):
+            mask = race_ids == race
+            exp = np.exp(scores[mask] * 3)
+            assert np.allclose(probs[mask], exp / exp.sum())
+            # rank 1 = mayor probabilidad
+            assert ranks[mask][np.argmax(probs[mask])] == 1
+            assert sorted(ranks[mask]) == list(range(1, mask.sum() + 1))
+
+    def test_normalize_uniform_when_sum_zero(self):
+        race_ids = np.array(['a', 'a', 'b', 'b', 'b'])
+        probs = segment_normalize([1.0, 3.0, 0.0, 0.0, 0.0], race_ids)
+        assert np.allclose(probs, [0.25, 0.75, 1 / 3, 1 / 3, 1 / 3])
+
+    def test_minmax_flags_degenerate_races(self):
+        race_ids = np.array(['a', 'b', 'a', 'b'])
+        normalized, degenerate = segment_minmax([2.0, 5.0, 4.0, 5.0], race_ids)
+        assert np.allclose(normalized, [0.0, 0.0, 1.0, 0.0])
+        assert degenerate.tolist() == [False, True, False, True]
+
+    def test_empty_input(self):
+        probs, ranks = segment_softmax([], np.array([], dtype=object))
+        assert len(probs) == 0 and len(ranks) == 0
@@ -0,0 +1,90 @@
+import pytest
+import io
+import os
+import sys
+import sqlite3
+from contextlib import redirect_stdout
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.scripts.generate_synthetic_data import generate
+from src.etl.etl_pipeline import HipicaETL
+from src.models.data_manager import cargar_datos_3nf
+
+TABLES = ['hipodromos', 'caballos', 'jinetes', 'studs', 'jornadas', 'carreras', 'participaciones',
+          'programa_carreras', 'archivos_procesados']
+
+
+def _dump(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return {t: conn.execute(f'SELECT * FROM {t} ORDER BY 1').fetchall()
+                for t in TABLES if t != 'archivos_procesados'}
+    finally:
+        conn.close()
+
+
+class TestSyntheticData:
+    """Tests del generador de datos sintéticos"""
+
+    def test_same_seed_same_data(self, tmp_path):
+        a = generate(str(tmp_path / 'a'), participations=1500, seed=3)
+        b = generate(str(tmp_path / 'b'), participations=1500, seed=3)
+        c = generate(str(tmp_path / 'c'), participations=1500, seed=4, write_csv=False)
+
+        assert {k: v for k, v in a.items() if 'dir' not in k and 'path' not in k} == \
+               {k: v for k, v in b.items() if 'dir' not in k and 'path' not in k}
+        assert _dump(a['db_path']) == _dump(b['db_path'])
+        assert _dump(a['db_path']) != _dump(c['db_path'])
+        files = sorted(os.listdir(a['exports_dir']))
+        assert files == sorted(os.listdir(b['exports_dir']))
+        for name in files:
+            with open(os.path.join(a['exports_dir'], name), 'rb') as fa, \
+                 open(os.path.join(b['exports_dir'], name), 'rb') as fb:
+                assert fa.read() == fb.read()
+        assert c['exports_dir'] is None
+
+    def test_realistic_structure(self, tmp_path):
+        summary = generate(str(tmp_path / 'syn'), participations=3000, seed=1, program_days=2)
+        assert summary['participations'] >= 3000
+        assert len(summary['program_dates']) == 2 and summary['program_dates'][0] > summary['last_date']
+
+        conn = sqlite3.connect(summary['db_path'])
+        fields = [n for (n,) in conn.execute('SELECT COUNT(*) FROM participaciones GROUP BY carrera_id')]
+        assert min(fields) >= 8 and max(fields) <= 16
+        # Una llegada completa y un solo dividendo (ganador) por carrera
+        assert conn.execute('''SELECT COUNT(*) FROM (SELECT carrera_id FROM participaciones GROUP BY carrera_id
+                               HAVING MIN(posicion) != 1 OR MAX(posicion) != COUNT(*)
+                               OR SUM(dividendo IS NOT NULL) != 1)''').fetchone()[0] == 0
+        # Los caballos repiten (carreras deportivas) y tienen padre
+        assert conn.execute('SELECT MAX(n) FROM (SELECT COUNT(*) n FROM participaciones GROUP BY caballo_id)').fetchone()[0] > 3
+        assert conn.execute('SELECT COUNT(*) FROM caballos WHERE padre IS NULL').fetchone()[0] == 0
+        assert conn.execute('SELECT COUNT(DISTINCT fecha) FROM programa_carreras').fetchone()[0] == 2
+        conn.close()
+
+        df = cargar_datos_3nf(summary['db_path'])
+        assert len(df) == summary['participations']
+        assert df['tiempo'].str.match(r'^\d\.\d{2}\.\d{2}$').all()
+        assert df['peso_fs'].between(400, 540).all()
+
+    def test_csvs_load_through_etl(self, tmp_path):
+        summary = generate(str(tmp_path / 'syn'), participations=1200, seed=2)
+
+        # Registrados como procesados: un sync sobre el mismo directorio no recarga nada
+        with redirect_stdout(io.StringIO()):
+            assert HipicaETL(db_path=summary['db_path'], exports_dir=summary['exports_dir']).run() == 0
+
+        # Cargados en una DB vacía reproducen el mismo historial
+        db = str(tmp_path / 'etl.db')
+        with redirect_stdout(io.StringIO()):
+            HipicaETL(db_path=db, exports_dir=summary['exports_dir']).run()
+        original = cargar_datos_3nf(summary['db_path'])
+        loaded = cargar_datos_3nf(db)
+        key = ['fecha', 'hipodromo', 'nro_carrera', 'posicion']
+        cols = key + ['caballo', 'jinete', 'mandil', 'tiempo', 'distancia']
+        assert loaded[cols].sort_values(key).values.tolist() == original[cols].sort_values(key).values.tolist()
+        conn = sqlite3.connect(db)
+        assert conn.execute('SELECT COUNT(*) FROM programa_carreras').fetchone()[0] == \
+            sqlite3.connect(summary['db_path']).execute('SELECT COUNT(*) FROM programa_carreras').fetchone()[0]
+        conn.close()
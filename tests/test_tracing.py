@@ -0,0 +1,114 @@
+import pytest
+import json
+import sqlite3
+import os
+import sys
+import threading
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils import instrumentation, tracing
+
+
+class TestTracing:
+    """Tests de las trazas estructuradas (spans)"""
+
+    def test_nested_spans_and_chrome_export(self, tmp_path):
+        path = str(tmp_path / 'sync.json')
+
+        @tracing.traced('sqlite cargar')
+        def cargar():
+            tracing.event('sqlite', sql='SELECT 1')
+            return 1
+
+        with tracing.trace('sync', path) as active:
+            with tracing.span('upload', races=12) as upload:
+                for _ in range(12):
+                    with tracing.span('supabase GET predicciones') as s:
+                        s.set(status=200)
+                assert cargar() == 1
+            with pytest.raises(ValueError):
+                with tracing.span('pozos'):
+                    raise ValueError('sin red')
+            # Otro hilo: spans propios sin padre
+            def work():
+                with tracing.span('worker'):
+                    pass
+            worker = threading.Thread(target=work)
+            worker.start()
+            worker.join()
+            # Reentrante: una traza interna reutiliza la activa
+            with tracing.trace('upload', str(tmp_path / 'otra.json')) as inner:
+                assert inner is active
+
+        assert tracing.current_trace() is None
+        assert not os.path.exists(tmp_path / 'otra.json')
+        by_name = {}
+        for s in active.spans:
+            by_name.setdefault(s.name, []).append(s)
+        root = by_name['sync'][0]
+        assert root.parent_id is None
+        assert upload.parent_id == root.span_id and upload.attributes == {'races': 12}
+        assert {s.parent_id for s in by_name['supabase GET predicciones']} == {upload.span_id}
+        assert by_name['sqlite cargar'][0].parent_id == upload.span_id
+        assert by_name['pozos'][0].status == 'error' and 'sin red' in by_name['pozos'][0].attributes['error']
+        assert by_name['upload'][1].parent_id == root.span_id  # span de la traza reutilizada
+        assert by_name['worker'][0].parent_id is None and by_name['worker'][0].tid != root.tid
+        assert active.events[0][3] == by_name['sqlite cargar'][0].span_id
+        assert active.repeated() == [('upload', 'supabase GET predicciones', 12, pytest.approx(
+            sum(s.dur_us for s in by_name['supabase GET predicciones']) / 1000, abs=0.1))]
+
+        with open(path, encoding='utf-8') as f:
+            trace = json.load(f)
+        events = trace['traceEvents']
+        assert events[0]['ph'] == 'M'
+        complete = [e for e in events if e['ph'] == 'X']
+        assert len(complete) == len(active.spans)
+        assert all(e['dur'] >= 0 and e['ts'] >= 0 and 'span_id' in e['args'] for e in complete)
+        instant = [e for e in events if e['ph'] == 'i']
+        assert instant[0]['args']['sql'] == 'SELECT 1'
+
+    def test_noop_without_trace_and_switch(self, tmp_path, monkeypatch):
+        with tracing.span('suelto') as s:
+            tracing.event('sqlite', sql='SELECT 1')
+        assert s is None
+
+        monkeypatch.delenv(tracing.TRACE_ENV, raising=False)
+        assert tracing.trace_path() is None and tracing.trace_path('0') is None
+        assert tracing.trace_path('1', 'sync', str(tmp_path)).startswith(os.path.join(str(tmp_path), 'sync_'))
+        assert tracing.trace_path('out/sync.json') == 'out/sync.json'
+        monkeypatch.setenv(tracing.TRACE_ENV, str(tmp_path / 'env.json'))
+        with tracing.trace_run('sync'):
+            pass
+        assert os.path.exists(tmp_path / 'env.json')
+
+    def test_stages_sql_and_http_become_spans(self, tmp_path):
+        import httpx
+        from src.models.data_manager import cargar_programa
+
+        db = str(tmp_path / 'db.sqlite')
+        conn = sqlite3.connect(db)
+        conn.execute('CREATE TABLE programa_carreras (fecha TEXT, hipodromo TEXT, nro_carrera INTEGER, numero INTEGER)')
+        conn.execute("INSERT INTO programa_carreras VALUES ('2030-01-01', 'Club Hípico de Santiago', 1, 1)")
+        conn.commit()
+        conn.close()
+
+        instrumentation.instrument_httpx()
+        client = httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(200, json=[])))
+
+        with tracing.trace('sync') as active, instrumentation.run('sync', path=None, summary=False):
+            with instrumentation.stage('upload'):
+                client.get('https://demo.supabase.co/rest/v1/predicciones?select=id&carrera_id=eq.5')
+                client.post('https://api.vercel.invalid/hook')
+            with instrumentation.stage('inferencia'):
+                cargar_programa(db, fecha='2030-01-01')
+
+        spans = {s.name: s for s in active.spans}
+        assert spans['supabase GET predicciones'].parent_id == spans['upload'].span_id
+        assert spans['supabase GET predicciones'].attributes['status'] == 200
+        assert 'carrera_id=eq.5' in spans['supabase GET predicciones'].attributes['url']
+        assert spans['http POST api.vercel.invalid'].parent_id == spans['upload'].span_id
+        assert spans['sqlite cargar_programa'].parent_id == spans['inferencia'].span_id
+        sql = [e for e in active.events if e[3] == spans['sqlite cargar_programa'].span_id]
+        assert sql and 'programa_carreras' in ' '.join(e[4]['sql'] for e in sql)
@@ -0,0 +1,70 @@
+import pytest
+import pandas as pd
+import numpy as np
+import os
+import sys
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.models.tree_compiler import compile_model, verify, probe_matrix, load_compiled
+
+
+def _datos(n_races=100, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(n_races * 10, 6)), columns=[f'f{i}' for i in range(6)])
+    X.iloc[::13, 2] = np.nan   # feature con NaN en entrenamiento
+    X.iloc[::4, 3] = 0.0       # feature con muchos ceros
+    y = rng.integers(0, 5, len(X))
+    qid = np.repeat(np.arange(n_races), 10)
+    return X, y, qid
+
+
+class TestTreeCompiler:
+    """Tests del compilador de boosters a NumPy"""
+
+    def test_lightgbm_matches_native(self):
+        from lightgbm import LGBMRanker
+
+        X, y, qid = _datos()
+        model = LGBMRanker(n_estimators=40, num_leaves=15, verbose=-1)
+        model.fit(X, y, group=np.bincount(qid))
+
+        compiled = compile_model(model)
+        assert verify(model, compiled, atol=1e-9) < 1e-9
+        assert np.allclose(compiled.predict(X), model.predict(X))
+
+    def test_xgboost_matches_native(self):
+        from xgboost import XGBRanker
+
+        X, y, qid = _datos()
+        model = XGBRanker(n_estimators=30, max_depth=4)
+        model.fit(X, y, qid=qid)
+
+        compiled = compile_model(model)
+        assert verify(model, compiled, atol=1e-5) < 1e-5
+
+    def test_catboost_matches_native(self):
+        from catboost import CatBoostRanker
+
+        X, y, qid = _datos()
+        model = CatBoostRanker(iterations=30, depth=4, verbose=False, allow_writing_files=False)
+        model.fit(X, y, group_id=qid)
+
+        compiled = compile_model(model)
+        assert verify(model, compiled, atol=1e-9) < 1e-9
+
+    def test_save_load_roundtrip(self, tmp_path):
+        from lightgbm import LGBMRanker
+
+        X, y, qid = _datos()
+        model = LGBMRanker(n_estimators=10, verbose=-1).fit(X, y, group=np.bincount(qid))
+        compiled = compile_model(model)
+        path = compiled.save(str(tmp_path / 'model.npz'))
+
+        loaded = load_compiled(path)
+        probe = probe_matrix(compiled, n_rows=64)
+        assert loaded.feature_names == list(X.columns)
+        assert np.array_equal(loaded.predict(probe), compiled.predict(probe))
+        # Columnas desordenadas: se reordenan por feature_names
+        assert np.allclose(loaded.predict(X[X.columns[::-1]]), model.predict(X))
@@ -0,0 +1,125 @@
+import pytest
+import io
+import os
+import sys
+import sqlite3
+from contextlib import redirect_stdout
+
+import numpy as np
+import pandas as pd
+
+# Agregar path del proyecto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.scripts.generate_synthetic_data import generate
+from src.etl.etl_pipeline import HipicaETL
+from src.models.data_manager import (COLUMNAS_3NF, cargar_datos_3nf, cargar_datos_3nf_tipado,
+                                     calcular_todos_patrones)
+
+
+def _como_untyped(df):
+    """Frame tipado llevado a los tipos de cargar_datos_3nf, para comparar valores."""
+    out = df.copy()
+    for col in out.columns:
+        if isinstance(out[col].dtype, pd.CategoricalDtype):
+            out[col] = out[col].astype(object).where(out[col].notna(), None)
+    out['fecha'] = out['fecha'].dt.strftime('%Y-%m-%d')
+    return out
+
+
+@pytest.fixture(scope='module')
+def db(tmp_path_factory):
+    with redirect_stdout(io.StringIO()):
+        return generate(str(tmp_path_factory.mktemp('typed')), participations=3000, seed=5,
+                        write_csv=False)['db_path']
+
+
+class TestCargarDatos3nfTipado:
+    """Tests del loader 3NF con dtypes compactos"""
+
+    def test_same_result_with_compact_dtypes(self, db):
+        plain = cargar_datos_3nf(db)
+        typed = cargar_datos_3nf_tipado(db)
+
+        assert list(typed.columns) == list(plain.columns) == COLUMNAS_3NF
+        assert typed['part_id'].tolist() == plain['part_id'].tolist()  # mismo orden de filas
+        assert typed['part_id'].dtype == 'int32' and typed['nro_carrera'].dtype == 'int32'
+        assert typed['dividendo'].dtype == 'float32' and typed['posicion'].dtype == 'float32'
+        assert typed['caballo'].dtype == 'category' and typed['hipodromo'].dtype == 'category'
+        assert typed['fecha'].dtype.kind == 'M'
+
+        converted = _como_untyped(typed)
+        for col in ['tiempo', 'caballo', 'padre', 'jinete', 'fecha', 'hipodromo', 'tipo', 'pista',
+                    'caballo_id', 'jinete_id', 'hipodromo_id', 'nro_carrera']:
+            assert converted[col].tolist() == plain[col].tolist(), col
+        for col in ['posicion', 'mandil', 'peso_fs', 'dividendo', 'ano_nacimiento', 'distancia']:
+            np.testing.assert_allclose(converted[col].astype('float64'), plain[col].astype('float64'),
+                                       rtol=1e-6, err_msg=col)
+
+        # Varias veces menos memoria residente
+        assert typed.memory_usage(deep=True).sum() * 4 < plain.memory_usage(deep=True).sum()
+        # Las categorías sólo tienen valores presentes (groupby sin grupos vacíos)
+        assert set(typed['jinete'].cat.categories) == set(plain['jinete'])
+
+    def test_legacy_text_numerics_normalized_by_etl(self, db, tmp_path, monkeypatch):
+        legacy = str(tmp_path / 'legacy.db')
+        with sqlite3.connect(db) as src, sqlite3.connect(legacy) as dst:
+            src.backup(dst)
+        conn = sqlite3.connect(legacy)
+        conn.execute('PRAGMA user_version = 0')  # BD anterior a la migración
+        ids = [r[0] for r in conn.execute('SELECT id FROM participaciones ORDER BY id LIMIT 3')]
+        conn.execute("UPDATE participaciones SET dividendo = '2,5', peso_fs = '56 Kg' WHERE id = ?", (ids[0],))
+        conn.execute("UPDATE participaciones SET dividendo = 'N/A' WHERE id = ?", (ids[1],))
+        conn.commit()
+
+        # Sin normalizar, ambos loaders siguen limpiando los strings
+        for df in (cargar_datos_3nf(legacy), cargar_datos_3nf_tipado(legacy)):
+            row = df.set_index('part_id').loc[ids[0]]
+            assert row['dividendo'] == pytest.approx(2.5) and row['peso_fs'] == pytest.approx(56)
+            assert pd.isna(df.set_index('part_id').loc[ids[1], 'dividendo'])
+
+        with redirect_stdout(io.StringIO()):
+            HipicaETL(db_path=legacy).conn.close()
+        assert conn.execute('''SELECT COUNT(*) FROM participaciones
+                               WHERE typeof(peso_fs) = 'text' OR typeof(dividendo) = 'text' ''').fetchone()[0] == 0
+        assert conn.execute('SELECT dividendo, peso_fs FROM participaciones WHERE id = ?', (ids[0],)).fetchone() == (2.5, 56.0)
+        assert conn.execute('PRAGMA user_version').fetchone()[0] >= 1
+
+        # Migración aplicada: los HipicaETL siguientes no vuelven a escanear participaciones
+        from src.utils import instrumentation
+
+        statements = []
+        monkeypatch.setattr(instrumentation, 'instrument_connection',
+                            lambda etl_conn: etl_conn.set_trace_callback(statements.append) or etl_conn)
+        with redirect_stdout(io.StringIO()):
+            HipicaETL(db_path=legacy).conn.close()
+        monkeypatch.undo()
+        assert statements and not [sql for sql in statements if 'typeof' in sql]
+        conn.close()
+
+        df = cargar_datos_3nf(legacy)
+        assert df['dividendo'].dtype == 'float64' and df['peso_fs'].dtype == 'float64'
+
+    def test_migrated_callers_match_untyped(self, db):
+        from src.models.feature_store import FeatureStore
+        from src.models.train_v5_optimized import prepare_training_data
+
+        plain = cargar_datos_3nf(db)
+        typed = cargar_datos_3nf_tipado(db)
+
+        assert calcular_todos_patrones(typed.copy()) == calcular_todos_patrones(plain.copy())
+
+        stores = [FeatureStore(), FeatureStore()]
+        for store, df in zip(stores, (plain, typed)):
+            store.update(df.copy())
+        for attr in ['horse_stats', 'horse_track_stats', 'horse_dist_stats', 'duo_stats', 'sire_stats']:
+            assert getattr(stores[0], attr) == getattr(stores[1], attr), attr
+
+        with redirect_stdout(io.StringIO()):
+            X_a, y_a, g_a, _, _ = prepare_training_data(plain.copy())
+            X_b, y_b, g_b, _, _ = prepare_training_data(typed.copy())
+        assert g_a.tolist() == g_b.tolist() and y_a.tolist() == y_b.tolist()
+        np.testing.assert_allclose(X_a.astype('float64'), X_b.astype('float64'), rtol=1e-5)
+
+    def test_missing_db_returns_empty(self, tmp_path):
+        assert cargar_datos_3nf_tipado(str(tmp_path / 'no_existe.db')).empty